@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+Import Time
+-----------
+Profile the imports done when a uWSGI or Celery worker starts, and fail
+if startup is over a budget.
+
+Both pay this on every worker start, w/ uWSGI ``max-requests`` recycling
+and Celery autoscaling.
+
+A child interpreter does what a worker does at startup: ``django.setup()``,
+then imports the URLconf and every app's ``tasks``. Each module's import
+time is read from ``python -X importtime`` (Python 3.7+), or from an
+``__import__`` hook printing the same format on Python 2.
+
+:usage:
+    DJANGO_SETTINGS_MODULE=textress.settings.local \\
+        python scripts/import_time.py --top 20 --budget 2.5
+
+Exits 1 if the total startup time is over ``--budget`` seconds.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+TEXTRESS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+    'textress')
+
+STARTUP = """
+import django
+django.setup()
+
+from importlib import import_module
+from django.conf import settings
+
+import_module(settings.ROOT_URLCONF)
+for app in settings.INSTALLED_APPS:
+    try:
+        import_module(app + '.tasks')
+    except ImportError:
+        pass
+"""
+
+# Python 2 has no ``-X importtime``, so time each 1st import w/ a hook,
+# and print the same "import time: self | cumulative | name" lines
+IMPORT_HOOK = """
+import sys
+import time
+import __builtin__
+
+_import = __builtin__.__import__
+_stack = []
+
+def _timed_import(name, *args, **kwargs):
+    if name in sys.modules:
+        return _import(name, *args, **kwargs)
+
+    _stack.append(0)
+    start = time.time()
+    try:
+        return _import(name, *args, **kwargs)
+    finally:
+        cumulative = int((time.time() - start) * 1000000)
+        children = _stack.pop()
+        if _stack:
+            _stack[-1] += cumulative
+        sys.stderr.write("import time: {:>9} | {:>10} | {}{}\\n".format(
+            cumulative - children, cumulative, '  ' * len(_stack), name))
+
+__builtin__.__import__ = _timed_import
+"""
+
+
+def command(python):
+    if has_importtime(python):
+        return [python, '-X', 'importtime', '-c', STARTUP]
+    return [python, '-c', IMPORT_HOOK + STARTUP]
+
+
+def has_importtime(python):
+    version = subprocess.check_output([python, '-c',
+        'import sys; print(sys.version_info >= (3, 7))'])
+    return version.strip() == b'True'
+
+
+def parse(stderr):
+    """
+    Returns a list of (self_us, cumulative_us, name) for each module in
+    the ``-X importtime`` output, and the total startup time in us.
+    """
+    modules = []
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        self_us, cumulative_us = int(self_us), int(cumulative_us)
+        # top level imports have no indent
+        if not name[1:].startswith(' '):
+            total += cumulative_us
+        modules.append((self_us, cumulative_us, name.strip()))
+    return modules, total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--python', default=sys.executable,
+        help="Interpreter of the workers. Default: this one")
+    parser.add_argument('--settings', default=os.environ.get('DJANGO_SETTINGS_MODULE',
+        'textress.settings.local'))
+    parser.add_argument('--top', type=int, default=20,
+        help="Number of slowest modules to list, by cumulative time")
+    parser.add_argument('--budget', type=float, default=None,
+        help="Max seconds for startup. Exits 1 if over")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=args.settings)
+    process = subprocess.Popen(command(args.python), cwd=TEXTRESS_DIR, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    stdout, stderr = process.communicate()
+    if process.returncode:
+        sys.stderr.write(stderr)
+        return process.returncode
+
+    modules, total = parse(stderr)
+
+    print("{:>12}{:>12}  {}".format("self ms", "cumul. ms", "module"))
+    for self_us, cumulative_us, name in sorted(modules, key=lambda m: -m[1])[:args.top]:
+        print("{:>12.1f}{:>12.1f}  {}".format(self_us / 1000., cumulative_us / 1000., name))
+    print("\n{} modules, startup: {:.3f}s".format(len(modules), total / 1000000.))
+
+    if args.budget is not None and total / 1000000. > args.budget:
+        print("Over the startup budget of {:.3f}s".format(args.budget))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+MONTHLY_CHARGE_DESC = "monthly charge: "
+
+
+def backfill_monthly_phone_number_charges(apps, schema_editor):
+    """
+    Set 'phone_number' and 'billing_month' on the monthly PH charges made 
+    before these fields existed, so they aren't charged again.
+    """
+    AcctTrans = apps.get_model('account', 'AcctTrans')
+    seen = set()
+
+    for acct_trans in (AcctTrans.objects.filter(trans_type__name='phone_number',
+                                                desc__startswith=MONTHLY_CHARGE_DESC,
+                                                insert_date__isnull=False)
+                                        .order_by('id')):
+        phone_number = acct_trans.desc[len(MONTHLY_CHARGE_DESC):]
+        billing_month = acct_trans.insert_date.replace(day=1)
+
+        key = (acct_trans.hotel_id, phone_number, billing_month)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        AcctTrans.objects.filter(id=acct_trans.id).update(
+            phone_number=phone_number, billing_month=billing_month)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_auto_20151129_1605'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accttrans',
+            name='billing_month',
+            field=models.DateField(help_text=b"1st of the month that a monthly 'phone_number' charge is for.", null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='accttrans',
+            name='phone_number',
+            field=models.CharField(help_text=b"NULL unless a monthly 'phone_number' charge", max_length=12, null=True, blank=True),
+        ),
+        migrations.RunPython(backfill_monthly_phone_number_charges, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='accttrans',
+            unique_together=set([('hotel', 'phone_number', 'billing_month')]),
+        ),
+    ]
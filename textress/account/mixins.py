@@ -1,8 +1,11 @@
+from account.models import AcctCost
+
+
 class AcctCostContextMixin(object):
 
     def get_context_data(self, **kwargs):
         context = super(AcctCostContextMixin, self).get_context_data(**kwargs)
-        context['acct_cost'] = getattr(self.hotel, 'acct_cost', None)
+        context['acct_cost'] = AcctCost.objects.for_hotel(self.hotel)
         return context
 
 
@@ -5,7 +5,7 @@ import calendar
 import datetime
 import pytz
 
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Max, Sum, Q
 from django.conf import settings
 from django.core.cache import cache
@@ -15,14 +15,13 @@ from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.utils.translation import ugettext, ugettext_lazy as _
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 
 import stripe
-stripe.api_key = settings.STRIPE_SECRET_KEY
 
 from main.models import Hotel
 from payment.models import Charge
-from utils import email
+from utils import email, routers
 from utils.exceptions import RechargeFailedExcp, AutoRechargeOffExcp
 from utils.models import Dates, TimeStampBaseModel
 
@@ -136,22 +135,62 @@ BALANCE_AMOUNTS = [(INIT_BALANCE_AMOUNT, '${:.2f}'.format(INIT_BALANCE_AMOUNT/10
 
 class AcctCostManager(models.Manager):
 
+    @staticmethod
+    def cache_key(hotel_id):
+        return "acct_cost_{}".format(hotel_id)
+
+    def upsert(self, hotel, **kwargs):
+        """
+        Create the Hotel's AcctCost, or update only the ``kwargs`` fields 
+        whose values changed, in a single ``update_fields`` save.
+
+        Return: AcctCost, created
+        """
+        try:
+            acct_cost = self.get(hotel=hotel)
+        except AcctCost.DoesNotExist:
+            return self.create(hotel=hotel, **kwargs), True
+
+        changed = [k for k,v in kwargs.items() if getattr(acct_cost, k) != v]
+        if changed:
+            for k in changed:
+                setattr(acct_cost, k, kwargs[k])
+            acct_cost.save(update_fields=changed + ['modified'])
+
+        return acct_cost, False
+
     def get_or_create(self, hotel, **kwargs):
         '''
         Override `get_or_create` to enforce 1 record p/ Hotel.
 
         Will - get, create, or update the AcctCost record for the Hotel.
         '''
+        return self.upsert(hotel, **kwargs)
+
+    def for_hotel(self, hotel):
+        """
+        Read only accessor for Views. Returns the Hotel's cached AcctCost, 
+        or None, and never writes to the DB.
+        """
         try:
-            acct_cost = self.get(hotel=hotel)
+            return self.get_for_hotel(hotel)
         except AcctCost.DoesNotExist:
-            acct_cost = self.create(hotel=hotel, **kwargs)
-            return acct_cost, True
-        else:
-            for k,v in kwargs.items():
-                setattr(acct_cost, k, v)
-                acct_cost.save()
-            return acct_cost, False
+            return
+
+    def get_for_hotel(self, hotel):
+        """
+        Cached accessor for the recharge and init math, which can't go on 
+        w/o an AcctCost.
+
+        Raise: AcctCost.DoesNotExist
+        """
+        key = self.cache_key(hotel.id)
+        acct_cost = cache.get(key)
+        if not acct_cost:
+            with routers.use_primary():
+                acct_cost = self.get(hotel=hotel)
+            cache.set(key, acct_cost)
+        return acct_cost
 
 
 class AcctCost(TimeStampBaseModel):
@@ -351,7 +390,7 @@ class AcctTransQuerySet(models.query.QuerySet):
 class AcctTransManager(Dates, models.Manager):
 
     def get_queryset(self):
-        return AcctTransQuerySet(self.model, self._db)
+        return AcctTransQuerySet(self.model, using=self._db)
 
     def monthly_trans(self, hotel, date=None):
         """Default to return the Hotel's current month's transactions
@@ -407,7 +446,7 @@ class AcctTransManager(Dates, models.Manager):
             self.recharge(hotel, recharge_amt)
 
     def recharge(self, hotel, recharge_amt):
-        if not hotel.acct_cost.auto_recharge:
+        if not AcctCost.objects.get_for_hotel(hotel).auto_recharge:
             self.handle_auto_recharge_failed(hotel)
 
         # if ``charge_hotel`` is called here, all ``recharge`` tests will need a Stripe
@@ -482,8 +521,10 @@ class AcctTransManager(Dates, models.Manager):
         return acct_trans
 
     def sms_used_count(self, hotel, date=None):
+        "SMS segments, not Messages, w/ an ``insert_date`` of ``date``."
         date = date or self._today
-        return hotel.messages.filter(insert_date=date).count()
+        return (hotel.messages.filter(insert_date=date)
+                              .aggregate(Sum('segments'))['segments__sum'] or 0)
 
     def create_sms_used(self, hotel, date):
         # SMS counts needed to get the daily incremental "sms_used" cost
@@ -546,11 +587,11 @@ class AcctTransManager(Dates, models.Manager):
 
     @staticmethod
     def check_recharge_required(hotel, balance):
-        return balance < hotel.acct_cost.balance_min
+        return balance < AcctCost.objects.get_for_hotel(hotel).balance_min
 
     @staticmethod
     def calculate_recharge_amount(hotel, balance):
-        return hotel.acct_cost.recharge_amt - balance
+        return AcctCost.objects.get_for_hotel(hotel).recharge_amt - balance
 
     def phone_number_charge(self, hotel, phone_number, desc=None):
         """
@@ -573,6 +614,76 @@ class AcctTransManager(Dates, models.Manager):
             desc=desc or "PH charge ${:.2f} for PH#: {}".format(amount/100, phone_number)
         )
 
+    def phone_number_monthly_charges(self, hotel, phone_numbers, date=None):
+        """
+        Batch version of ``phone_number_charge`` for the monthly PH charges.
+
+        A single ``check_balance`` covers the total of all charges, so there 
+        is one 'sms_used' update and at most one recharge per Hotel, then 
+        the AcctTrans are ``bulk_create``'d with their running balances.
+
+        The Hotel row is locked 1st, so concurrent runs for the same Hotel 
+        are serialized, and PHs already charged for the 'billing_month' are 
+        skipped before the card is recharged.
+
+        :hotel: Hotel object
+        :phone_numbers: PhoneNumber objects not yet charged for the month
+        :date: insert_date, defaults to today. Its month is the 'billing_month'
+
+        Return: list of created AcctTrans
+        """
+        if not phone_numbers:
+            return []
+
+        date = date or self._today
+        billing_month = self.first_of_month(date.month, date.year)
+        amount = -(settings.PHONE_NUMBER_MONTHLY_COST)
+        trans_type = self.trans_types.phone_number
+        auto_recharge_off = None
+
+        with transaction.atomic():
+            Hotel.objects.select_for_update().get(pk=hotel.pk)
+
+            charged = set(self.filter(hotel=hotel, trans_type=trans_type,
+                                      billing_month=billing_month)
+                              .values_list('phone_number', flat=True))
+            phone_numbers = [ph for ph in phone_numbers
+                             if ph.phone_number not in charged]
+            if not phone_numbers:
+                return []
+
+            try:
+                self.check_balance(hotel, extra_amount=amount*len(phone_numbers))
+            except AutoRechargeOffExcp as e:
+                # raised after the commit, so the Hotel stays deactivated
+                auto_recharge_off = e
+            else:
+                balance = self.get_balance(hotel)
+                acct_trans = []
+
+                for ph in phone_numbers:
+                    balance += amount
+                    acct_trans.append(AcctTrans(
+                        hotel=hotel,
+                        trans_type=trans_type,
+                        amount=amount,
+                        desc=ph.monthly_charge_desc,
+                        phone_number=ph.phone_number,
+                        billing_month=billing_month,
+                        insert_date=date,
+                        balance=balance
+                    ))
+
+                self.bulk_create(acct_trans)
+
+        if auto_recharge_off:
+            raise auto_recharge_off
+
+        # ``bulk_create`` doesn't send signals
+        BillingSnapshot.invalidate(hotel.id)
+
+        return acct_trans
+
     def sms_used_mtd(self, hotel, insert_date):
         """
         MTD SMS used by the Hotel.
@@ -611,7 +722,7 @@ class AcctTransManager(Dates, models.Manager):
             return self.get_or_create_recharge_amt(hotel, date)
 
     def get_or_create_init_amt(self, hotel, date):
-        amount = hotel.acct_cost.init_amt
+        amount = AcctCost.objects.get_for_hotel(hotel).init_amt
         trans_type = self.trans_types.init_amt
 
         acct_tran = self.create(
@@ -624,7 +735,7 @@ class AcctTransManager(Dates, models.Manager):
         return acct_tran, True
 
     def get_or_create_recharge_amt(self, hotel, date):
-        amount = hotel.acct_cost.recharge_amt
+        amount = AcctCost.objects.get_for_hotel(hotel).recharge_amt
         trans_type = self.trans_types.recharge_amt
 
         acct_tran = self.create(
@@ -666,12 +777,18 @@ class AcctTrans(TimeStampBaseModel):
     insert_date = models.DateField(_("Insert Date"), blank=True, null=True)
     balance = models.PositiveIntegerField(_("Balance"), blank=True,
         help_text="Current blance, just like in a Bank Account.")
+    # Monthly PH charges only
+    phone_number = models.CharField(max_length=12, blank=True, null=True,
+        help_text="NULL unless a monthly 'phone_number' charge")
+    billing_month = models.DateField(blank=True, null=True,
+        help_text="1st of the month that a monthly 'phone_number' charge is for.")
 
     objects = AcctTransManager()
 
     class Meta:
         verbose_name = "Account Transaction"
         ordering = ('-insert_date',)
+        unique_together = ('hotel', 'phone_number', 'billing_month')
 
     def __str__(self):
         return "Date: {self.insert_date} Hotel: {self.hotel} TransType: {self.trans_type} \
@@ -692,3 +809,110 @@ Amount: ${amount:.2f}".format(self=self, amount=float(self.amount)/100.0)
                 hotel=self.hotel, excludes=True) + self.amount
         else:
             self.balance = AcctTrans.objects.get_balance(hotel=self.hotel) + self.amount
+
+
+
+####################
+# BILLING SNAPSHOT #
+####################
+
+FUNDING_TRANS_TYPES = ['init_amt', 'recharge_amt']
+
+
+class BillingSnapshot(Dates):
+    """
+    Precomputed Billing page data for a single Hotel, so the Billing Views 
+    render from one cache read instead of re-querying AcctStmt / AcctTrans.
+
+    :balance: current funds balance
+    :sms_used_mtd: posted 'sms_used' count for the current month
+    :funds_added_mtd: 'init_amt' + 'recharge_amt' for the current month
+    :starting_balance: last month's ending balance
+    :funding_trans: last 4 'init_amt' / 'recharge_amt' AcctTrans
+    :acct_stmts: the Hotel's statement index, newest first
+
+    The cached snapshot is dropped on every AcctTrans / AcctStmt write for 
+    the Hotel, and rebuilt on the next read.
+    """
+    def __init__(self, hotel):
+        today = self._today
+
+        self.hotel_id = hotel.id
+        self.date = today
+        self.balance = AcctTrans.objects.get_balance(hotel)
+        self.sms_used_mtd = AcctStmt.objects.get_total_sms(hotel, today)
+        self.funds_added_mtd = AcctTrans.objects.funds_added(hotel, today)
+        self.starting_balance = AcctStmt.objects.starting_balance(hotel, today)
+        self.funding_trans = list(AcctTrans.objects.filter(hotel=hotel,
+                                                           trans_type__name__in=FUNDING_TRANS_TYPES)
+                                                   .select_related('trans_type')
+                                                   .order_by('-insert_date')[:4])
+        self.acct_stmts = list(AcctStmt.objects.filter(hotel=hotel))
+
+    @staticmethod
+    def cache_key(hotel_id):
+        return "billing_snapshot_{}".format(hotel_id)
+
+    @classmethod
+    def get(cls, hotel):
+        """
+        Return the cached snapshot, or build and cache it. A snapshot built 
+        on a previous day is rebuilt, so the MTD figures roll over.
+        """
+        snapshot = cache.get(cls.cache_key(hotel.id))
+        if not snapshot or snapshot.date != snapshot._today:
+            snapshot = cls.refresh(hotel)
+        return snapshot
+
+    @classmethod
+    def refresh(cls, hotel):
+        # built from the primary, b/c it's cached past the replica's lag
+        with routers.use_primary():
+            snapshot = cls(hotel)
+        cache.set(cls.cache_key(hotel.id), snapshot,
+            settings.BILLING_SNAPSHOT_CACHE_TIMEOUT)
+        return snapshot
+
+    @classmethod
+    def invalidate(cls, hotel_id):
+        cache.delete(cls.cache_key(hotel_id))
+
+    def get_acct_stmt(self, month=None, year=None):
+        """
+        Return the AcctStmt for the ``month`` / ``year`` from the statement 
+        index, or the latest AcctStmt if neither are given.
+        """
+        if not all([month, year]):
+            return self.acct_stmts[0] if self.acct_stmts else None
+
+        for acct_stmt in self.acct_stmts:
+            if acct_stmt.month == int(month) and acct_stmt.year == int(year):
+                return acct_stmt
+
+
+'''
+Billing Cache
+-------------
+Drop the Hotel's cached ``BillingSnapshot`` / ``AcctCost`` when its billing 
+records change. New Hotels are also cleared, so stale values are never served 
+for a reused id.
+'''
+@receiver(post_save, sender=AcctTrans)
+@receiver(post_delete, sender=AcctTrans)
+@receiver(post_save, sender=AcctStmt)
+@receiver(post_delete, sender=AcctStmt)
+def invalidate_billing_snapshot(sender, instance=None, **kwargs):
+    BillingSnapshot.invalidate(instance.hotel_id)
+
+
+@receiver(post_save, sender=AcctCost)
+@receiver(post_delete, sender=AcctCost)
+def invalidate_acct_cost(sender, instance=None, **kwargs):
+    cache.delete(AcctCost.objects.cache_key(instance.hotel_id))
+
+
+@receiver(post_save, sender=Hotel)
+def invalidate_new_hotel_billing_cache(sender, instance=None, created=False, **kwargs):
+    if created:
+        BillingSnapshot.invalidate(instance.id)
+        cache.delete(AcctCost.objects.cache_key(instance.id))
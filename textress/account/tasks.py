@@ -20,13 +20,23 @@ PH charge date, then charge.
 """
 from __future__ import absolute_import
 
+import logging
+from collections import defaultdict
+
 from django.conf import settings
+from django.db import IntegrityError
 
 from celery import shared_task
 
 from account.models import AcctTrans, TransType, AcctStmt, Pricing
 from main.models import Hotel
+from sms.models import PhoneNumber
+from utils.exceptions import AutoRechargeOffExcp
 from utils.models import Dates
+from utils.routers import on_replica
+
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
@@ -57,6 +67,7 @@ def get_or_create_acct_stmt(hotel_id, month, year):
 
 
 @shared_task
+@on_replica
 def get_or_create_acct_stmt_all_hotels(month, year):
     """
     Master scheduled 'AcctStmt' task to update all Hotels.
@@ -65,14 +76,17 @@ def get_or_create_acct_stmt_all_hotels(month, year):
         get_or_create_acct_stmt.delay(hotel.id, month, year)
 
 
-FIRST_OF_MONTH = Dates().first_of_month()
-
-
 @shared_task
-def acct_stmt_update_prev(hotel_id, first_of_month=FIRST_OF_MONTH):
+def acct_stmt_update_prev(hotel_id, first_of_month=None):
+    """
+    ``first_of_month`` defaults to the current month, computed per call
+    and not at import, so it doesn't go stale in a long lived worker.
+    """
     hotel = Hotel.objects.get(id=hotel_id)
 
     dates = Dates()
+    if first_of_month is None:
+        first_of_month = dates.first_of_month()
     last_month = dates.last_month_end(first_of_month)
 
     update_prev_month = False
@@ -99,11 +113,57 @@ def acct_stmt_update_prev(hotel_id, first_of_month=FIRST_OF_MONTH):
 
 
 @shared_task
-def acct_stmt_update_prev_all_hotels(first_of_month=FIRST_OF_MONTH):
+@on_replica
+def acct_stmt_update_prev_all_hotels(first_of_month=None):
+    if first_of_month is None:
+        first_of_month = Dates().first_of_month()
+
     for hotel_id in Hotel.objects.values_list("id", flat=True):
         acct_stmt_update_prev.delay(hotel_id, first_of_month=first_of_month)
 
 
+@shared_task
+def charge_monthly_phone_numbers(hotel_ids):
+    """
+    Batch monthly 'phone_number' charges for a chunk of Hotels.
+
+    One query finds all 'Phone Numbers' of the chunk w/o a charge for the 
+    current 'billing_month', then each Hotel gets a single ``bulk_create``.
+    The AcctTrans unique (hotel, phone_number, billing_month) makes 
+    reruns a no-op. A Hotel that fails is logged, and the rest of the 
+    chunk is still charged.
+    """
+    dates = Dates()
+    today = dates._today
+
+    charged = (AcctTrans.objects.filter(hotel_id__in=hotel_ids,
+                                        trans_type__name='phone_number',
+                                        billing_month=dates.first_of_month())
+                                .values('phone_number'))
+
+    phone_numbers = (PhoneNumber.objects.filter(hotel_id__in=hotel_ids)
+                                        .exclude(phone_number__in=charged)
+                                        .select_related('hotel'))
+
+    hotel_phone_numbers = defaultdict(list)
+    for ph in phone_numbers:
+        hotel_phone_numbers[ph.hotel].append(ph)
+
+    for hotel, phs in hotel_phone_numbers.items():
+        try:
+            AcctTrans.objects.phone_number_monthly_charges(hotel, phs, today)
+        except AutoRechargeOffExcp:
+            # Hotel is deactivated and emailed by ``recharge``
+            continue
+        except IntegrityError:
+            # charged by a concurrent run
+            continue
+        except Exception:
+            # i.e. no AcctCost, the rest of the chunk is still charged
+            logger.exception("Monthly PH charges failed for Hotel %s", hotel.id)
+            continue
+
+
 @shared_task
 def charge_hotel_monthly_for_phone_numbers(hotel_id):
     """
@@ -114,28 +174,25 @@ def charge_hotel_monthly_for_phone_numbers(hotel_id):
     today = dates._today.day
 
     if today == settings.PHONE_NUMBER_MONTHLY_CHARGE_DAY:
-        hotel = Hotel.objects.get(id=hotel_id)
-        
-        for ph in hotel.phone_numbers.all():
-            try:
-                AcctTrans.objects.get(
-                    hotel=hotel,
-                    trans_type__name='phone_number',
-                    insert_date__day=settings.PHONE_NUMBER_MONTHLY_CHARGE_DAY,
-                    desc=ph.monthly_charge_desc
-                )
-            except AcctTrans.DoesNotExist:
-                AcctTrans.objects.phone_number_charge(
-                    hotel=hotel, 
-                    phone_number=ph.phone_number,
-                    desc=ph.monthly_charge_desc
-                )
+        charge_monthly_phone_numbers(hotel_ids=[hotel_id])
 
 
 @shared_task
+@on_replica
 def charge_hotel_monthly_for_phone_numbers_all_hotels():
-    for hotel in Hotel.objects.all():
-        charge_hotel_monthly_for_phone_numbers.delay(hotel.id)
+    """
+    Master scheduled task. Charges Hotels in chunks of 
+    ``PHONE_NUMBER_CHARGE_CHUNK_SIZE``.
+    """
+    dates = Dates()
+    today = dates._today.day
+
+    if today == settings.PHONE_NUMBER_MONTHLY_CHARGE_DAY:
+        hotel_ids = list(Hotel.objects.values_list('id', flat=True))
+        chunk_size = settings.PHONE_NUMBER_CHARGE_CHUNK_SIZE
+
+        for i in range(0, len(hotel_ids), chunk_size):
+            charge_monthly_phone_numbers.delay(hotel_ids[i:i+chunk_size])
 
 
 @shared_task
@@ -5,6 +5,7 @@ import pytz
 
 from django.db.models import Max, Sum
 from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
 from django.conf import settings
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
@@ -16,15 +17,16 @@ from model_mommy import mommy
 import stripe
 
 from account.models import (Dates, Pricing, TransType, TransTypeCache, AcctCost, AcctStmt,
-    AcctTrans, TRANS_TYPES, INIT_CHARGE_AMOUNT, CHARGE_AMOUNTS, BALANCE_AMOUNTS)
+    AcctTrans, BillingSnapshot, TRANS_TYPES, INIT_CHARGE_AMOUNT, CHARGE_AMOUNTS, BALANCE_AMOUNTS)
 from account.tests.factory import (create_acct_stmts, create_acct_tran, create_acct_trans,
     create_trans_types)
 from concierge.models import Guest, Message
 from concierge.tests.factory import make_guests, make_messages
-from main.models import Subaccount
+from main.models import Hotel, Subaccount
 from main.tests.factory import create_hotel, create_hotel_user, PASSWORD
 from payment.models import Charge, Customer
-from utils import create
+from sms.tests.factory import fake_phone_number
+from utils import create, routers
 from utils.exceptions import AutoRechargeOffExcp
 
 
@@ -157,6 +159,69 @@ class AcctCostTests(TestCase):
         self.assertEqual(acct_cost.init_amt, INIT_CHARGE_AMOUNT)
         self.assertEqual(acct_cost.recharge_amt, INIT_CHARGE_AMOUNT)
 
+    def test_upsert__no_changes_no_write(self):
+        acct_cost, created = AcctCost.objects.upsert(self.hotel)
+        self.assertTrue(created)
+
+        with self.assertNumQueries(1):
+            new_acct_cost, created = AcctCost.objects.upsert(self.hotel,
+                balance_min=acct_cost.balance_min, recharge_amt=acct_cost.recharge_amt)
+
+        self.assertFalse(created)
+        self.assertEqual(new_acct_cost.modified, acct_cost.modified)
+
+    def test_upsert__single_write(self):
+        AcctCost.objects.upsert(self.hotel)
+
+        # 1 select, 1 update
+        with self.assertNumQueries(2):
+            acct_cost, created = AcctCost.objects.upsert(self.hotel,
+                balance_min=BALANCE_AMOUNTS[2][0], recharge_amt=CHARGE_AMOUNTS[2][0])
+
+        acct_cost = AcctCost.objects.get(hotel=self.hotel)
+        self.assertEqual(acct_cost.balance_min, BALANCE_AMOUNTS[2][0])
+        self.assertEqual(acct_cost.recharge_amt, CHARGE_AMOUNTS[2][0])
+
+    def test_for_hotel(self):
+        acct_cost, created = AcctCost.objects.upsert(self.hotel)
+
+        self.assertEqual(AcctCost.objects.for_hotel(self.hotel), acct_cost)
+        # cached
+        with self.assertNumQueries(0):
+            self.assertEqual(AcctCost.objects.for_hotel(self.hotel), acct_cost)
+
+    @override_settings(DATABASE_REPLICA='replica')
+    def test_for_hotel__cached_from_primary(self):
+        AcctCost.objects.upsert(self.hotel)
+        routers.reset()
+        self.addCleanup(routers.reset)
+
+        with routers.use_replica():
+            acct_cost = AcctCost.objects.for_hotel(self.hotel)
+
+        self.assertEqual(acct_cost._state.db, 'default')
+
+    def test_for_hotel__does_not_exist(self):
+        self.assertIsNone(AcctCost.objects.for_hotel(self.hotel))
+        self.assertFalse(AcctCost.objects.filter(hotel=self.hotel).exists())
+
+    def test_get_for_hotel__does_not_exist(self):
+        with self.assertRaises(AcctCost.DoesNotExist):
+            AcctCost.objects.get_for_hotel(self.hotel)
+
+    def test_recharge__no_acct_cost(self):
+        with self.assertRaises(AcctCost.DoesNotExist):
+            AcctTrans.objects.check_recharge_required(self.hotel, 0)
+
+    def test_for_hotel__updated(self):
+        AcctCost.objects.upsert(self.hotel)
+        AcctCost.objects.for_hotel(self.hotel)
+
+        AcctCost.objects.upsert(self.hotel, balance_min=BALANCE_AMOUNTS[2][0])
+
+        self.assertEqual(AcctCost.objects.for_hotel(self.hotel).balance_min,
+            BALANCE_AMOUNTS[2][0])
+
 
 class AcctStmtTests(TestCase):
 
@@ -922,6 +987,14 @@ class AcctTransTests(TransactionTestCase):
 
         self.assertEqual(sms_used_count, messages.count())
 
+    def test_sms_used_count__segments(self):
+        guest = make_guests(hotel=self.hotel, number=1)[0]
+        for body, segments in (("Hi", 1), ("a" * 307, 3)):
+            mommy.make(Message, sid=create._generate_name(), hotel=self.hotel,
+                guest=guest, insert_date=self.today, body=body, segments=segments)
+
+        self.assertEqual(AcctTrans.objects.sms_used_count(self.hotel), 4)
+
     # create_sms_used
 
     def test_create_sms_used(self):
@@ -1092,6 +1165,75 @@ class AcctTransTests(TransactionTestCase):
         self.assertEqual(acct_tran.desc, "PH charge ${:.2f} for PH#: {}".format(
             -settings.PHONE_NUMBER_MONTHLY_COST/100, desc))
 
+    # phone_number_monthly_charges
+
+    @patch("account.models.AcctTransManager.check_balance")
+    def test_phone_number_monthly_charges(self, mock_check_balance):
+        phs = [fake_phone_number(self.hotel) for i in range(2)]
+        init_balance = AcctTrans.objects.get_balance(self.hotel)
+
+        acct_trans = AcctTrans.objects.phone_number_monthly_charges(self.hotel, phs)
+
+        # single balance check for the total
+        mock_check_balance.assert_called_once_with(self.hotel,
+            extra_amount=2 * -settings.PHONE_NUMBER_MONTHLY_COST)
+        self.assertEqual(len(acct_trans), 2)
+        for ph in phs:
+            acct_tran = AcctTrans.objects.get(hotel=self.hotel, phone_number=ph.phone_number)
+            self.assertEqual(acct_tran.trans_type, self.phone_number)
+            self.assertEqual(acct_tran.amount, -settings.PHONE_NUMBER_MONTHLY_COST)
+            self.assertEqual(acct_tran.desc, ph.monthly_charge_desc)
+            self.assertEqual(acct_tran.insert_date, self.today)
+            self.assertEqual(acct_tran.billing_month, self.today.replace(day=1))
+        self.assertEqual(
+            AcctTrans.objects.get_balance(self.hotel),
+            init_balance - 2 * settings.PHONE_NUMBER_MONTHLY_COST
+        )
+
+    @patch("account.models.AcctTransManager.check_balance")
+    def test_phone_number_monthly_charges__no_phone_numbers(self, mock_check_balance):
+        ret = AcctTrans.objects.phone_number_monthly_charges(self.hotel, [])
+
+        self.assertEqual(ret, [])
+        self.assertFalse(mock_check_balance.called)
+
+    @patch("account.models.AcctTransManager.check_balance")
+    def test_phone_number_monthly_charges__already_charged(self, mock_check_balance):
+        ph = fake_phone_number(self.hotel)
+        ph2 = fake_phone_number(self.hotel)
+        AcctTrans.objects.phone_number_monthly_charges(self.hotel, [ph])
+
+        acct_trans = AcctTrans.objects.phone_number_monthly_charges(self.hotel, [ph2, ph])
+
+        # only the uncharged PH is in the balance check, and charged
+        mock_check_balance.assert_called_with(self.hotel,
+            extra_amount=-settings.PHONE_NUMBER_MONTHLY_COST)
+        self.assertEqual([a.phone_number for a in acct_trans], [ph2.phone_number])
+        self.assertEqual(AcctTrans.objects.filter(phone_number=ph.phone_number).count(), 1)
+
+    @patch("account.models.AcctTransManager.check_balance")
+    def test_phone_number_monthly_charges__all_charged(self, mock_check_balance):
+        ph = fake_phone_number(self.hotel)
+        AcctTrans.objects.phone_number_monthly_charges(self.hotel, [ph])
+
+        ret = AcctTrans.objects.phone_number_monthly_charges(self.hotel, [ph])
+
+        # a rerun doesn't recharge
+        self.assertEqual(ret, [])
+        self.assertEqual(mock_check_balance.call_count, 1)
+
+    def test_phone_number_monthly_charges__auto_recharge_off(self):
+        AcctTrans.objects.filter(hotel=self.hotel).delete()
+        AcctCost.objects.upsert(self.hotel, auto_recharge=False)
+        ph = fake_phone_number(self.hotel)
+
+        with self.assertRaises(AutoRechargeOffExcp):
+            AcctTrans.objects.phone_number_monthly_charges(self.hotel, [ph])
+
+        self.assertFalse(AcctTrans.objects.filter(phone_number=ph.phone_number).exists())
+        # the deactivation isn't rolled back
+        self.assertFalse(Hotel.objects.get(pk=self.hotel.pk).active)
+
     # sms_used_mtd
 
     def test_sms_used_mtd(self):
@@ -1183,3 +1325,96 @@ class AcctTransTests(TransactionTestCase):
             AcctTrans.objects.funds_added(self.hotel),
             funds_added
         )
+
+
+class BillingSnapshotTests(TestCase):
+
+    fixtures = ['trans_type.json']
+
+    def setUp(self):
+        self.hotel = create_hotel()
+        self.pricing = mommy.make(Pricing, hotel=self.hotel)
+        self.acct_cost = mommy.make(AcctCost, hotel=self.hotel)
+        # TransType
+        self.init_amt = TransType.objects.get(name='init_amt')
+        self.recharge_amt = TransType.objects.get(name='recharge_amt')
+        self.sms_used = TransType.objects.get(name='sms_used')
+        # Dates
+        self.today = Dates()._today
+        # AcctTrans / AcctStmt
+        create_acct_tran(self.hotel, self.init_amt, self.today)
+        create_acct_tran(self.hotel, self.sms_used, self.today)
+        self.acct_stmt, _ = AcctStmt.objects.get_or_create(self.hotel,
+            month=self.today.month, year=self.today.year)
+
+        cache.clear()
+
+    def test_snapshot(self):
+        snapshot = BillingSnapshot.get(self.hotel)
+
+        self.assertEqual(snapshot.hotel_id, self.hotel.id)
+        self.assertEqual(snapshot.balance, AcctTrans.objects.get_balance(self.hotel))
+        self.assertEqual(snapshot.sms_used_mtd,
+            AcctStmt.objects.get_total_sms(self.hotel, self.today))
+        self.assertEqual(snapshot.funds_added_mtd,
+            AcctTrans.objects.funds_added(self.hotel, self.today))
+        self.assertEqual(snapshot.starting_balance,
+            AcctStmt.objects.starting_balance(self.hotel))
+        self.assertEqual(snapshot.acct_stmts, [self.acct_stmt])
+        self.assertEqual(
+            snapshot.funding_trans,
+            list(AcctTrans.objects.filter(hotel=self.hotel, trans_type=self.init_amt))
+        )
+
+    def test_get__cached(self):
+        BillingSnapshot.get(self.hotel)
+
+        self.assertIsInstance(cache.get(BillingSnapshot.cache_key(self.hotel.id)),
+            BillingSnapshot)
+
+        with self.assertNumQueries(0):
+            BillingSnapshot.get(self.hotel)
+
+    @override_settings(DATABASE_REPLICA='replica')
+    def test_get__cached_from_primary(self):
+        routers.reset()
+        self.addCleanup(routers.reset)
+
+        with routers.use_replica():
+            snapshot = BillingSnapshot.get(self.hotel)
+
+        self.assertEqual(snapshot.acct_stmts[0]._state.db, 'default')
+        self.assertEqual(snapshot.funding_trans[0]._state.db, 'default')
+
+    def test_funding_trans__last_4(self):
+        for i in range(5):
+            create_acct_tran(self.hotel, self.recharge_amt, self.today)
+
+        snapshot = BillingSnapshot.get(self.hotel)
+
+        self.assertEqual(len(snapshot.funding_trans), 4)
+
+    def test_invalidate__acct_trans_write(self):
+        snapshot = BillingSnapshot.get(self.hotel)
+
+        create_acct_tran(self.hotel, self.recharge_amt, self.today)
+
+        self.assertIsNone(cache.get(BillingSnapshot.cache_key(self.hotel.id)))
+        self.assertNotEqual(BillingSnapshot.get(self.hotel).balance, snapshot.balance)
+
+    def test_invalidate__acct_stmt_write(self):
+        BillingSnapshot.get(self.hotel)
+
+        self.acct_stmt.save()
+
+        self.assertIsNone(cache.get(BillingSnapshot.cache_key(self.hotel.id)))
+
+    def test_get_acct_stmt(self):
+        snapshot = BillingSnapshot.get(self.hotel)
+
+        self.assertEqual(snapshot.get_acct_stmt(), self.acct_stmt)
+        self.assertEqual(
+            snapshot.get_acct_stmt(str(self.today.month), str(self.today.year)),
+            self.acct_stmt
+        )
+        self.assertIsNone(snapshot.get_acct_stmt(self.today.month, self.today.year-1))
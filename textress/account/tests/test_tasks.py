@@ -3,6 +3,7 @@ from mock import patch
 
 from django.test import TestCase
 from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Sum
 
 from model_mommy import mommy
@@ -11,8 +12,9 @@ from account import tasks
 from account.models import AcctTrans, AcctStmt, TransType, AcctCost, Pricing
 from account.tests.factory import create_acct_stmt, create_acct_tran
 from main.models import Hotel
-from main.tests.factory import create_hotel
-from sms.tests.factory import create_phone_number
+from main.tests.factory import create_hotel, create_hotel_user
+from sms.tests.factory import create_phone_number, fake_phone_number
+from utils import create
 from utils.models import Dates
 from utils.tests.runners import celery_set_eager
 
@@ -101,13 +103,23 @@ class CreateInitialAcctTransAndAcctStmtTests(TestCase):
 
     # acct_stmt_update_prev
 
-    def test_first_of_month(self):
-        self.assertEqual(tasks.FIRST_OF_MONTH, Dates().first_of_month())
+    def test_first_of_month__default_per_call(self):
+        # not computed at import, so a long lived worker doesn't use a stale month
+        [x.delete() for x in AcctStmt.objects.filter(hotel=self.hotel)]
+        first_of_next_month = Dates().first_of_next_month()
+        first_of_month = Dates.first_of_month.__func__
 
-    def test_first_of_month(self):
-        tasks.FIRST_OF_MONTH = Dates()._today
+        def first_of_month_next(dates, month=None, year=None):
+            if month and year:
+                return first_of_month(dates, month, year)
+            return first_of_next_month
 
-        self.assertNotEqual(tasks.FIRST_OF_MONTH, Dates().first_of_month())
+        with patch.object(Dates, 'first_of_month', first_of_month_next):
+            tasks.acct_stmt_update_prev.delay(hotel_id=self.hotel.id)
+
+        acct_stmt = AcctStmt.objects.get(hotel=self.hotel)
+        self.assertEqual(acct_stmt.month, self.today.month)
+        self.assertEqual(acct_stmt.year, self.today.year)
 
     def test_acct_stmt_update_prev__create(self):
         """
@@ -374,3 +386,108 @@ class CreateInitialAcctTransAndAcctStmtTests(TestCase):
         post_acct_tran = AcctTrans.objects.filter(hotel=self.hotel,
             trans_type=self.sms_used).order_by('-modified').first()
         self.assertTrue(post_acct_tran.modified > init_acct_tran.modified)
+
+
+class ChargeMonthlyPhoneNumbersTests(TestCase):
+
+    fixtures = ['trans_type.json']
+
+    def setUp(self):
+        self.hotel = create_hotel()
+        self.hotel2 = create_hotel()
+        for hotel in (self.hotel, self.hotel2):
+            mommy.make(Pricing, hotel=hotel)
+            AcctCost.objects.get_or_create(hotel=hotel)
+        # TransType
+        self.init_amt = TransType.objects.get(name='init_amt')
+        # dates
+        self.dates = Dates()
+        self.today = self.dates._today
+
+        celery_set_eager()
+
+        # clear cache - cached "TransTypes" may be from another test db
+        cache.clear()
+
+    # charge_monthly_phone_numbers
+
+    def test_charge_monthly_phone_numbers(self):
+        create_acct_tran(self.hotel, self.init_amt, self.today)
+        create_acct_tran(self.hotel2, self.init_amt, self.today)
+        ph = fake_phone_number(self.hotel)
+        ph2 = fake_phone_number(self.hotel)
+        ph3 = fake_phone_number(self.hotel2)
+
+        tasks.charge_monthly_phone_numbers.delay([self.hotel.id, self.hotel2.id])
+
+        for hotel, count in ((self.hotel, 2), (self.hotel2, 1)):
+            ph_num_acct_trans = AcctTrans.objects.filter(
+                hotel=hotel,
+                trans_type__name='phone_number',
+                billing_month=self.dates.first_of_month()
+            )
+            self.assertEqual(ph_num_acct_trans.count(), count)
+            self.assertEqual(
+                ph_num_acct_trans.aggregate(Sum('amount'))['amount__sum'],
+                count * -(settings.PHONE_NUMBER_MONTHLY_COST)
+            )
+
+        # re-run doesn't recharge
+        tasks.charge_monthly_phone_numbers.delay([self.hotel.id, self.hotel2.id])
+
+        self.assertEqual(AcctTrans.objects.filter(trans_type__name='phone_number').count(), 3)
+
+    def test_charge_monthly_phone_numbers__new_phone_number(self):
+        create_acct_tran(self.hotel, self.init_amt, self.today)
+        ph = fake_phone_number(self.hotel)
+        tasks.charge_monthly_phone_numbers.delay([self.hotel.id])
+
+        ph2 = fake_phone_number(self.hotel)
+        tasks.charge_monthly_phone_numbers.delay([self.hotel.id])
+
+        self.assertEqual(AcctTrans.objects.filter(
+            hotel=self.hotel, trans_type__name='phone_number').count(), 2)
+        self.assertTrue(AcctTrans.objects.filter(
+            hotel=self.hotel, phone_number=ph2.phone_number).exists())
+
+    def test_charge_monthly_phone_numbers__single_balance_check(self):
+        create_acct_tran(self.hotel, self.init_amt, self.today)
+        for i in range(3):
+            fake_phone_number(self.hotel)
+
+        with patch("account.models.AcctTransManager.check_balance") as mock_check_balance:
+            tasks.charge_monthly_phone_numbers.delay([self.hotel.id])
+
+        self.assertEqual(mock_check_balance.call_count, 1)
+
+    def test_charge_monthly_phone_numbers__auto_recharge_off(self):
+        fake_phone_number(self.hotel)
+        ph2 = fake_phone_number(self.hotel2)
+        create_acct_tran(self.hotel2, self.init_amt, self.today)
+        AcctCost.objects.upsert(self.hotel, auto_recharge=False)
+        create._get_groups_and_perms()
+        create_hotel_user(self.hotel, group='hotel_admin')
+
+        tasks.charge_monthly_phone_numbers.delay([self.hotel.id, self.hotel2.id])
+
+        # Hotel w/o funds is skipped, the other is still charged
+        self.assertFalse(AcctTrans.objects.filter(
+            hotel=self.hotel, trans_type__name='phone_number').exists())
+        self.assertTrue(AcctTrans.objects.filter(
+            hotel=self.hotel2, phone_number=ph2.phone_number).exists())
+
+    def test_charge_monthly_phone_numbers__error(self):
+        fake_phone_number(self.hotel)
+        ph2 = fake_phone_number(self.hotel2)
+        create_acct_tran(self.hotel2, self.init_amt, self.today)
+        AcctCost.objects.filter(hotel=self.hotel).delete()
+
+        with patch("account.tasks.logger") as mock_logger:
+            tasks.charge_monthly_phone_numbers.delay([self.hotel.id, self.hotel2.id])
+
+        # Hotel w/o an AcctCost is logged, the other is still charged
+        self.assertEqual(mock_logger.exception.call_count, 1)
+        self.assertFalse(AcctTrans.objects.filter(
+            hotel=self.hotel, trans_type__name='phone_number').exists())
+        self.assertTrue(AcctTrans.objects.filter(
+            hotel=self.hotel2, phone_number=ph2.phone_number).exists())
@@ -1,4 +1,5 @@
 import datetime
+import json
 
 from django.conf import settings
 from django.test import TestCase
@@ -559,6 +560,12 @@ class AcctStmtAndOtherAccountViewTests(TestCase):
 
         self.assertEqual(response.status_code, 200)
 
+    def test_acct_stmt_detail__does_not_exist(self):
+        response = self.client.get(reverse('acct_stmt_detail',
+            kwargs={'year': 1999, 'month': self.month}))
+
+        self.assertEqual(response.status_code, 404)
+
     def test_acct_stmt_detail__logged_out(self):
         self.client.logout()
 
@@ -633,6 +640,44 @@ class AcctStmtAndOtherAccountViewTests(TestCase):
         self.assertIn("init amt", response.content)
         self.assertIn('${:.2f}'.format(acct_tran.amount/100.0), response.content)
 
+    ### EXPORTS
+
+    def test_acct_trans_export__csv(self):
+        response = self.client.get(reverse('acct_trans_export'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="transactions.csv"')
+        lines = ''.join(response.streaming_content).splitlines()
+        self.assertEqual(lines[0], 'id,insert_date,trans_type,amount,sms_used,phone_number,balance,desc')
+        self.assertEqual(len(lines) - 1, AcctTrans.objects.filter(hotel=self.hotel).count())
+
+    def test_acct_trans_export__ndjson_date_range(self):
+        acct_tran = AcctTrans.objects.filter(hotel=self.hotel).order_by('insert_date').last()
+
+        response = self.client.get(reverse('acct_trans_export'),
+            {'format': 'ndjson', 'start': str(acct_tran.insert_date)})
+
+        rows = [json.loads(line) for line in ''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), AcctTrans.objects.filter(hotel=self.hotel,
+            insert_date__gte=acct_tran.insert_date).count())
+        self.assertIn(acct_tran.id, [row['id'] for row in rows])
+
+    def test_acct_trans_export__logged_out(self):
+        self.client.logout()
+
+        response = self.client.get(reverse('acct_trans_export'), follow=True)
+
+        self.assertRedirects(response, "{}?next={}".format(reverse('login'),
+            reverse('acct_trans_export')))
+
+    def test_acct_stmt_export(self):
+        response = self.client.get(reverse('acct_stmt_export'), {'format': 'ndjson'})
+
+        self.assertEqual(response.status_code, 200)
+        rows = [json.loads(line) for line in ''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), AcctStmt.objects.filter(hotel=self.hotel).count())
+        self.assertEqual((rows[0]['year'], rows[0]['month']), (self.year, self.month))
+
 
 class APITests(TestCase):
 
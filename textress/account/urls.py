@@ -22,11 +22,13 @@ api_patterns = patterns('',
 acct_cost_patterns = patterns('',
     url(r'^refill-settings/(?P<pk>\w+)/$', views.AcctCostUpdateView.as_view(), name='acct_cost_update'),
     url(r'^history/$', views.AcctPmtHistoryView.as_view(), name='acct_pmt_history'),
+    url(r'^export/$', views.AcctTransExportView.as_view(), name='acct_trans_export'),
 )
 
 acct_stmt_patterns = patterns('',
     # url(r'^$', views.AcctStmtListView.as_view(), name='acct_stmt_list'),
     url(r'^(?P<year>\d+)/(?P<month>\d+)/$', views.AcctStmtDetailView.as_view(), name='acct_stmt_detail'),
+    url(r'^export/$', views.AcctStmtExportView.as_view(), name='acct_stmt_export'),
 )
 
 account_patterns = patterns('',
@@ -1,6 +1,6 @@
 from django.shortcuts import render
 from django.utils.translation import ugettext_lazy as _
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect
 from django.conf import settings
 from django.core.urlresolvers import reverse, reverse_lazy
 from django.contrib import auth, messages
@@ -27,14 +27,15 @@ from ws4redis.publisher import RedisPublisher
 from account.forms import (AuthenticationForm, CloseAccountForm,
     CloseAcctConfirmForm, AcctCostForm, AcctCostUpdateForm)
 from account.mixins import alert_messages
-from account.models import Dates, AcctCost, AcctStmt, AcctTrans, Pricing
+from account.models import Dates, AcctCost, AcctStmt, AcctTrans, BillingSnapshot, Pricing
 from account.serializers import PricingSerializer
 from main.mixins import RegistrationContextMixin, AdminOnlyMixin, HotelUserMixin
 from payment.helpers import no_funds_alert, no_customer_alert
 from payment.mixins import BillingSummaryContextMixin
 from sms.helpers import no_twilio_phone_number_alert
 from utils import email, login_messages
-from utils.mixins import FormUpdateMessageMixin
+from utils.exports import ExportMixin
+from utils.mixins import FormUpdateMessageMixin, ReplicaMixin
 
 
 ### ACCOUNT ERROR / REDIRCT ROUTING VIEWS ###
@@ -231,7 +232,7 @@ class AcctCostUpdateView(LoginRequiredMixin, AdminOnlyMixin, BillingSummaryConte
 # ACCT STMT #
 #############
 
-class AcctStmtDetailView(LoginRequiredMixin, AdminOnlyMixin, SetHeadlineMixin,
+class AcctStmtDetailView(ReplicaMixin, LoginRequiredMixin, AdminOnlyMixin, SetHeadlineMixin,
     BillingSummaryContextMixin, TemplateView):
     '''
     All AcctTrans for a single Month.
@@ -241,19 +242,22 @@ class AcctStmtDetailView(LoginRequiredMixin, AdminOnlyMixin, SetHeadlineMixin,
 
     def get_context_data(self, **kwargs):
         context = super(AcctStmtDetailView, self).get_context_data(**kwargs)
-        # Use All Time Hotel Transactions to get the Balance
-        _date = Dates().first_of_month(int(kwargs['month']), int(kwargs['year']))
-        all_trans = AcctTrans.objects.filter(hotel=self.hotel)
+        billing_snapshot = BillingSnapshot.get(self.hotel)
+        acct_stmt = billing_snapshot.get_acct_stmt(kwargs['month'], kwargs['year'])
+        if not acct_stmt:
+            raise Http404
+        _date = Dates().first_of_month(acct_stmt.month, acct_stmt.year)
         # Table Context
-        context['monthly_trans'] = AcctTrans.objects.monthly_trans(self.hotel, _date).order_by('-created')
-        context['acct_stmt'] = (AcctStmt.objects.filter(hotel=self.hotel)
-                                                .get(month=kwargs['month'], year=kwargs['year']))
-        context['acct_stmts'] = AcctStmt.objects.filter(hotel=self.hotel)
+        context['monthly_trans'] = (AcctTrans.objects.monthly_trans(self.hotel, _date)
+                                                     .select_related('trans_type')
+                                                     .order_by('-created'))
+        context['acct_stmt'] = acct_stmt
+        context['acct_stmts'] = billing_snapshot.acct_stmts
         context['debit_trans_types'] = ['sms_used', 'phone_number']
         return context
 
 
-class AcctPmtHistoryView(LoginRequiredMixin, AdminOnlyMixin, SetHeadlineMixin,
+class AcctPmtHistoryView(ReplicaMixin, LoginRequiredMixin, AdminOnlyMixin, SetHeadlineMixin,
     BillingSummaryContextMixin, ListView):
     '''
     Simple table view of payments that uses pagination.
@@ -269,11 +273,53 @@ class AcctPmtHistoryView(LoginRequiredMixin, AdminOnlyMixin, SetHeadlineMixin,
         return queryset
 
 
+class AcctTransExportView(LoginRequiredMixin, AdminOnlyMixin, ExportMixin, View):
+    '''
+    Streaming CSV, or ``?format=ndjson``, of all AcctTrans for
+    ``?start=`` to ``?end=``.
+    '''
+    export_name = 'transactions'
+    export_date_field = 'insert_date'
+    export_fields = [
+        ('id', 'id'),
+        ('insert_date', 'insert_date'),
+        ('trans_type', 'trans_type__name'),
+        ('amount', 'amount'),
+        ('sms_used', 'sms_used'),
+        ('phone_number', 'phone_number'),
+        ('balance', 'balance'),
+        ('desc', 'desc'),
+    ]
+
+    def get_export_querysets(self):
+        return [AcctTrans.objects.filter(hotel=self.hotel)]
+
+
+class AcctStmtExportView(LoginRequiredMixin, AdminOnlyMixin, ExportMixin, View):
+    '''
+    Streaming CSV, or ``?format=ndjson``, of all monthly AcctStmts.
+    '''
+    export_name = 'statements'
+    export_fields = [
+        ('year', 'year'),
+        ('month', 'month'),
+        ('funds_added', 'funds_added'),
+        ('phone_numbers', 'phone_numbers'),
+        ('monthly_costs', 'monthly_costs'),
+        ('total_sms', 'total_sms'),
+        ('total_sms_costs', 'total_sms_costs'),
+        ('balance', 'balance'),
+    ]
+
+    def get_export_querysets(self):
+        return [AcctStmt.objects.filter(hotel=self.hotel)]
+
+
 ########
 # REST #
 ########
 
-class PricingListAPIView(generics.ListAPIView):
+class PricingListAPIView(ReplicaMixin, generics.ListAPIView):
     '''No permissions needed b/c read only list view, and will be used 
     on the Biz Site.'''
 
@@ -286,7 +332,7 @@ class PricingListAPIView(generics.ListAPIView):
         return Response(serializer.data)
 
 
-class PricingRetrieveAPIView(generics.RetrieveAPIView):
+class PricingRetrieveAPIView(ReplicaMixin, generics.RetrieveAPIView):
 
     queryset = Pricing.objects.all()
     serializer_class = PricingSerializer
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from concierge.models import Guest, Message, Reply, TriggerType, Trigger
+from concierge.models import Guest, Message, Reply, ScheduledMessage, TriggerType, Trigger
 
 
 @admin.register(Guest)
@@ -27,4 +27,11 @@ class TriggerType(admin.ModelAdmin):
 
 @admin.register(Trigger)
 class Trigger(admin.ModelAdmin):
-    list_display = ('id', 'hotel', 'type', 'reply')
\ No newline at end of file
+    list_display = ('id', 'hotel', 'type', 'reply')
+
+
+@admin.register(ScheduledMessage)
+class ScheduledMessageAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'hotel', 'guest', 'send_at', 'status',)
+    list_filter = ('status',)
+    readonly_fields = ('created', 'modified')
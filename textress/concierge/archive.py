@@ -0,0 +1,95 @@
+"""
+Message Cold Storage
+--------------------
+Messages live in 3 tiers:
+
+- hot: ``Message``, the last ``MESSAGE_HOT_MONTHS`` months
+- warm: ``ArchivedMessage``, until ``MESSAGE_COLD_MONTHS`` months old
+- cold: 1 gzipped JSONL file per month in ``MESSAGE_COLD_STORAGE_DIR``,
+  i.e. ``2015/11.jsonl.gz``, 1 Message per line
+
+``read_month`` streams a month back from all 3, i.e. for billing audits.
+"""
+import gzip
+import json
+import os
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from concierge.models import ArchivedMessage, Message
+
+
+FIELDS = [f.attname for f in Message._meta.concrete_fields]
+
+
+def cold_path(year, month):
+    return os.path.join(settings.MESSAGE_COLD_STORAGE_DIR, str(year),
+        "{:02d}.jsonl.gz".format(month))
+
+
+def read_cold_month(year, month):
+    "Stream a month's Messages, as Dicts, from its cold storage file, if any."
+    path = cold_path(year, month)
+    if not os.path.exists(path):
+        return
+
+    with gzip.open(path, 'rb') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def export_month(year, month):
+    """
+    Write a month of Archived Messages to its cold storage file, and
+    delete them from the DB.
+
+    The file is written to a temp file and renamed, so it's always whole.
+    Messages already in the file are kept, and not written twice, so a
+    rerun after a failed delete, or for a late Message, is safe.
+
+    Return: number of Messages exported
+    """
+    path = cold_path(year, month)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    messages = ArchivedMessage.objects.filter(insert_date__year=year,
+        insert_date__month=month).order_by('id')
+    ids = []
+
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wb') as f:
+        exported = set()
+        for message in read_cold_month(year, month):
+            exported.add(message['id'])
+            f.write(json.dumps(message, cls=DjangoJSONEncoder) + '\n')
+
+        for message in messages.values(*FIELDS).iterator():
+            ids.append(message['id'])
+            if message['id'] not in exported:
+                f.write(json.dumps(message, cls=DjangoJSONEncoder) + '\n')
+
+    os.rename(tmp_path, path)
+
+    for i in range(0, len(ids), settings.MESSAGE_ARCHIVE_CHUNK_SIZE):
+        ArchivedMessage.objects.filter(id__in=ids[i:i + settings.MESSAGE_ARCHIVE_CHUNK_SIZE]).delete()
+    return len(ids)
+
+
+def read_month(year, month, hotel_id=None):
+    """
+    Stream a month's Messages, as Dicts, from the hot, warm and cold tiers,
+    optionally for 1 Hotel.
+    """
+    filters = {'insert_date__year': year, 'insert_date__month': month}
+    if hotel_id:
+        filters['hotel_id'] = hotel_id
+
+    for model in (Message, ArchivedMessage):
+        for message in model.objects.filter(**filters).order_by('id').values(*FIELDS).iterator():
+            yield message
+
+    for message in read_cold_month(year, month):
+        if not hotel_id or message['hotel_id'] == hotel_id:
+            yield message
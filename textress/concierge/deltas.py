@@ -0,0 +1,146 @@
+"""
+Guest List Deltas
+-----------------
+Guest and Message changes go out on the websocket as small patches, so open
+Guest Lists stay current w/o refetching '/api/guests/' or
+'/api/guest-messages/'.
+
+Patches are only sent to the Hotel's Users, on their ws4redis user channels,
+i.e. pages subscribe w/ '?subscribe-user'.
+
+Each Hotel's patches are numbered by a Redis counter, and the last
+``DELTA_LOG_SIZE`` are kept. A client that reconnects, or sees a gap in the
+versions, GETs the ones it missed from '/api/deltas/?since=<version>'. If
+they're gone, it gets ``reset``, and refetches the list.
+
+Patches, by ``type`` and ``action``:
+
+- guest / update: the created or changed Guest's fields
+- guest / archive: ``ids`` of the archived Guests
+- message / create, update: the Message's fields, i.e. on a delivery status
+- message / read: the ``guest`` whose Messages were all read
+"""
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from rest_framework.renderers import JSONRenderer
+from ws4redis.publisher import RedisPublisher
+from ws4redis.redis_store import RedisMessage
+
+from utils.redis_server import get_server
+
+
+GUEST_FIELDS = ('id', 'name', 'room_number', 'phone_number', 'check_in',
+    'check_out', 'confirmed', 'stop', 'hidden')
+
+MESSAGE_FIELDS = ('id', 'guest_id', 'user_id', 'received', 'status', 'to_ph',
+    'from_ph', 'body', 'read', 'created', 'hidden')
+
+# KEYS[1]: version counter, KEYS[2]: log sorted set. ARGV: patch JSON w/o
+# the version, log size, timeout. Return: the patch JSON w/ the version
+PUBLISH_SCRIPT = """
+local version = redis.call('INCR', KEYS[1])
+local patch = '{"version":' .. version .. ',' .. string.sub(ARGV[1], 2)
+redis.call('ZADD', KEYS[2], version, patch)
+redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -tonumber(ARGV[2]) - 1)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return patch
+"""
+
+def keys(hotel_id):
+    return ["deltas:{}:version".format(hotel_id), "deltas:{}:log".format(hotel_id)]
+
+
+def fields(obj, names):
+    "Dict of the ``names`` attrs, w/ '_id' dropped from FK names."
+    return {name[:-3] if name.endswith('_id') else name: getattr(obj, name)
+            for name in names}
+
+
+def hotel_users(hotel_id):
+    "Usernames of the Hotel's Users, the only ones sent its patches."
+    return list(User.objects.filter(profile__hotel_id=hotel_id, is_active=True)
+                            .values_list('username', flat=True))
+
+
+def publish(hotel_id, type, action, data, users=None):
+    """
+    Number the patch w/ the Hotel's next version, log it, and send it on the
+    websocket of each of the Hotel's Users.
+
+    :users: the Hotel's usernames, if already looked up
+    Return: the patch JSON
+    """
+    patch = JSONRenderer().render({'event': 'delta', 'hotel': hotel_id,
+        'type': type, 'action': action, 'data': data})
+    server = get_server()
+    patch = server.register_script(PUBLISH_SCRIPT)(keys=keys(hotel_id),
+        args=[patch, settings.DELTA_LOG_SIZE, settings.DELTA_LOG_TIMEOUT])
+
+    users = hotel_users(hotel_id) if users is None else users
+    if users:
+        redis_publisher = RedisPublisher(facility='foobar', users=users)
+        redis_publisher.publish_message(RedisMessage(patch))
+    return patch
+
+
+def publish_guest(guest, users=None):
+    return publish(guest.hotel_id, 'guest', 'update', fields(guest, GUEST_FIELDS),
+        users=users)
+
+
+def publish_guests(guests):
+    "An update patch per Guest, looking up each Hotel's Users once."
+    users = {}
+    for guest in guests:
+        if guest.hotel_id not in users:
+            users[guest.hotel_id] = hotel_users(guest.hotel_id)
+        publish_guest(guest, users=users[guest.hotel_id])
+
+
+def publish_message(message, created=False, users=None):
+    return publish(message.hotel_id, 'message', 'create' if created else 'update',
+        fields(message, MESSAGE_FIELDS), users=users)
+
+
+def publish_messages(messages):
+    "An update patch per Message, looking up each Hotel's Users once."
+    users = {}
+    for message in messages:
+        if message.hotel_id not in users:
+            users[message.hotel_id] = hotel_users(message.hotel_id)
+        publish_message(message, users=users[message.hotel_id])
+
+
+def version(hotel_id):
+    "The Hotel's current version, to start from."
+    return int(get_server().get(keys(hotel_id)[0]) or 0)
+
+
+def since(hotel_id, version):
+    """
+    The Hotel's patches after ``version``.
+
+    Return: {'hotel', 'version': current version, 'deltas': list of patches,
+        'reset': True if some of them are gone, and the list must be refetched}
+    """
+    version_key, log_key = keys(hotel_id)
+    pipe = get_server().pipeline(transaction=True)
+    pipe.get(version_key)
+    pipe.zrange(log_key, 0, 0, withscores=True)
+    pipe.zrangebyscore(log_key, '({}'.format(version), '+inf')
+    current, oldest, patches = pipe.execute()
+
+    current = int(current or 0)
+    oldest = int(oldest[0][1]) if oldest else current + 1
+    reset = version > current or version < oldest - 1
+
+    return {
+        'hotel': hotel_id,
+        'version': current,
+        'deltas': [] if reset else [json.loads(patch) for patch in patches],
+        'reset': reset
+    }
@@ -1,3 +1,4 @@
+import csv
 import os
 from os import listdir
 from os.path import isfile, join
@@ -44,14 +45,22 @@ def merge_twilio_messages_to_db(guest, date):
     return messages
 
 
-def merge_twilio_messages_to_db_all(date=timezone.localtime(timezone.now()).date()):
+def merge_twilio_messages_to_db_all(date=None):
+    if date is None:
+        date = timezone.localtime(timezone.now()).date()
+
     for guest in Guest.objects.current():
         merge_twilio_messages_to_db(guest, date)
 
 
 def get_hotel_by_twilio_phone(ph_num):
+    """
+    Hotel of any of its PhoneNumbers, i.e. a sender pool number, from the
+    cached PH # -> Hotel index.
+    """
+    hotel_id = PhoneNumber.objects.hotel_id(ph_num)
     try:
-        return Hotel.objects.get(twilio_phone_number=ph_num)
+        return Hotel.objects.get(id=hotel_id)
     except Hotel.DoesNotExist:
         PhoneNumber.objects.delete_unknown_number(ph_num)
 
@@ -98,3 +107,61 @@ def generate_icon_fixtures():
         i.delete()
     for f in onlyfiles:
         Icon.objects.get_or_create(icon='icons/{}'.format(f))
+
+
+################
+# GUEST IMPORT #
+################
+
+# Guest field: header aliases, lowercase w/ spaces as "_", of CSV exports
+# and PMS arrival feeds
+GUEST_IMPORT_COLUMNS = {
+    'name': ('name', 'guest_name', 'guest', 'full_name'),
+    'first_name': ('first_name', 'firstname', 'first'),
+    'last_name': ('last_name', 'lastname', 'last', 'surname'),
+    'room_number': ('room_number', 'room', 'room_no'),
+    'phone_number': ('phone_number', 'phone', 'phone_no', 'mobile', 'cell'),
+    'check_in': ('check_in', 'checkin', 'arrival', 'arrival_date'),
+    'check_out': ('check_out', 'checkout', 'departure', 'departure_date'),
+}
+
+
+def _import_header(header):
+    return header.decode('utf-8-sig').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def read_guest_import(f):
+    """
+    Rows of a CSV, or PMS arrival feed, as Dicts for
+    ``Guest.objects.bulk_import``. Unknown columns are ignored, and
+    "first_name" / "last_name" columns are joined as the "name".
+
+    :f: file like object of UTF-8 encoded lines
+    """
+    reader = csv.reader(f)
+    try:
+        headers = [_import_header(h) for h in next(reader)]
+    except StopIteration:
+        return []
+
+    columns = {}
+    for field, aliases in GUEST_IMPORT_COLUMNS.items():
+        for alias in aliases:
+            if alias in headers:
+                columns[field] = headers.index(alias)
+                break
+
+    rows = []
+    for line in reader:
+        if not any(line):
+            continue
+        line = [value.decode('utf-8').strip() for value in line]
+        row = {field: line[index] if index < len(line) else ''
+               for field, index in columns.items()}
+
+        if not row.get('name'):
+            row['name'] = ' '.join(filter(None, [row.get('first_name'), row.get('last_name')]))
+        row.pop('first_name', None)
+        row.pop('last_name', None)
+        rows.append(row)
+    return rows
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0001_initial'),
+        ('concierge', '0003_auto_20160405_0558'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.IntegerField(serialize=False, primary_key=True)),
+                ('created', models.DateTimeField()),
+                ('modified', models.DateTimeField()),
+                ('hidden', models.BooleanField(default=False)),
+                ('sid', models.CharField(max_length=55, null=True, db_index=True)),
+                ('received', models.NullBooleanField(default=False)),
+                ('status', models.CharField(max_length=25, null=True)),
+                ('to_ph', models.CharField(max_length=12, blank=True)),
+                ('from_ph', models.CharField(max_length=12, blank=True)),
+                ('body', models.TextField(max_length=320)),
+                ('reason', models.CharField(max_length=500, null=True)),
+                ('cost', models.FloatField(null=True)),
+                ('insert_date', models.DateField(null=True, db_index=True)),
+                ('read', models.BooleanField(default=False)),
+                ('guest', models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.DO_NOTHING, db_constraint=False, to='concierge.Guest', null=True)),
+                ('hotel', models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.DO_NOTHING, db_constraint=False, to='main.Hotel', null=True)),
+                ('user', models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.DO_NOTHING, db_constraint=False, to=settings.AUTH_USER_MODEL, null=True)),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='message',
+            index_together=set([('hotel', 'insert_date')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='archivedmessage',
+            index_together=set([('hotel', 'insert_date')]),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from utils.operations import PostgresRunSQL
+
+
+class Migration(migrations.Migration):
+    """
+    ``body_search`` tsvector of ``Message.body``, w/ a GIN index per Hotel,
+    for ``MessageQuerySet.search``. Kept up to date on insert / update of
+    ``body`` by the built-in ``tsvector_update_trigger``.
+    """
+    dependencies = [
+        ('concierge', '0004_archivedmessage'),
+    ]
+
+    operations = [
+        PostgresRunSQL(
+            "CREATE EXTENSION IF NOT EXISTS btree_gin;",
+            migrations.RunSQL.noop
+        ),
+        PostgresRunSQL(
+            """
+            ALTER TABLE concierge_message ADD COLUMN body_search tsvector;
+            UPDATE concierge_message SET body_search = to_tsvector('pg_catalog.english', body);
+            CREATE INDEX concierge_message_hotel_body_search
+                ON concierge_message USING gin (hotel_id, body_search);
+            CREATE TRIGGER concierge_message_body_search
+                BEFORE INSERT OR UPDATE OF body ON concierge_message
+                FOR EACH ROW EXECUTE PROCEDURE
+                tsvector_update_trigger(body_search, 'pg_catalog.english', body);
+            """,
+            """
+            DROP TRIGGER concierge_message_body_search ON concierge_message;
+            ALTER TABLE concierge_message DROP COLUMN body_search;
+            """
+        ),
+    ]
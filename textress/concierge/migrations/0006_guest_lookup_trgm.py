@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from utils.operations import PostgresRunSQL
+
+
+class Migration(migrations.Migration):
+    """
+    Trigram GIN indexes per Hotel for ``GuestQuerySet.lookup``, on ``name``,
+    ``room_number``, and the digits of ``phone_number``.
+    """
+    dependencies = [
+        ('concierge', '0005_message_body_search'),
+    ]
+
+    operations = [
+        PostgresRunSQL(
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+            migrations.RunSQL.noop
+        ),
+        PostgresRunSQL(
+            r"""
+            CREATE INDEX concierge_guest_name_trgm
+                ON concierge_guest USING gin (hotel_id, name gin_trgm_ops);
+            CREATE INDEX concierge_guest_room_number_trgm
+                ON concierge_guest USING gin (hotel_id, room_number gin_trgm_ops);
+            CREATE INDEX concierge_guest_phone_digits_trgm
+                ON concierge_guest USING gin (hotel_id,
+                    (regexp_replace(phone_number, '\D', '', 'g')) gin_trgm_ops);
+            """,
+            """
+            DROP INDEX concierge_guest_name_trgm;
+            DROP INDEX concierge_guest_room_number_trgm;
+            DROP INDEX concierge_guest_phone_digits_trgm;
+            """
+        ),
+    ]
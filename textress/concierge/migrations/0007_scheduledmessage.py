@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import utils.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+        ('concierge', '0006_guest_lookup_trgm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledMessage',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('body', models.TextField(max_length=320, verbose_name='Message')),
+                ('send_at', models.DateTimeField(verbose_name='Send At')),
+                ('status', models.CharField(default=b'pending', max_length=10, choices=[(b'pending', b'Pending'), (b'sending', b'Sending'), (b'sent', b'Sent'), (b'failed', b'Failed'), (b'canceled', b'Canceled')])),
+                ('batch_id', models.CharField(db_index=True, max_length=32, blank=True)),
+                ('reason', models.CharField(max_length=500, verbose_name='Error Code Reason', blank=True)),
+                ('guest', models.ForeignKey(related_name='scheduled_messages', to='concierge.Guest')),
+                ('hotel', models.ForeignKey(related_name='scheduled_messages', to='main.Hotel')),
+            ],
+            bases=(utils.models.Dates, models.Model),
+        ),
+        migrations.AddField(
+            model_name='trigger',
+            name='send_days',
+            field=models.SmallIntegerField(default=0, help_text=b"Days after the Guest's check-in, or check-out, date to send on.", verbose_name='Send Days', blank=True),
+        ),
+        migrations.AddField(
+            model_name='trigger',
+            name='send_time',
+            field=models.TimeField(help_text=b'Schedule the Reply for this time, instead of sending it right away.', null=True, verbose_name='Send Time', blank=True),
+        ),
+        migrations.AddField(
+            model_name='scheduledmessage',
+            name='message',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, blank=True, to='concierge.Message', help_text=b'The sent Message.'),
+        ),
+        migrations.AddField(
+            model_name='scheduledmessage',
+            name='trigger',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.SET_NULL, blank=True, to='concierge.Trigger', null=True),
+        ),
+        migrations.AlterIndexTogether(
+            name='scheduledmessage',
+            index_together=set([('status', 'send_at')]),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concierge', '0007_scheduledmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='segments',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='segments',
+            field=models.PositiveSmallIntegerField(default=1, help_text=b'Number of SMS the Message is sent, and billed, as.', verbose_name='Segments'),
+        ),
+    ]
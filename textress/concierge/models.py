@@ -2,8 +2,10 @@ import sys
 import datetime
 import random
 import string
+import uuid
 
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Q
 from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.contrib.auth.models import User
@@ -11,12 +13,18 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 
 from twilio import TwilioRestException
 
+from concierge import deltas
 from main.models import Hotel, Icon
 from sms.helpers import send_message
-from utils import validate_phone
+from sms.pool import sender
+from sms.ratelimit import RateLimited
+from sms.segments import count_segments
+from utils import NON_DIGITS, normalize_phone, to_date, validate_phone
 from utils.models import BaseModel, BaseQuerySet, BaseManager, TimeStampBaseModel
 from utils.exceptions import CheckOutDateException, PhoneNumberInUse, ReplyNotFound
 
@@ -29,6 +37,10 @@ logger = logging.getLogger(__name__)
 # GUEST #
 #########
 
+# Fewer digits than this would match most phone numbers
+GUEST_LOOKUP_MIN_DIGITS = 3
+
+
 class GuestQuerySet(BaseQuerySet):
     
     def get_by_hotel_phone(self, hotel, phone_number):
@@ -55,11 +67,42 @@ class GuestQuerySet(BaseQuerySet):
         today = timezone.localtime(timezone.now()).date()
         return self.filter(check_out__lt=today, hidden=False)
 
+    def lookup(self, query):
+        """
+        Guests whose ``name`` or ``room_number`` contains the ``query``, or
+        whose phone number contains its digits. Current Guests 1st, then
+        the closest match.
+
+        On Postgres, uses the ``pg_trgm`` indexes, and also matches names
+        w/ typos. Else, i.e. sqlite, a plain ``icontains``.
+        """
+        digits = NON_DIGITS.sub('', query)
+
+        if connection.vendor != 'postgresql':
+            match = Q(name__icontains=query) | Q(room_number__icontains=query)
+            if len(digits) >= GUEST_LOOKUP_MIN_DIGITS:
+                match |= Q(phone_number__contains=digits)
+            return self.filter(match).order_by('hidden', 'name')
+
+        like = '%{}%'.format(query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+        where = ["name ILIKE %s", "name %% %s", "room_number ILIKE %s"]
+        params = [like, query, like]
+        if len(digits) >= GUEST_LOOKUP_MIN_DIGITS:
+            where.append("regexp_replace(phone_number, '\\D', '', 'g') LIKE %s")
+            params.append('%{}%'.format(digits))
+
+        return self.extra(
+            select={'rank': "GREATEST(similarity(name, %s), similarity(room_number, %s))"},
+            select_params=[query, query],
+            where=["({})".format(' OR '.join(where))],
+            params=params,
+            order_by=['hidden', '-rank', 'name'])
+
 
 class GuestManager(BaseManager):
 
     def get_queryset(self):
-        return GuestQuerySet(self.model, self._db)
+        return GuestQuerySet(self.model, using=self._db)
 
     def get_by_hotel_phone(self, hotel, phone_number):
         return self.get_queryset().get_by_hotel_phone(hotel, phone_number)
@@ -109,6 +152,116 @@ class GuestManager(BaseManager):
     def need_to_archive(self):
         return self.get_queryset().need_to_archive()
 
+    def archive_chunk(self, size):
+        """
+        Archive up to ``size`` Guests that are past their Check-out date,
+        in 1 ``UPDATE ... RETURNING``.
+
+        ``hidden = false`` is checked again by the outer ``UPDATE``, so
+        when 2 jobs overlap, a Guest is only returned by the 1 that
+        archived it.
+
+        Else, i.e. sqlite, which has no ``RETURNING`` before 3.35, the ids
+        are selected, updated, and read back, in 1 transaction.
+
+        Return: list of (id, hotel_id, stop) of the archived Guests
+        """
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        today = timezone.localtime(timezone.now()).date()
+
+        if connection.vendor != 'postgresql':
+            with transaction.atomic():
+                ids = list(self.filter(hidden=False, check_out__lt=today)
+                               .order_by('id').values_list('id', flat=True)[:size])
+                # read back by ``modified``, so only the Guests this job archived
+                now = timezone.now()
+                self.filter(id__in=ids, hidden=False).update(hidden=True, modified=now)
+                return list(self.filter(id__in=ids, modified=now).order_by('id')
+                                .values_list('id', 'hotel_id', 'stop'))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE {table} SET hidden = %s, modified = %s "
+                "WHERE hidden = %s AND id IN ("
+                "SELECT id FROM {table} WHERE hidden = %s AND check_out < %s "
+                "ORDER BY id LIMIT %s) "
+                "RETURNING id, hotel_id, stop".format(table=table),
+                [True, timezone.now(), False, False, today, size])
+            return [(id, hotel_id, bool(stop)) for id, hotel_id, stop in cursor.fetchall()]
+
+    def bulk_import(self, hotel, rows):
+        """
+        Create Guests from a CSV or PMS arrival feed, w/ a fixed number of
+        queries for any number of ``rows``.
+
+        Each row is validated as ``Guest.save`` would, except that phone
+        number conflicts w/ other rows, or current Guests, are found w/ 1
+        ``phone_number__in`` query. Valid rows are created w/ 1
+        ``bulk_create``, and invalid ones are skipped.
+
+        :rows: list of Dicts w/ Guest fields
+        Return: (created Guests, {row #: [errors]})
+        """
+        errors = {}
+        guests = []
+        phones = set()
+        icons = list(Icon.objects.all())
+
+        for i, row in enumerate(rows, start=1):
+            guest = Guest(hotel=hotel, name=row.get('name') or '',
+                room_number=row.get('room_number') or '',
+                phone_number=normalize_phone(row.get('phone_number')))
+            row_errors = []
+
+            if not guest.phone_number:
+                row_errors.append("phone_number: Please enter a 10-digit phone number")
+            elif guest.phone_number in phones:
+                row_errors.append("phone_number: {} is in another row".format(guest.phone_number))
+
+            try:
+                guest.check_in, guest.check_out = guest.validate_check_in_out(
+                    to_date(row.get('check_in')), to_date(row.get('check_out')))
+            except ValueError as e:
+                row_errors.append("check_in / check_out: {}".format(e))
+            except CheckOutDateException:
+                row_errors.append("check_out: Check-out date before check-in")
+
+            try:
+                guest.clean_fields(exclude=['hotel', 'icon', 'phone_number',
+                    'check_in', 'check_out'])
+            except ValidationError as e:
+                row_errors += [u"{}: {}".format(field, message)
+                               for field, messages in sorted(e.message_dict.items())
+                               for message in messages]
+
+            if row_errors:
+                errors[i] = row_errors
+                continue
+
+            phones.add(guest.phone_number)
+            if icons:
+                guest.icon = random.choice(icons)
+            guests.append((i, guest))
+
+        taken = set(self.current().filter(hotel=hotel, phone_number__in=phones)
+                                   .values_list('phone_number', flat=True))
+        for i, guest in guests:
+            if guest.phone_number in taken:
+                errors[i] = ["phone_number: {} is currently in use".format(guest.phone_number)]
+        guests = [guest for i, guest in guests if guest.phone_number not in taken]
+
+        if not guests:
+            return [], errors
+
+        self.bulk_create(guests)
+        # ``bulk_create`` doesn't set PKs. These phones had no current Guest
+        # before, so the current Guests w/ them are the ones just created.
+        created = list(self.current().filter(hotel=hotel,
+            phone_number__in=[g.phone_number for g in guests]))
+        # ``bulk_create`` doesn't send ``post_save``
+        deltas.publish_guests(created)
+        return created, errors
+
 
 class Guest(BaseModel):
     # Keys
@@ -211,15 +364,56 @@ class MessageQuerySet(models.query.QuerySet):
     def daily_all(self, date):
         return self.filter(insert_date=date)
 
+    def search(self, query):
+        """
+        The newest ``MESSAGE_SEARCH_LIMIT`` Messages whose ``body`` matches
+        the ``query`` words, best match 1st.
+
+        Only searches the ``Message`` table, i.e. the last ``MESSAGE_HOT_MONTHS``,
+        not ``ArchivedMessage``.
+
+        On Postgres, uses the ``body_search`` tsvector column and GIN index,
+        ranked by ``ts_rank``. The limit bounds the rank sort and the count,
+        so a common word doesn't rank every Message. Else, i.e. sqlite,
+        ``body`` contains ``query``.
+        """
+        if connection.vendor != 'postgresql':
+            newest = (self.filter(body__icontains=query)
+                          .order_by('-insert_date', '-id')
+                          .values('id')[:settings.MESSAGE_SEARCH_LIMIT])
+            return self.filter(id__in=newest).order_by('-id')
+
+        # looked up once, not for both the paginator's count and the page
+        tsquery = "plainto_tsquery('pg_catalog.english', %s)"
+        ids = list(self.extra(where=["body_search @@ {}".format(tsquery)], params=[query])
+                       .order_by('-insert_date', '-id')
+                       .values_list('id', flat=True)[:settings.MESSAGE_SEARCH_LIMIT])
+        return self.filter(id__in=ids).extra(
+            select={'rank': "ts_rank(body_search, {})".format(tsquery)},
+            select_params=[query],
+            order_by=['-rank', '-id'])
+
 
 class MessageManager(models.Manager):
 
     def get_queryset(self):
-        return MessageQuerySet(self.model, self._db)
+        return MessageQuerySet(self.model, using=self._db)
 
     def current(self):
         return self.get_queryset().current()
 
+    def create_paced(self, **kwargs):
+        """
+        ``create``, but the send waits up to ``SMS_RATE_LIMIT_MAX_WAIT`` for
+        the sending number's rate limit. For Tasks, not requests.
+
+        Raises: ``RateLimited`` if it would wait longer
+        """
+        message = self.model(**kwargs)
+        message.max_wait = None
+        message.save(force_insert=True, using=self.db)
+        return message
+
     def receive_message(self, guest, data):
         """
         Access the Twilio API, and get_or_create a Message Obj in the DB.
@@ -331,14 +525,21 @@ class Message(BaseModel):
         blank=True, null=True, help_text="Reason for failure of SMS send, else Null.")
     cost = models.FloatField(blank=True, null=True)
     # Auto fields
+    segments = models.PositiveSmallIntegerField(_("Segments"), default=1,
+        help_text="Number of SMS the Message is sent, and billed, as.")
     insert_date = models.DateField(_("Insert Date"), blank=True, null=True)
     read = models.BooleanField(_("Read"), blank=True, default=False,
         help_text="All messages are unread until rendered in a User View.")
 
+    # seconds a send waits for the sending number's rate limit, see
+    # ``sms.helpers.send_message``. Only Tasks wait, w/ ``create_paced``.
+    max_wait = 0
+
     objects = MessageManager()
 
     class Meta:
         ordering = ('-created',)
+        index_together = [('hotel', 'insert_date')]
 
     def __str__(self):
         return "Date: {} Guest: {} Msg: {}".format(self.created, self.guest,
@@ -349,15 +550,19 @@ class Message(BaseModel):
         Validate Sender. If Guest, send_message()
         '''
         self.hotel = self.hotel or self.resolve_hotel()
+        self.segments = count_segments(self.body)
 
         if not self.sid:
+            from_ph = sender(self.hotel, self.to_ph)
             try:
-                msg = send_message(hotel=self.hotel, to=self.to_ph, body=self.body)
+                msg = send_message(hotel=self.hotel, to=self.to_ph, body=self.body,
+                    from_=from_ph, max_wait=self.max_wait)
                 msg = msg.__dict__
                 self.sid = msg['sid']
                 self.cost = msg['price']
                 self.reason = msg['error_code']
                 self.received = True
+                self.from_ph = from_ph or self.from_ph
                 # add User to note the message was sent by a User, not a Guest
                 # self.user = 
                 self.read = True
@@ -382,6 +587,88 @@ class Message(BaseModel):
         return "{}...".format(' '.join(self.body.split()[:5]))
 
 
+class ArchivedMessageManager(models.Manager):
+
+    def move(self, before, size):
+        """
+        Move up to ``size`` Messages w/ an ``insert_date`` before ``before``
+        from the ``Message`` table to this one, w/ 1 ``INSERT ... SELECT``
+        and 1 ``DELETE``, in 1 transaction. The raw ``DELETE`` skips
+        ``on_delete``, so the ScheduledMessages that sent them are unset
+        1st, else their foreign key fails.
+
+        Return: number of Messages moved
+        """
+        ids = list(Message.objects.filter(insert_date__lt=before)
+                                  .order_by('id')
+                                  .values_list('id', flat=True)[:size])
+        if not ids:
+            return 0
+
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(f.column) for f in Message._meta.concrete_fields)
+        where = "WHERE id IN ({})".format(', '.join(['%s'] * len(ids)))
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            ScheduledMessage.objects.filter(message_id__in=ids).update(message=None)
+            cursor.execute("INSERT INTO {} ({columns}) SELECT {columns} FROM {} {}".format(
+                quote(self.model._meta.db_table), quote(Message._meta.db_table), where,
+                columns=columns), ids)
+            cursor.execute("DELETE FROM {} {}".format(
+                quote(Message._meta.db_table), where), ids)
+        return len(ids)
+
+    def months(self, before):
+        "(year, month) of all Archived Messages before the ``before`` date."
+        return sorted(set((d.year, d.month) for d in
+            self.filter(insert_date__lt=before).dates('insert_date', 'month')))
+
+
+class ArchivedMessage(models.Model):
+    """
+    Messages older than ``MESSAGE_HOT_MONTHS``, moved out of the ``Message``
+    table by the ``archive_messages`` Task, so the Guest Lists, Guest
+    detail views and billing counts only scan recent Messages.
+
+    Same columns and ids as ``Message``. Months older than
+    ``MESSAGE_COLD_MONTHS`` are exported to cold storage files by
+    ``concierge.archive``, and deleted here.
+    """
+    id = models.IntegerField(primary_key=True)
+    created = models.DateTimeField()
+    modified = models.DateTimeField()
+    hidden = models.BooleanField(default=False)
+    # Keys: w/o constraints, so the related records can be deleted
+    guest = models.ForeignKey(Guest, null=True, related_name='+',
+        db_constraint=False, on_delete=models.DO_NOTHING)
+    user = models.ForeignKey(User, null=True, related_name='+',
+        db_constraint=False, on_delete=models.DO_NOTHING)
+    hotel = models.ForeignKey(Hotel, null=True, related_name='+',
+        db_constraint=False, on_delete=models.DO_NOTHING)
+    # Twilio Fields
+    sid = models.CharField(max_length=55, null=True, db_index=True)
+    received = models.NullBooleanField(default=False)
+    status = models.CharField(max_length=25, null=True)
+    to_ph = models.CharField(max_length=12, blank=True)
+    from_ph = models.CharField(max_length=12, blank=True)
+    body = models.TextField(max_length=320)
+    reason = models.CharField(max_length=500, null=True)
+    cost = models.FloatField(null=True)
+    # Auto fields
+    segments = models.PositiveSmallIntegerField(default=1)
+    insert_date = models.DateField(null=True, db_index=True)
+    read = models.BooleanField(default=False)
+
+    objects = ArchivedMessageManager()
+
+    class Meta:
+        ordering = ('-created',)
+        index_together = [('hotel', 'insert_date')]
+
+    def __str__(self):
+        return "Date: {} Archived Msg: {}".format(self.created, self.id)
+
+
 #########
 # REPLY #
 #########
@@ -543,8 +830,66 @@ class TriggerManager(models.Manager):
             return
         else:
             if not guest.stop:
-                return Message.objects.create(to_ph=guest.phone_number, guest=guest,
-                    user=guest.hotel.get_admin(), body=trigger.reply.message)
+                if trigger.send_time:
+                    return ScheduledMessage.objects.schedule(guest, trigger.reply.message,
+                        trigger.send_at(guest), trigger=trigger)
+                try:
+                    return Message.objects.create(to_ph=guest.phone_number, guest=guest,
+                        user=guest.hotel.get_admin(), body=trigger.reply.message)
+                except RateLimited as e:
+                    # for when the sending number can send again
+                    return ScheduledMessage.objects.schedule(guest, trigger.reply.message,
+                        timezone.now() + datetime.timedelta(seconds=e.wait), trigger=trigger)
+
+    def send_messages(self, guest_ids, trigger_type_name):
+        """
+        ``send_message`` for many Guests of the same Hotel, looking up
+        the Trigger once. Scheduled Triggers are saved w/ 1 ``bulk_create``.
+
+        For Tasks: sends are paced to each sending number's rate limit. If
+        a number is limited for longer than ``SMS_RATE_LIMIT_MAX_WAIT``, the
+        rest of its Guests are scheduled for when it can send again. W/ a
+        sender pool, the other numbers keep sending.
+        """
+        guests = list(Guest.objects.filter(id__in=guest_ids, stop=False)
+                                   .select_related('hotel'))
+        if not guests:
+            return []
+
+        hotel = guests[0].hotel
+        try:
+            trigger = self.select_related('reply', 'type').get(hotel=hotel,
+                type__name=trigger_type_name)
+        except Trigger.DoesNotExist:
+            return []
+
+        if trigger.send_time:
+            return ScheduledMessage.objects.bulk_create([
+                ScheduledMessage(hotel=hotel, guest=guest, trigger=trigger,
+                    body=trigger.reply.message, send_at=trigger.send_at(guest))
+                for guest in guests])
+
+        user = hotel.get_admin()
+        messages = []
+        scheduled = []
+        # sending number: when it can send again
+        limited = {}
+        for guest in guests:
+            from_ph = sender(hotel, guest.phone_number)
+            if from_ph not in limited:
+                try:
+                    messages.append(Message.objects.create_paced(to_ph=guest.phone_number,
+                        guest=guest, user=user, body=trigger.reply.message))
+                    continue
+                except RateLimited as e:
+                    limited[from_ph] = timezone.now() + datetime.timedelta(seconds=e.wait)
+
+            scheduled.append(ScheduledMessage(hotel=hotel, guest=guest, trigger=trigger,
+                body=trigger.reply.message, send_at=limited[from_ph]))
+
+        if scheduled:
+            messages += ScheduledMessage.objects.bulk_create(scheduled)
+        return messages
 
     def welcome_message_configured(self, hotel):
         return Trigger.objects.filter(hotel=hotel,
@@ -573,11 +918,18 @@ class Trigger(TimeStampBaseModel):
     2. Day after check-out, check "check_out" Trigger if need to send?
 
     :Reply FK: b/c Hotel's can configure the Reply letter they want.
+
+    :send_time: if set, the Reply is scheduled, i.e. 3pm on the check-in
+        day, or 9am the morning after check-out w/ ``send_days=1``.
     """
     hotel = models.ForeignKey(Hotel)
     type = models.ForeignKey(TriggerType)
     reply = models.ForeignKey(Reply)
     active = models.BooleanField(blank=True, default=False)
+    send_time = models.TimeField(_("Send Time"), blank=True, null=True,
+        help_text="Schedule the Reply for this time, instead of sending it right away.")
+    send_days = models.SmallIntegerField(_("Send Days"), blank=True, default=0,
+        help_text="Days after the Guest's check-in, or check-out, date to send on.")
 
     objects = TriggerManager()
 
@@ -588,6 +940,17 @@ class Trigger(TimeStampBaseModel):
         self._validate_type_hotel_unique()
         return super(Trigger, self).save(*args, **kwargs)
 
+    def send_at(self, guest):
+        """
+        When to send the scheduled Reply to the ``guest``: ``send_time`` on
+        ``send_days`` after their check-out date for the "check_out" Trigger,
+        else after their check-in date.
+        """
+        date = guest.check_out if self.type.name == settings.CHECK_OUT_TRIGGER else guest.check_in
+        date = date + datetime.timedelta(days=self.send_days)
+        return timezone.make_aware(datetime.datetime.combine(date, self.send_time),
+            timezone.get_current_timezone())
+
     def _validate_type_hotel_unique(self):
         try:
             trigger = (Trigger.objects.exclude(id=self.id)
@@ -598,3 +961,152 @@ class Trigger(TimeStampBaseModel):
             raise ValidationError(
                 "Unique constraint violated, this Trigger exists: {}"
                 .format(trigger))
+
+
+#####################
+# SCHEDULED MESSAGE #
+#####################
+
+class ScheduledMessageManager(models.Manager):
+
+    def schedule(self, guest, body, send_at, trigger=None):
+        return self.create(hotel=guest.hotel, guest=guest, trigger=trigger,
+            body=body, send_at=send_at)
+
+    def claim(self, batch_size):
+        """
+        Mark up to ``batch_size`` due ScheduledMessages as ``SENDING`` under
+        a new ``batch_id``, w/ 1 ``UPDATE``.
+
+        On Postgres, rows are selected ``FOR UPDATE SKIP LOCKED``, so
+        concurrent workers claim different batches w/o waiting on each other,
+        and never send the same ScheduledMessage twice.
+
+        Claims not renewed for ``SCHEDULED_MESSAGE_CLAIM_TIMEOUT`` are from a
+        worker that died, maybe after Twilio sent them. They're marked
+        ``FAILED`` for review, not resent.
+        """
+        now = timezone.now()
+        stale = now - datetime.timedelta(seconds=settings.SCHEDULED_MESSAGE_CLAIM_TIMEOUT)
+        self.filter(status=ScheduledMessage.SENDING, modified__lt=stale).update(
+            status=ScheduledMessage.FAILED, reason=ScheduledMessage.STALE_REASON, modified=now)
+
+        batch_id = uuid.uuid4().hex
+        lock = "FOR UPDATE SKIP LOCKED" if connection.vendor == 'postgresql' else ""
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE {table} SET status = %s, batch_id = %s, modified = %s
+                WHERE id IN (
+                    SELECT id FROM {table}
+                    WHERE status = %s AND send_at <= %s
+                    ORDER BY send_at
+                    LIMIT %s
+                    {lock}
+                )
+                """.format(table=connection.ops.quote_name(self.model._meta.db_table),
+                           lock=lock),
+                [ScheduledMessage.SENDING, batch_id, now,
+                 ScheduledMessage.PENDING, now, batch_size])
+            if not cursor.rowcount:
+                return self.none()
+
+        return (self.filter(batch_id=batch_id).select_related('guest', 'hotel')
+                    .order_by('send_at'))
+
+
+class ScheduledMessage(TimeStampBaseModel):
+    """
+    A Message to send to a Guest at ``send_at``, i.e. by a scheduled Trigger.
+
+    Sent by the ``send_scheduled_messages`` workers, through ``Message``,
+    like any other Message. Canceled if the Guest replied 'S' to Stop since.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    CANCELED = 'canceled'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+        (CANCELED, 'Canceled'),
+    )
+    STALE_REASON = "Sending timed out, it may have been sent."
+
+    hotel = models.ForeignKey(Hotel, related_name='scheduled_messages')
+    guest = models.ForeignKey(Guest, related_name='scheduled_messages')
+    trigger = models.ForeignKey(Trigger, blank=True, null=True, on_delete=models.SET_NULL)
+    body = models.TextField(_("Message"), max_length=320)
+    send_at = models.DateTimeField(_("Send At"))
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    batch_id = models.CharField(max_length=32, blank=True, db_index=True)
+    message = models.OneToOneField(Message, blank=True, null=True, on_delete=models.SET_NULL,
+        help_text="The sent Message.")
+    reason = models.CharField(_("Error Code Reason"), max_length=500, blank=True)
+
+    objects = ScheduledMessageManager()
+
+    class Meta:
+        index_together = [('status', 'send_at')]
+
+    def __str__(self):
+        return "{self.guest}: {self.send_at} ({self.status})".format(self=self)
+
+    def renew_claim(self):
+        """
+        Refresh the claim of this one's batch, so its unsent ScheduledMessages
+        aren't taken as stale while the worker is still sending.
+
+        Return: False if this one was failed as stale, so mustn't be sent
+        """
+        claimed = ScheduledMessage.objects.filter(batch_id=self.batch_id,
+            status=self.SENDING)
+        claimed.update(modified=timezone.now())
+        return claimed.filter(id=self.id).exists()
+
+    def send(self):
+        """
+        Send through ``Message``. A failed send is recorded, and not retried,
+        as Twilio may have sent it. If rate limited, it's rescheduled for
+        when the sending number can send again.
+        """
+        if self.guest.stop:
+            self.status = self.CANCELED
+            return self.save()
+
+        try:
+            self.message = Message.objects.create_paced(hotel=self.hotel, guest=self.guest,
+                user=self.hotel.get_admin(), to_ph=self.guest.phone_number, body=self.body)
+        except RateLimited as e:
+            self.status = self.PENDING
+            self.send_at = timezone.now() + datetime.timedelta(seconds=e.wait)
+            return self.save()
+
+        if self.message.reason:
+            self.status = self.FAILED
+            self.reason = self.message.reason
+        else:
+            self.status = self.SENT
+        self.save()
+
+
+'''
+Deltas
+------
+Guest and Message saves are sent to the Hotel's open Guest Lists as
+versioned patches, see ``concierge.deltas``.
+'''
+@receiver(post_save, sender=Guest)
+def publish_guest_delta(sender, instance=None, raw=False, **kwargs):
+    if not raw:
+        deltas.publish_guest(instance)
+
+
+@receiver(post_save, sender=Message)
+def publish_message_delta(sender, instance=None, created=False, raw=False, **kwargs):
+    if not raw and instance.hotel_id:
+        deltas.publish_message(instance, created)
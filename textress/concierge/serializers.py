@@ -1,14 +1,14 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 
-from concierge.models import Guest, Message, Reply, TriggerType, Trigger
+from concierge.models import Guest, Message, Reply, ScheduledMessage, TriggerType, Trigger
 from main.serializers import IconSerializer
 
 
 ### MESSAGE
 
 MESSAGE_FIELDS = ('id', 'guest', 'user', 'sid', 'received', 'status',
-    'to_ph', 'from_ph', 'body', 'reason', 'cost', 'read',
+    'to_ph', 'from_ph', 'body', 'reason', 'cost', 'segments', 'read',
     'created', 'modified', 'hidden')
 
 
@@ -53,6 +53,15 @@ class MessageListCreateSerializer(serializers.ModelSerializer):
         read_only_fields = ('created', 'modified',)
 
 
+class ScheduledMessageSerializer(serializers.ModelSerializer):
+    '''
+    A Message from a User, scheduled b/c the sending number was rate limited.
+    '''
+    class Meta:
+        model = ScheduledMessage
+        fields = ('id', 'guest', 'body', 'send_at', 'status',)
+
+
 ### GUEST
 
 class GuestBaseSerizer(serializers.ModelSerializer):
@@ -70,6 +79,16 @@ class GuestBaseSerizer(serializers.ModelSerializer):
         read_only_fields = ('created', 'modified',)
 
 
+class GuestLookupSerializer(serializers.ModelSerializer):
+    '''
+    Compact Guest for the typeahead lookup.
+    '''
+    class Meta:
+        model = Guest
+        fields = ('id', 'name', 'room_number', 'phone_number', 'check_in',
+            'check_out', 'hidden',)
+
+
 class GuestListSerializer(GuestBaseSerizer):
     '''
     Guest List Create API Serializer
@@ -105,11 +124,11 @@ class TriggerSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Trigger
-        fields = ('id', 'type', 'reply', 'hotel',)
+        fields = ('id', 'type', 'reply', 'hotel', 'send_time', 'send_days',)
 
 
 class TriggerCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Trigger
-        fields = ('id', 'type', 'reply', 'hotel',)
+        fields = ('id', 'type', 'reply', 'hotel', 'send_time', 'send_days',)
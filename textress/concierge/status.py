@@ -0,0 +1,130 @@
+"""
+Message Delivery Status
+-----------------------
+Twilio POSTs each status change of a sent SMS to '/api/receive/status/',
+instead of us polling Twilio for it.
+
+Callbacks come in bursts, i.e. a bulk send, so the view only pushes them on
+a Redis list. The 1st one of a burst schedules ``update_message_statuses``
+``MESSAGE_STATUS_BATCH_DELAY`` seconds later, which drains the list, saves
+the latest status of each ``sid`` w/ 1 ``UPDATE`` per status, and publishes
+a ``concierge.deltas`` patch per changed Message.
+"""
+import json
+
+from django.conf import settings
+
+from concierge import deltas
+from concierge.models import Message
+from utils.redis_server import get_server
+
+
+QUEUE_KEY = 'message_status:queue'
+SCHEDULED_KEY = 'message_status:scheduled'
+
+# Callbacks can arrive out of order, so a status never replaces a later one.
+# 'delivered', 'undelivered' and 'failed' are final.
+STATUS_RANK = {
+    'accepted': 0,
+    'queued': 1,
+    'sending': 2,
+    'sent': 3,
+    'delivered': 4,
+    'undelivered': 4,
+    'failed': 4,
+}
+
+def later_statuses(status):
+    rank = STATUS_RANK.get(status, 0)
+    return [s for s, r in STATUS_RANK.items() if r > rank]
+
+
+def push(data):
+    """
+    Queue 1 Twilio status callback.
+
+    :data: Twilio POST, w/ ``MessageSid``, ``MessageStatus``, and maybe
+        ``ErrorCode`` and ``Price``
+    Return: True if it's the 1st of a burst, and ``update_message_statuses``
+        should be scheduled
+    """
+    update = {
+        'sid': data['MessageSid'],
+        'status': data['MessageStatus'],
+        'reason': data.get('ErrorCode') or None,
+        'cost': float(data['Price']) if data.get('Price') else None,
+    }
+    server = get_server()
+    pipe = server.pipeline(transaction=False)
+    pipe.rpush(QUEUE_KEY, json.dumps(update))
+    # expires in case the scheduled task is lost
+    pipe.set(SCHEDULED_KEY, 1, nx=True, ex=settings.MESSAGE_STATUS_BATCH_DELAY + 60)
+    pushed, scheduled = pipe.execute()
+    return bool(scheduled)
+
+
+def pop():
+    """
+    Take all queued updates. The scheduled flag is cleared 1st, so a callback
+    that comes in during the update schedules the next one.
+    """
+    server = get_server()
+    server.delete(SCHEDULED_KEY)
+    pipe = server.pipeline(transaction=True)
+    pipe.lrange(QUEUE_KEY, 0, -1)
+    pipe.delete(QUEUE_KEY)
+    values, deleted = pipe.execute()
+    return [json.loads(value) for value in values]
+
+
+def latest(updates):
+    "{sid: latest update}, the last one of the highest ``STATUS_RANK``."
+    by_sid = {}
+    for update in updates:
+        current = by_sid.get(update['sid'])
+        if (not current or STATUS_RANK.get(update['status'], 0) >=
+                STATUS_RANK.get(current['status'], 0)):
+            by_sid[update['sid']] = update
+    return by_sid
+
+
+def save(updates):
+    """
+    Save the latest update of each ``sid``, 1 ``UPDATE`` per distinct
+    (status, reason, cost), on the unique ``sid`` index.
+
+    Return: list of the updated Messages
+    """
+    by_sid = latest(updates)
+    groups = {}
+    for update in by_sid.values():
+        key = (update['status'], update['reason'], update['cost'])
+        groups.setdefault(key, []).append(update['sid'])
+
+    for (status, reason, cost), sids in groups.items():
+        fields = {'status': status}
+        if reason:
+            fields['reason'] = reason
+        if cost is not None:
+            fields['cost'] = cost
+        (Message.objects.filter(sid__in=sids)
+                        .exclude(status__in=later_statuses(status))
+                        .update(**fields))
+
+    messages = Message.objects.filter(sid__in=by_sid.keys())
+    return [m for m in messages if m.status == by_sid[m.sid]['status']]
+
+
+def flush():
+    """
+    Save and publish all queued updates.
+
+    Return: number of Messages updated
+    """
+    updates = pop()
+    if not updates:
+        return 0
+
+    messages = save(updates)
+    deltas.publish_messages(messages)
+    return len(messages)
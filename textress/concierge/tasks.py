@@ -1,13 +1,18 @@
 from __future__ import absolute_import
 
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
 from celery import shared_task
 
+from concierge import archive, deltas, status
 from concierge.helpers import merge_twilio_messages_to_db, convert_to_json_and_publish_to_redis
-from concierge.models import Guest, Reply, TriggerType, Trigger
+from concierge.models import (ArchivedMessage, Guest, Message, Reply, ScheduledMessage,
+    TriggerType, Trigger)
 from main.models import Hotel
+from sms.ratelimit import RateLimited
+from utils.models import Dates
 
 
 @shared_task
@@ -19,8 +24,77 @@ def check_twilio_messages_to_merge(guest, date=None):
 
 
 @shared_task
-def archive_guests():
-    Guest.objects.archive()
+def update_message_statuses():
+    "Save the queued Twilio status callbacks, see ``concierge.status``."
+    return status.flush()
+
+
+@shared_task
+def archive_guests(chunk_size=None):
+    """
+    Archive all Guests that are past their Check-out date, in chunks of
+    ``GUEST_ARCHIVE_CHUNK_SIZE``, each its own transaction.
+
+    Per chunk and Hotel, the "check_out" Trigger is sent to the Guests
+    that haven't replied 'S' to Stop, as 1 Task. Then each Hotel's Users
+    get 1 "guest / archive" delta w/ all of its archived Guest ids.
+
+    Archived Guests aren't selected again, so this can run as often as
+    needed.
+
+    Return: {hotel_id: [archived Guest ids]}
+    """
+    chunk_size = chunk_size or settings.GUEST_ARCHIVE_CHUNK_SIZE
+    archived = {}
+
+    while True:
+        with transaction.atomic():
+            guests = Guest.objects.archive_chunk(chunk_size)
+
+        check_out = {}
+        for guest_id, hotel_id, stop in guests:
+            archived.setdefault(hotel_id, []).append(guest_id)
+            if not stop:
+                check_out.setdefault(hotel_id, []).append(guest_id)
+
+        for hotel_id, guest_ids in check_out.items():
+            trigger_send_messages.delay(guest_ids, settings.CHECK_OUT_TRIGGER)
+
+        if len(guests) < chunk_size:
+            break
+
+    for hotel_id, guest_ids in archived.items():
+        deltas.publish(hotel_id, 'guest', 'archive', {'ids': guest_ids})
+
+    return archived
+
+
+@shared_task
+def archive_messages(chunk_size=None):
+    """
+    Move Messages older than ``MESSAGE_HOT_MONTHS`` to the ``ArchivedMessage``
+    table, in chunks, then export months older than ``MESSAGE_COLD_MONTHS``
+    to cold storage files.
+
+    Return: (number of Messages moved, number exported)
+    """
+    chunk_size = chunk_size or settings.MESSAGE_ARCHIVE_CHUNK_SIZE
+    dates = Dates()
+
+    moved = 0
+    before = dates.first_of_month_ago(settings.MESSAGE_HOT_MONTHS)
+    while True:
+        count = ArchivedMessage.objects.move(before, chunk_size)
+        moved += count
+        if count < chunk_size:
+            break
+
+    exported = 0
+    before = dates.first_of_month_ago(settings.MESSAGE_COLD_MONTHS)
+    for year, month in ArchivedMessage.objects.months(before):
+        exported += archive.export_month(year, month)
+
+    return moved, exported
 
 
 @shared_task
@@ -42,3 +116,49 @@ def create_hotel_default_send_welcome(hotel_id):
 @shared_task
 def trigger_send_message(guest_id, trigger_type_name):
     return Trigger.objects.send_message(guest_id, trigger_type_name)
+
+
+@shared_task
+def trigger_send_messages(guest_ids, trigger_type_name):
+    return Trigger.objects.send_messages(guest_ids, trigger_type_name)
+
+
+@shared_task
+def send_welcome_messages(hotel_id, phone_numbers, body):
+    """
+    Send the bulk welcome ``body`` to the ``phone_numbers``, paced to the
+    Hotel's rate limit. If it's limited for longer than
+    ``SMS_RATE_LIMIT_MAX_WAIT``, the rest are sent by a new Task once it
+    can send again.
+
+    Return: number of Messages sent
+    """
+    hotel = Hotel.objects.get(id=hotel_id)
+    for i, ph in enumerate(phone_numbers):
+        try:
+            Message.objects.create_paced(hotel=hotel, to_ph=ph, body=body)
+        except RateLimited as e:
+            send_welcome_messages.apply_async((hotel_id, phone_numbers[i:], body),
+                countdown=e.wait)
+            return i
+    return len(phone_numbers)
+
+
+@shared_task
+def send_scheduled_messages(batch_size=None):
+    """
+    Send all due ScheduledMessages, ``batch_size`` claimed at a time. Safe
+    to run in many processes at once.
+
+    Return: number of ScheduledMessages sent, failed or canceled
+    """
+    batch_size = batch_size or settings.SCHEDULED_MESSAGE_BATCH_SIZE
+    count = 0
+    while True:
+        batch = list(ScheduledMessage.objects.claim(batch_size))
+        for scheduled_message in batch:
+            if scheduled_message.renew_claim():
+                scheduled_message.send()
+        count += len(batch)
+        if len(batch) < batch_size:
+            return count
@@ -0,0 +1,157 @@
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from model_mommy import mommy
+
+from concierge import archive
+from concierge.models import ArchivedMessage, Message, ScheduledMessage
+from concierge.tasks import archive_messages
+from concierge.tests.factory import make_guests, make_messages
+from main.tests.factory import create_hotel, create_hotel_user
+from utils import create
+from utils.models import Dates
+from utils.tests.runners import celery_set_eager
+
+
+class ArchiveTestCase(TestCase):
+
+    def setUp(self):
+        create._get_groups_and_perms()
+        self.hotel = create_hotel()
+        self.admin = create_hotel_user(self.hotel, group='hotel_admin')
+        self.guest = make_guests(hotel=self.hotel, number=1)[0]
+
+        dates = Dates()
+        self.today = dates._today
+        self.hot_date = dates.first_of_month_ago(settings.MESSAGE_HOT_MONTHS)
+        self.warm_date = self.hot_date - datetime.timedelta(days=1)
+        self.cold_date = dates.first_of_month_ago(settings.MESSAGE_COLD_MONTHS) - datetime.timedelta(days=1)
+
+        self.recent = self.make_messages(self.hot_date, 3)
+        self.old = self.make_messages(self.warm_date, 3)
+        self.oldest = self.make_messages(self.cold_date, 2)
+
+        self.cold_storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cold_storage_dir)
+        override = override_settings(MESSAGE_COLD_STORAGE_DIR=self.cold_storage_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def make_messages(self, insert_date, number):
+        make_messages(hotel=self.hotel, user=self.admin, guest=self.guest,
+            insert_date=insert_date, number=number)
+        return list(Message.objects.filter(insert_date=insert_date).order_by('id'))
+
+
+class ArchivedMessageManagerTests(ArchiveTestCase):
+
+    def test_move(self):
+        old_ids = [m.id for m in self.old + self.oldest]
+
+        moved = ArchivedMessage.objects.move(self.hot_date, size=100)
+
+        self.assertEqual(moved, 5)
+        self.assertEqual(sorted(Message.objects.values_list('id', flat=True)),
+                         [m.id for m in self.recent])
+        self.assertEqual(sorted(ArchivedMessage.objects.values_list('id', flat=True)),
+                         sorted(old_ids))
+
+        message, archived = self.old[0], ArchivedMessage.objects.get(id=self.old[0].id)
+        for field in archive.FIELDS:
+            self.assertEqual(getattr(archived, field), getattr(message, field))
+
+    def test_move__scheduled_message(self):
+        scheduled_message = ScheduledMessage.objects.schedule(self.guest, "Hi", timezone.now())
+        ScheduledMessage.objects.filter(id=scheduled_message.id).update(
+            status=ScheduledMessage.SENT, message=self.old[0])
+
+        ArchivedMessage.objects.move(self.hot_date, size=100)
+
+        # w/o the deleted Message, which would fail its foreign key
+        scheduled_message = ScheduledMessage.objects.get(id=scheduled_message.id)
+        self.assertIsNone(scheduled_message.message_id)
+        self.assertEqual(scheduled_message.status, ScheduledMessage.SENT)
+
+    def test_move__size(self):
+        self.assertEqual(ArchivedMessage.objects.move(self.hot_date, size=2), 2)
+        self.assertEqual(ArchivedMessage.objects.move(self.hot_date, size=2), 2)
+        self.assertEqual(ArchivedMessage.objects.move(self.hot_date, size=2), 1)
+        self.assertEqual(ArchivedMessage.objects.move(self.hot_date, size=2), 0)
+
+    def test_months(self):
+        ArchivedMessage.objects.move(self.hot_date, size=100)
+
+        self.assertEqual(ArchivedMessage.objects.months(self.hot_date), sorted([
+            (self.cold_date.year, self.cold_date.month),
+            (self.warm_date.year, self.warm_date.month)]))
+
+
+class ColdStorageTests(ArchiveTestCase):
+
+    def setUp(self):
+        super(ColdStorageTests, self).setUp()
+        ArchivedMessage.objects.move(self.hot_date, size=100)
+        self.year, self.month = self.cold_date.year, self.cold_date.month
+
+    def read_file(self):
+        with gzip.open(archive.cold_path(self.year, self.month), 'rb') as f:
+            return [json.loads(line) for line in f]
+
+    def test_export_month(self):
+        exported = archive.export_month(self.year, self.month)
+
+        self.assertEqual(exported, 2)
+        self.assertEqual([m['id'] for m in self.read_file()], [m.id for m in self.oldest])
+        self.assertFalse(ArchivedMessage.objects.filter(id__in=[m.id for m in self.oldest]).exists())
+        self.assertEqual(ArchivedMessage.objects.count(), 3)
+
+    def test_export_month__rerun(self):
+        archive.export_month(self.year, self.month)
+        # a late Message for the month is added, w/o duplicating the exported ones
+        late = mommy.make(ArchivedMessage, id=10000, hotel=self.hotel, body="late",
+            insert_date=self.cold_date, created=self.cold_date, modified=self.cold_date)
+
+        self.assertEqual(archive.export_month(self.year, self.month), 1)
+
+        self.assertEqual([m['id'] for m in self.read_file()],
+                         [m.id for m in self.oldest] + [late.id])
+
+    def test_read_month(self):
+        archive.export_month(self.year, self.month)
+        hotel2 = create_hotel()
+
+        messages = list(archive.read_month(self.year, self.month, hotel_id=self.hotel.id))
+
+        self.assertEqual([m['id'] for m in messages], [m.id for m in self.oldest])
+        self.assertEqual(messages[0]['body'], self.oldest[0].body)
+        self.assertEqual(list(archive.read_month(self.year, self.month, hotel_id=hotel2.id)), [])
+
+    def test_read_month__all_tiers(self):
+        for date, messages in ((self.hot_date, self.recent), (self.warm_date, self.old)):
+            self.assertEqual([m['id'] for m in archive.read_month(date.year, date.month)],
+                             [m.id for m in messages])
+
+
+class ArchiveMessagesTaskTests(ArchiveTestCase):
+
+    def setUp(self):
+        super(ArchiveMessagesTaskTests, self).setUp()
+        celery_set_eager()
+
+    def test_archive_messages(self):
+        moved, exported = archive_messages.delay(chunk_size=2).get()
+
+        self.assertEqual((moved, exported), (5, 2))
+        self.assertEqual(Message.objects.count(), 3)
+        self.assertEqual(sorted(ArchivedMessage.objects.values_list('id', flat=True)),
+                         [m.id for m in self.old])
+        self.assertTrue(os.path.exists(archive.cold_path(self.cold_date.year, self.cold_date.month)))
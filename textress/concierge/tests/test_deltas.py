@@ -0,0 +1,168 @@
+import json
+
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from mock import patch
+from model_mommy import mommy
+from rest_framework.test import APITestCase
+
+from concierge import deltas
+from concierge.models import Guest, Message
+from concierge.tests.factory import make_guests
+from main.tests.factory import create_hotel, create_hotel_user, PASSWORD
+from utils import create
+
+
+class DeltaTestCase(TestCase):
+
+    def setUp(self):
+        publisher_patcher = patch('concierge.deltas.RedisPublisher')
+        self.publisher = publisher_patcher.start()
+        self.addCleanup(publisher_patcher.stop)
+
+        self.hotel = create_hotel()
+        self.user = create_hotel_user(self.hotel)
+        self.clear()
+        self.addCleanup(self.clear)
+
+    def clear(self):
+        deltas.get_server().delete(*deltas.keys(self.hotel.id))
+
+    def published(self):
+        return [json.loads(str(call[0][0]))
+                for call in self.publisher.return_value.publish_message.call_args_list]
+
+
+class DeltaTests(DeltaTestCase):
+
+    def test_publish(self):
+        for i in range(2):
+            deltas.publish(self.hotel.id, 'guest', 'archive', {'ids': [i]})
+
+        patches = self.published()
+        self.assertEqual([p['version'] for p in patches], [1, 2])
+        self.assertEqual(patches[1], {'version': 2, 'event': 'delta', 'hotel': self.hotel.id,
+            'type': 'guest', 'action': 'archive', 'data': {'ids': [1]}})
+        self.assertEqual(deltas.version(self.hotel.id), 2)
+
+    def test_publish__hotel_users_only(self):
+        create_hotel_user(create_hotel())
+
+        deltas.publish(self.hotel.id, 'guest', 'archive', {'ids': [1]})
+
+        self.publisher.assert_called_once_with(facility='foobar', users=[self.user.username])
+
+    def test_publish__no_users(self):
+        self.user.delete()
+
+        deltas.publish(self.hotel.id, 'guest', 'archive', {'ids': [1]})
+
+        self.assertFalse(self.publisher.called)
+        # still logged
+        self.assertEqual(deltas.version(self.hotel.id), 1)
+
+    def test_since(self):
+        for i in range(3):
+            deltas.publish(self.hotel.id, 'guest', 'archive', {'ids': [i]})
+
+        data = deltas.since(self.hotel.id, 1)
+
+        self.assertEqual(data['version'], 3)
+        self.assertFalse(data['reset'])
+        self.assertEqual([p['version'] for p in data['deltas']], [2, 3])
+        self.assertEqual(data['deltas'], self.published()[1:])
+
+    def test_since__current(self):
+        deltas.publish(self.hotel.id, 'guest', 'archive', {'ids': [1]})
+
+        data = deltas.since(self.hotel.id, 1)
+
+        self.assertEqual(data['deltas'], [])
+        self.assertFalse(data['reset'])
+
+    @override_settings(DELTA_LOG_SIZE=2)
+    def test_since__reset_when_trimmed(self):
+        for i in range(4):
+            deltas.publish(self.hotel.id, 'guest', 'archive', {'ids': [i]})
+
+        self.assertFalse(deltas.since(self.hotel.id, 2)['reset'])
+        data = deltas.since(self.hotel.id, 1)
+        self.assertTrue(data['reset'])
+        self.assertEqual(data['deltas'], [])
+
+    def test_since__reset_when_ahead(self):
+        # i.e. the Redis keys expired
+        self.assertTrue(deltas.since(self.hotel.id, 5)['reset'])
+
+    def test_guest_saved(self):
+        guest = make_guests(hotel=self.hotel, number=1)[0]
+
+        patch = self.published()[-1]
+        self.assertEqual((patch['type'], patch['action']), ('guest', 'update'))
+        self.assertEqual(patch['data']['id'], guest.id)
+        self.assertEqual(patch['data']['phone_number'], guest.phone_number)
+
+    def test_message_saved(self):
+        guest = make_guests(hotel=self.hotel, number=1)[0]
+
+        with patch.object(Message, 'save', Message.save_base):
+            message = mommy.make(Message, hotel=self.hotel, guest=guest, body="Hi")
+
+        patch_ = self.published()[-1]
+        self.assertEqual((patch_['type'], patch_['action']), ('message', 'create'))
+        self.assertEqual(patch_['data']['id'], message.id)
+        self.assertEqual(patch_['data']['guest'], guest.id)
+        self.assertEqual(patch_['data']['body'], "Hi")
+
+    def test_bulk_import(self):
+        guests, errors = Guest.objects.bulk_import(self.hotel, [
+            {'name': 'Jane', 'room_number': '101', 'phone_number': '7025550111'},
+            {'name': 'John', 'room_number': '102', 'phone_number': '7025550112'}])
+
+        ids = [p['data']['id'] for p in self.published() if p['type'] == 'guest']
+        self.assertEqual(sorted(ids), sorted(g.id for g in guests))
+
+
+class DeltaAPIViewTests(APITestCase):
+
+    def setUp(self):
+        create._get_groups_and_perms()
+        self.hotel = create_hotel()
+        self.user = create_hotel_user(self.hotel)
+        deltas.get_server().delete(*deltas.keys(self.hotel.id))
+        self.addCleanup(deltas.get_server().delete, *deltas.keys(self.hotel.id))
+
+        with patch('concierge.deltas.RedisPublisher'):
+            for i in range(3):
+                deltas.publish(self.hotel.id, 'guest', 'archive', {'ids': [i]})
+
+        self.url = reverse('deltas')
+        self.client.login(username=self.user.username, password=PASSWORD)
+
+    def test_get(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'hotel': self.hotel.id, 'version': 3,
+            'deltas': [], 'reset': False})
+
+    def test_get__since(self):
+        response = self.client.get(self.url, {'since': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['version'] for p in response.data['deltas']], [2, 3])
+        self.assertFalse(response.data['reset'])
+
+    def test_get__since_invalid(self):
+        response = self.client.get(self.url, {'since': 'x'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_get__login_required(self):
+        self.client.logout()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 403)
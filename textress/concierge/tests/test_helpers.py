@@ -1,7 +1,11 @@
 import os
+from StringIO import StringIO
 
+from django.core.cache import cache
 from django.test import TestCase
 
+from model_mommy import mommy
+
 from twilio.rest.client import TwilioRestClient
 
 from account.models import Dates
@@ -10,6 +14,7 @@ from concierge.models import Message
 from concierge.tests.factory import make_guests, make_messages
 from main.models import Hotel
 from main.tests.factory import create_hotel, create_hotel_user
+from sms.models import PhoneNumber
 
 
 class ProcessFromMessageTests(TestCase):
@@ -59,6 +64,15 @@ class ProcessFromMessageTests(TestCase):
         hotel = helpers.get_hotel_by_twilio_phone(self.hotel.twilio_phone_number)
         self.assertTrue(isinstance(hotel, Hotel))
 
+    def test_get_by_phone__sender_pool_number(self):
+        cache.clear()
+        mommy.make(PhoneNumber, hotel=self.hotel, phone_number='+17025550301',
+            default=False)
+
+        hotel = helpers.get_hotel_by_twilio_phone('+17025550301')
+
+        self.assertEqual(hotel, self.hotel)
+
     def test_get_by_phone_fail(self):
         hotel = helpers.get_hotel_by_twilio_phone('1') #invalid ph num
         self.assertIsNone(hotel)
@@ -66,3 +80,28 @@ class ProcessFromMessageTests(TestCase):
     # ``merge_twilio_messages_to_db_all`` - no test b/c simple forloop
 
 
+class ReadGuestImportTests(TestCase):
+
+    def test_csv(self):
+        f = StringIO("name,room_number,phone_number,check_in,check_out\n"
+                     "Jane Doe,101,(702) 600-0001,2030-10-01,2030-10-03\n"
+                     "\n")
+
+        rows = helpers.read_guest_import(f)
+
+        self.assertEqual(rows, [{'name': u"Jane Doe", 'room_number': u"101",
+            'phone_number': u"(702) 600-0001", 'check_in': u"2030-10-01",
+            'check_out': u"2030-10-03"}])
+
+    def test_pms_arrival_feed(self):
+        f = StringIO("\xef\xbb\xbfConf No,Last Name,First Name,Room,Mobile,Arrival,Departure\n"
+                     "A1,Doe,Jane,101,702-600-0001,10/01/2030,10/03/2030\n")
+
+        rows = helpers.read_guest_import(f)
+
+        self.assertEqual(rows, [{'name': u"Jane Doe", 'room_number': u"101",
+            'phone_number': u"702-600-0001", 'check_in': u"10/01/2030",
+            'check_out': u"10/03/2030"}])
+
+    def test_empty(self):
+        self.assertEqual(helpers.read_guest_import(StringIO("")), [])
@@ -1,5 +1,6 @@
 import os
 import datetime
+from mock import patch
 
 from django.conf import settings
 from django.db import models
@@ -11,10 +12,12 @@ from django.utils import timezone
 
 from model_mommy import mommy
 
-from concierge.models import Message, Guest, Hotel, Reply, TriggerType, Trigger
+from concierge.models import (Message, Guest, Hotel, Reply, ScheduledMessage,
+    TriggerType, Trigger)
 from concierge.tasks import create_hotel_default_send_welcome
 from concierge.tests.factory import make_guests, make_messages
 from main.tests.factory import create_hotel, create_hotel_user
+from sms.ratelimit import RateLimited
 from utils import create
 from utils.exceptions import (CheckOutDateException, PhoneNumberInUse,
     ReplyNotFound)
@@ -108,6 +111,26 @@ class GuestManagerTests(TestCase):
             Guest.objects.need_to_archive().count()
         )
 
+    def test_archive_chunk(self):
+        to_archive = list(Guest.objects.need_to_archive().values_list('id', 'hotel_id', 'stop'))
+        self.assertTrue(to_archive)
+
+        archived = Guest.objects.archive_chunk(size=100)
+
+        self.assertEqual(sorted(archived), sorted(to_archive))
+        self.assertFalse(Guest.objects.need_to_archive().exists())
+        self.assertFalse(Guest.objects.get(id=self.guest.id).hidden)
+
+    def test_archive_chunk__size(self):
+        mommy.make(Guest, hotel=self.hotel, check_in=self.yesterday,
+            check_out=self.yesterday, phone_number=settings.DEFAULT_TO_PH)
+        self.assertEqual(Guest.objects.need_to_archive().count(), 2)
+
+        self.assertEqual(len(Guest.objects.archive_chunk(size=1)), 1)
+        self.assertEqual(len(Guest.objects.archive_chunk(size=1)), 1)
+        # already archived Guests aren't returned again
+        self.assertEqual(Guest.objects.archive_chunk(size=1), [])
+
 
 class GuestTests(TestCase):
 
@@ -197,6 +220,64 @@ class GuestTests(TestCase):
         self.assertTrue(self.unknown_guest.is_unknown)
 
 
+class GuestBulkImportTests(TestCase):
+
+    def setUp(self):
+        self.hotel = create_hotel()
+        self.guest = make_guests(hotel=self.hotel, number=1)[0]
+        self.today = timezone.localtime(timezone.now()).date()
+        self.rows = [
+            {'name': "Guest{}".format(i), 'room_number': str(100 + i),
+             'phone_number': "(702) 600-{:04d}".format(i)}
+            for i in range(10)
+        ]
+
+    def test_bulk_import(self):
+        guests, errors = Guest.objects.bulk_import(self.hotel, self.rows)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(len(guests), 10)
+        guest = Guest.objects.get(hotel=self.hotel, name="Guest1")
+        self.assertEqual(guest.phone_number, "+17026000001")
+        self.assertEqual(guest.check_in, self.today)
+        self.assertEqual(guest.check_out, self.today + datetime.timedelta(days=1))
+
+    def test_bulk_import__queries(self):
+        # Icons, phones in use, insert, created Guests, and the Hotel's Users
+        # for the deltas
+        with self.assertNumQueries(5):
+            Guest.objects.bulk_import(self.hotel, self.rows)
+
+    def test_bulk_import__dates(self):
+        rows = [dict(self.rows[0], check_in='10/01/2030', check_out='2030-10-03')]
+
+        guests, errors = Guest.objects.bulk_import(self.hotel, rows)
+
+        self.assertEqual(guests[0].check_in, datetime.date(2030, 10, 1))
+        self.assertEqual(guests[0].check_out, datetime.date(2030, 10, 3))
+
+    def test_bulk_import__errors(self):
+        rows = self.rows[:2] + [
+            dict(self.rows[0], name="Duplicate"),
+            dict(self.rows[2], phone_number="123"),
+            dict(self.rows[3], name=""),
+            dict(self.rows[4], check_in="2030-10-03", check_out="2030-10-01"),
+            dict(self.rows[5], check_in="tomorrow"),
+            dict(self.rows[6], phone_number=self.guest.phone_number),
+        ]
+
+        guests, errors = Guest.objects.bulk_import(self.hotel, rows)
+
+        self.assertEqual(len(guests), 2)
+        self.assertEqual(sorted(errors), [3, 4, 5, 6, 7, 8])
+        self.assertIn("is in another row", errors[3][0])
+        self.assertIn("10-digit", errors[4][0])
+        self.assertTrue(errors[5][0].startswith("name: "))
+        self.assertIn("Check-out date before check-in", errors[6][0])
+        self.assertIn("tomorrow isn't a valid date", errors[7][0])
+        self.assertIn("is currently in use", errors[8][0])
+
+
 class MessageManagerTests(TestCase):
 
     def setUp(self):
@@ -619,6 +700,37 @@ class TriggerTests(TestCase):
 
         self.assertIsNone(Trigger.objects.send_message(self.guest.id, self.trigger.type.name))
 
+    def test_send_at(self):
+        self.trigger.send_time = datetime.time(9)
+        self.trigger.send_days = 1
+
+        send_at = self.trigger.send_at(self.guest)
+
+        self.assertEqual(timezone.localtime(send_at).replace(tzinfo=None),
+            datetime.datetime.combine(self.guest.check_out + datetime.timedelta(days=1),
+                                      datetime.time(9)))
+
+    def test_send_at__check_in(self):
+        self.trigger.type = mommy.make(TriggerType, name=settings.CHECK_IN_TRIGGER)
+        self.trigger.send_time = datetime.time(15)
+
+        send_at = self.trigger.send_at(self.guest)
+
+        self.assertEqual(timezone.localtime(send_at).date(), self.guest.check_in)
+        self.assertEqual(timezone.localtime(send_at).hour, 15)
+
+    def test_send_message__scheduled(self):
+        self.trigger.send_time = datetime.time(9)
+        self.trigger.save()
+        message_count = Message.objects.count()
+
+        ret = Trigger.objects.send_message(self.guest.id, self.trigger.type.name)
+
+        self.assertIsInstance(ret, ScheduledMessage)
+        self.assertEqual(ret.send_at, self.trigger.send_at(self.guest))
+        self.assertEqual(ret.body, self.hotel_reply.message)
+        self.assertEqual(Message.objects.count(), message_count)
+
     def test_welcome_message_configured__true(self):
         create_hotel_default_send_welcome(self.hotel.id)
         raw_ret = Trigger.objects.filter(hotel=self.hotel, type__name=settings.BULK_SEND_WELCOME_TRIGGER).exists()
@@ -653,3 +765,137 @@ class TriggerTests(TestCase):
 
         self.assertIn(ret, settings.WELCOME_MSG_NOT_CONFIGURED)
 
+
+def sent_save(reason=None):
+    "``Message.save`` w/o Twilio, and w/ the ``reason`` of a failed send."
+    def save(message, *args, **kwargs):
+        message.reason = reason
+        return models.Model.save(message, *args, **kwargs)
+    return save
+
+
+class ScheduledMessageTests(TestCase):
+
+    def setUp(self):
+        create._get_groups_and_perms()
+        self.hotel = create_hotel()
+        self.admin = create_hotel_user(self.hotel, group='hotel_admin')
+        self.guest = make_guests(hotel=self.hotel, number=1)[0]
+        self.now = timezone.now()
+
+    def schedule(self, seconds=-60, **kwargs):
+        return ScheduledMessage.objects.schedule(self.guest, "Enjoy your stay",
+            self.now + datetime.timedelta(seconds=seconds), **kwargs)
+
+    def test_claim(self):
+        due = [self.schedule(), self.schedule(-120)]
+        self.schedule(3600)
+
+        batch = list(ScheduledMessage.objects.claim(10))
+
+        # oldest 1st
+        self.assertEqual([s.id for s in batch], [due[1].id, due[0].id])
+        self.assertTrue(all(s.status == ScheduledMessage.SENDING for s in batch))
+        self.assertEqual(len(set(s.batch_id for s in batch)), 1)
+
+    def test_claim__batch_size(self):
+        for i in range(3):
+            self.schedule()
+
+        self.assertEqual(ScheduledMessage.objects.claim(2).count(), 2)
+        self.assertEqual(ScheduledMessage.objects.claim(2).count(), 1)
+        self.assertFalse(ScheduledMessage.objects.claim(2))
+
+    def make_stale(self, **kwargs):
+        stale = self.now - datetime.timedelta(seconds=settings.SCHEDULED_MESSAGE_CLAIM_TIMEOUT + 1)
+        ScheduledMessage.objects.filter(**kwargs).update(modified=stale)
+
+    def test_claim__stale(self):
+        scheduled_message = self.schedule()
+        ScheduledMessage.objects.claim(10)
+        self.make_stale(id=scheduled_message.id)
+
+        # not resent, b/c it may have been sent
+        self.assertFalse(ScheduledMessage.objects.claim(10))
+
+        scheduled_message = ScheduledMessage.objects.get(id=scheduled_message.id)
+        self.assertEqual(scheduled_message.status, ScheduledMessage.FAILED)
+        self.assertEqual(scheduled_message.reason, ScheduledMessage.STALE_REASON)
+
+    @patch.object(Message, 'save', sent_save())
+    def test_claim__stale_partway(self):
+        first, second = self.schedule(-120), self.schedule()
+        batch = list(ScheduledMessage.objects.claim(10))
+        self.assertTrue(batch[0].renew_claim())
+        batch[0].send()
+        # the worker stalls, and another claims after the timeout
+        self.make_stale(status=ScheduledMessage.SENDING)
+        self.assertFalse(ScheduledMessage.objects.claim(10))
+
+        self.assertFalse(batch[1].renew_claim())
+
+        self.assertEqual(ScheduledMessage.objects.get(id=first.id).status, ScheduledMessage.SENT)
+        second = ScheduledMessage.objects.get(id=second.id)
+        self.assertEqual(second.status, ScheduledMessage.FAILED)
+        self.assertIsNone(second.message)
+
+    def test_renew_claim(self):
+        first, second = self.schedule(-120), self.schedule()
+        batch = list(ScheduledMessage.objects.claim(10))
+        self.make_stale(status=ScheduledMessage.SENDING)
+
+        self.assertTrue(batch[0].renew_claim())
+
+        # the rest of the batch is kept too
+        self.assertFalse(ScheduledMessage.objects.claim(10))
+        self.assertEqual(ScheduledMessage.objects.get(id=second.id).status,
+            ScheduledMessage.SENDING)
+
+    @patch.object(Message, 'save', sent_save())
+    def test_send(self):
+        scheduled_message = self.schedule()
+
+        scheduled_message.send()
+
+        self.assertEqual(scheduled_message.status, ScheduledMessage.SENT)
+        message = scheduled_message.message
+        self.assertEqual(message.guest, self.guest)
+        self.assertEqual(message.to_ph, self.guest.phone_number)
+        self.assertEqual(message.body, "Enjoy your stay")
+        self.assertEqual(message.user, self.admin)
+        # paced, b/c it's sent by a Task
+        self.assertIsNone(message.max_wait)
+
+    @patch.object(Message, 'save', sent_save(reason='30006'))
+    def test_send__failed(self):
+        scheduled_message = self.schedule()
+
+        scheduled_message.send()
+
+        self.assertEqual(scheduled_message.status, ScheduledMessage.FAILED)
+        self.assertEqual(scheduled_message.reason, '30006')
+
+    @patch('concierge.models.Message.save')
+    def test_send__rate_limited(self, save_mock):
+        save_mock.side_effect = RateLimited(90)
+        scheduled_message = self.schedule()
+        claimed = ScheduledMessage.objects.claim(10)[0]
+
+        claimed.send()
+
+        claimed = ScheduledMessage.objects.get(id=scheduled_message.id)
+        self.assertEqual(claimed.status, ScheduledMessage.PENDING)
+        self.assertIsNone(claimed.message)
+        self.assertGreater(claimed.send_at, self.now + datetime.timedelta(seconds=80))
+
+    @patch('concierge.models.Message.save')
+    def test_send__guest_stop(self, save_mock):
+        self.guest.stop = True
+        self.guest.save()
+        scheduled_message = self.schedule()
+
+        scheduled_message.send()
+
+        self.assertEqual(scheduled_message.status, ScheduledMessage.CANCELED)
+        self.assertIsNone(scheduled_message.message)
+        self.assertFalse(save_mock.called)
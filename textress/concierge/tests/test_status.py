@@ -0,0 +1,184 @@
+import json
+
+from django.conf import settings
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from mock import patch
+from model_mommy import mommy
+from twilio.util import RequestValidator
+
+from concierge import status
+from concierge.models import Message
+from concierge.tasks import update_message_statuses
+from concierge.tests.factory import make_guests
+from main.tests.factory import create_hotel, create_hotel_user
+from utils.tests.runners import celery_set_eager
+
+
+def callback(sid, message_status, **kwargs):
+    data = {'MessageSid': sid, 'MessageStatus': message_status}
+    data.update(kwargs)
+    return data
+
+
+class StatusTestCase(TestCase):
+
+    def setUp(self):
+        self.server = status.get_server()
+        self.clear()
+        self.addCleanup(self.clear)
+
+        self.hotel = create_hotel()
+        self.guest = make_guests(hotel=self.hotel, number=1)[0]
+        self.messages = [self.make_message('SM{}'.format(i)) for i in range(3)]
+
+    def clear(self):
+        self.server.delete(status.QUEUE_KEY, status.SCHEDULED_KEY)
+
+    def make_message(self, sid, message_status='queued'):
+        with patch.object(Message, 'save', Message.save_base):
+            return mommy.make(Message, hotel=self.hotel, guest=self.guest,
+                sid=sid, status=message_status)
+
+
+class StatusTests(StatusTestCase):
+
+    def test_push(self):
+        self.assertTrue(status.push(callback('SM0', 'sent')))
+        self.assertFalse(status.push(callback('SM0', 'delivered', Price='-0.0075')))
+
+        self.assertEqual(status.pop(), [
+            {'sid': 'SM0', 'status': 'sent', 'reason': None, 'cost': None},
+            {'sid': 'SM0', 'status': 'delivered', 'reason': None, 'cost': -0.0075}
+        ])
+
+    def test_pop__clears_scheduled(self):
+        status.push(callback('SM0', 'sent'))
+
+        status.pop()
+
+        self.assertEqual(status.pop(), [])
+        self.assertTrue(status.push(callback('SM0', 'delivered')))
+
+    def test_latest(self):
+        updates = [{'sid': 'SM0', 'status': 'delivered'},
+                   {'sid': 'SM0', 'status': 'sent'},
+                   {'sid': 'SM1', 'status': 'sent'},
+                   {'sid': 'SM1', 'status': 'failed'}]
+
+        by_sid = status.latest(updates)
+
+        self.assertEqual(by_sid['SM0']['status'], 'delivered')
+        self.assertEqual(by_sid['SM1']['status'], 'failed')
+
+    def test_save(self):
+        updates = [{'sid': 'SM0', 'status': 'delivered', 'reason': None, 'cost': -0.0075},
+                   {'sid': 'SM1', 'status': 'delivered', 'reason': None, 'cost': -0.0075},
+                   {'sid': 'SM2', 'status': 'undelivered', 'reason': '30003', 'cost': None}]
+
+        # 1 UPDATE per status, and the SELECT of the updated Messages
+        with self.assertNumQueries(3):
+            messages = status.save(updates)
+
+        self.assertEqual(len(messages), 3)
+        self.assertEqual(Message.objects.get(sid='SM0').status, 'delivered')
+        self.assertEqual(Message.objects.get(sid='SM1').cost, -0.0075)
+        message = Message.objects.get(sid='SM2')
+        self.assertEqual(message.status, 'undelivered')
+        self.assertEqual(message.reason, '30003')
+
+    def test_save__not_replacing_a_later_status(self):
+        self.make_message('SM3', 'delivered')
+
+        messages = status.save([{'sid': 'SM3', 'status': 'sent', 'reason': None, 'cost': None}])
+
+        self.assertEqual(messages, [])
+        self.assertEqual(Message.objects.get(sid='SM3').status, 'delivered')
+
+    @patch('concierge.deltas.RedisPublisher')
+    def test_flush(self, publisher_mock):
+        create_hotel_user(self.hotel)
+        status.push(callback('SM0', 'sent'))
+        status.push(callback('SM0', 'delivered'))
+        status.push(callback('SM1', 'failed', ErrorCode='30006'))
+
+        self.assertEqual(status.flush(), 2)
+
+        # a Guest List delta per Message
+        patches = [json.loads(str(call[0][0])) for call in
+                   publisher_mock.return_value.publish_message.call_args_list]
+        self.assertEqual([(p['type'], p['action'], p['hotel']) for p in patches],
+                         [('message', 'update', self.hotel.id)] * 2)
+        self.assertEqual(patches[1]['version'], patches[0]['version'] + 1)
+        by_id = {p['data']['id']: p['data'] for p in patches}
+        self.assertEqual(by_id[self.messages[0].id]['status'], 'delivered')
+        self.assertEqual(by_id[self.messages[1].id]['status'], 'failed')
+        self.assertEqual(by_id[self.messages[1].id]['guest'], self.guest.id)
+
+    @patch('concierge.deltas.RedisPublisher')
+    def test_flush__empty(self, publisher_mock):
+        self.assertEqual(status.flush(), 0)
+        self.assertFalse(publisher_mock.called)
+
+
+class ReceiveStatusViewTests(StatusTestCase):
+
+    def setUp(self):
+        super(ReceiveStatusViewTests, self).setUp()
+        self.url = reverse('concierge:receive_status')
+        self.hotel.twilio_sid = 'AC' + 'a' * 32
+        self.hotel.twilio_auth_token = 'token'
+        self.hotel.save()
+
+    def post(self, data, auth_token='token'):
+        "POST ``data`` signed by the Hotel's Subaccount, like Twilio."
+        data = dict(data, AccountSid=self.hotel.twilio_sid)
+        signature = RequestValidator(auth_token).compute_signature(
+            settings.MESSAGE_STATUS_CALLBACK_URL, data)
+        return self.client.post(self.url, data, HTTP_X_TWILIO_SIGNATURE=signature)
+
+    @patch('concierge.views.update_message_statuses')
+    def test_post(self, task_mock):
+        for message_status in ('sent', 'delivered'):
+            response = self.post(callback('SM0', message_status))
+            self.assertEqual(response.status_code, 204)
+
+        # scheduled once per burst
+        self.assertEqual(task_mock.apply_async.call_count, 1)
+        self.assertEqual(len(status.pop()), 2)
+
+    @patch('concierge.views.update_message_statuses')
+    def test_post__invalid(self, task_mock):
+        response = self.post({'MessageSid': 'SM0'})
+
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(task_mock.apply_async.called)
+        self.assertEqual(status.pop(), [])
+
+    @patch('concierge.views.update_message_statuses')
+    def test_post__bad_signature(self, task_mock):
+        response = self.post(callback('SM0', 'delivered'), auth_token='forged')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(task_mock.apply_async.called)
+        self.assertEqual(status.pop(), [])
+
+    @patch('concierge.views.update_message_statuses')
+    def test_post__unsigned(self, task_mock):
+        response = self.client.post(self.url, callback('SM0', 'delivered',
+            AccountSid=self.hotel.twilio_sid))
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(status.pop(), [])
+
+
+class UpdateMessageStatusesTaskTests(StatusTestCase):
+
+    @patch('concierge.deltas.RedisPublisher')
+    def test_update_message_statuses(self, publisher_mock):
+        celery_set_eager()
+        status.push(callback('SM2', 'delivered'))
+
+        self.assertEqual(update_message_statuses.delay().get(), 1)
+        self.assertEqual(Message.objects.get(sid='SM2').status, 'delivered')
@@ -7,11 +7,13 @@ from django.utils import timezone
 
 from model_mommy import mommy
 
-from concierge.models import Guest, Reply, Trigger, TriggerType
-from concierge.tasks import (archive_guests, trigger_send_message,
+from concierge.models import Guest, Reply, ScheduledMessage, Trigger, TriggerType
+from concierge.tasks import (archive_guests, send_scheduled_messages, send_welcome_messages,
+    trigger_send_message, trigger_send_messages,
     create_hotel_default_help_reply, create_hotel_default_send_welcome)
 from concierge.tests.factory import make_guests
 from main.tests.factory import create_hotel
+from sms.ratelimit import RateLimited
 from utils import create
 from utils.tests.runners import celery_set_eager
 
@@ -35,10 +37,55 @@ class GuestTaskTests(TestCase):
     def test_archive_guest(self):
         self.assertEqual(Guest.objects.need_to_archive().count(), 1)
 
-        ret = archive_guests.delay()
+        with patch('concierge.tasks.deltas'):
+            ret = archive_guests.delay()
 
         self.assertEqual(Guest.objects.need_to_archive().count(), 0)
 
+    @patch('concierge.tasks.deltas')
+    def test_archive_guests__delta(self, deltas_mock):
+        archive_guests.delay()
+
+        deltas_mock.publish.assert_called_once_with(self.hotel.id, 'guest', 'archive',
+            {'ids': [self.guest_to_archive.id]})
+
+    @patch('concierge.tasks.deltas')
+    @patch('concierge.tasks.trigger_send_messages.delay')
+    def test_archive_guests__chunks(self, delay_mock, deltas_mock):
+        hotel2 = create_hotel()
+        stopped = mommy.make(Guest, hotel=self.hotel, stop=True, check_in=self.yesterday,
+            check_out=self.yesterday, phone_number=create._generate_ph())
+        guest2 = mommy.make(Guest, hotel=hotel2, check_in=self.yesterday,
+            check_out=self.yesterday, phone_number=create._generate_ph())
+
+        archived = archive_guests.delay(chunk_size=2).get()
+
+        self.assertEqual(archived, {
+            self.hotel.id: [self.guest_to_archive.id, stopped.id],
+            hotel2.id: [guest2.id]
+        })
+        # Guests that replied 'S' to Stop don't get the "check_out" message
+        self.assertEqual(sorted(c[0] for c in delay_mock.call_args_list), sorted([
+            ([self.guest_to_archive.id], settings.CHECK_OUT_TRIGGER),
+            ([guest2.id], settings.CHECK_OUT_TRIGGER)
+        ]))
+        # 1 delta per Hotel
+        self.assertEqual(sorted(c[0] for c in deltas_mock.publish.call_args_list), sorted([
+            (self.hotel.id, 'guest', 'archive', {'ids': [self.guest_to_archive.id, stopped.id]}),
+            (hotel2.id, 'guest', 'archive', {'ids': [guest2.id]})
+        ]))
+
+    @patch('concierge.tasks.deltas')
+    @patch('concierge.tasks.trigger_send_messages.delay')
+    def test_archive_guests__rerun(self, delay_mock, deltas_mock):
+        archive_guests.delay()
+        delay_mock.reset_mock()
+        deltas_mock.reset_mock()
+
+        self.assertEqual(archive_guests.delay().get(), {})
+        self.assertFalse(delay_mock.called)
+        self.assertFalse(deltas_mock.publish.called)
+
 
 class ReplyTaskTests(TestCase):
 
@@ -102,3 +149,152 @@ class TriggerTaskTests(TestCase):
         trigger_send_message.delay(self.guest.id, self.check_out_trigger_name)
 
         self.assertTrue(save_mock.called)
+
+    @patch("concierge.models.Message.save", autospec=True)
+    def test_trigger_send_message__rate_limited(self, save_mock):
+        save_mock.side_effect = RateLimited(90)
+
+        scheduled_message = trigger_send_message.delay(self.guest.id,
+            self.check_out_trigger_name).get()
+
+        # the send didn't wait, b/c it's in a request
+        self.assertEqual(save_mock.call_args[0][0].max_wait, 0)
+        self.assertIsInstance(scheduled_message, ScheduledMessage)
+        self.assertEqual(scheduled_message.trigger, self.check_out_trigger)
+        self.assertGreater(scheduled_message.send_at,
+            timezone.now() + datetime.timedelta(seconds=80))
+
+
+class TriggerSendMessagesTaskTests(TestCase):
+
+    def setUp(self):
+        self.hotel = create_hotel()
+        self.guests = make_guests(hotel=self.hotel, number=3)
+        self.reply = mommy.make(Reply, hotel=self.hotel, letter="C", message="Welcome")
+        self.trigger_type = mommy.make(TriggerType, name=settings.CHECK_IN_TRIGGER)
+        self.trigger = mommy.make(Trigger, hotel=self.hotel, type=self.trigger_type,
+            reply=self.reply)
+
+        celery_set_eager()
+
+    @patch("concierge.models.Message.save")
+    def test_trigger_send_messages(self, save_mock):
+        stopped = self.guests[0]
+        stopped.stop = True
+        stopped.save()
+
+        messages = trigger_send_messages.delay([g.id for g in self.guests],
+            settings.CHECK_IN_TRIGGER).get()
+
+        self.assertEqual(save_mock.call_count, 2)
+        self.assertEqual(sorted(m.guest.id for m in messages),
+                         sorted(g.id for g in self.guests if g.id != stopped.id))
+        self.assertTrue(all(m.body == "Welcome" for m in messages))
+
+    @patch("concierge.models.Message.save", autospec=True)
+    def test_trigger_send_messages__paced(self, save_mock):
+        trigger_send_messages.delay([g.id for g in self.guests], settings.CHECK_IN_TRIGGER)
+
+        self.assertEqual(save_mock.call_count, 3)
+        # waits up to SMS_RATE_LIMIT_MAX_WAIT
+        self.assertTrue(all(c[0][0].max_wait is None for c in save_mock.call_args_list))
+
+    @patch("concierge.models.Message.save")
+    def test_trigger_send_messages__no_trigger(self, save_mock):
+        self.trigger.delete()
+
+        trigger_send_messages.delay([g.id for g in self.guests], settings.CHECK_IN_TRIGGER)
+
+        self.assertFalse(save_mock.called)
+
+    @patch("concierge.models.Message.save")
+    def test_trigger_send_messages__rate_limited(self, save_mock):
+        # the 2nd send is rate limited
+        save_mock.side_effect = [None, RateLimited(90)]
+        guest_ids = [g.id for g in self.guests]
+
+        sent = trigger_send_messages.delay(guest_ids, settings.CHECK_IN_TRIGGER).get()
+
+        self.assertEqual(save_mock.call_count, 2)
+        scheduled = ScheduledMessage.objects.filter(trigger=self.trigger)
+        self.assertEqual(scheduled.count(), 2)
+        self.assertEqual(sorted(m.guest.id for m in sent), sorted(guest_ids))
+
+    @patch("concierge.models.sender")
+    @patch("concierge.models.Message.save")
+    def test_trigger_send_messages__rate_limited_sender_pool(self, save_mock, sender_mock):
+        # the 1st Guest's number is rate limited, the 2nd's isn't, and the
+        # 3rd isn't tried as it shares the 1st's number
+        sender_mock.side_effect = ['+17025550201', '+17025550202', '+17025550201']
+        save_mock.side_effect = [RateLimited(90), None]
+        guest_ids = [g.id for g in self.guests]
+
+        sent = trigger_send_messages.delay(guest_ids, settings.CHECK_IN_TRIGGER).get()
+
+        self.assertEqual(save_mock.call_count, 2)
+        self.assertEqual(ScheduledMessage.objects.filter(trigger=self.trigger).count(), 2)
+        self.assertEqual(sorted(m.guest.id for m in sent), sorted(guest_ids))
+
+    @patch("concierge.models.Message.save")
+    def test_trigger_send_messages__scheduled(self, save_mock):
+        self.trigger.send_time = datetime.time(15)
+        self.trigger.save()
+        guest_ids = [g.id for g in self.guests]
+
+        # Guests, Trigger, and 1 INSERT
+        with self.assertNumQueries(3):
+            scheduled = trigger_send_messages.delay(guest_ids, settings.CHECK_IN_TRIGGER).get()
+
+        self.assertFalse(save_mock.called)
+        self.assertEqual(ScheduledMessage.objects.filter(trigger=self.trigger).count(), 3)
+        self.assertEqual(len(scheduled), 3)
+
+
+class SendWelcomeMessagesTaskTests(TestCase):
+
+    def setUp(self):
+        self.hotel = create_hotel()
+        self.phone_numbers = ['+17025550301', '+17025550302', '+17025550303']
+
+    @patch("concierge.models.Message.save", autospec=True)
+    def test_send_welcome_messages(self, save_mock):
+        sent = send_welcome_messages(self.hotel.id, self.phone_numbers, "Welcome")
+
+        self.assertEqual(sent, 3)
+        self.assertEqual([c[0][0].to_ph for c in save_mock.call_args_list], self.phone_numbers)
+        # paced
+        self.assertTrue(all(c[0][0].max_wait is None for c in save_mock.call_args_list))
+
+    @patch("concierge.tasks.send_welcome_messages.apply_async")
+    @patch("concierge.models.Message.save")
+    def test_send_welcome_messages__rate_limited(self, save_mock, apply_async_mock):
+        save_mock.side_effect = [None, RateLimited(90)]
+
+        sent = send_welcome_messages(self.hotel.id, self.phone_numbers, "Welcome")
+
+        self.assertEqual(sent, 1)
+        # the rest, once the number can send again
+        apply_async_mock.assert_called_once_with(
+            (self.hotel.id, self.phone_numbers[1:], "Welcome"), countdown=90)
+
+
+class SendScheduledMessagesTaskTests(TestCase):
+
+    def setUp(self):
+        self.hotel = create_hotel()
+        self.guest = make_guests(hotel=self.hotel, number=1)[0]
+        now = timezone.now()
+        self.due = [ScheduledMessage.objects.schedule(self.guest, "Hi", now) for i in range(3)]
+        self.later = ScheduledMessage.objects.schedule(self.guest, "Hi",
+            now + datetime.timedelta(hours=1))
+
+        celery_set_eager()
+
+    @patch("concierge.models.ScheduledMessage.send")
+    def test_send_scheduled_messages(self, send_mock):
+        count = send_scheduled_messages.delay(batch_size=2).get()
+
+        self.assertEqual(count, 3)
+        self.assertEqual(send_mock.call_count, 3)
+        self.assertEqual(ScheduledMessage.objects.get(id=self.later.id).status,
+            ScheduledMessage.PENDING)
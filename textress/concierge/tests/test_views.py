@@ -1,3 +1,6 @@
+import datetime
+import json
+
 from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.test import TestCase
@@ -5,7 +8,7 @@ from django.test import TestCase
 from model_mommy import mommy
 
 from concierge.forms import GuestForm
-from concierge.models import Guest, Message, Trigger, TriggerType, Reply
+from concierge.models import ArchivedMessage, Guest, Message, Trigger, TriggerType, Reply
 from concierge.tasks import create_hotel_default_send_welcome
 from concierge.tests.factory import make_guests, make_messages
 from main.tests.factory import create_hotel, create_hotel_user, PASSWORD
@@ -366,3 +369,89 @@ class GuestViewTriggerReplyTests(TestCase):
         msg = Message.objects.first()
         self.assertEqual(msg.guest, guest)
         self.assertEqual(msg.body, check_out_message)
+
+
+class MessageExportViewTests(TestCase):
+
+    def setUp(self):
+        create._get_groups_and_perms()
+        self.hotel = create_hotel()
+        self.admin = create_hotel_user(self.hotel, group='hotel_admin')
+        self.manager = create_hotel_user(self.hotel, group='hotel_manager')
+        self.guest = make_guests(self.hotel, number=1)[0]
+
+        self.today = Dates()._today
+        self.old_date = self.today - datetime.timedelta(days=40)
+        make_messages(self.hotel, self.admin, self.guest, insert_date=self.today, number=3)
+        make_messages(self.hotel, self.admin, self.guest, insert_date=self.old_date, number=2)
+        ArchivedMessage.objects.move(self.today, 10)
+
+        # other Hotel's Messages aren't exported
+        hotel_2 = create_hotel()
+        guest_2 = make_guests(hotel_2, number=1)[0]
+        make_messages(hotel_2, create_hotel_user(hotel_2, group='hotel_admin'), guest_2,
+            insert_date=self.today, number=1)
+
+        self.client.login(username=self.admin.username, password=PASSWORD)
+
+    def get(self, **params):
+        response = self.client.get(reverse('concierge:message_export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, ''.join(response.streaming_content)
+
+    def test_csv(self):
+        response, content = self.get()
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="messages.csv"')
+        lines = content.splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['id', 'insert_date', 'guest', 'user'])
+        # header + 3 hot + 2 archived
+        self.assertEqual(len(lines), 6)
+
+    def test_ndjson(self):
+        response, content = self.get(format='ndjson')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(
+            sorted(row['id'] for row in rows),
+            sorted(list(Message.objects.filter(hotel=self.hotel).values_list('id', flat=True)) +
+                   list(ArchivedMessage.objects.filter(hotel=self.hotel).values_list('id', flat=True))))
+        self.assertEqual(rows[0]['guest'], self.guest.name)
+
+    def test_date_range(self):
+        response, content = self.get(format='ndjson', start=str(self.today - datetime.timedelta(days=1)))
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(set(row['insert_date'] for row in rows), set([str(self.today)]))
+
+        response, content = self.get(format='ndjson', end=str(self.old_date))
+
+        self.assertEqual(len(content.splitlines()), 2)
+
+    def test_date_range__invalid(self):
+        for param in ('start', 'end'):
+            response = self.client.get(reverse('concierge:message_export'), {param: 'foo'})
+
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.streaming)
+            self.assertEqual(response.content,
+                "'{}' must be a date, i.e. 2016-04-05.".format(param))
+
+    def test_admin_only(self):
+        self.client.login(username=self.manager.username, password=PASSWORD)
+
+        response = self.client.get(reverse('concierge:message_export'))
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_logged_out(self):
+        self.client.logout()
+
+        response = self.client.get(reverse('concierge:message_export'))
+
+        self.assertEqual(response.status_code, 302)
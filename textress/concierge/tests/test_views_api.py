@@ -1,18 +1,34 @@
+import datetime
 import json
 import mock
+import sys
+from StringIO import StringIO
 
 from django.conf import settings
+from django.db import models
+from django.test.utils import override_settings
 from django.utils import timezone
 
 from model_mommy import mommy
 from rest_framework.test import APITestCase
 
 from concierge import serializers
-from concierge.models import Reply, REPLY_LETTERS, TriggerType, Trigger, Guest, Message
+from concierge.models import (Reply, REPLY_LETTERS, TriggerType, Trigger, Guest, Message,
+    ScheduledMessage)
 from concierge.tasks import create_hotel_default_send_welcome
 from concierge.tests.factory import make_guests, make_messages, make_trigger_types
 from main.tests.factory import create_hotel, create_user, create_hotel_user, PASSWORD
+from sms.helpers import send_message
+from sms.ratelimit import RateLimited, hotel_bucket
 from utils import create
+from utils.tests.budget import QueryBudgetMixin
+from utils.tests.runners import celery_set_eager
+
+
+def sending_save(message, *args, **kwargs):
+    "``Message.save`` through ``send_message`` and its rate limit, w/o Twilio."
+    send_message(message.hotel, message.to_ph, message.body, max_wait=message.max_wait)
+    return models.Model.save(message, *args, **kwargs)
 
 
 class MessagAPIViewTests(APITestCase):
@@ -118,6 +134,31 @@ class MessagAPIViewTests(APITestCase):
         response = self.client.post('/api/messages/', data, format='json')
         self.assertEqual(response.status_code, 201)
 
+    @mock.patch('concierge.models.Message.save')
+    def test_create__rate_limited(self, save_mock):
+        save_mock.side_effect = RateLimited(90)
+        data = {'to_ph': self.guest.phone_number, 'guest': self.guest.id, 'body': 'hi'}
+
+        response = self.client.post('/api/messages/', data, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        scheduled_message = ScheduledMessage.objects.get(id=response.data['id'])
+        self.assertEqual(scheduled_message.guest, self.guest)
+        self.assertEqual(scheduled_message.body, 'hi')
+        self.assertGreater(scheduled_message.send_at,
+            timezone.now() + datetime.timedelta(seconds=80))
+
+    @mock.patch('concierge.models.Message.save')
+    def test_create__rate_limited_no_guest(self, save_mock):
+        save_mock.side_effect = RateLimited(90)
+        data = {'to_ph': self.guest.phone_number, 'body': 'hi'}
+
+        response = self.client.post('/api/messages/', data, format='json')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '90')
+        self.assertFalse(ScheduledMessage.objects.exists())
+
     ### MessageRetrieveAPIView
 
     def test_detail(self):
@@ -167,6 +208,33 @@ class MessagAPIViewTests(APITestCase):
         trigger = Trigger.objects.get(hotel=self.hotel, type__name=settings.BULK_SEND_WELCOME_TRIGGER)
         self.assertEqual(msg.body, trigger.reply.message)
 
+    @mock.patch('sms.ratelimit.time')
+    @mock.patch('sms.helpers.TwilioRestClient')
+    def test_bulk_send_welcome__rate_limited(self, client_mock, time_mock):
+        celery_set_eager()
+        time_mock.time.return_value = 1000.0
+        self.hotel.twilio_phone_number = '+17025550003'
+        self.hotel.save()
+        bucket = hotel_bucket(self.hotel)
+        bucket.server.delete(bucket.key)
+        self.addCleanup(bucket.server.delete, bucket.key)
+        create_hotel_default_send_welcome(self.hotel.id)
+        data = {"0": "7754194000", "1": "7023012823", "2": "7023012824"}
+
+        with mock.patch.object(Message, 'save', sending_save), \
+                mock.patch.object(sys, 'argv', ['manage.py']):
+            response = self.client.post('/api/messages/send-welcome/', data, format='json')
+
+        # the 1st is sent by the request, the rest are paced by a Task
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(client_mock.return_value.messages.create.call_count, 3)
+        self.assertEqual(time_mock.sleep.call_count, 2)
+        trigger = Trigger.objects.get(hotel=self.hotel, type__name=settings.BULK_SEND_WELCOME_TRIGGER)
+        self.assertEqual(
+            sorted(Message.objects.filter(body=trigger.reply.message).values_list('to_ph', flat=True)),
+            sorted("+1{}".format(v) for v in data.values())
+        )
+
     def test_bulk_send_welcome__bulk_send_welcome_msg_not_configured(self):
         data = {'foo':'bar'}
 
@@ -177,6 +245,67 @@ class MessagAPIViewTests(APITestCase):
         self.assertEqual(len(data), 1)
         self.assertEqual(data[0], u"Trigger not configured, need to configure: bulk send welcome")
 
+    # search
+
+    def test_search(self):
+        msg = Message.objects.filter(hotel=self.hotel).first()
+        Message.objects.filter(id=msg.id).update(body="Can I get extra towels?")
+        # other Hotel's Messages aren't searched
+        Message.objects.filter(hotel=self.hotel2).update(body="extra towels please")
+
+        response = self.client.get('/api/messages/search/', {'q': 'towels'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['id'], msg.id)
+
+    def test_search__dates(self):
+        msg = Message.objects.filter(hotel=self.hotel).first()
+        Message.objects.filter(id=msg.id).update(body="late check out")
+        yesterday = msg.insert_date
+
+        response = self.client.get('/api/messages/search/', {'q': 'check', 'start': str(yesterday)})
+        self.assertEqual(response.data['count'], 1)
+
+        response = self.client.get('/api/messages/search/',
+            {'q': 'check', 'end': str(yesterday - datetime.timedelta(days=1))})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_search__paginated(self):
+        Message.objects.filter(hotel=self.hotel).update(body="wifi password")
+
+        response = self.client.get('/api/messages/search/', {'q': 'wifi'})
+
+        self.assertEqual(response.data['count'], 10)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get('/api/messages/search/', {'q': 'wifi', 'page': 2})
+
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(MESSAGE_SEARCH_LIMIT=2)
+    def test_search__limit(self):
+        Message.objects.filter(hotel=self.hotel).update(body="wifi password")
+        newest = (Message.objects.filter(hotel=self.hotel)
+                                 .order_by('-insert_date', '-id')[:2])
+
+        response = self.client.get('/api/messages/search/', {'q': 'wifi'})
+
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(sorted(m['id'] for m in response.data['results']),
+                         sorted(m.id for m in newest))
+
+    def test_search__q_required(self):
+        response = self.client.get('/api/messages/search/')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_search__bad_date(self):
+        response = self.client.get('/api/messages/search/', {'q': 'towels', 'start': 'foo'})
+
+        self.assertEqual(response.status_code, 400)
+
 
 class GuestMessageAPIViewTests(APITestCase):
 
@@ -363,6 +492,99 @@ class GuestAPIViewTests(APITestCase):
             [x['id'] for x in data]
         )
 
+    # import - /api/guests/import/
+
+    @mock.patch('concierge.views_api.trigger_send_messages.delay')
+    def test_import__json(self, delay_mock):
+        rows = [{'name': "Jane", 'room_number': "101", 'phone_number': "(702) 600-0001"},
+                {'name': "John", 'room_number': "102", 'phone_number': self.guest.phone_number}]
+
+        response = self.client.post('/api/guests/import/', rows, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        data = json.loads(response.content)
+        self.assertEqual(data['created'], 1)
+        self.assertEqual(list(data['errors']), ['2'])
+        guest = Guest.objects.get(hotel=self.hotel, name="Jane")
+        delay_mock.assert_called_once_with([guest.id], settings.CHECK_IN_TRIGGER)
+
+    @mock.patch('concierge.views_api.trigger_send_messages.delay')
+    def test_import__csv(self, delay_mock):
+        f = StringIO("Guest Name,Room,Phone,Arrival,Departure\n"
+                     "Jane,101,702-600-0001,10/01/2030,10/03/2030\n")
+        f.name = 'arrivals.csv'
+
+        response = self.client.post('/api/guests/import/', {'file': f}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        guest = Guest.objects.get(hotel=self.hotel, name="Jane")
+        self.assertEqual(guest.phone_number, "+17026000001")
+        self.assertEqual(guest.check_in, datetime.date(2030, 10, 1))
+        self.assertTrue(delay_mock.called)
+
+    @mock.patch('concierge.views_api.trigger_send_messages.delay')
+    def test_import__all_invalid(self, delay_mock):
+        rows = [{'name': "Jane", 'room_number': "101", 'phone_number': "123"}]
+
+        response = self.client.post('/api/guests/import/', rows, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(delay_mock.called)
+
+    def test_import__max_rows(self):
+        rows = [{'name': "Jane", 'room_number': "101", 'phone_number': "(702) 600-0001"}] * 2
+
+        with self.settings(GUEST_IMPORT_MAX_ROWS=1):
+            response = self.client.post('/api/guests/import/', rows, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Guest.objects.filter(name="Jane").exists())
+
+    # lookup - /api/guests/lookup/
+
+    def test_lookup__name(self):
+        Guest.objects.filter(id=self.guest.id).update(name="Jane Doe")
+
+        response = self.client.get('/api/guests/lookup/', {'q': 'jane'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([g['id'] for g in response.data], [self.guest.id])
+        self.assertEqual(sorted(response.data[0]),
+            ['check_in', 'check_out', 'hidden', 'id', 'name', 'phone_number', 'room_number'])
+
+    def test_lookup__room_number_and_phone(self):
+        Guest.objects.filter(id=self.guest.id).update(room_number="4321", phone_number="+17026009876")
+
+        response = self.client.get('/api/guests/lookup/', {'q': '4321'})
+        self.assertIn(self.guest.id, [g['id'] for g in response.data])
+
+        response = self.client.get('/api/guests/lookup/', {'q': '(702) 600-9876'})
+        self.assertEqual([g['id'] for g in response.data], [self.guest.id])
+
+    def test_lookup__current_first(self):
+        Guest.objects.filter(hotel=self.hotel).update(name="Smith")
+        archived = self.guests[1]
+        Guest.objects.filter(id=archived.id).update(name="Aaron Smith", hidden=True)
+
+        response = self.client.get('/api/guests/lookup/', {'q': 'smith'})
+
+        self.assertEqual(response.data[-1]['id'], archived.id)
+
+    def test_lookup__limit_and_hotel(self):
+        other = make_guests(hotel=create_hotel(), number=1)[0]
+        Guest.objects.update(name="Smith")
+
+        with self.settings(GUEST_LOOKUP_LIMIT=3):
+            response = self.client.get('/api/guests/lookup/', {'q': 'smith'})
+
+        self.assertEqual(len(response.data), 3)
+        self.assertNotIn(other.id, [g['id'] for g in response.data])
+
+    def test_lookup__no_query(self):
+        response = self.client.get('/api/guests/lookup/')
+
+        self.assertEqual(response.data, [])
+
 
 class ReplyAPIViewTests(APITestCase):
 
@@ -634,3 +856,106 @@ class CurrentUserAPIView(APITestCase):
         self.client.login(username=user.username, password=PASSWORD)
         response = self.client.get('/api/current-user/')
         self.assertEqual(response.status_code, 403)
+
+
+class APIQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """
+    Every router registered ViewSet, at 1, 10 and 100 objects, is w/i the
+    same query budget, so N+1 queries fail.
+    """
+    def setUp(self):
+        create._get_groups_and_perms()
+        self.hotel = create_hotel()
+        self.admin = create_hotel_user(self.hotel, group='hotel_admin')
+        self.guest = make_guests(hotel=self.hotel, number=1)[0]
+        self.client.login(username=self.admin.username, password=PASSWORD)
+
+    def tearDown(self):
+        self.client.logout()
+
+    def make_guests(self, n):
+        "n Guests w/ 2 Messages each."
+        make_guests(hotel=self.hotel, number=n - Guest.objects.count())
+        for guest in Guest.objects.filter(message__isnull=True):
+            self.make_messages(2, guest)
+
+    def make_messages(self, n, guest=None):
+        guest = guest or self.guest
+        Message.objects.bulk_create([
+            Message(hotel=self.hotel, guest=guest, user=self.admin,
+                sid=create._generate_name(), body='hi')
+            for i in range(n - Message.objects.filter(guest=guest).count())
+        ])
+
+    def make_replies(self, n):
+        Reply.objects.bulk_create([
+            Reply(hotel=self.hotel, letter=REPLY_LETTERS[i % 26][0])
+            for i in range(n - Reply.objects.count())
+        ])
+
+    def make_trigger_types(self, n):
+        TriggerType.objects.bulk_create([
+            TriggerType(name=create._generate_name())
+            for i in range(n - TriggerType.objects.count())
+        ])
+
+    def make_triggers(self, n):
+        self.make_trigger_types(n)
+        reply = Reply.objects.filter(hotel=self.hotel).first() or mommy.make(Reply, hotel=self.hotel)
+        Trigger.objects.bulk_create([
+            Trigger(hotel=self.hotel, type=trigger_type, reply=reply)
+            for trigger_type in TriggerType.objects.filter(trigger__isnull=True)
+        ])
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    # guests
+
+    def test_guests_list(self):
+        self.assertBudgetFlat(self.make_guests, lambda: self.get('/api/guests/'),
+            db=5, cache=1)
+
+    # guest-messages
+
+    def test_guest_messages_list(self):
+        self.assertBudgetFlat(self.make_guests, lambda: self.get('/api/guest-messages/'),
+            db=5, cache=1)
+
+    def test_guest_messages_detail(self):
+        url = '/api/guest-messages/{}/'.format(self.guest.id)
+        self.assertBudgetFlat(self.make_messages, lambda: self.get(url),
+            db=6, cache=1)
+
+    # messages
+
+    def test_messages_list(self):
+        self.assertBudgetFlat(self.make_messages, lambda: self.get('/api/messages/'),
+            db=4, cache=1)
+
+    def test_messages_detail(self):
+        self.make_messages(1)
+        message = Message.objects.first()
+
+        with self.assertBudget(db=5, cache=1):
+            self.get('/api/messages/{}/'.format(message.id))
+
+    # reply
+
+    def test_reply_list(self):
+        self.assertBudgetFlat(self.make_replies, lambda: self.get('/api/reply/'),
+            db=5, cache=1)
+
+    # trigger-type
+
+    def test_trigger_type_list(self):
+        self.assertBudgetFlat(self.make_trigger_types, lambda: self.get('/api/trigger-type/'),
+            db=3, cache=1)
+
+    # trigger
+
+    def test_trigger_list(self):
+        self.assertBudgetFlat(self.make_triggers, lambda: self.get('/api/trigger/'),
+            db=5, cache=1)
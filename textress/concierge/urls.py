@@ -6,6 +6,7 @@ from concierge import views
 api_patterns = patterns('',
     # Receive Twilio Config'd URI
     url(r'^receive/sms_url/$', views.ReceiveSMSView.as_view(), name='receive_sms'),
+    url(r'^receive/status/$', views.ReceiveStatusView.as_view(), name='receive_status'),
     )
 
 guest_patterns = patterns('',
@@ -16,9 +17,14 @@ guest_patterns = patterns('',
     url(r'^delete/(?P<pk>\d+)/$', views.GuestDeleteView.as_view(), name='guest_delete'),
     )
 
+message_patterns = patterns('',
+    url(r'^export/$', views.MessageExportView.as_view(), name='message_export'),
+    )
+
 urlpatterns = patterns('',
     url(r'^api/', include(api_patterns)),
     url(r'^guests/', include(guest_patterns)),
+    url(r'^messages/', include(message_patterns)),
     # No Prefix
     url(r'^send-welcome/$', views.SendWelcomeView.as_view(), name='send_welcome'),
     url(r'^auto-replies/$', views.ReplyView.as_view(), name='replies'),
@@ -1,7 +1,7 @@
 from django.conf import settings
 from django.contrib.auth.models import Group
 from django.core.urlresolvers import reverse, reverse_lazy
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import HttpResponseRedirect, HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View, DetailView, ListView, TemplateView
@@ -12,14 +12,18 @@ from braces.views import (LoginRequiredMixin, SetHeadlineMixin, CsrfExemptMixin,
 from twilio import twiml
 from ws4redis.publisher import RedisPublisher
 
-from concierge.models import Message, Guest, Trigger
+from concierge import deltas, status
+from concierge.models import ArchivedMessage, Message, Guest, Trigger
 from concierge.helpers import process_incoming_message, convert_to_json_and_publish_to_redis
 from concierge.forms import GuestForm
 from concierge.mixins import GuestListContextMixin
 from concierge.permissions import IsManagerOrAdmin
-from concierge.tasks import check_twilio_messages_to_merge, trigger_send_message
-from main.mixins import HotelUserMixin
+from concierge.tasks import (check_twilio_messages_to_merge, trigger_send_message,
+    update_message_statuses)
+from main.mixins import AdminOnlyMixin, HotelUserMixin
+from sms.helpers import twilio_signature_valid
 from utils import DeleteButtonMixin
+from utils.exports import ExportMixin
 
 
 class ReceiveSMSView(CsrfExemptMixin, TemplateView):
@@ -55,6 +59,26 @@ class ReceiveSMSView(CsrfExemptMixin, TemplateView):
         return HttpResponse(str(resp), content_type='text/xml')
 
 
+class ReceiveStatusView(CsrfExemptMixin, View):
+    '''
+    Twilio ``StatusCallback`` URL of sent Messages. Updates are queued, and
+    saved in batches by ``update_message_statuses``.
+
+    Only callbacks w/ a valid ``X-Twilio-Signature`` are queued.
+    '''
+    def post(self, request, *args, **kwargs):
+        if not twilio_signature_valid(settings.MESSAGE_STATUS_CALLBACK_URL, request.POST,
+                                      request.META.get('HTTP_X_TWILIO_SIGNATURE')):
+            return HttpResponseForbidden()
+
+        if request.POST.get('MessageSid') and request.POST.get('MessageStatus'):
+            if status.push(request.POST):
+                update_message_statuses.apply_async(
+                    countdown=settings.MESSAGE_STATUS_BATCH_DELAY)
+
+        return HttpResponse(status=204)
+
+
 class SendWelcomeView(LoginRequiredMixin, SetHeadlineMixin, StaticContextMixin,
     HotelUserMixin, TemplateView):
     '''
@@ -104,7 +128,8 @@ class GuestDetailView(GuestBaseView, GuestListContextMixin, DetailView):
         RedisPublisher(facility='foobar', broadcast=True)
         # mark all messages as 'read'
         self.object = self.get_object()
-        Message.objects.filter(guest=self.object, read=False).update(read=True)
+        if Message.objects.filter(guest=self.object, read=False).update(read=True):
+            deltas.publish(self.object.hotel_id, 'message', 'read', {'guest': self.object.id})
         check_twilio_messages_to_merge(self.object)
 
         return super(GuestDetailView, self).get(request, *args, **kwargs)
@@ -174,6 +199,33 @@ class GuestDeleteView(GuestBaseView, DeleteButtonMixin, TemplateView):
         return HttpResponseRedirect(reverse('concierge:guest_list'))
 
 
+class MessageExportView(LoginRequiredMixin, AdminOnlyMixin, ExportMixin, View):
+    """
+    Streaming CSV, or ``?format=ndjson``, of the Hotel's Messages, incl.
+    archived ones, for ``?start=`` to ``?end=``.
+    """
+    export_name = 'messages'
+    export_date_field = 'insert_date'
+    export_fields = [
+        ('id', 'id'),
+        ('insert_date', 'insert_date'),
+        ('guest', 'guest__name'),
+        ('user', 'user__username'),
+        ('received', 'received'),
+        ('status', 'status'),
+        ('to_ph', 'to_ph'),
+        ('from_ph', 'from_ph'),
+        ('body', 'body'),
+        ('reason', 'reason'),
+        ('cost', 'cost'),
+        ('segments', 'segments'),
+    ]
+
+    def get_export_querysets(self):
+        return [model.objects.filter(hotel=self.hotel)
+                for model in (Message, ArchivedMessage)]
+
+
 class ReplyView(LoginRequiredMixin, IsManagerOrAdmin, SetHeadlineMixin, StaticContextMixin,
     HotelUserMixin, TemplateView):
     """
@@ -1,19 +1,30 @@
+import datetime
+
 from django.conf import settings
 from django.http import Http404
 from django.db.models import Q
+from django.utils import timezone
 
 from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import list_route
-from rest_framework.exceptions import MethodNotAllowed, PermissionDenied, ValidationError
+from rest_framework.exceptions import (MethodNotAllowed, PermissionDenied, Throttled,
+    ValidationError)
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from concierge.models import Message, Guest, Reply, TriggerType, Trigger
+from concierge import deltas
+from concierge.helpers import read_guest_import
+from concierge.models import Message, Guest, Reply, ScheduledMessage, TriggerType, Trigger
 from concierge.permissions import IsHotelObject, IsManagerOrAdmin
 from concierge.serializers import (MessageListCreateSerializer, GuestMessageSerializer,
-    GuestListSerializer, MessageRetrieveSerializer, ReplySerializer,
-    TriggerTypeSerializer, TriggerSerializer, TriggerCreateSerializer)
+    GuestListSerializer, GuestLookupSerializer, MessageRetrieveSerializer,
+    ReplySerializer, ScheduledMessageSerializer, TriggerTypeSerializer, TriggerSerializer,
+    TriggerCreateSerializer)
+from concierge.tasks import send_welcome_messages, trigger_send_messages
 from sms.helpers import clean_ph_num_mask
+from sms.ratelimit import RateLimited
+from utils import to_date
+from utils.mixins import ReplicaMixin
 from utils.views import ListDataMixin, BaseModelViewSet
 
 
@@ -41,13 +52,67 @@ class MessageAPIView(viewsets.ModelViewSet):
         serializer = MessageListCreateSerializer(messages, many=True)
         return Response(serializer.data)
 
+    def create(self, request, *args, **kwargs):
+        """
+        Sent right away. If the sending number is rate limited, a Message to
+        a Guest is scheduled for when it can send again, and returned as a
+        ScheduledMessage w/ a 202. Else, a 429.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            self.perform_create(serializer)
+        except RateLimited as e:
+            guest = serializer.validated_data.get('guest')
+            if not guest:
+                raise Throttled(wait=e.wait)
+            scheduled_message = ScheduledMessage.objects.schedule(guest,
+                serializer.validated_data['body'],
+                timezone.now() + datetime.timedelta(seconds=e.wait))
+            return Response(ScheduledMessageSerializer(scheduled_message).data,
+                status=status.HTTP_202_ACCEPTED)
+
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    @list_route(methods=['get'], url_path=r"search")
+    def search(self, request):
+        """
+        The Hotel's Messages matching ``?q=``, best match 1st, paginated w/
+        ``?page=``. Optionally ``?start=`` / ``?end=`` dates.
+
+        Only the newest ``MESSAGE_SEARCH_LIMIT`` matches, from the last
+        ``MESSAGE_HOT_MONTHS`` months, are returned. Archived Messages
+        aren't searched.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError("'q' is required.")
+
+        messages = Message.objects.current().filter(hotel=request.user.profile.hotel)
+        for param, lookup in (('start', 'insert_date__gte'), ('end', 'insert_date__lte')):
+            try:
+                date = to_date(request.query_params.get(param))
+            except ValueError:
+                raise ValidationError("'{}' must be a date, i.e. 2016-04-05.".format(param))
+            if date:
+                messages = messages.filter(**{lookup: date})
+
+        page = self.paginate_queryset(messages.search(query))
+        serializer = MessageListCreateSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @list_route(methods=['post'], url_path=r"send-welcome")
     def bulk_send_welcome(self, request):
+        """
+        Sent right away, until the Hotel's number is rate limited. The rest
+        are paced by a Task, w/ a 202.
+        """
         hotel = request.user.profile.hotel
         trigger = self._get_trigger(hotel)
         body = trigger.reply.message
-        self._bulk_send(request, body)
-        return Response(status=status.HTTP_200_OK)
+        queued = self._bulk_send(request, body)
+        return Response(status=status.HTTP_202_ACCEPTED if queued else status.HTTP_200_OK)
 
     def _get_trigger(self, hotel):
         try:
@@ -59,18 +124,30 @@ class MessageAPIView(viewsets.ModelViewSet):
         return trigger
 
     def _bulk_send(self, request, body):
+        """
+        Return: the phone numbers handed to ``send_welcome_messages``, b/c
+            they were rate limited
+        """
+        hotel = request.user.profile.hotel
+        phone_numbers = [clean_ph_num_mask(v) for k,v in sorted(request.data.iteritems())]
         errors = {}
-        for k,v in request.data.iteritems():
-            ph = clean_ph_num_mask(v)
-            msg = Message.objects.create(hotel=request.user.profile.hotel, to_ph=ph, body=body)
+        queued = []
+        for i, ph in enumerate(phone_numbers):
+            try:
+                msg = Message.objects.create(hotel=hotel, to_ph=ph, body=body)
+            except RateLimited:
+                queued = phone_numbers[i:]
+                send_welcome_messages.delay(hotel.id, queued, body)
+                break
             if msg.reason:
                 errors[ph] = msg.reason
 
         if errors:
             raise ValidationError(errors)
+        return queued
 
 
-class GuestMessagesAPIView(viewsets.ModelViewSet):
+class GuestMessagesAPIView(ReplicaMixin, viewsets.ModelViewSet):
     """Filter for Guests for the User's Hotel only."""
 
     queryset = Guest.objects.current()
@@ -78,7 +155,10 @@ class GuestMessagesAPIView(viewsets.ModelViewSet):
 
     def list(self, request):
         try:
-            guests = Guest.objects.current().filter(hotel=request.user.profile.hotel)
+            guests = (Guest.objects.current()
+                                   .filter(hotel=request.user.profile.hotel)
+                                   .select_related('icon')
+                                   .prefetch_related('message_set'))
         except AttributeError:
             raise Http404
         serializer = GuestMessageSerializer(guests, many=True)
@@ -97,16 +177,60 @@ class GuestAPIView(viewsets.ModelViewSet):
     permission_classes = DEFAULT_PERMISSIONS
 
     def list(self, request):
-        guests = Guest.objects.current().filter(hotel=request.user.profile.hotel)
+        guests = (Guest.objects.current()
+                               .filter(hotel=request.user.profile.hotel)
+                               .select_related('icon')
+                               .prefetch_related('message_set'))
         serializer = GuestListSerializer(guests, many=True)
         return Response(serializer.data)
 
     def perform_create(self, serializer):
         serializer.save(hotel=self.request.user.profile.hotel)
 
+    @list_route(methods=['get'], url_path=r"lookup")
+    def lookup(self, request):
+        """
+        Typeahead: the top ``GUEST_LOOKUP_LIMIT`` Guests of the Hotel matching
+        ``?q=`` by name, room number or phone number, current Guests 1st.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response([])
+
+        guests = (Guest.objects.filter(hotel=request.user.profile.hotel)
+                               .lookup(query)[:settings.GUEST_LOOKUP_LIMIT])
+        serializer = GuestLookupSerializer(guests, many=True)
+        return Response(serializer.data)
+
+    @list_route(methods=['post'], url_path=r"import")
+    def bulk_import(self, request):
+        """
+        Create Guests from an uploaded CSV / PMS arrival feed ``file``,
+        or a JSON list of Guests, and send their "check_in" Triggers
+        as 1 Task.
+        """
+        upload = request.FILES.get('file')
+        rows = read_guest_import(upload) if upload else request.data
+
+        if not isinstance(rows, list):
+            raise ValidationError("Upload a CSV 'file', or post a list of Guests.")
+        if len(rows) > settings.GUEST_IMPORT_MAX_ROWS:
+            raise ValidationError("Import at most {} Guests at a time."
+                                  .format(settings.GUEST_IMPORT_MAX_ROWS))
+
+        guests, errors = Guest.objects.bulk_import(request.user.profile.hotel, rows)
+        if guests:
+            trigger_send_messages.delay([guest.id for guest in guests],
+                settings.CHECK_IN_TRIGGER)
+
+        return Response({'created': len(guests), 'errors': errors},
+            status=status.HTTP_201_CREATED if guests else status.HTTP_400_BAD_REQUEST)
+
     def get_serializer_class(self):
         if self.action == 'list':
             return GuestListSerializer
+        elif self.action == 'lookup':
+            return GuestLookupSerializer
         else:
             raise MethodNotAllowed(self.action)
 
@@ -163,10 +287,37 @@ class TriggerAPIView(BaseModelViewSet):
 
     def get_queryset(self):
         queryset = super(TriggerAPIView, self).get_queryset()
-        queryset = queryset.filter(hotel=self.request.user.profile.hotel)
+        queryset = (queryset.filter(hotel=self.request.user.profile.hotel)
+                            .select_related('type', 'reply'))
         return queryset
 
 
+class DeltaAPIView(APIView):
+    """
+    The Hotel's Guest List deltas after ``?since=<version>``, to catch up
+    after a websocket reconnect. W/o ``since``, only the current version.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request, format='json'):
+        try:
+            hotel_id = request.user.profile.hotel.id
+        except AttributeError:
+            raise PermissionDenied
+
+        version = request.query_params.get('since')
+        if version is None:
+            return Response({'hotel': hotel_id, 'version': deltas.version(hotel_id),
+                             'deltas': [], 'reset': False})
+
+        try:
+            version = int(version)
+        except ValueError:
+            raise ValidationError("'since' must be a version number.")
+
+        return Response(deltas.since(hotel_id, version))
+
+
 class CurrentUserAPIView(APIView):
     
     permission_classes = (permissions.IsAuthenticated,)
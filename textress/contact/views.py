@@ -3,13 +3,14 @@ from rest_framework import generics
 
 from contact.models import Contact, Topic
 from contact.serializers import ContactSerializer, FAQSerializer
+from utils.mixins import ReplicaMixin
 
 
 ########
 # REST #
 ########
 
-class FAQListAPIView(generics.ListAPIView):
+class FAQListAPIView(ReplicaMixin, generics.ListAPIView):
     '''No permissions needed b/c read only list view, and will be used 
     on the Biz Site.'''
 
@@ -22,7 +23,7 @@ class FAQListAPIView(generics.ListAPIView):
         serializer = self.serializer_class(self.queryset, many=True)
         return Response(serializer.data)
 
-class FAQRetrieveAPIView(generics.RetrieveAPIView):
+class FAQRetrieveAPIView(ReplicaMixin, generics.RetrieveAPIView):
 
     queryset = Topic.objects.all()
     serializer_class = FAQSerializer
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hotel',
+            name='sender_pool',
+            field=models.BooleanField(default=False, help_text=b"Send from all of the Hotel's Phone Numbers. Each Guest always hears from the same number.", verbose_name='Sender Pool'),
+        ),
+    ]
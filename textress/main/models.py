@@ -8,11 +8,13 @@ from django.utils.translation import ugettext, ugettext_lazy as _
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.contrib.auth.models import User, Group
+from django.utils import timezone
 from django.utils.text import slugify
 from django.utils.encoding import python_2_unicode_compatible
 from django.dispatch import receiver
 from django.db.models.signals import post_save, pre_delete
 from django.forms.models import model_to_dict
+from django.utils.functional import cached_property
 
 from django.core.cache import caches
 cache = caches['default']
@@ -40,12 +42,14 @@ def viewable_user_fields_dict(user):
 
 
 class TwilioClient(object):
-
-    def __init__(self, *args, **kwargs):
-        super(TwilioClient, self).__init__(*args, **kwargs)
-
+    """
+    Master Account Twilio Client, built on first use and not for every
+    Model instance, or at import for the Managers.
+    """
+    @cached_property
+    def client(self):
         # bring in Twilio and get API key from settings.py
-        self.client = TwilioRestClient(settings.TWILIO_ACCOUNT_SID,
+        return TwilioRestClient(settings.TWILIO_ACCOUNT_SID,
             settings.TWILIO_AUTH_TOKEN, timeout=None)
 
 
@@ -106,6 +110,9 @@ class Hotel(TwilioClient, BaseModel):
     active = models.BooleanField(blank=True, default=True,
         help_text="Deactivate Hotel here when they run out of funds to send SMS.")
     group_name = models.CharField(blank=True, max_length=100)
+    sender_pool = models.BooleanField(_("Sender Pool"), blank=True, default=False,
+        help_text="Send from all of the Hotel's Phone Numbers. Each Guest always "
+                  "hears from the same number.")
     # Stripe
     customer = models.ForeignKey(Customer, blank=True, null=True,
         help_text="Stripe Customer Id")
@@ -228,17 +235,26 @@ class Hotel(TwilioClient, BaseModel):
         self.save()
         return self
 
+    def _update_fields(self, *fields):
+        """
+        Field scoped UPDATE w/o calling ``save``, so the ``group_name`` 
+        isn't regenerated, and no signals are sent.
+        """
+        self.modified = timezone.now()
+        values = {f: getattr(self, f) for f in fields}
+        Hotel.objects.filter(pk=self.pk).update(modified=self.modified, **values)
+
     def update_twilio_phone(self, ph_sid, phone_number):
         self.twilio_ph_sid = ph_sid
         self.twilio_phone_number = phone_number
-        self.save()
+        self._update_fields('twilio_ph_sid', 'twilio_phone_number')
         return self
 
     def remove_twilio_phone(self):
         "Remove denormalized PH reference on Hotel"
         self.twilio_ph_sid = None
         self.twilio_phone_number = None
-        self.save()
+        self._update_fields('twilio_ph_sid', 'twilio_phone_number')
         return self
 
     def get_subaccount(self):
@@ -349,11 +365,11 @@ class UserProfile(BaseModel):
 
     def hotel_group(self):
         hotel_group_names = Hotel.group_names_dict()
-        # should be a count of either 1 or 0
-        groups = self.user.groups.filter(name__in=['hotel_admin', 'hotel_manager'])
+        # should be a count of either 1 or 0. ``all()``, so uses ``prefetch_related``
+        groups = [g.name for g in self.user.groups.all() if g.name in hotel_group_names]
 
         try:
-            return Hotel.group_names_dict()[groups[0].name]
+            return hotel_group_names[groups[0]]
         except IndexError:
             return ''
 
@@ -413,11 +429,10 @@ class Subaccount(BaseModel):
 
     objects = SubaccountManager()
     
-    def __init__(self, *args, **kwargs):
-        super(Subaccount, self).__init__(*args, **kwargs)
-
-        # Twilio Client
-        self.client = TwilioRestClient(self.sid, self.auth_token)
+    @cached_property
+    def client(self):
+        "Twilio Client"
+        return TwilioRestClient(self.sid, self.auth_token)
 
     def __str__(self):
         return self.sid
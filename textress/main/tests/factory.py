@@ -41,9 +41,7 @@ def create_hotel(name=None, address_phone=None):
         name = create._generate_name()
     address_data['name'] = name
 
-    if not address_phone:
-        address_data['address_phone'] = create._generate_ph()
-    address_data['address_phone']
+    address_data['address_phone'] = address_phone or create._generate_ph()
 
     return Hotel.objects.create(**address_data)
 
@@ -28,6 +28,14 @@ class TwilioClientTests(TestCase):
         self.assertIsInstance(tc, TwilioClient)
         self.assertIsInstance(tc.client, TwilioRestClient)
 
+    def test_client__lazy(self):
+        tc = TwilioClient()
+        self.assertNotIn('client', tc.__dict__)
+
+        client = tc.client
+
+        self.assertIs(tc.client, client)
+
 
 class HotelTests(TestCase):
 
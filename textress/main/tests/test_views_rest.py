@@ -7,6 +7,7 @@ from rest_framework.test import APITestCase
 
 from main.tests.factory import create_hotel, create_hotel_user, PASSWORD
 from utils import create
+from utils.tests.budget import QueryBudgetMixin
 
 
 class UserAPIViewTests(APITestCase):
@@ -119,3 +120,35 @@ class HotelAPIViewTests(APITestCase):
         self.client.login(username=self.admin_a.username, password=self.password)
         response = self.client.get(reverse('main:api_hotel', kwargs={'pk':self.hotel_a.pk}))
         self.assertEqual(response.status_code, 200)
+
+
+class APIQueryBudgetTests(QueryBudgetMixin, APITestCase):
+
+    def setUp(self):
+        create._get_groups_and_perms()
+        self.hotel = create_hotel()
+        self.admin = create_hotel_user(hotel=self.hotel, group='hotel_admin')
+        self.client.login(username=self.admin.username, password=PASSWORD)
+
+    def make_users(self, n):
+        for i in range(n - User.objects.count()):
+            create_hotel_user(hotel=self.hotel, group='hotel_manager')
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_users_list(self):
+        self.assertBudgetFlat(self.make_users, lambda: self.get(reverse('main:api_users')),
+            db=6, cache=1)
+
+    def test_users_detail(self):
+        url = reverse('main:api_users', kwargs={'pk': self.admin.pk})
+        with self.assertBudget(db=6, cache=1):
+            self.get(url)
+
+    def test_hotel_detail(self):
+        url = reverse('main:api_hotel', kwargs={'pk': self.hotel.pk})
+        with self.assertBudget(db=5, cache=1):
+            self.get(url)
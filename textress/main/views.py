@@ -340,14 +340,16 @@ class UserListAPIView(generics.ListAPIView):
     permission_classes = (permissions.IsAuthenticated, IsManagerOrAdmin)
 
     def list(self, request):
-        users = User.objects.filter(profile__hotel=request.user.profile.hotel)
+        users = (User.objects.filter(profile__hotel=request.user.profile.hotel)
+                             .select_related('profile__icon')
+                             .prefetch_related('groups'))
         serializer = UserSerializer(users, many=True)
         return Response(serializer.data)
 
 
 class UserRetrieveAPIView(generics.RetrieveAPIView):
 
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('profile__icon', 'profile__hotel').prefetch_related('groups')
     serializer_class = UserSerializer
     permission_classes = (permissions.IsAuthenticated, IsManagerOrAdmin, IsHotelUser)
 
@@ -1,6 +1,6 @@
 from django import forms
 
-from account.models import CHARGE_AMOUNTS
+from account.models import AcctCost, CHARGE_AMOUNTS
 from utils.forms import Bootstrap3Form
 
 
@@ -32,8 +32,9 @@ class OneTimePaymentForm(Bootstrap3Form):
     def __init__(self, hotel, *args, **kwargs):
         super(OneTimePaymentForm, self).__init__(*args, **kwargs)
         self.hotel = hotel
-        self.fields['amount'].initial = self.hotel.acct_cost.recharge_amt
-        self.fields['auto_recharge'].initial = self.hotel.acct_cost.auto_recharge
+        acct_cost = AcctCost.objects.get_for_hotel(self.hotel)
+        self.fields['amount'].initial = acct_cost.recharge_amt
+        self.fields['auto_recharge'].initial = acct_cost.auto_recharge
 
     amount = forms.ChoiceField(choices=CHARGE_AMOUNTS, required=False)
     auto_recharge = forms.BooleanField(required=False)
@@ -47,10 +48,5 @@ class OneTimePaymentForm(Bootstrap3Form):
 
     def clean_auto_recharge(self):
         auto_recharge = self.cleaned_data.get('auto_recharge', False)
-        acct_cost = self.hotel.acct_cost
-
-        if auto_recharge != acct_cost.auto_recharge:
-            acct_cost.auto_recharge = auto_recharge
-            acct_cost.save()
-
+        AcctCost.objects.upsert(self.hotel, auto_recharge=auto_recharge)
         return auto_recharge
@@ -1,6 +1,5 @@
 import stripe
 
-from django.conf import settings
 from django.core.urlresolvers import reverse
 
 from account.models import TransType, AcctTrans
@@ -8,9 +7,6 @@ from payment.models import Customer, Card, Charge
 from utils import alert_messages
 
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
-
 def signup_register_step4(hotel, token, email, amount):
     '''
     Setup all Payment records for the Hotel upon registration.
@@ -9,13 +9,17 @@ from django.core.exceptions import ValidationError
 
 
 class StripeClient(object):
-    '''Stripe is needed for Model Manager Methods.'''
+    '''
+    Stripe is needed for Model Manager Methods.
 
-    def __init__(self, *args, **kwargs):
-        super(StripeClient, self).__init__(*args, **kwargs)
-        
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-        self.stripe = stripe
+    The API Key is set on first use, and not when the Managers are
+    instantiated at import.
+    '''
+    @property
+    def stripe(self):
+        if stripe.api_key != settings.STRIPE_SECRET_KEY:
+            stripe.api_key = settings.STRIPE_SECRET_KEY
+        return stripe
 
 
 class PmtBaseModel(StripeClient, models.Model):
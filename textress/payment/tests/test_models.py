@@ -23,6 +23,14 @@ class StripeClientTests(TestCase):
         self.assertTrue(hasattr(sc, 'stripe'))
         self.assertIsNotNone(sc.stripe.api_key)
 
+    def test_api_key__set_on_use(self):
+        self.addCleanup(setattr, stripe, 'api_key', stripe.api_key)
+        stripe.api_key = None
+        sc = StripeClient()
+
+        self.assertIsNone(stripe.api_key)
+        self.assertEqual(sc.stripe.api_key, settings.STRIPE_SECRET_KEY)
+
 
 class PmtBaseModelTests(TestCase):
 
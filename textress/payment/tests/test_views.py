@@ -6,7 +6,7 @@ from django.contrib.auth.models import User
 
 from model_mommy import mommy
 
-from account.models import (Pricing, AcctCost, AcctStmt, AcctTrans,
+from account.models import (Pricing, AcctCost, AcctStmt, AcctTrans, BillingSnapshot,
     CHARGE_AMOUNTS, BALANCE_AMOUNTS)
 from account.tests.factory import (CREATE_ACCTCOST_DICT, create_acct_stmt,
     create_acct_stmts, create_acct_trans)
@@ -361,6 +361,27 @@ class BillingSummaryTests(TransactionTestCase):
             self.acct_stmt.balance
         )
 
+    def test_context_billing_snapshot(self):
+        response = self.client.get(reverse('payment:summary'))
+
+        snapshot = response.context['billing_snapshot']
+        self.assertIsInstance(snapshot, BillingSnapshot)
+        self.assertEqual(snapshot.hotel_id, self.hotel.id)
+        self.assertEqual(response.context['acct_stmts'], snapshot.acct_stmts)
+
+    def test_context_date(self):
+        response = self.client.get("{}?date={}-{}".format(reverse('payment:summary'),
+            self.acct_stmt.year, self.acct_stmt.month))
+
+        self.assertEqual(response.context['acct_stmt'], self.acct_stmt)
+
+    def test_context_date__invalid(self):
+        for date in ('2015-xx', '2015', '2015-1-1'):
+            response = self.client.get("{}?date={}".format(reverse('payment:summary'), date))
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['acct_stmt'], self.acct_stmt)
+
     def test_acct_stmts_preview_none(self):
         [x.delete() for x in AcctStmt.objects.filter(hotel=self.hotel)]
         response = self.client.get(reverse('payment:summary'))
@@ -9,7 +9,7 @@ import stripe
 from braces.views import SetHeadlineMixin, FormValidMessageMixin, LoginRequiredMixin
 
 from account.mixins import AcctCostContextMixin
-from account.models import AcctCost, AcctStmt, AcctTrans
+from account.models import AcctCost, AcctTrans, BillingSnapshot
 from account.tasks import create_initial_acct_trans_and_stmt
 from concierge.tasks import create_hotel_default_help_reply, create_hotel_default_send_welcome
 from main.mixins import (RegistrationContextMixin, HotelContextMixin, HotelUserMixin,
@@ -122,20 +122,19 @@ class SummaryView(LoginRequiredMixin, AdminOnlyMixin, SetHeadlineMixin, Template
         """
         context = self.get_context_data(**kwargs)
 
-        queryset = AcctStmt.objects.filter(hotel=self.hotel)
-        if queryset:
-            try:
-                date = request.GET.get('date')
-                year, month = date.split('-')
-                acct_stmt = queryset.get(year=year, month=month)  
-            except (KeyError, AttributeError):
-                acct_stmt = queryset.first()
-            finally:
-                context.update({
-                    'year': acct_stmt.year,
-                    'month': acct_stmt.month,
-                    'acct_stmt': acct_stmt
-                })
+        try:
+            year, month = map(int, request.GET['date'].split('-'))
+        except (KeyError, ValueError):
+            year = month = None
+
+        acct_stmt = (self.billing_snapshot.get_acct_stmt(month, year) or
+                     self.billing_snapshot.get_acct_stmt())
+        if acct_stmt:
+            context.update({
+                'year': acct_stmt.year,
+                'month': acct_stmt.month,
+                'acct_stmt': acct_stmt
+            })
         else:
             context['acct_stmt'] = None
 
@@ -143,13 +142,14 @@ class SummaryView(LoginRequiredMixin, AdminOnlyMixin, SetHeadlineMixin, Template
 
     def get_context_data(self, **kwargs):
         context = super(SummaryView, self).get_context_data(**kwargs)
+        self.billing_snapshot = BillingSnapshot.get(self.hotel)
         # new
-        context['acct_stmt_starting_balance'] = AcctStmt.objects.starting_balance(hotel=self.hotel)
+        context['acct_stmt_starting_balance'] = self.billing_snapshot.starting_balance
         # legacy
-        context['acct_stmts'] = AcctStmt.objects.filter(hotel=self.hotel)
-        context['acct_cost'], created = AcctCost.objects.get_or_create(hotel=self.hotel)
-        context['acct_trans'] = AcctTrans.objects.filter(hotel=self.hotel,
-            trans_type__name__in=['init_amt', 'recharge_amt']).order_by('-insert_date')[:4]
+        context['acct_stmts'] = self.billing_snapshot.acct_stmts
+        context['acct_cost'] = AcctCost.objects.for_hotel(self.hotel)
+        context['acct_trans'] = self.billing_snapshot.funding_trans
+        context['billing_snapshot'] = self.billing_snapshot
         return context
 
 
@@ -171,8 +171,8 @@ class CardListView(LoginRequiredMixin, AdminOnlyMixin, BillingSummaryContextMixi
         return kwargs
 
     def get_form_valid_message(self):
-        return "The payment has been successfully processed. An email will be"
-               "sent to {}. Thank you.".format(self.request.user.email)
+        return ("The payment has been successfully processed. An email will be "
+                "sent to {}. Thank you.".format(self.request.user.email))
 
     def form_valid(self, form):
         try:
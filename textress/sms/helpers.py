@@ -11,7 +11,9 @@ from django.core.urlresolvers import reverse
 
 import twilio
 from twilio.rest import TwilioRestClient
+from twilio.util import RequestValidator
 
+from sms.ratelimit import hotel_bucket
 from utils import alert_messages, sms_messages
 
 
@@ -50,12 +52,20 @@ def send_text(text):
         return text
 
 
-def send_message(hotel, to, body):
+def send_message(hotel, to, body, from_=None, max_wait=0):
     """
     Main Send Message Twilio function call.
 
+    :from_: PH # to send from, i.e. from ``sms.pool.sender``. Default is the
+        Hotel's ``twilio_phone_number``.
+    :max_wait: seconds to wait for the ``from_`` number's rate limit. None
+        for ``SMS_RATE_LIMIT_MAX_WAIT``, to pace Tasks. Requests don't wait.
+
     Monkey patch this method in test, so the ``if 'test' in sys.argv`` is removed
     from this production code.
+
+    Raises: ``sms.ratelimit.RateLimited`` if the ``from_`` number can't send
+        w/i ``max_wait`` seconds.
     """
     # so not sending live SMS with ``./manage.py test``
     if 'test' in sys.argv:
@@ -63,12 +73,19 @@ def send_message(hotel, to, body):
         hotel.redis_incr_sms_count()
         return True
 
+    from_ = from_ or hotel.twilio_phone_number
+
+    # paced to the number's rate limit, or raises ``RateLimited``
+    if from_:
+        hotel_bucket(hotel, from_).acquire(max_wait)
+
     client = TwilioRestClient(hotel.twilio_sid, hotel.twilio_auth_token)
     try:
         message = client.messages.create(
             to=to,
-            from_=hotel.twilio_phone_number,
-            body=body
+            from_=from_,
+            body=body,
+            status_callback=settings.MESSAGE_STATUS_CALLBACK_URL
             )
     except twilio.TwilioRestException as e:
         raise e
@@ -78,6 +95,33 @@ def send_message(hotel, to, body):
         return message
 
 
+def twilio_signature_valid(url, data, signature):
+    """
+    Twilio signs its callbacks w/ the auth token of the account that sent
+    the SMS, the Hotel's Subaccount or ours.
+
+    :url: URL Twilio was given for the callback
+    :data: POST of the callback
+    :signature: its ``X-Twilio-Signature`` header
+    """
+    from main.models import Hotel
+
+    account_sid = data.get('AccountSid')
+    if not (account_sid and signature):
+        return False
+
+    if account_sid == settings.TWILIO_ACCOUNT_SID:
+        auth_token = settings.TWILIO_AUTH_TOKEN
+    else:
+        auth_token = (Hotel.objects.filter(twilio_sid=account_sid)
+                                   .values_list('twilio_auth_token', flat=True)
+                                   .first())
+    if not auth_token:
+        return False
+
+    return RequestValidator(auth_token).validate(url, dict(data.items()), signature)
+
+
 def get_weather(url="http://weather.yahooapis.com/forecastrss?w=12795483&u=f"):
     try:
         r = requests.get(url)
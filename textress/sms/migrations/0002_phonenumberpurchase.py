@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import utils.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+        ('sms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhoneNumberPurchase',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('status', models.CharField(default=b'pending', max_length=10, choices=[(b'pending', b'Pending'), (b'running', b'Running'), (b'complete', b'Complete'), (b'failed', b'Failed')])),
+                ('error', models.CharField(max_length=255, blank=True)),
+                ('hotel', models.ForeignKey(related_name='phone_number_purchases', to='main.Hotel')),
+                ('phone_number', models.ForeignKey(on_delete=django.db.models.deletion.SET_NULL, blank=True, to='sms.PhoneNumber', null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+            bases=(utils.models.Dates, models.Model),
+        ),
+    ]
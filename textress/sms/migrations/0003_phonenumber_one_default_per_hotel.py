@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def dedupe_defaults(apps, schema_editor):
+    """
+    Keep 1 default PhoneNumber per Hotel before adding the unique index. 
+    The Hotel's denormalized ``twilio_ph_sid`` wins, else the latest modified.
+    """
+    PhoneNumber = apps.get_model('sms', 'PhoneNumber')
+    seen = set()
+
+    for ph in (PhoneNumber.objects.filter(default=True)
+                                  .select_related('hotel')
+                                  .order_by('hotel', '-modified')):
+        if ph.hotel_id in seen:
+            continue
+        seen.add(ph.hotel_id)
+
+        keep = ph.hotel.twilio_ph_sid or ph.sid
+        if not PhoneNumber.objects.filter(hotel_id=ph.hotel_id, sid=keep, default=True).exists():
+            keep = ph.sid
+
+        (PhoneNumber.objects.filter(hotel_id=ph.hotel_id, default=True)
+                            .exclude(sid=keep)
+                            .update(default=False))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0002_phonenumberpurchase'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_defaults, migrations.RunPython.noop),
+        migrations.RunSQL(
+            ['CREATE UNIQUE INDEX sms_phonenumber_one_default_per_hotel '
+             'ON sms_phonenumber (hotel_id) WHERE "default";'],
+            ['DROP INDEX sms_phonenumber_one_default_per_hotel;']
+        ),
+    ]
@@ -1,26 +1,78 @@
-import sys
+import datetime
+import logging
 
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import ugettext, ugettext_lazy as _
 from django.core.exceptions import (ObjectDoesNotExist, MultipleObjectsReturned,
     ValidationError)
 from django.dispatch import receiver
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.utils import timezone
 
 from twilio import TwilioRestException
 
 from account.models import AcctTrans, TransType
 from main.models import Hotel, TwilioClient
 from utils import email
-from utils.exceptions import PhoneNumberNotDeletedExcp
+from utils.exceptions import (AutoRechargeOffExcp, PhoneNumberNotDeletedExcp,
+    PhoneNumberPurchaseFailedExcp)
 from utils.models import TimeStampBaseModel
+from utils.redis_server import get_server
+
+
+logger = logging.getLogger(__name__)
 
 
 ################
 # PHONE NUMBER #
 ################
 
+class PhoneNumberCandidates(object):
+    """
+    Redis list of available Twilio PH #'s per ``area_code``, so a purchase 
+    doesn't have to wait on a Twilio search.
+
+    Refilled in the background by ``sms.tasks.refresh_phone_number_candidates``
+    when it runs low.
+    """
+    @staticmethod
+    def cache_key(area_code):
+        return "ph_num_candidates_{}".format(area_code)
+
+    @classmethod
+    def get(cls, area_code):
+        return get_server().lrange(cls.cache_key(area_code), 0, -1)
+
+    @classmethod
+    def set(cls, area_code, candidates):
+        key = cls.cache_key(area_code)
+        pipe = get_server().pipeline(transaction=True)
+        pipe.delete(key)
+        if candidates:
+            pipe.rpush(key, *candidates)
+            pipe.expire(key, settings.PHONE_NUMBER_CANDIDATES_CACHE_TIMEOUT)
+        pipe.execute()
+
+    @classmethod
+    def take(cls, area_code, count):
+        """
+        Remove and return up to ``count`` candidates in 1 MULTI, so 
+        concurrent purchases never get the same PH #.
+        """
+        key = cls.cache_key(area_code)
+        pipe = get_server().pipeline(transaction=True)
+        pipe.lrange(key, 0, count - 1)
+        pipe.ltrim(key, count, -1)
+        candidates, _ = pipe.execute()
+        return candidates
+
+    @classmethod
+    def is_low(cls, area_code):
+        return get_server().llen(cls.cache_key(area_code)) < settings.PHONE_NUMBER_CANDIDATES_MIN
+
+
 class PhoneNumberManager(TwilioClient, models.Manager):
 
     ### UPDATE PRIMARY
@@ -35,30 +87,34 @@ hotel: {}".format(hotel))
         return ph
 
     def _set_default(self, hotel, sid):
-        """Set the Default Card before calling the complete 
-        ``update_default`` method."""
-        ph = self.get(sid=sid)
-        ph.default = True
-        ph.save()
-        return ph
+        """Set the default PhoneNumber w/o updating the Hotel. Non-defaults 
+        are updated 1st, so there is never more than 1 default per Hotel."""
+        self._update_non_defaults(hotel, sid)
+        self.filter(hotel=hotel, sid=sid).update(default=True)
 
     def _update_non_defaults(self, hotel, sid):
         "All other 'non-default' PhoneNumbers are set as default=False."
-        for ph in self.filter(hotel=hotel, default=True).exclude(sid=sid):
-            ph.default = False
-            ph.save()
+        self.filter(hotel=hotel, default=True).exclude(sid=sid).update(default=False)
 
     def update_default(self, hotel, sid):
         """
         Call all set default PH logic.
 
+        Single transaction of UPDATE's, so no PhoneNumber or Hotel ``save`` 
+        (and their signals) are called. The Hotel row is locked, so 
+        concurrent switches for the same Hotel are serialized.
+
         :hotel: Hotel object
         :sid: PhoneNumber.sid that will be set as the **default**
         """
-        self._validate_ph_num(hotel, sid)
-        ph = self._set_default(hotel, sid)
-        hotel.update_twilio_phone(ph.sid, ph.phone_number)
-        self._update_non_defaults(hotel, sid)
+        ph = self._validate_ph_num(hotel, sid)
+
+        with transaction.atomic():
+            Hotel.objects.select_for_update().get(pk=hotel.pk)
+            self._set_default(hotel, sid)
+            hotel.update_twilio_phone(ph.sid, ph.phone_number)
+
+        ph.default = True
         return ph
 
     def default(self, hotel):
@@ -76,21 +132,105 @@ hotel: {}".format(hotel))
                 ph = self.update_default(hotel, ph.sid)
                 return ph
 
+    ### SENDER POOL
+
+    @staticmethod
+    def pool_cache_key(hotel_id):
+        return "sms:pool:{}".format(hotel_id)
+
+    @staticmethod
+    def hotel_cache_key(phone_number):
+        return "sms:hotel:{}".format(phone_number)
+
+    def pool(self, hotel):
+        "Sorted ``phone_number``'s of all the Hotel's PhoneNumbers."
+        key = self.pool_cache_key(hotel.id)
+        numbers = cache.get(key)
+        if numbers is None:
+            numbers = sorted(self.filter(hotel=hotel).values_list('phone_number', flat=True))
+            cache.set(key, numbers, settings.SMS_SENDER_POOL_CACHE_TIMEOUT)
+        return numbers
+
+    def hotel_id(self, phone_number):
+        """
+        Cached PH # -> Hotel index, so an inbound SMS to any of a Hotel's 
+        numbers, not only the default, finds the Hotel.
+
+        Return: ``hotel_id``, or None if the PH # isn't a Hotel's
+        """
+        key = self.hotel_cache_key(phone_number)
+        hotel_id = cache.get(key)
+        if hotel_id is None:
+            hotel_id = (self.filter(phone_number=phone_number)
+                            .values_list('hotel_id', flat=True).first() or
+                        Hotel.objects.filter(twilio_phone_number=phone_number)
+                                     .values_list('id', flat=True).first())
+            if hotel_id:
+                cache.set(key, hotel_id, settings.SMS_SENDER_POOL_CACHE_TIMEOUT)
+        return hotel_id
+
+    def clear_cache(self, number):
+        cache.delete_many([self.pool_cache_key(number.hotel_id),
+                           self.hotel_cache_key(number.phone_number)])
+
     ### TWILIO
 
-    def _twilio_purchase_number(self, hotel):
+    def search_candidates(self, **kwargs):
+        """
+        Single Twilio search for available PH #'s.
+
+        :kwargs: Twilio search params, i.e. ``area_code`` or ``near_number``
+        Return: list of ``phone_number`` strings
+        """
+        numbers = self.client.phone_numbers.search(sms_enabled=True,
+            voice_enabled=True, mms_enabled=True, **kwargs)
+        return [n.phone_number for n in numbers]
+
+    def refresh_candidates(self, area_code):
+        "Replace the cached pool of candidate PH #'s for the ``area_code``."
+        candidates = self.search_candidates(area_code=area_code)
+        PhoneNumberCandidates.set(area_code, candidates)
+        return candidates
+
+    def _purchase_candidates(self, hotel):
+        """
+        Generator of PH #'s to try and purchase, at most 
+        ``PHONE_NUMBER_PURCHASE_MAX_ATTEMPTS`` from the Hotel's ``area_code``, 
+        then the same number from a search of nearby area codes.
+        """
+        max_attempts = settings.PHONE_NUMBER_PURCHASE_MAX_ATTEMPTS
+
+        candidates = PhoneNumberCandidates.take(hotel.area_code, max_attempts)
+        if not candidates:
+            candidates = self.search_candidates(area_code=hotel.area_code)[:max_attempts]
+
+        for phone_number in candidates:
+            yield phone_number
+
+        nearby = [ph for ph in self.search_candidates(near_number=hotel.address_phone,
+                                                      distance=settings.PHONE_NUMBER_NEARBY_DISTANCE)
+                  if ph not in candidates]
+
+        for phone_number in nearby[:max_attempts]:
+            yield phone_number
+
+    def _twilio_purchase_number(self, hotel, renew=None):
         """
         Purchase live Twilio PH # based on ``area_code`` of the Hotel.
+
+        Candidates can be bought by someone else between the search and 
+        the purchase, so each failure moves on to the next candidate.
         """
-        if 'test' not in sys.argv:
-            number = None
-            while not number:
-                numbers = self.client.phone_numbers.search(
-                    area_code=hotel.area_code, sms_enabled=True,
-                    voice_enabled=True, mms_enabled=True)
-                if numbers:
-                    number = numbers[0].purchase()
-            return number
+        for phone_number in self._purchase_candidates(hotel):
+            if renew:
+                renew()
+            try:
+                return self.client.phone_numbers.purchase(phone_number=phone_number)
+            except TwilioRestException:
+                continue
+
+        raise PhoneNumberPurchaseFailedExcp(
+            "No Phone Number available for area code: {}".format(hotel.area_code))
 
     def update_account_sid(self, hotel, number):
         '''
@@ -124,16 +264,27 @@ hotel: {}".format(hotel))
 
         return number
 
-    def purchase_number(self, hotel):
+    def purchase_number(self, hotel, renew=None):
         '''
         Calls all logic for the Purchase of a New PhoneNumber.
+
+        :renew: called before each Twilio purchase attempt and the charge,
+            i.e. ``PhoneNumberPurchase.renew``. Raises
+            ``PhoneNumberPurchaseFailedExcp`` to stop.
         '''
         # LIVE: Twilio PH Num purchase
-        twilio_ph = self._twilio_purchase_number(hotel)
+        twilio_ph = self._twilio_purchase_number(hotel, renew)
         
         # LIVE: Stripe Charge
-        acct_tran = AcctTrans.objects.phone_number_charge(hotel,
-            phone_number=twilio_ph.phone_number)
+        try:
+            if renew:
+                renew()
+            acct_tran = AcctTrans.objects.phone_number_charge(hotel,
+                phone_number=twilio_ph.phone_number)
+        except (AutoRechargeOffExcp, PhoneNumberPurchaseFailedExcp):
+            # release, so we aren't billed for a PH the Hotel didn't pay for
+            self.client.phone_numbers.delete(twilio_ph.sid)
+            raise
 
         # DB create (but LIVE updates my current Twilio PH Num REST API 
         # endpoint for the PH Num)
@@ -223,6 +374,111 @@ class PhoneNumber(TwilioClient, TimeStampBaseModel):
         return "monthly charge: {}".format(self.phone_number)
 
 
+class PhoneNumberPurchaseManager(models.Manager):
+
+    def stale(self, hotel):
+        "Purchases 'running' longer than ``PHONE_NUMBER_PURCHASE_TIMEOUT``, i.e. the worker died."
+        timeout = timezone.now() - datetime.timedelta(seconds=settings.PHONE_NUMBER_PURCHASE_TIMEOUT)
+        return self.filter(hotel=hotel, status=PhoneNumberPurchase.RUNNING, modified__lt=timeout)
+
+    def open(self, hotel):
+        return (self.filter(hotel=hotel, status__in=PhoneNumberPurchase.OPEN_STATUSES)
+                    .exclude(pk__in=self.stale(hotel).values('pk')))
+
+    def get_or_create_open(self, hotel):
+        """
+        Only 1 open purchase per Hotel, so a double submit of the 
+        Purchase Form doesn't buy 2 PH #'s. Stale purchases are failed, so 
+        they don't block the Hotel from buying again.
+        """
+        self.stale(hotel).update(status=PhoneNumberPurchase.FAILED,
+            error="Timed out", modified=timezone.now())
+
+        purchase = self.open(hotel).first()
+        if purchase:
+            return purchase, False
+        return self.create(hotel=hotel), True
+
+
+class PhoneNumberPurchase(TimeStampBaseModel):
+    """
+    Tracks the async purchase of a PhoneNumber (Twilio purchase, Stripe 
+    charge, and Subaccount transfer), so the UI can poll for the result.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (COMPLETE, 'Complete'),
+        (FAILED, 'Failed'),
+    )
+    OPEN_STATUSES = (PENDING, RUNNING)
+
+    # Keys
+    hotel = models.ForeignKey(Hotel, related_name="phone_number_purchases")
+    phone_number = models.ForeignKey(PhoneNumber, blank=True, null=True,
+        on_delete=models.SET_NULL)
+    # Fields
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.CharField(max_length=255, blank=True)
+
+    objects = PhoneNumberPurchaseManager()
+
+    def __str__(self):
+        return "{self.hotel} {self.status}".format(self=self)
+
+    def run(self):
+        """
+        Called by ``sms.tasks.purchase_phone_number``.
+
+        ``modified`` is renewed while it runs, so a slow purchase isn't
+        failed as stale. Each status change is conditional, so a purchase
+        failed as stale, or run twice, never buys a 2nd PH #.
+        """
+        if not self._update_from(self.PENDING, status=self.RUNNING):
+            self.refresh_from_db()
+            return self
+        self.status = self.RUNNING
+
+        try:
+            self.phone_number = PhoneNumber.objects.purchase_number(self.hotel,
+                renew=self.renew)
+        except (AutoRechargeOffExcp, PhoneNumberPurchaseFailedExcp, TwilioRestException) as e:
+            self.status = self.FAILED
+            self.error = str(e)[:255]
+        except Exception as e:
+            # never leave it 'running', which would block the Hotel's next purchase
+            logger.exception("PhoneNumberPurchase %s failed", self.pk)
+            self.status = self.FAILED
+            self.error = str(e)[:255]
+        else:
+            self.status = self.COMPLETE
+
+        if not self._update_from(self.RUNNING, status=self.status, error=self.error,
+                                 phone_number=self.phone_number):
+            if self.status == self.COMPLETE:
+                logger.error("PhoneNumberPurchase %s timed out, but bought %s",
+                    self.pk, self.phone_number.phone_number)
+            self.refresh_from_db()
+        return self
+
+    def renew(self):
+        """
+        Raises: PhoneNumberPurchaseFailedExcp if it's no longer running,
+            i.e. it was failed as stale
+        """
+        if not self._update_from(self.RUNNING):
+            raise PhoneNumberPurchaseFailedExcp("Timed out")
+
+    def _update_from(self, from_status, **kwargs):
+        "UPDATE only if still in ``from_status``. Return: True if it was"
+        return bool(type(self).objects.filter(pk=self.pk, status=from_status)
+                                      .update(modified=timezone.now(), **kwargs))
+
+
 '''
 Denormalize Hotel
 -----------------
@@ -233,6 +489,10 @@ The ``hotel.twilio_phone_number`` is the default Twilio PhoneNumber in use.
 @receiver(post_save, sender=PhoneNumber)
 def denormalize_twilio_phone(sender, instance=None, created=False, **kwargs):
     if instance.default:
-        hotel = instance.hotel
-        hotel.twilio_phone_number = instance.phone_number
-        hotel.save()
\ No newline at end of file
+        instance.hotel.update_twilio_phone(instance.sid, instance.phone_number)
+
+
+@receiver(post_save, sender=PhoneNumber)
+@receiver(post_delete, sender=PhoneNumber)
+def clear_sender_pool_cache(sender, instance=None, **kwargs):
+    PhoneNumber.objects.clear_cache(instance)
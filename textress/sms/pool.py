@@ -0,0 +1,66 @@
+"""
+Sender Pool
+-----------
+A Hotel w/ ``sender_pool`` on sends from all of its PhoneNumbers, so bulk and
+Trigger sends are paced by 1 ``sms.ratelimit`` bucket per number, instead of
+1 for the Hotel.
+
+Each Guest's number is picked from a consistent hash ring of the pool, so a
+Guest always hears from, and replies to, the same number, and adding or
+removing a number only moves about 1/n of the Guests.
+"""
+import bisect
+import hashlib
+
+from django.utils.encoding import force_bytes
+
+from sms.models import PhoneNumber
+
+
+# virtual nodes per PH #, so Guests are spread evenly
+REPLICAS = 100
+MAX_RINGS = 1000
+
+_rings = {}
+
+
+def _hash(value):
+    return int(hashlib.md5(force_bytes(value)).hexdigest()[:8], 16)
+
+
+class HashRing(object):
+
+    def __init__(self, nodes, replicas=REPLICAS):
+        ring = sorted((_hash("{}:{}".format(node, i)), node)
+                      for node in nodes for i in range(replicas))
+        self.hashes = [h for h, node in ring]
+        self.nodes = [node for h, node in ring]
+
+    def get(self, key):
+        "The node of ``key``, the 1st one clockwise on the ring."
+        if not self.nodes:
+            return None
+        i = bisect.bisect(self.hashes, _hash(key)) % len(self.hashes)
+        return self.nodes[i]
+
+
+def get_ring(numbers):
+    "HashRing of the ``numbers``, built once per pool per process."
+    key = tuple(numbers)
+    if key not in _rings:
+        if len(_rings) >= MAX_RINGS:
+            _rings.clear()
+        _rings[key] = HashRing(key)
+    return _rings[key]
+
+
+def sender(hotel, to):
+    """
+    PH # to send to the ``to`` PH # from. The Hotel's ``twilio_phone_number``
+    unless it has a sender pool.
+    """
+    if hotel.sender_pool:
+        numbers = PhoneNumber.objects.pool(hotel)
+        if numbers:
+            return get_ring(numbers).get(to)
+    return hotel.twilio_phone_number
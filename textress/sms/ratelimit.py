@@ -0,0 +1,147 @@
+"""
+SMS Rate Limiting
+-----------------
+Twilio sends about 1 SMS/s per long code number, and answers faster sends
+w/ 429s. So each sending number, the Hotel's ``twilio_phone_number``, or
+each number of its ``sms.pool`` sender pool, has a token bucket in Redis,
+refilled at ``SMS_RATE_LIMIT_RATE`` tokens/s, up to
+``SMS_RATE_LIMIT_BURST``.
+
+Each send reserves a token w/ 1 atomic Lua script, and sleeps until it's
+due. The bucket goes negative by the reserved tokens, so concurrent
+workers are paced in turn, and ``-tokens`` is the queue depth. A send due
+in more than ``SMS_RATE_LIMIT_MAX_WAIT`` seconds isn't reserved, and
+raises ``RateLimited`` for the caller to reschedule it.
+"""
+import math
+import time
+
+from django.conf import settings
+
+from utils.redis_server import get_server
+
+
+# KEYS[1]: bucket hash. ARGV: rate, burst, now, max wait.
+# Return: {1 if reserved else 0, seconds until the token is due}
+RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = math.max(0, (1 - tokens) / rate)
+if wait > max_wait then
+    return {0, tostring(wait)}
+end
+
+tokens = tokens - 1
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 60)
+return {1, tostring(wait)}
+"""
+
+class RateLimited(Exception):
+
+    def __init__(self, wait):
+        self.wait = wait
+        super(RateLimited, self).__init__("SMS rate limited, next send in {:.1f}s".format(wait))
+
+
+class TokenBucket(object):
+    """
+    Token bucket of 1 sending phone number.
+    """
+    prefix = 'sms:bucket'
+
+    def __init__(self, phone_number, rate=None, burst=None, server=None):
+        self.phone_number = phone_number
+        self.rate = rate or settings.SMS_RATE_LIMIT_RATE
+        self.burst = burst or settings.SMS_RATE_LIMIT_BURST
+        self.server = server or get_server()
+        self.script = self.server.register_script(RESERVE_SCRIPT)
+
+    @property
+    def key(self):
+        return "{}:{}".format(self.prefix, self.phone_number)
+
+    def reserve(self, max_wait=None):
+        """
+        Reserve the next token.
+
+        Return: seconds until it's due
+        Raises: ``RateLimited`` if that's more than ``max_wait``
+        """
+        max_wait = settings.SMS_RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        reserved, wait = self.script(keys=[self.key],
+            args=[self.rate, self.burst, repr(time.time()), max_wait])
+        wait = float(wait)
+        if not reserved:
+            raise RateLimited(wait)
+        return wait
+
+    def acquire(self, max_wait=None):
+        "Reserve the next token, and sleep until it's due."
+        wait = self.reserve(max_wait)
+        if wait:
+            time.sleep(wait)
+
+    def depth(self):
+        "Number of sends waiting for a token."
+        return depth(self.server.hmget(self.key, 'tokens', 'ts'), self.rate, self.burst)
+
+
+def depth(bucket, rate, burst, now=None):
+    tokens, ts = bucket
+    if tokens is None:
+        return 0
+    now = now or time.time()
+    tokens = min(burst, float(tokens) + max(0, now - float(ts)) * rate)
+    return max(0, int(math.ceil(-tokens)))
+
+
+def hotel_bucket(hotel, phone_number=None):
+    "Bucket of the ``phone_number`` sent from, by default the Hotel's."
+    return TokenBucket(phone_number or hotel.twilio_phone_number)
+
+
+def queue_depths():
+    """
+    {hotel_id: sends waiting for a token} for all Hotels w/ a phone number,
+    summed over the numbers of a sender pool.
+    """
+    from main.models import Hotel
+    from sms.models import PhoneNumber
+
+    numbers = set(Hotel.objects.exclude(twilio_phone_number__isnull=True)
+                               .exclude(twilio_phone_number='')
+                               .values_list('id', 'twilio_phone_number'))
+    numbers.update(PhoneNumber.objects.filter(hotel__sender_pool=True)
+                                      .values_list('hotel_id', 'phone_number'))
+    if not numbers:
+        return {}
+
+    numbers = sorted(numbers)
+    server = get_server()
+    pipe = server.pipeline(transaction=False)
+    for hotel_id, phone_number in numbers:
+        pipe.hmget(TokenBucket(phone_number, server=server).key, 'tokens', 'ts')
+    now = time.time()
+
+    depths = {}
+    for (hotel_id, phone_number), bucket in zip(numbers, pipe.execute()):
+        depths[hotel_id] = depths.get(hotel_id, 0) + depth(bucket,
+            settings.SMS_RATE_LIMIT_RATE, settings.SMS_RATE_LIMIT_BURST, now)
+    return depths
+
+
+def prometheus():
+    "Queue depths as a Prometheus gauge, for '/metrics/'."
+    lines = ["# TYPE textress_sms_queue_depth gauge"]
+    for hotel_id, value in sorted(queue_depths().items()):
+        lines.append('textress_sms_queue_depth{{hotel="{}"}} {}'.format(hotel_id, value))
+    return '\n'.join(lines) + '\n'
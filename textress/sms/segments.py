@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+SMS Segments
+------------
+Number of SMS a body is sent as, and billed as, computed locally instead of
+waiting for Twilio's ``num_segments``.
+
+A body of only GSM-7 chars is sent 160 septets per SMS, else it's UCS-2, 70
+UTF-16 code units per SMS. Longer bodies are split, and each part loses
+room to the 6 byte concatenation header: 153 septets, or 67 code units.
+Escaped GSM-7 extension chars, and UTF-16 surrogate pairs, take 2 units, and
+are never split across parts.
+"""
+from __future__ import division
+
+import math
+
+from django.utils.encoding import force_text
+
+
+GSM7 = 'gsm7'
+UCS2 = 'ucs2'
+
+GSM7_BASIC = (u"@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+              u"¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà")
+GSM7_EXTENSION = u"\x0c^{}\\[~]|€"
+
+# septets per GSM-7 char
+GSM7_SEPTETS = dict([(c, 1) for c in GSM7_BASIC] + [(c, 2) for c in GSM7_EXTENSION])
+
+# units per single SMS, and per part of a concatenated one
+SINGLE = {GSM7: 160, UCS2: 70}
+MULTI = {GSM7: 153, UCS2: 67}
+
+
+def encoding(body):
+    return GSM7 if all(c in GSM7_SEPTETS for c in body) else UCS2
+
+
+def _ucs2_units(c):
+    code = ord(c)
+    # astral char on a wide Python build, or the halves of a surrogate pair
+    # on a narrow one, counted on the high half so the pair isn't split
+    if code > 0xFFFF or 0xD800 <= code <= 0xDBFF:
+        return 2
+    if 0xDC00 <= code <= 0xDFFF:
+        return 0
+    return 1
+
+
+def units(body, body_encoding=None):
+    "Length of each char of the ``body`` in septets, or UTF-16 code units."
+    body_encoding = body_encoding or encoding(body)
+    if body_encoding == GSM7:
+        return [GSM7_SEPTETS[c] for c in body]
+    return [_ucs2_units(c) for c in body]
+
+
+def count_segments(body):
+    "Number of SMS the ``body`` is sent as. An empty body is still 1."
+    body = force_text(body or '')
+    body_encoding = encoding(body)
+    char_units = units(body, body_encoding)
+    total = sum(char_units)
+
+    if total <= SINGLE[body_encoding]:
+        return 1
+
+    if total == len(char_units):
+        return int(math.ceil(total / MULTI[body_encoding]))
+
+    segments, used = 1, 0
+    for n in char_units:
+        if used + n > MULTI[body_encoding]:
+            segments += 1
+            used = 0
+        used += n
+    return segments
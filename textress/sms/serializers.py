@@ -0,0 +1,12 @@
+from rest_framework import serializers
+
+from sms.models import PhoneNumberPurchase
+
+
+class PhoneNumberPurchaseSerializer(serializers.ModelSerializer):
+    '''Polled by the Phone Number List page until the purchase is done.'''
+
+    class Meta:
+        model = PhoneNumberPurchase
+        fields = ('id', 'status', 'phone_number', 'error', 'created', 'modified',)
+        read_only_fields = fields
@@ -0,0 +1,26 @@
+from __future__ import absolute_import
+
+from celery import shared_task
+
+from sms.models import PhoneNumber, PhoneNumberCandidates, PhoneNumberPurchase
+
+
+@shared_task
+def refresh_phone_number_candidates(area_code):
+    return PhoneNumber.objects.refresh_candidates(area_code)
+
+
+@shared_task
+def purchase_phone_number(purchase_id):
+    """
+    Run the tracked PhoneNumber purchase, then refill the ``area_code``'s 
+    candidate pool if this purchase left it low.
+    """
+    purchase = PhoneNumberPurchase.objects.select_related('hotel').get(id=purchase_id)
+    purchase.run()
+
+    area_code = purchase.hotel.area_code
+    if PhoneNumberCandidates.is_low(area_code):
+        refresh_phone_number_candidates.delay(area_code)
+
+    return purchase.status
@@ -10,7 +10,9 @@ from account.models import (AcctCost, AcctTrans, TransType, Pricing,
     TRANS_TYPES, INIT_CHARGE_AMOUNT)
 from main.tests.factory import create_hotel, create_hotel_user, PASSWORD
 from sms.forms import PhoneNumberAddForm
+from sms.tests.factory import fake_phone_number
 from utils import create
+from utils.tests.runners import celery_set_eager
 
 
 class PhoneNumberAddTests(TestCase):
@@ -32,11 +34,15 @@ class PhoneNumberAddTests(TestCase):
         #Login
         self.client.login(username=self.user.username, password=self.password)
 
+        celery_set_eager()
+
     def teardown(self):
         self.client.logout()
 
+    @patch("sms.tasks.refresh_phone_number_candidates.delay")
     @patch("sms.models.PhoneNumberManager.purchase_number")
-    def test_form_success(self, _twilio_purchase_number_mock):
+    def test_form_success(self, _twilio_purchase_number_mock, refresh_mock):
+        _twilio_purchase_number_mock.return_value = fake_phone_number(self.hotel)
         # Auto-recharge = True, so this will succeed
         response = self.client.post(reverse('sms:ph_num_add'))
 
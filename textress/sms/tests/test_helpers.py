@@ -2,6 +2,7 @@ import os
 
 from django.conf import settings
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.contrib.auth.models import User, Group
 
 from django.core.cache import get_cache
@@ -10,10 +11,11 @@ cache = get_cache('default')
 from model_mommy import mommy
 from twilio.rest import TwilioRestClient
 from twilio.rest.resources.messages import Message as TwilioMessage
+from twilio.util import RequestValidator
 
 from concierge.models import Message
 from main.tests.test_models import create_hotel
-from sms.helpers import send_text, send_message, clean_ph_num_mask
+from sms.helpers import send_text, send_message, clean_ph_num_mask, twilio_signature_valid
 from utils import create
 
 
@@ -46,3 +48,25 @@ class SendMessageTests(TestCase):
         ret = clean_ph_num_mask(ph)
 
         self.assertEqual(ret, '+17754194000')
+
+
+@override_settings(TWILIO_ACCOUNT_SID='AC' + 'm' * 32, TWILIO_AUTH_TOKEN='master')
+class TwilioSignatureTests(TestCase):
+
+    def setUp(self):
+        self.url = 'https://textress.com/api/receive/status/'
+
+    def sign(self, data, auth_token):
+        return RequestValidator(auth_token).compute_signature(self.url, data)
+
+    def test_twilio_signature_valid__master_account(self):
+        data = {'AccountSid': settings.TWILIO_ACCOUNT_SID, 'MessageSid': 'SM0'}
+
+        self.assertTrue(twilio_signature_valid(self.url, data, self.sign(data, 'master')))
+        self.assertFalse(twilio_signature_valid(self.url, data, self.sign(data, 'forged')))
+        self.assertFalse(twilio_signature_valid(self.url, data, None))
+
+    def test_twilio_signature_valid__unknown_account(self):
+        data = {'AccountSid': 'AC' + 'x' * 32, 'MessageSid': 'SM0'}
+
+        self.assertFalse(twilio_signature_valid(self.url, data, self.sign(data, '')))
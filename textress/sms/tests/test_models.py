@@ -1,17 +1,27 @@
+import datetime
 import os
+from mock import Mock, patch
 
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 from model_mommy import mommy
 from twilio.rest import TwilioRestClient
 from twilio.rest.resources.phone_numbers import PhoneNumber as TwilioPhoneNumber
 
-from main.models import Subaccount
-from main.tests.factory import create_hotel
-from sms.models import PhoneNumber
+from account.models import AcctCost, AcctTrans, Pricing, TransType
+from account.tests.factory import create_acct_tran, create_trans_types
+from main.models import Hotel, Subaccount
+from main.tests.factory import create_hotel, create_hotel_user
+from sms.models import PhoneNumber, PhoneNumberCandidates, PhoneNumberPurchase
 from sms.tests.factory import create_phone_number
+from utils.loadtest.fake_twilio import FakeTwilioClient
+from utils import create
+from utils.exceptions import AutoRechargeOffExcp, PhoneNumberPurchaseFailedExcp
 
 
 class PhoneNumberManagerTests(TestCase):
@@ -91,6 +101,276 @@ class PhoneNumberManagerTests(TestCase):
     #     twilio_ph = PhoneNumber.objects._twilio_purchase_number(self.hotel)
     #     self.assertIsInstance(twilio_ph, TwilioPhoneNumber)
 
+class PhoneNumberPurchaseWorkflowTests(TestCase):
+
+    def setUp(self):
+        self.hotel = create_hotel(address_phone='+17025550000')
+        create._get_groups_and_perms()
+        self.admin = create_hotel_user(self.hotel, group='hotel_admin')
+        mommy.make(AcctCost, hotel=self.hotel, balance_min=100)
+        mommy.make(Pricing, hotel=self.hotel)
+        create_trans_types()
+        # clear cache for TransTypes, and PH # candidates
+        cache.clear()
+        PhoneNumberCandidates.set('702', [])
+        create_acct_tran(self.hotel, TransType.objects.get(name='init_amt'),
+            self.hotel.created.date(), amount=1000)
+
+    def purchase_number(self, **kwargs):
+        self.twilio = FakeTwilioClient(**kwargs)
+        with patch.object(PhoneNumber.objects, 'client', self.twilio):
+            return PhoneNumber.objects.purchase_number(self.hotel)
+
+    def test_purchase_number(self):
+        ph = self.purchase_number(available={'702': 5})
+
+        self.assertIsInstance(ph, PhoneNumber)
+        self.assertTrue(ph.default)
+        self.assertEqual(ph.phone_number[:5], '+1702')
+        self.assertEqual(self.hotel.twilio_phone_number, ph.phone_number)
+        self.assertEqual(self.twilio.phone_numbers.get(ph.sid).account_sid,
+            self.hotel.twilio_sid)
+        self.assertTrue(AcctTrans.objects.filter(hotel=self.hotel,
+            trans_type__name='phone_number').exists())
+
+    def test_purchase_number__candidate_pool(self):
+        PhoneNumberCandidates.set('702', ['+17025550003', '+17025550004'])
+
+        ph = self.purchase_number(available={'702': 5})
+
+        self.assertEqual(ph.phone_number, '+17025550003')
+        self.assertEqual(self.twilio.phone_numbers.searches, [])
+
+    def test_purchase_number__nearby(self):
+        taken = ['+17025550001', '+17025550002', '+17025550003']
+        PhoneNumberCandidates.set('702', taken)
+
+        ph = self.purchase_number(available={'702': 3, '619': 1}, nearby=['702', '619'],
+            taken=taken)
+
+        self.assertEqual(ph.phone_number, '+16195550001')
+        self.assertEqual(len(self.twilio.phone_numbers.searches), 1)
+        self.assertEqual(self.twilio.phone_numbers.searches[0]['near_number'],
+            self.hotel.address_phone)
+
+    def test_purchase_number__bounded(self):
+        available = {'702': 10}
+        taken = ["+17025550{:03d}".format(i) for i in range(1, 11)]
+
+        with self.assertRaises(PhoneNumberPurchaseFailedExcp):
+            self.purchase_number(available=available, nearby=['702'], taken=taken)
+
+        # 1 area code search, 1 nearby search, and no PH created
+        self.assertEqual(len(self.twilio.phone_numbers.searches), 2)
+        self.assertFalse(PhoneNumber.objects.filter(hotel=self.hotel).exists())
+
+    def test_purchase_number__auto_recharge_off(self):
+        AcctCost.objects.upsert(self.hotel, auto_recharge=False, balance_min=10000)
+
+        with self.assertRaises(AutoRechargeOffExcp):
+            self.purchase_number(available={'702': 1})
+
+        # Twilio PH # was released
+        self.assertEqual(len(self.twilio.phone_numbers.deleted), 1)
+        self.assertEqual(self.twilio.phone_numbers.purchased, {})
+        self.assertFalse(PhoneNumber.objects.filter(hotel=self.hotel).exists())
+
+    def test_purchase_number__timed_out(self):
+        # failed as stale after the Twilio purchase, before the charge
+        renew = Mock(side_effect=[None, PhoneNumberPurchaseFailedExcp("Timed out")])
+
+        self.twilio = FakeTwilioClient(available={'702': 1})
+        with patch.object(PhoneNumber.objects, 'client', self.twilio):
+            with self.assertRaises(PhoneNumberPurchaseFailedExcp):
+                PhoneNumber.objects.purchase_number(self.hotel, renew=renew)
+
+        self.assertEqual(len(self.twilio.phone_numbers.deleted), 1)
+        self.assertFalse(AcctTrans.objects.filter(hotel=self.hotel,
+            trans_type__name='phone_number').exists())
+
+    def test_refresh_candidates(self):
+        twilio = FakeTwilioClient(available={'702': 5})
+        with patch.object(PhoneNumber.objects, 'client', twilio):
+            candidates = PhoneNumber.objects.refresh_candidates('702')
+
+        self.assertEqual(len(candidates), 5)
+        self.assertEqual(PhoneNumberCandidates.get('702'), candidates)
+
+
+class PhoneNumberCandidatesTests(TestCase):
+
+    def setUp(self):
+        PhoneNumberCandidates.set('619', [])
+        self.candidates = ['+17025550001', '+17025550002', '+17025550003', '+17025550004']
+        PhoneNumberCandidates.set('702', self.candidates)
+
+    def test_get__empty(self):
+        self.assertEqual(PhoneNumberCandidates.get('619'), [])
+
+    def test_take(self):
+        self.assertEqual(PhoneNumberCandidates.take('702', 3), self.candidates[:3])
+        self.assertEqual(PhoneNumberCandidates.get('702'), self.candidates[3:])
+
+    def test_take__never_the_same_candidate(self):
+        taken = PhoneNumberCandidates.take('702', 3) + PhoneNumberCandidates.take('702', 3)
+
+        self.assertEqual(taken, self.candidates)
+        self.assertEqual(PhoneNumberCandidates.take('702', 3), [])
+
+    def test_is_low(self):
+        self.assertFalse(PhoneNumberCandidates.is_low('702'))
+
+        PhoneNumberCandidates.take('702', 2)
+
+        self.assertTrue(PhoneNumberCandidates.is_low('702'))
+
+
+class PhoneNumberPurchaseTests(TestCase):
+
+    def setUp(self):
+        self.hotel = create_hotel()
+
+    def test_get_or_create_open(self):
+        purchase, created = PhoneNumberPurchase.objects.get_or_create_open(self.hotel)
+        self.assertTrue(created)
+        self.assertEqual(purchase.status, PhoneNumberPurchase.PENDING)
+
+        purchase2, created = PhoneNumberPurchase.objects.get_or_create_open(self.hotel)
+        self.assertFalse(created)
+        self.assertEqual(purchase2, purchase)
+
+    def test_get_or_create_open__closed(self):
+        purchase = mommy.make(PhoneNumberPurchase, hotel=self.hotel,
+            status=PhoneNumberPurchase.FAILED)
+
+        purchase2, created = PhoneNumberPurchase.objects.get_or_create_open(self.hotel)
+
+        self.assertTrue(created)
+        self.assertNotEqual(purchase2, purchase)
+
+    def test_get_or_create_open__stale(self):
+        purchase = mommy.make(PhoneNumberPurchase, hotel=self.hotel,
+            status=PhoneNumberPurchase.RUNNING)
+        modified = timezone.now() - datetime.timedelta(seconds=settings.PHONE_NUMBER_PURCHASE_TIMEOUT + 1)
+        PhoneNumberPurchase.objects.filter(id=purchase.id).update(modified=modified)
+
+        purchase2, created = PhoneNumberPurchase.objects.get_or_create_open(self.hotel)
+
+        self.assertTrue(created)
+        purchase = PhoneNumberPurchase.objects.get(id=purchase.id)
+        self.assertEqual(purchase.status, PhoneNumberPurchase.FAILED)
+        self.assertEqual(purchase.error, "Timed out")
+
+    def test_get_or_create_open__running(self):
+        purchase = mommy.make(PhoneNumberPurchase, hotel=self.hotel,
+            status=PhoneNumberPurchase.RUNNING)
+
+        purchase2, created = PhoneNumberPurchase.objects.get_or_create_open(self.hotel)
+
+        self.assertFalse(created)
+        self.assertEqual(purchase2, purchase)
+
+    @patch("sms.models.PhoneNumberManager.purchase_number")
+    def test_run(self, mock_purchase_number):
+        ph = mommy.make(PhoneNumber, hotel=self.hotel)
+        mock_purchase_number.return_value = ph
+        purchase = mommy.make(PhoneNumberPurchase, hotel=self.hotel)
+
+        purchase.run()
+
+        purchase = PhoneNumberPurchase.objects.get(id=purchase.id)
+        self.assertEqual(purchase.status, PhoneNumberPurchase.COMPLETE)
+        self.assertEqual(purchase.phone_number, ph)
+
+    @patch("sms.models.PhoneNumberManager.purchase_number")
+    def test_run__failed(self, mock_purchase_number):
+        mock_purchase_number.side_effect = PhoneNumberPurchaseFailedExcp("no PH")
+        purchase = mommy.make(PhoneNumberPurchase, hotel=self.hotel)
+
+        purchase.run()
+
+        purchase = PhoneNumberPurchase.objects.get(id=purchase.id)
+        self.assertEqual(purchase.status, PhoneNumberPurchase.FAILED)
+        self.assertEqual(purchase.error, "no PH")
+        self.assertIsNone(purchase.phone_number)
+
+    @patch("sms.models.PhoneNumberManager.purchase_number")
+    def test_run__error(self, mock_purchase_number):
+        mock_purchase_number.side_effect = KeyError("sid")
+        purchase = mommy.make(PhoneNumberPurchase, hotel=self.hotel)
+
+        with patch("sms.models.logger") as mock_logger:
+            purchase.run()
+
+        purchase = PhoneNumberPurchase.objects.get(id=purchase.id)
+        self.assertEqual(purchase.status, PhoneNumberPurchase.FAILED)
+        self.assertTrue(mock_logger.exception.called)
+
+
+    def make_stale(self, purchase):
+        modified = timezone.now() - datetime.timedelta(seconds=settings.PHONE_NUMBER_PURCHASE_TIMEOUT + 1)
+        PhoneNumberPurchase.objects.filter(id=purchase.id).update(modified=modified)
+
+    @patch("sms.models.PhoneNumberManager.purchase_number")
+    def test_run__renew(self, mock_purchase_number):
+        purchase = mommy.make(PhoneNumberPurchase, hotel=self.hotel)
+        def purchase_number(hotel, renew):
+            self.make_stale(purchase)
+            renew()
+            return mommy.make(PhoneNumber, hotel=self.hotel)
+        mock_purchase_number.side_effect = purchase_number
+
+        purchase.run()
+
+        self.assertFalse(PhoneNumberPurchase.objects.stale(self.hotel).exists())
+        purchase = PhoneNumberPurchase.objects.get(id=purchase.id)
+        self.assertEqual(purchase.status, PhoneNumberPurchase.COMPLETE)
+
+    @patch("sms.models.PhoneNumberManager.purchase_number")
+    def test_run__timed_out(self, mock_purchase_number):
+        purchase = mommy.make(PhoneNumberPurchase, hotel=self.hotel)
+        def purchase_number(hotel, renew):
+            self.make_stale(purchase)
+            PhoneNumberPurchase.objects.get_or_create_open(self.hotel)
+            renew()
+        mock_purchase_number.side_effect = purchase_number
+
+        purchase.run()
+
+        purchase = PhoneNumberPurchase.objects.get(id=purchase.id)
+        self.assertEqual(purchase.status, PhoneNumberPurchase.FAILED)
+        self.assertEqual(purchase.error, "Timed out")
+
+    @patch("sms.models.PhoneNumberManager.purchase_number")
+    def test_run__timed_out_complete(self, mock_purchase_number):
+        "A purchase failed as stale isn't then marked complete."
+        ph = mommy.make(PhoneNumber, hotel=self.hotel)
+        purchase = mommy.make(PhoneNumberPurchase, hotel=self.hotel)
+        def purchase_number(hotel, renew):
+            self.make_stale(purchase)
+            PhoneNumberPurchase.objects.get_or_create_open(self.hotel)
+            return ph
+        mock_purchase_number.side_effect = purchase_number
+
+        with patch("sms.models.logger") as mock_logger:
+            purchase.run()
+
+        self.assertEqual(purchase.status, PhoneNumberPurchase.FAILED)
+        purchase = PhoneNumberPurchase.objects.get(id=purchase.id)
+        self.assertEqual(purchase.status, PhoneNumberPurchase.FAILED)
+        self.assertTrue(mock_logger.error.called)
+
+    @patch("sms.models.PhoneNumberManager.purchase_number")
+    def test_run__not_pending(self, mock_purchase_number):
+        purchase = mommy.make(PhoneNumberPurchase, hotel=self.hotel,
+            status=PhoneNumberPurchase.RUNNING)
+
+        purchase.run()
+
+        self.assertFalse(mock_purchase_number.called)
+        self.assertEqual(purchase.status, PhoneNumberPurchase.RUNNING)
+
+
 class PhoneNumberTests(TestCase):
 
     def setUp(self):
@@ -124,6 +404,34 @@ class PhoneNumberTests(TestCase):
             len(phones) - 1
         )
 
+    def test_update_default__fast_path(self):
+        ph, ph2, ph3 = mommy.make(PhoneNumber, hotel=self.hotel, _quantity=3)
+        group_name = Hotel.objects.get(pk=self.hotel.pk).group_name
+
+        # get, lock Hotel, clear defaults, set default, Hotel (+ savepoints)
+        with self.assertNumQueries(7):
+            ret = PhoneNumber.objects.update_default(self.hotel, ph.sid)
+
+        self.assertTrue(ret.default)
+        self.assertEqual(
+            list(PhoneNumber.objects.filter(hotel=self.hotel, default=True)), [ph])
+        hotel = Hotel.objects.get(pk=self.hotel.pk)
+        self.assertEqual(hotel.twilio_ph_sid, ph.sid)
+        self.assertEqual(hotel.twilio_phone_number, ph.phone_number)
+        # Hotel ``save`` not called
+        self.assertEqual(hotel.group_name, group_name)
+
+    def test_one_default_per_hotel(self):
+        ph, ph2 = mommy.make(PhoneNumber, hotel=self.hotel, _quantity=2)
+
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                PhoneNumber.objects.filter(hotel=self.hotel).update(default=True)
+
+        # other Hotels can have their own default
+        ph3 = mommy.make(PhoneNumber, hotel=create_hotel())
+        self.assertTrue(ph3.default)
+
     def test_monthly_charge_desc(self):
         ph = create_phone_number()
 
@@ -0,0 +1,103 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from model_mommy import mommy
+
+from main.tests.factory import create_hotel
+from sms import pool
+from sms.models import PhoneNumber
+from sms.pool import HashRing, sender
+
+
+NUMBERS = ['+17025550101', '+17025550102', '+17025550103']
+GUESTS = ['+1702555{:04d}'.format(i) for i in range(300)]
+
+
+class HashRingTests(TestCase):
+
+    def test_get__sticky(self):
+        ring = HashRing(NUMBERS)
+
+        self.assertIn(ring.get(GUESTS[0]), NUMBERS)
+        self.assertEqual(ring.get(GUESTS[0]), HashRing(NUMBERS).get(GUESTS[0]))
+
+    def test_get__spread(self):
+        ring = HashRing(NUMBERS)
+
+        counts = {number: 0 for number in NUMBERS}
+        for guest in GUESTS:
+            counts[ring.get(guest)] += 1
+
+        for number in NUMBERS:
+            self.assertGreater(counts[number], len(GUESTS) / 6)
+
+    def test_get__add_number_moves_a_few(self):
+        ring = HashRing(NUMBERS[:2])
+        bigger_ring = HashRing(NUMBERS)
+
+        moved = [guest for guest in GUESTS if ring.get(guest) != bigger_ring.get(guest)]
+
+        # only to the new number
+        self.assertEqual(set(bigger_ring.get(guest) for guest in moved), {NUMBERS[2]})
+        self.assertLess(len(moved), len(GUESTS) / 2)
+
+    def test_get__empty(self):
+        self.assertIsNone(HashRing([]).get(GUESTS[0]))
+
+    def test_get_ring(self):
+        self.assertIs(pool.get_ring(NUMBERS), pool.get_ring(list(NUMBERS)))
+
+
+class SenderPoolTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.hotel = create_hotel()
+        for i, number in enumerate(NUMBERS):
+            mommy.make(PhoneNumber, hotel=self.hotel, phone_number=number,
+                default=(i == 0))
+        self.hotel.refresh_from_db()
+
+    def test_sender__pool_off(self):
+        self.assertEqual(sender(self.hotel, GUESTS[0]), NUMBERS[0])
+
+    def test_sender__pool_on(self):
+        self.hotel.sender_pool = True
+
+        senders = set(sender(self.hotel, guest) for guest in GUESTS[:30])
+
+        self.assertEqual(senders, set(NUMBERS))
+        self.assertEqual(sender(self.hotel, GUESTS[0]), sender(self.hotel, GUESTS[0]))
+
+    def test_sender__pool_on_no_numbers(self):
+        hotel = create_hotel()
+        hotel.sender_pool = True
+
+        self.assertEqual(sender(hotel, GUESTS[0]), hotel.twilio_phone_number)
+
+    def test_pool(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(PhoneNumber.objects.pool(self.hotel), NUMBERS)
+            self.assertEqual(PhoneNumber.objects.pool(self.hotel), NUMBERS)
+
+    def test_pool__cleared_on_save(self):
+        PhoneNumber.objects.pool(self.hotel)
+
+        mommy.make(PhoneNumber, hotel=self.hotel, phone_number='+17025550104',
+            default=False)
+
+        self.assertEqual(PhoneNumber.objects.pool(self.hotel), NUMBERS + ['+17025550104'])
+
+    def test_hotel_id(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(PhoneNumber.objects.hotel_id(NUMBERS[2]), self.hotel.id)
+            self.assertEqual(PhoneNumber.objects.hotel_id(NUMBERS[2]), self.hotel.id)
+
+    def test_hotel_id__hotel_number_only(self):
+        hotel = create_hotel()
+        hotel.update_twilio_phone('sid', '+17025550199')
+
+        self.assertEqual(PhoneNumber.objects.hotel_id('+17025550199'), hotel.id)
+
+    def test_hotel_id__unknown(self):
+        self.assertIsNone(PhoneNumber.objects.hotel_id('+17025550198'))
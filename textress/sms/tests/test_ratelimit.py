@@ -0,0 +1,174 @@
+import sys
+
+from django.conf import settings
+from django.test import TestCase
+
+from mock import patch
+from model_mommy import mommy
+
+from main.tests.factory import create_hotel
+from sms import ratelimit
+from sms.helpers import send_message
+from sms.models import PhoneNumber
+from sms.ratelimit import RateLimited, TokenBucket
+
+
+class TokenBucketTests(TestCase):
+
+    def setUp(self):
+        self.bucket = TokenBucket('+17025550001', rate=2.0, burst=1)
+        self.bucket.prefix = 'sms:bucket_test'
+        self.bucket.server.delete(self.bucket.key)
+        self.addCleanup(self.bucket.server.delete, self.bucket.key)
+
+        time_patcher = patch('sms.ratelimit.time')
+        self.time = time_patcher.start()
+        self.time.time.return_value = 1000.0
+        self.addCleanup(time_patcher.stop)
+
+    def test_reserve(self):
+        self.assertEqual(self.bucket.reserve(), 0)
+        self.assertEqual(self.bucket.depth(), 0)
+
+        # 2 tokens/s
+        self.assertEqual(self.bucket.reserve(), 0.5)
+        self.assertEqual(self.bucket.reserve(), 1.0)
+        self.assertEqual(self.bucket.depth(), 2)
+
+    def test_reserve__refill(self):
+        self.bucket.reserve()
+        self.bucket.reserve()
+
+        self.time.time.return_value = 1000.5
+        self.assertEqual(self.bucket.depth(), 0)
+        self.assertEqual(self.bucket.reserve(), 0.5)
+
+        # never more than the burst
+        self.time.time.return_value = 2000.0
+        self.assertEqual(self.bucket.reserve(), 0)
+        self.assertEqual(self.bucket.reserve(), 0.5)
+
+    def test_reserve__max_wait(self):
+        self.bucket.reserve()
+        self.bucket.reserve()
+
+        with self.assertRaises(RateLimited) as cm:
+            self.bucket.reserve(max_wait=0.9)
+
+        self.assertEqual(cm.exception.wait, 1.0)
+        # not reserved
+        self.assertEqual(self.bucket.depth(), 1)
+
+    def test_acquire(self):
+        self.bucket.acquire()
+        self.assertFalse(self.time.sleep.called)
+
+        self.bucket.acquire()
+        self.time.sleep.assert_called_once_with(0.5)
+
+
+class QueueDepthTests(TestCase):
+
+    def setUp(self):
+        self.hotel = create_hotel()
+        self.hotel.twilio_phone_number = '+17025550002'
+        self.hotel.save()
+
+        self.bucket = ratelimit.hotel_bucket(self.hotel)
+        self.bucket.server.delete(self.bucket.key)
+        self.addCleanup(self.bucket.server.delete, self.bucket.key)
+
+    def test_queue_depths(self):
+        for i in range(3):
+            self.bucket.reserve()
+
+        depths = ratelimit.queue_depths()
+
+        # 1 sending, 2 waiting, unless a token was added in between
+        self.assertIn(depths[self.hotel.id], (1, 2))
+
+    def test_queue_depths__sender_pool(self):
+        self.hotel.sender_pool = True
+        self.hotel.save()
+        ph = mommy.make(PhoneNumber, hotel=self.hotel, phone_number='+17025550004',
+            default=False)
+        bucket = ratelimit.hotel_bucket(self.hotel, ph.phone_number)
+        bucket.server.delete(bucket.key)
+        self.addCleanup(bucket.server.delete, bucket.key)
+        for i in range(3):
+            self.bucket.reserve()
+            bucket.reserve()
+
+        depths = ratelimit.queue_depths()
+
+        # summed over both numbers
+        self.assertIn(depths[self.hotel.id], (2, 3, 4))
+
+    def test_prometheus(self):
+        text = ratelimit.prometheus()
+
+        self.assertIn("# TYPE textress_sms_queue_depth gauge", text)
+        self.assertIn('textress_sms_queue_depth{{hotel="{}"}} 0'.format(self.hotel.id), text)
+
+
+class SendMessageRateLimitTests(TestCase):
+
+    def setUp(self):
+        self.hotel = create_hotel()
+        self.hotel.twilio_phone_number = '+17025550003'
+        self.hotel.save()
+
+    @patch('sms.helpers.TwilioRestClient')
+    @patch('sms.helpers.hotel_bucket')
+    def test_send_message__acquires(self, hotel_bucket_mock, client_mock):
+        with patch.object(sys, 'argv', ['manage.py']):
+            send_message(self.hotel, settings.DEFAULT_TO_PH, "Hi")
+
+        hotel_bucket_mock.assert_called_once_with(self.hotel, self.hotel.twilio_phone_number)
+        # w/o waiting, i.e. in a request
+        hotel_bucket_mock.return_value.acquire.assert_called_once_with(0)
+        self.assertTrue(client_mock.return_value.messages.create.called)
+
+    @patch('sms.helpers.TwilioRestClient')
+    @patch('sms.helpers.hotel_bucket')
+    def test_send_message__from(self, hotel_bucket_mock, client_mock):
+        with patch.object(sys, 'argv', ['manage.py']):
+            send_message(self.hotel, settings.DEFAULT_TO_PH, "Hi", from_='+17025550005')
+
+        hotel_bucket_mock.assert_called_once_with(self.hotel, '+17025550005')
+        self.assertEqual(client_mock.return_value.messages.create.call_args[1]['from_'],
+            '+17025550005')
+
+    @patch('sms.helpers.TwilioRestClient')
+    @patch('sms.helpers.hotel_bucket')
+    def test_send_message__rate_limited(self, hotel_bucket_mock, client_mock):
+        hotel_bucket_mock.return_value.acquire.side_effect = RateLimited(90)
+
+        with patch.object(sys, 'argv', ['manage.py']):
+            with self.assertRaises(RateLimited):
+                send_message(self.hotel, settings.DEFAULT_TO_PH, "Hi")
+
+        self.assertFalse(client_mock.return_value.messages.create.called)
+
+    @patch('sms.ratelimit.time')
+    @patch('sms.helpers.TwilioRestClient')
+    def test_send_message__bucket(self, client_mock, time_mock):
+        time_mock.time.return_value = 1000.0
+        bucket = ratelimit.hotel_bucket(self.hotel)
+        bucket.server.delete(bucket.key)
+        self.addCleanup(bucket.server.delete, bucket.key)
+
+        with patch.object(sys, 'argv', ['manage.py']):
+            for i in range(settings.SMS_RATE_LIMIT_BURST):
+                send_message(self.hotel, settings.DEFAULT_TO_PH, "Hi")
+            # a request doesn't wait for the next token
+            with self.assertRaises(RateLimited) as cm:
+                send_message(self.hotel, settings.DEFAULT_TO_PH, "Hi")
+            self.assertFalse(time_mock.sleep.called)
+            # a Task does
+            send_message(self.hotel, settings.DEFAULT_TO_PH, "Hi", max_wait=None)
+
+        self.assertEqual(cm.exception.wait, 1 / settings.SMS_RATE_LIMIT_RATE)
+        time_mock.sleep.assert_called_once_with(cm.exception.wait)
+        self.assertEqual(client_mock.return_value.messages.create.call_count,
+            settings.SMS_RATE_LIMIT_BURST + 1)
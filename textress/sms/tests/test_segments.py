@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from django.test import SimpleTestCase
+
+from sms.segments import GSM7, UCS2, count_segments, encoding, units
+
+
+class SegmentsTests(SimpleTestCase):
+
+    def test_encoding(self):
+        self.assertEqual(encoding(u"Hi, your room is ready! €5 off {spa}"), GSM7)
+        self.assertEqual(encoding(u"Hi ’ there"), UCS2)
+        self.assertEqual(encoding(u"Ready \U0001F600"), UCS2)
+
+    def test_units(self):
+        self.assertEqual(units(u"a€"), [1, 2])
+        self.assertEqual(sum(units(u"\U0001F600")), 2)
+
+    def test_count_segments__gsm7(self):
+        self.assertEqual(count_segments(u""), 1)
+        self.assertEqual(count_segments(u"a" * 160), 1)
+        self.assertEqual(count_segments(u"a" * 161), 2)
+        self.assertEqual(count_segments(u"a" * 306), 2)
+        self.assertEqual(count_segments(u"a" * 307), 3)
+
+    def test_count_segments__gsm7_extension(self):
+        # 80 escaped chars are 160 septets
+        self.assertEqual(count_segments(u"€" * 80), 1)
+        self.assertEqual(count_segments(u"€" * 81), 2)
+        # 306 septets, but the 76th escape doesn't fit in the 1st part's last septet
+        self.assertEqual(count_segments(u"aa" + u"€" * 76 + u"a" * 152), 3)
+
+    def test_count_segments__ucs2(self):
+        self.assertEqual(count_segments(u"’" * 70), 1)
+        self.assertEqual(count_segments(u"’" * 71), 2)
+        self.assertEqual(count_segments(u"’" * 134), 2)
+        self.assertEqual(count_segments(u"’" * 135), 3)
+
+    def test_count_segments__surrogate_pair_not_split(self):
+        self.assertEqual(count_segments(u"\U0001F600" * 35), 1)
+        # 66 + 2 code units don't fit in a 67 unit part
+        self.assertEqual(count_segments(u"a" * 66 + u"\U0001F600" + u"a" * 66), 3)
+
+    def test_count_segments__bytes(self):
+        self.assertEqual(count_segments("a" * 161), 2)
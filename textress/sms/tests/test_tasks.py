@@ -0,0 +1,51 @@
+from mock import patch
+
+from django.test import TestCase
+from django.core.cache import cache
+
+from model_mommy import mommy
+
+from main.tests.factory import create_hotel
+from sms import tasks
+from sms.models import PhoneNumber, PhoneNumberCandidates, PhoneNumberPurchase
+from utils.loadtest.fake_twilio import FakeTwilioClient
+from utils.tests.runners import celery_set_eager
+
+
+class SMSTaskTests(TestCase):
+
+    def setUp(self):
+        self.hotel = create_hotel(address_phone='+17025550000')
+        self.purchase = mommy.make(PhoneNumberPurchase, hotel=self.hotel)
+        self.twilio = FakeTwilioClient(available={'702': 10})
+        cache.clear()
+        PhoneNumberCandidates.set('702', [])
+
+        celery_set_eager()
+
+    def test_refresh_phone_number_candidates(self):
+        with patch.object(PhoneNumber.objects, 'client', self.twilio):
+            tasks.refresh_phone_number_candidates.delay('702')
+
+        self.assertEqual(len(PhoneNumberCandidates.get('702')), 10)
+
+    @patch("sms.models.PhoneNumberManager.purchase_number")
+    def test_purchase_phone_number(self, mock_purchase_number):
+        mock_purchase_number.return_value = mommy.make(PhoneNumber, hotel=self.hotel)
+
+        with patch.object(PhoneNumber.objects, 'client', self.twilio):
+            ret = tasks.purchase_phone_number.delay(self.purchase.id)
+
+        self.assertEqual(ret.result, PhoneNumberPurchase.COMPLETE)
+        # candidate pool was low, so refreshed
+        self.assertEqual(len(PhoneNumberCandidates.get('702')), 10)
+
+    @patch("sms.models.PhoneNumberManager.purchase_number")
+    def test_purchase_phone_number__pool_ok(self, mock_purchase_number):
+        mock_purchase_number.return_value = mommy.make(PhoneNumber, hotel=self.hotel)
+        PhoneNumberCandidates.set('702', ['+17025550001', '+17025550002', '+17025550003'])
+
+        with patch.object(PhoneNumber.objects, 'client', self.twilio):
+            tasks.purchase_phone_number.delay(self.purchase.id)
+
+        self.assertEqual(self.twilio.phone_numbers.searches, [])
@@ -13,9 +13,10 @@ from account.models import AcctCost, AcctTrans, TransType, Pricing
 from account.tests.factory import create_trans_types
 from main.models import Hotel
 from main.tests.factory import create_hotel, create_hotel_user, PASSWORD
-from sms.models import PhoneNumber
+from sms.models import PhoneNumber, PhoneNumberPurchase
 from sms.tests.factory import create_phone_number
 from utils import create
+from utils.tests.runners import celery_set_eager
 
 
 class PhoneNumberTests(TestCase):
@@ -89,8 +90,11 @@ class PhoneNumberTests(TestCase):
         self.assertTrue(response.context['form'])
         self.assertIsInstance(response.context['form'].hotel, Hotel)
 
+    @patch("sms.tasks.refresh_phone_number_candidates.delay")
     @patch("sms.models.PhoneNumberManager.purchase_number")
-    def test_add_phone_number__creates_acct_trans(self, purchase_number_mock):
+    def test_add_phone_number__creates_acct_trans(self, purchase_number_mock, refresh_mock):
+        purchase_number_mock.return_value = self.ph_num
+        celery_set_eager()
         self.assertEqual(AcctTrans.objects.filter(hotel=self.hotel,
             trans_type__name='phone_number').count(), 0)
 
@@ -98,6 +102,7 @@ class PhoneNumberTests(TestCase):
 
         self.assertRedirects(response, reverse('sms:ph_num_list'))
         self.assertTrue(purchase_number_mock.called)
+        self.assertTrue(PhoneNumberPurchase.objects.filter(hotel=self.hotel).exists())
 
     ### DELETE
 
@@ -107,3 +112,55 @@ class PhoneNumberTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(response.context['btn_color']) == 'danger'
         self.assertTrue(response.context['btn_text']) == 'Delete'
+
+
+class PhoneNumberPurchaseTests(TestCase):
+
+    def setUp(self):
+        create._get_groups_and_perms()
+        self.password = PASSWORD
+        self.hotel = create_hotel()
+        self.acct_cost = mommy.make(AcctCost, hotel=self.hotel)
+        self.pricing = mommy.make(Pricing, hotel=self.hotel)
+        create_trans_types()
+        self.user = create_hotel_user(self.hotel, group='hotel_admin')
+        self.client.login(username=self.user.username, password=self.password)
+        # clear cache for TransTypes
+        cache.clear()
+
+        celery_set_eager()
+
+    @patch("sms.tasks.purchase_phone_number.delay")
+    def test_add__starts_purchase(self, mock_delay):
+        response = self.client.post(reverse('sms:ph_num_add'), {}, follow=True)
+
+        self.assertRedirects(response, reverse('sms:ph_num_list'))
+        purchase = PhoneNumberPurchase.objects.get(hotel=self.hotel)
+        mock_delay.assert_called_once_with(purchase.id)
+        # open purchases are polled on the List page
+        self.assertIn(purchase, response.context['purchases'])
+
+    @patch("sms.tasks.purchase_phone_number.delay")
+    def test_add__double_submit(self, mock_delay):
+        self.client.post(reverse('sms:ph_num_add'), {})
+        self.client.post(reverse('sms:ph_num_add'), {})
+
+        self.assertEqual(PhoneNumberPurchase.objects.filter(hotel=self.hotel).count(), 1)
+        self.assertEqual(mock_delay.call_count, 1)
+
+    def test_api_purchase(self):
+        purchase = mommy.make(PhoneNumberPurchase, hotel=self.hotel)
+
+        response = self.client.get(reverse('sms:api_ph_num_purchase',
+            kwargs={'pk': purchase.pk}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], PhoneNumberPurchase.PENDING)
+
+    def test_api_purchase__other_hotel(self):
+        purchase = mommy.make(PhoneNumberPurchase, hotel=create_hotel())
+
+        response = self.client.get(reverse('sms:api_ph_num_purchase',
+            kwargs={'pk': purchase.pk}))
+
+        self.assertEqual(response.status_code, 403)
@@ -3,6 +3,11 @@ from django.conf.urls import patterns, include, url
 from sms import views
 
 
+api_patterns = patterns('',
+    url(r'^phone-numbers/purchase/(?P<pk>\d+)/$', views.PhoneNumberPurchaseRetrieveAPIView.as_view(),
+        name='api_ph_num_purchase'),
+    )
+
 phone_patters = patterns('',
     url(r'^$', views.PhoneNumberListView.as_view(), name='ph_num_list'),
     url(r'^add/$', views.PhoneNumberAddView.as_view(), name='ph_num_add'),
@@ -11,5 +16,6 @@ phone_patters = patterns('',
     )
 
 urlpatterns = patterns('',
+    url(r'^api/', include(api_patterns)),
     url(r'^phone-numbers/', include(phone_patters)),
     )
\ No newline at end of file
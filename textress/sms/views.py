@@ -10,12 +10,16 @@ from django.contrib.auth.decorators import login_required
 
 from braces.views import (LoginRequiredMixin, SetHeadlineMixin, FormValidMessageMixin,
     FormInvalidMessageMixin)
+from rest_framework import generics, permissions
 
 from account.mixins import alert_messages
+from concierge.permissions import IsHotelObject
 from main.mixins import AdminOnlyMixin
 from sms.forms import PhoneNumberAddForm
 from sms.helpers import no_twilio_phone_number_alert
-from sms.models import PhoneNumber
+from sms.models import PhoneNumber, PhoneNumberPurchase
+from sms.serializers import PhoneNumberPurchaseSerializer
+from sms.tasks import purchase_phone_number
 from utils.exceptions import PhoneNumberNotDeletedExcp
 from utils.forms import EmptyForm
 
@@ -41,6 +45,7 @@ class PhoneNumberListView(PhoneNumberBaseView):
     def get_context_data(self, **kwargs):
         context = super(PhoneNumberListView, self).get_context_data(**kwargs)
         context['phone_numbers'] = self.hotel.phone_numbers.order_by('-default')
+        context['purchases'] = PhoneNumberPurchase.objects.open(self.hotel)
         context['addit_info'] = render_to_string('cpanel/forms/form_ph_list.html',
             {'ph_num_monthly_cost': settings.PHONE_NUMBER_MONTHLY_COST})
         if not self.hotel.twilio_ph_sid:
@@ -57,7 +62,10 @@ class PhoneNumberAddView(FormInvalidMessageMixin, PhoneNumberBaseView):
     template_name = 'cpanel/form.html'
     form_class = PhoneNumberAddForm
     success_url = reverse_lazy('sms:ph_num_list')
-    form_valid_message = "Phone Number successfully purchased"
+    form_valid_message = (
+        "Phone Number purchase started. It will be listed "
+        "below as soon as it is complete."
+    )
     form_invalid_message = (
         "Please refill your account balance in order to "
         "process this transation or turn Auto-recharge ON."
@@ -76,10 +84,13 @@ class PhoneNumberAddView(FormInvalidMessageMixin, PhoneNumberBaseView):
         return kwargs
 
     def form_valid(self, form):
-        "Purchase Twilio Ph # Obj here, and add to related models."
-        # Remove for Demos
-        # if not settings.DEBUG and 'test' not in sys.argv:
-        phone_number = PhoneNumber.objects.purchase_number(hotel=self.hotel)
+        """
+        Purchase Twilio Ph # Obj in the background, and add to related models. 
+        The List View polls the ``PhoneNumberPurchase`` for the result.
+        """
+        purchase, created = PhoneNumberPurchase.objects.get_or_create_open(self.hotel)
+        if created:
+            purchase_phone_number.delay(purchase.id)
         return super(PhoneNumberAddView, self).form_valid(form)
 
 
@@ -122,3 +133,14 @@ class PhoneNumberDeleteView(PhoneNumberBaseView, DeleteView):
             messages.add_message(self.request, messages.INFO, "Phone number delete \
 failed. Please contact support at: {}".format(settings.DEFAULT_EMAIL_SUPPORT))
         return HttpResponseRedirect(self.get_success_url())
+
+
+########
+# REST #
+########
+
+class PhoneNumberPurchaseRetrieveAPIView(generics.RetrieveAPIView):
+
+    queryset = PhoneNumberPurchase.objects.all()
+    serializer_class = PhoneNumberPurchaseSerializer
+    permission_classes = (permissions.IsAuthenticated, IsHotelObject,)
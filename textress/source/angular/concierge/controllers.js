@@ -30,23 +30,28 @@ conciergeControllers.controller('SendWelcomeCtrl', ['$scope', 'MessageSendWelcom
   }
 ]);
 
-conciergeControllers.controller('GuestListCtrl', ['$scope', '$timeout', 'Guest', 'Message',
-  function($scope, $timeout, Guest, Message) {
+conciergeControllers.controller('GuestListCtrl', ['$scope', '$timeout', 'Guest', 'GuestDeltas',
+  function($scope, $timeout, Guest, GuestDeltas) {
 
     // Sorting for List
     $scope.predicate = 'messages[0].read';
     $scope.reverse = false;
 
-    Guest.query().$promise.then(function(response) {
-      $scope.guests = response;
+    // Loaded once, then kept current by the websocket's deltas
+    $scope.deltas = GuestDeltas(function() {
+      return Guest.query().$promise.then(function(response) {
+        $scope.guests = response;
+        return response;
+      });
     });
+    $scope.deltas.load();
 
     $scope.order = function(predicate) {
       $scope.reverse = ($scope.predicate === predicate) ? !$scope.reverse : false;
       $scope.predicate = predicate;
     };
 
-    // GuestListView: Push incoming messsage onto Guest Messages array for all Guests
+    // GuestListView: apply Guest and Message deltas to the list
     $scope.initializing = true;
 
     $scope.getMessage = function(message) {
@@ -56,20 +61,7 @@ conciergeControllers.controller('GuestListCtrl', ['$scope', '$timeout', 'Guest',
         if (typeof(message) !== "object") {
           message = JSON.parse(message);
         }
-
-        for (i = 0; i < $scope.guests.length; i++) {
-          if (message.guest == $scope.guests[i].id) {
-            $scope.guest = $scope.guests[i]; // set as local $scope to the Ctrl otherwise
-            // can't access it w/i `Message.get()` below
-            Message.get({
-              id: message.id
-            }, function(response) {
-              // Only append the Message if it belongs to the Guest
-              // $scope.guests[i].messages.unshift(response);
-              $scope.guest.messages.push(response);
-            });
-          }
-        }
+        $scope.deltas.receive(message);
       }
 
       if ($scope.initializing) {
@@ -83,19 +75,20 @@ conciergeControllers.controller('GuestListCtrl', ['$scope', '$timeout', 'Guest',
   }
 ]);
 
-// ``Dashboard page``: where new messages should pop via a websocket to dispay to the User
-conciergeControllers.controller('GuestMsgPreviewCtrl', ['$scope', '$filter', '$stateParams', '$timeout', 'Message', 'GuestMessages',
-  function($scope, $filter, $stateParams, $timeout, Message, GuestMessages) {
 
-    // $scope.guests = GuestMessages.query();
-    GuestMessages.query().$promise.then(function(response) {
-      $scope.guests = response;
-    });
+conciergeControllers.controller('GuestMsgPreviewCtrl', ['$scope', '$filter', '$stateParams', '$timeout', 'GuestMessages', 'GuestDeltas',
+  function($scope, $filter, $stateParams, $timeout, GuestMessages, GuestDeltas) {
 
-    // Append Last Message object to each Guest in Array
-    // LastMsg has: text, time, read/unread status
+    // Loaded once, then kept current by the websocket's deltas
+    $scope.deltas = GuestDeltas(function() {
+      return GuestMessages.query().$promise.then(function(response) {
+        $scope.guests = response;
+        return response;
+      });
+    });
+    $scope.deltas.load();
 
-    // GuestListView: Push incoming messsage onto Guest Messages array for all Guests
+    // GuestListView: apply Guest and Message deltas to the list
     initializing = true;
 
     $scope.getMessage = function(message) {
@@ -105,20 +98,7 @@ conciergeControllers.controller('GuestMsgPreviewCtrl', ['$scope', '$filter', '$s
         if (typeof(message) !== "object") {
           message = JSON.parse(message);
         }
-
-        for (i = 0; i < $scope.guests.length; i++) {
-          if (message.guest == $scope.guests[i].id) {
-            $scope.guest = $scope.guests[i]; // set as local $scope to the Ctrl otherwise
-            // can't access it w/i `Message.get()` below
-            Message.get({
-              id: message.id
-            }, function(response) {
-              // Only append the Message if it belongs to the Guest
-              // $scope.guests[i].messages.unshift(response);
-              $scope.guest.messages.push(response);
-            });
-          }
-        }
+        $scope.deltas.receive(message);
       }
 
       if (initializing) {
@@ -177,7 +157,10 @@ conciergeControllers.controller('GuestMessageCtrl', ['$scope', '$stateParams', '
         // Comment out: only needed for debugging
         // console.log('typeof:', typeof(response), 'id:', response.id, 'response:', response);
         // console.log('Acutual msg being sent:', JSON.stringify(response));
-        ws4redis.send_message(JSON.stringify(response));
+        // a 202 w/ `send_at` is a ScheduledMessage, b/c the number is rate limited
+        if (!response.send_at) {
+          ws4redis.send_message(JSON.stringify(response));
+        }
       });
     }
 
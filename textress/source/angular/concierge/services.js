@@ -15,6 +15,126 @@ angular.module('conciergeApp.services', ['ngResource'])
   .factory('GuestMessages', function($resource) {
     return $resource('/api/guest-messages/:id/');
   })
+  .factory('Delta', function($resource) {
+    return $resource('/api/deltas/');
+  })
+  // Keeps a Guest list current w/ the versioned patches from the websocket.
+  // A gap in the versions is filled from '/api/deltas/?since=', and if
+  // the missed patches are gone, the list is reloaded.
+  // `load` returns a promise of the full Guest list.
+  .factory('GuestDeltas', ['Delta',
+    function(Delta) {
+      return function(load) {
+        var feed = {
+          hotel: null,
+          version: null,
+          guests: []
+        };
+
+        var find = function(list, id) {
+          for (var i = 0; i < list.length; i++) {
+            if (list[i].id === id) {
+              return i;
+            }
+          }
+          return -1;
+        };
+
+        var removeGuests = function(ids) {
+          for (var i = feed.guests.length - 1; i >= 0; i--) {
+            if (ids.indexOf(feed.guests[i].id) !== -1) {
+              feed.guests.splice(i, 1);
+            }
+          }
+        };
+
+        // patches can be applied more than once, i.e. after a catch up
+        feed.apply = function(delta) {
+          var data = delta.data;
+
+          if (delta.type === 'guest') {
+            if (delta.action === 'archive') {
+              removeGuests(data.ids);
+            } else if (data.hidden) {
+              removeGuests([data.id]);
+            } else {
+              var g = find(feed.guests, data.id);
+              if (g === -1) {
+                data.messages = [];
+                feed.guests.push(data);
+              } else {
+                angular.extend(feed.guests[g], data);
+              }
+            }
+            return;
+          }
+
+          var guest = feed.guests[find(feed.guests, data.guest)];
+          if (!guest) {
+            return;
+          }
+          if (delta.action === 'read') {
+            guest.messages.forEach(function(message) {
+              message.read = true;
+            });
+            return;
+          }
+          var m = find(guest.messages, data.id);
+          if (m === -1) {
+            guest.messages.push(data);
+          } else {
+            angular.extend(guest.messages[m], data);
+          }
+        };
+
+        var applyNewer = function(delta) {
+          if (delta.version > feed.version) {
+            feed.apply(delta);
+            feed.version = delta.version;
+          }
+        };
+
+        feed.catchUp = function() {
+          return Delta.get({
+            since: feed.version
+          }).$promise.then(function(response) {
+            if (response.reset) {
+              return feed.load();
+            }
+            response.deltas.forEach(applyNewer);
+          });
+        };
+
+        // version 1st, so patches made during the load are caught up after
+        feed.load = function() {
+          feed.version = null;
+          return Delta.get().$promise.then(function(response) {
+            var version = response.version;
+            feed.hotel = response.hotel;
+            return load().then(function(guests) {
+              feed.guests = guests;
+              feed.version = version;
+              return feed.catchUp();
+            });
+          });
+        };
+
+        feed.receive = function(delta) {
+          if (delta.event !== 'delta' || delta.hotel !== feed.hotel ||
+              feed.version === null) {
+            return;
+          }
+          if (delta.version === feed.version + 1) {
+            applyNewer(delta);
+          } else if (delta.version > feed.version) {
+            feed.catchUp();
+          }
+        };
+
+        return feed;
+      };
+    }
+  ])
   .factory('Reply', ['$resource',
     function($resource) {
       return $resource('/api/reply/:id/', null, {
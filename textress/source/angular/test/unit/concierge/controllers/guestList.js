@@ -8,6 +8,7 @@ describe('Controller: GuestListCtrl', function() {
   var deferred;
   var guests;
   var mockGuest;
+  var mockGuestDeltas;
 
   beforeEach(function() {
     guests = [{
@@ -44,13 +45,11 @@ describe('Controller: GuestListCtrl', function() {
         };
       }
     },
-    mockMessage = {
-      get: function(message) {
-        deferred = q.defer();
-        return {
-          $promise: deferred.promise
-        };
-      }
+    mockGuestDeltas = function(load) {
+      return {
+        load: load,
+        receive: jasmine.createSpy('receive')
+      };
     }
   });
 
@@ -63,7 +62,7 @@ describe('Controller: GuestListCtrl', function() {
     GuestListCtrl = $controller('GuestListCtrl', {
       $scope: scope,
       Guest: mockGuest,
-      Message: mockMessage
+      GuestDeltas: mockGuestDeltas
     });
   }));
 
@@ -95,26 +94,26 @@ describe('Controller: GuestListCtrl', function() {
     expect(scope.reverse).toBe(true);
   });
 
-  it('scope.getMessage - matches - so gets pushed onto their message list', function() {
-    spyOn(mockGuest, 'query').andCallThrough();
-    deferred.resolve(guests);
-    scope.$root.$digest();
-    expect(scope.guests[0].messages.length).toEqual(2);
-    var message = {
-      "id": 10,
-      "guest": 2,
-      "user": 1,
-      "read": false
+  it('scope.getMessage - passes deltas on after the initial message', inject(function($timeout) {
+    var delta = {
+      "event": "delta",
+      "hotel": 1,
+      "version": 1,
+      "type": "message",
+      "action": "create",
+      "data": {
+        "id": 10,
+        "guest": 2,
+        "user": 1,
+        "read": false
+      }
     };
 
-    spyOn(mockMessage, 'get').andCallThrough();
-    deferred.resolve(message);
-    scope.$root.$digest();
-    scope.getMessage(message);
+    scope.getMessage(delta);
+    $timeout.flush();
+    expect(scope.deltas.receive).not.toHaveBeenCalled();
 
-    // work on getting to pass
-    // expect(mockMessage.get).toHaveBeenCalled();
-    // expect(scope.guest, scope.guests[0]);
-    // expect(scope.guests[0].messages.length).toEqual(3);
-  });
+    scope.getMessage(JSON.stringify(delta));
+    expect(scope.deltas.receive).toHaveBeenCalledWith(delta);
+  }));
 });
\ No newline at end of file
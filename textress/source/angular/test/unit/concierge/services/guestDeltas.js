@@ -0,0 +1,180 @@
+'use strict';
+
+describe('Service: GuestDeltas', function() {
+
+  // load the service's module
+  beforeEach(module('conciergeApp'));
+
+  // instantiate service
+  var GuestDeltas;
+  var $httpBackend;
+  var $q;
+  var feed;
+  var loads;
+  var guests;
+
+  var delta = function(version, type, action, data) {
+    return {
+      "event": "delta",
+      "hotel": 1,
+      "version": version,
+      "type": type,
+      "action": action,
+      "data": data
+    };
+  };
+
+  beforeEach(inject(function(_$httpBackend_, _$q_, _GuestDeltas_) {
+    GuestDeltas = _GuestDeltas_;
+    $httpBackend = _$httpBackend_;
+    $q = _$q_;
+
+    loads = 0;
+    guests = [{
+      "id": 2,
+      "name": "Scott",
+      "hidden": false,
+      "messages": [{
+        "id": 144,
+        "guest": 2,
+        "read": false
+      }]
+    }];
+
+    feed = GuestDeltas(function() {
+      loads++;
+      return $q.when(guests);
+    });
+
+    $httpBackend.expectGET('/api/deltas/').respond(200, {
+      "hotel": 1,
+      "version": 5,
+      "deltas": [],
+      "reset": false
+    });
+    $httpBackend.expectGET('/api/deltas/?since=5').respond(200, {
+      "hotel": 1,
+      "version": 5,
+      "deltas": [],
+      "reset": false
+    });
+    feed.load();
+    $httpBackend.flush();
+  }));
+
+  it('should load', function() {
+    expect(loads).toBe(1);
+    expect(feed.version).toBe(5);
+    expect(feed.guests).toBe(guests);
+  });
+
+  it('should apply the next version', function() {
+    feed.receive(delta(6, "message", "create", {
+      "id": 145,
+      "guest": 2,
+      "read": false
+    }));
+    feed.receive(delta(7, "message", "read", {
+      "guest": 2
+    }));
+
+    expect(feed.version).toBe(7);
+    expect(guests[0].messages.length).toBe(2);
+    expect(guests[0].messages[1].read).toBe(true);
+  });
+
+  it('should add, update and archive Guests', function() {
+    feed.receive(delta(6, "guest", "update", {
+      "id": 3,
+      "name": "Dave",
+      "hidden": false
+    }));
+    feed.receive(delta(7, "guest", "update", {
+      "id": 2,
+      "name": "Scott T",
+      "hidden": false
+    }));
+    expect(guests.length).toBe(2);
+    expect(guests[0].name).toBe("Scott T");
+    expect(guests[1].messages).toEqual([]);
+
+    feed.receive(delta(8, "guest", "archive", {
+      "ids": [2, 3]
+    }));
+    expect(guests.length).toBe(0);
+  });
+
+  it('should ignore other Hotels and old versions', function() {
+    var other = delta(6, "guest", "archive", {
+      "ids": [2]
+    });
+    other.hotel = 2;
+
+    feed.receive(other);
+    feed.receive(delta(5, "guest", "archive", {
+      "ids": [2]
+    }));
+
+    expect(feed.version).toBe(5);
+    expect(guests.length).toBe(1);
+  });
+
+  it('should catch up a gap', function() {
+    $httpBackend.expectGET('/api/deltas/?since=5').respond(200, {
+      "hotel": 1,
+      "version": 7,
+      "deltas": [
+        delta(6, "guest", "update", {
+          "id": 3,
+          "name": "Dave",
+          "hidden": false
+        }),
+        delta(7, "message", "read", {
+          "guest": 2
+        })
+      ],
+      "reset": false
+    });
+
+    feed.receive(delta(7, "message", "read", {
+      "guest": 2
+    }));
+    $httpBackend.flush();
+
+    expect(feed.version).toBe(7);
+    expect(guests.length).toBe(2);
+    expect(guests[0].messages[0].read).toBe(true);
+  });
+
+  it('should reload when the missed deltas are gone', function() {
+    $httpBackend.expectGET('/api/deltas/?since=5').respond(200, {
+      "hotel": 1,
+      "version": 1500,
+      "deltas": [],
+      "reset": true
+    });
+    $httpBackend.expectGET('/api/deltas/').respond(200, {
+      "hotel": 1,
+      "version": 1500,
+      "deltas": [],
+      "reset": false
+    });
+    $httpBackend.expectGET('/api/deltas/?since=1500').respond(200, {
+      "hotel": 1,
+      "version": 1500,
+      "deltas": [],
+      "reset": false
+    });
+
+    feed.catchUp();
+    $httpBackend.flush();
+
+    expect(loads).toBe(2);
+    expect(feed.version).toBe(1500);
+  });
+
+  afterEach(function() {
+    $httpBackend.verifyNoOutstandingExpectation();
+    $httpBackend.verifyNoOutstandingRequest();
+  });
+});
@@ -11,7 +11,11 @@ SITE_ID = 1
 # ``../textra_project/textress/`` is the base dir
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
-SECRET_KEY = os.environ['T17_SECRET_KEY']
+# Env vars w/ secrets are defaulted, so a shell, Celery worker or
+# management command starts w/o them. ``prod.py`` requires them.
+# Except SECRET_KEY: Django won't start w/o it, and only ``local.py`` and
+# ``test.py`` default it, so no deploy signs sessions w/ a public key.
+SECRET_KEY = os.environ.get('T17_SECRET_KEY', '')
 
 DEFAULT_APPS = (
     'django.contrib.admin',
@@ -54,6 +58,8 @@ AUTHENTICATION_BACKENDS = (
 
 
 MIDDLEWARE_CLASSES = (
+    'utils.middleware.MetricsMiddleware',
+    'utils.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -93,14 +99,44 @@ WSGI_APPLICATION = 'textress.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql_psycopg2', 
-        'NAME': os.environ['T17_DB_NAME'],
-        'USER': os.environ['T17_DB_USER'],
-        'PASSWORD': os.environ['T17_DB_PASSWORD'],
+        'NAME': os.environ.get('T17_DB_NAME', ''),
+        'USER': os.environ.get('T17_DB_USER', ''),
+        'PASSWORD': os.environ.get('T17_DB_PASSWORD', ''),
         'HOST': 'localhost',
         'PORT': '5432',
+        # seconds to keep a connection open for reuse, see ``utils.connections``
+        'CONN_MAX_AGE': int(os.environ.get('T17_DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# PgBouncer in transaction pooling mode, i.e. '6432'. Its client connections
+# are cheap, so they're kept. Session state doesn't outlive a transaction,
+# so the DB role's timezone must be 'UTC', else Django SETs it per connection:
+#   ALTER ROLE <user> SET timezone TO 'UTC';
+DATABASE_PGBOUNCER = bool(os.environ.get('T17_DB_PGBOUNCER_PORT'))
+if DATABASE_PGBOUNCER:
+    DATABASES['default'].update(PORT=os.environ['T17_DB_PGBOUNCER_PORT'], CONN_MAX_AGE=None)
+
+# Connections idle this long (seconds) get a ``SELECT 1`` before reuse
+DATABASE_HEALTH_CHECK_IDLE = 30
+
+# Read replica for ``utils.mixins.ReplicaMixin`` Views and ``on_replica``
+# Tasks, see ``utils.routers``. W/o a replica, all reads go to 'default'.
+# It's connected to directly, not through PgBouncer, so it keeps its own
+# CONN_MAX_AGE.
+if os.environ.get('T17_DB_REPLICA_HOST'):
+    DATABASES['replica'] = dict(DATABASES['default'],
+        HOST=os.environ['T17_DB_REPLICA_HOST'],
+        PORT=os.environ.get('T17_DB_REPLICA_PORT', '5432'),
+        CONN_MAX_AGE=int(os.environ.get('T17_DB_CONN_MAX_AGE', 60)))
+
+DATABASE_REPLICA = 'replica' if 'replica' in DATABASES else None
+DATABASE_ROUTERS = ['utils.routers.ReplicaRouter']
+# After a write, the User's reads stay on 'default' this long (seconds), so
+# they see their writes while the replica catches up
+DATABASE_REPLICA_STICKY_SECONDS = 10
+DATABASE_REPLICA_STICKY_COOKIE = 'db_primary'
+
 
 ### SITE ###
 
@@ -111,7 +147,7 @@ USE_L10N = True
 USE_TZ = True
 
 SESSION_COOKIE_AGE = 5400
-SESSION_SAVE_EVERY_REQUEST = True
+SESSION_SAVE_EVERY_REQUEST = True # cheap w/ ``utils.sessions``, see SESSION_REFRESH_INTERVAL
 
 ADMIN_MEDIA_PREFIX = '/admin-media/'
 
@@ -126,10 +162,13 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 
+# w/o a db: the cache uses db 1, and ``utils.redis_server`` the raw keys in db 0
+REDIS_URL = 'redis://localhost:6379'
+
 CACHES = {
     'default': {
         'BACKEND': 'redis_cache.RedisCache',
-        'LOCATION': 'localhost:6379',
+        'LOCATION': REDIS_URL,
     },
 }
 
@@ -155,7 +194,7 @@ LOGIN_SUCCESS_URL = '/account/'
 ### EMAIL ###
 
 # DJRILL
-MANDRILL_API_KEY = os.environ['T17_MANDRILL_API_KEY']
+MANDRILL_API_KEY = os.environ.get('T17_MANDRILL_API_KEY', '')
 EMAIL_BACKEND = "djrill.mail.backends.djrill.DjrillBackend"
 
 # All 500 errors when ``DEBUG=False`` will be sent to this list
@@ -171,6 +210,14 @@ DEFAULT_EMAIL_BILLING = 'billing@textress.com'
 DEFAULT_EMAIL_AARON = 'aaron@textress.com'
 DEFAULT_EMAIL_NOREPLY = 'noreply@textress.com'
 
+# Outbox: ``utils.email.send_outbox_emails``
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+# seconds before the 1st retry; doubles after each failed attempt
+EMAIL_OUTBOX_RETRY_DELAY = 60
+# seconds before a batch claimed by a worker that died is sent again
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 600
+
 # SMTP Email Settings (Zoho)
 # django native settings used for ``django.core.mail.mail_admins()``
 # EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -183,11 +230,11 @@ DEFAULT_EMAIL_NOREPLY = 'noreply@textress.com'
 
 SUPERUSER_USERNAME = 'aaron'
 SUPERUSER_EMAIL = 'aaron@textress.com'
-SUPERUSER_PASSWORD = os.environ['T17_DB_PASSWORD']
+SUPERUSER_PASSWORD = os.environ.get('T17_DB_PASSWORD', '')
 
 
 ### OTHER CONTACT INFO ###
-TEXTRESS_PHONE_NUMBER = os.environ['T17_PHONE_NUMBER']
+TEXTRESS_PHONE_NUMBER = os.environ.get('T17_PHONE_NUMBER', '')
 
 COMPANY_NAME = "Textress"
 
@@ -195,19 +242,34 @@ COMPANY_NAME = "Textress"
 # needs to be recharged.
 CHECK_SMS_LIMIT = 100
 
+# Seconds to keep a Hotel's precomputed Billing page data in the cache. It is
+# also dropped whenever an AcctTrans or AcctStmt for the Hotel is written.
+BILLING_SNAPSHOT_CACHE_TIMEOUT = 60 * 60 * 24
+
 # Default Costs for Accounts (Stripe Amounts ~ in cents)
 DEFAULT_MONTHLY_FEE = 0
 DEFAULT_SMS_COST = 5.00
 PHONE_NUMBER_CHARGE = 300
 PHONE_NUMBER_MONTHLY_COST = 300
 PHONE_NUMBER_MONTHLY_CHARGE_DAY = 1 # 1st of the month
+PHONE_NUMBER_CHARGE_CHUNK_SIZE = 100 # Hotels per monthly charge task
+
+# PH # Purchase: candidates tried per area code search, before and after
+# widening to nearby area codes (distance in miles)
+PHONE_NUMBER_PURCHASE_MAX_ATTEMPTS = 3
+PHONE_NUMBER_NEARBY_DISTANCE = 50
+PHONE_NUMBER_CANDIDATES_MIN = 3
+PHONE_NUMBER_CANDIDATES_CACHE_TIMEOUT = 60 * 60
+# seconds before a 'running' PhoneNumberPurchase is from a dead worker, and a
+# new one can be started
+PHONE_NUMBER_PURCHASE_TIMEOUT = 60 * 10
 
 ### Twilio Settings ###
 DEFAULT_TO_PH = "+17754194000"
 DEFAULT_TO_PH_2 = "+17023012823"
 DEFAULT_TO_PH_BAD = "+14043488557"
 
-DEFAULT_FROM_PH = os.environ['TWILIO_PHONE_NUMBER'] # +17024302691
+DEFAULT_FROM_PH = os.environ.get('TWILIO_PHONE_NUMBER', '') # +17024302691
 DEFAULT_FROM_PH_BAD = "+1234567890"
 
 RESERVED_REPLY_LETTERS = ['Y', 'S'] # 'H' for HELP will be added to each Hotel upon signup
@@ -225,6 +287,46 @@ CHECK_IN_TRIGGER = 'check_in'
 CHECK_OUT_TRIGGER = 'check_out'
 BULK_SEND_WELCOME_TRIGGER = 'bulk_send_welcome'
 
+# Max rows per Guest import, from a CSV or PMS arrival feed
+GUEST_IMPORT_MAX_ROWS = 1000
+
+# ScheduledMessages claimed per batch by each ``send_scheduled_messages`` worker.
+# Claims not renewed for the timeout, in seconds, are from a dead worker. They're
+# failed, not resent, as they may have been sent.
+SCHEDULED_MESSAGE_BATCH_SIZE = 100
+SCHEDULED_MESSAGE_CLAIM_TIMEOUT = 600
+# Seconds ``send_scheduled_messages --loop`` waits when nothing is due
+SCHEDULED_MESSAGE_POLL_INTERVAL = 10
+
+# Twilio POSTs sent Message statuses to this URL. Callbacks are saved in
+# batches, MESSAGE_STATUS_BATCH_DELAY seconds after the 1st, see ``concierge.status``
+MESSAGE_STATUS_CALLBACK_URL = "https://textress.com/api/receive/status/"
+MESSAGE_STATUS_BATCH_DELAY = 2
+
+# Guest List deltas, see ``concierge.deltas``. The last DELTA_LOG_SIZE of each
+# Hotel are kept for '/api/deltas/?since=' catch ups.
+DELTA_LOG_SIZE = 1000
+DELTA_LOG_TIMEOUT = 60 * 60 * 24
+
+# Max Guests returned by '/api/guests/lookup/'
+GUEST_LOOKUP_LIMIT = 10
+
+# Max Messages matched by '/api/messages/search/', the newest ones
+MESSAGE_SEARCH_LIMIT = 1000
+
+# Guests archived per transaction by ``archive_guests``
+GUEST_ARCHIVE_CHUNK_SIZE = 500
+
+# Messages tiers, see ``concierge.archive``. Months are kept besides the
+# current one, so 2 keeps last month's in the ``Message`` table for billing.
+MESSAGE_HOT_MONTHS = 2
+MESSAGE_COLD_MONTHS = 13
+MESSAGE_ARCHIVE_CHUNK_SIZE = 500
+MESSAGE_COLD_STORAGE_DIR = os.path.join(os.path.dirname(BASE_DIR), "cold_storage", "messages")
+
+# Rows per query of the streaming CSV / NDJSON exports, see ``utils.exports``
+EXPORT_CHUNK_SIZE = 1000
+
 ### 3RD PARTY APPS CONFIG ###
 
 # DJANGO-REST-FRAMEWORK
@@ -242,30 +344,44 @@ REST_FRAMEWORK = {
 ### TWILIO ###
 
 # master
-PHONE_NUMBER = os.environ['TWILIO_PHONE_NUMBER']
-TWILIO_ACCOUNT_SID = os.environ['TWILIO_ACCOUNT_SID']
-TWILIO_AUTH_TOKEN = os.environ['TWILIO_AUTH_TOKEN']
+PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER', '')
+TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID', '')
+TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN', '')
 # aaron hotel
-PHONE_NUMBER_TEST = os.environ['TWILIO_PHONE_NUMBER_TEST']
-TWILIO_ACCOUNT_SID_TEST = os.environ['TWILIO_ACCOUNT_SID_TEST']
-TWILIO_AUTH_TOKEN_TEST = os.environ['TWILIO_AUTH_TOKEN_TEST']
+PHONE_NUMBER_TEST = os.environ.get('TWILIO_PHONE_NUMBER_TEST', '')
+TWILIO_ACCOUNT_SID_TEST = os.environ.get('TWILIO_ACCOUNT_SID_TEST', '')
+TWILIO_AUTH_TOKEN_TEST = os.environ.get('TWILIO_AUTH_TOKEN_TEST', '')
 
 TWILIO_RESOURCE_URI = "www.twilio.com/2010-01-01/Accounts/"+TWILIO_ACCOUNT_SID
 
 
 ### STRIPE ###
 
-STRIPE_SECRET_KEY = os.environ['STRIPE_TEST_SECRET_KEY']
-STRIPE_PUBLIC_KEY = os.environ['STRIPE_TEST_PUBLIC_KEY']
+STRIPE_SECRET_KEY = os.environ.get('STRIPE_TEST_SECRET_KEY', '')
+STRIPE_PUBLIC_KEY = os.environ.get('STRIPE_TEST_PUBLIC_KEY', '')
 
 
 ### REDIS ###
 
-SESSION_ENGINE = 'redis_sessions.session'
+SESSION_ENGINE = 'utils.sessions'
+SESSION_SERIALIZER = 'utils.sessions.CompactSerializer'
+# Sliding expiry: unchanged sessions only get an EXPIRE, at most this often (seconds)
+SESSION_REFRESH_INTERVAL = 60 * 5
 
 SESSION_REDIS_PREFIX = 'session'
 
 
+# ``sms.ratelimit``: token bucket per sending phone number. Twilio long codes
+# send ~1 SMS/s. Sends due in more than MAX_WAIT seconds raise ``RateLimited``.
+SMS_RATE_LIMIT_RATE = 1.0
+SMS_RATE_LIMIT_BURST = 1
+SMS_RATE_LIMIT_MAX_WAIT = 60
+
+# ``sms.pool``: cached PH #'s of a Hotel's sender pool, and the PH # -> Hotel
+# index for inbound SMS. Cleared when a PhoneNumber is saved or deleted.
+SMS_SENDER_POOL_CACHE_TIMEOUT = 60 * 60 * 24
+
+
 ### DJANGO-WEBSOCKET-REDIS ###
 
 WEBSOCKET_URL = '/ws/'
@@ -285,6 +401,22 @@ WS4REDIS_HEARTBEAT = '--heartbeat--'
 WS4REDIS_PREFIX = 'demo'
 
 
+### METRICS ###
+# ``utils.metrics``
+
+# 'utils.metrics.RedisBackend', 'utils.metrics.StatsdBackend', or None to disable
+METRICS_BACKEND = 'utils.metrics.RedisBackend'
+METRICS_STATSD_HOST = 'localhost'
+METRICS_STATSD_PORT = 8125
+METRICS_STATSD_PREFIX = 'textress'
+# Prometheus scrapers allowed to GET '/metrics/'
+METRICS_ALLOWED_IPS = ('127.0.0.1',)
+# Log requests and Tasks slower than this many seconds, or None
+METRICS_SLOW_REQUEST = 1.0
+# Slowest queries logged w/ a slow request
+METRICS_SLOW_QUERIES = 5
+
+
 ### LOGGING ###
 
 LOGGING_DIR = os.path.join(os.path.dirname(BASE_DIR), "log") # ../textra_project/log/
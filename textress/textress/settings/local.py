@@ -1,6 +1,8 @@
 from .base import *
 
 
+SECRET_KEY = SECRET_KEY or 'textress-dev-secret-key'
+
 SITE_URL = "http://localhost:8000"
 
 THIRD_PARTY_APPS = (
@@ -10,6 +12,14 @@ THIRD_PARTY_APPS = (
 INSTALLED_APPS += THIRD_PARTY_APPS
 
 
+### EMAIL ###
+# Write Emails to files instead of sending them. Set to
+# 'django.core.mail.backends.console.EmailBackend' to print them instead.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND',
+    'django.core.mail.backends.filebased.EmailBackend')
+EMAIL_FILE_PATH = os.path.join(LOGGING_DIR, 'emails')
+
+
 ### DJANGO DEBUG TOOLBAR ###
 # INSTALLED_APPS += ('debug_toolbar',)
 
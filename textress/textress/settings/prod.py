@@ -1,6 +1,27 @@
+from django.core.exceptions import ImproperlyConfigured
+
 from .base import *
 
 
+REQUIRED_ENV = (
+    'T17_SECRET_KEY',
+    'T17_DB_NAME',
+    'T17_DB_USER',
+    'T17_DB_PASSWORD',
+    'T17_MANDRILL_API_KEY',
+    'T17_PHONE_NUMBER',
+    'TWILIO_PHONE_NUMBER',
+    'TWILIO_ACCOUNT_SID',
+    'TWILIO_AUTH_TOKEN',
+    'STRIPE_LIVE_SECRET_KEY',
+    'STRIPE_LIVE_PUBLIC_KEY',
+)
+
+_missing_env = [name for name in REQUIRED_ENV if not os.environ.get(name)]
+if _missing_env:
+    raise ImproperlyConfigured("Missing env vars: {}".format(', '.join(_missing_env)))
+
+
 DEBUG = False
 
 ALLOWED_HOSTS = ['textress.com']
@@ -22,6 +43,8 @@ LOGIN_VERIFIER = True
 
 LOGGING_DIR = '/var/log/django'
 
+MESSAGE_COLD_STORAGE_DIR = '/var/lib/textress/messages'
+
 ### THIRD PARTY APPS ###
 REST_FRAMEWORK.update({
     'DEFAULT_RENDERER_CLASSES': (
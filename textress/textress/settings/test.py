@@ -1,6 +1,8 @@
 from .base import *
 
 
+SECRET_KEY = SECRET_KEY or 'textress-test-secret-key'
+
 THIRD_PARTY_APPS = (
     'django_nose',
     'django_coverage',
@@ -22,6 +24,14 @@ DATABASES['default'] = {
     'NAME': 'tests.db',
 }
 
+# both aliases on the one test DB. Reads only go to it w/ ``override_settings``,
+# b/c TestCase rows aren't committed, so the replica's connection can't see them
+DATABASES['replica'] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+DATABASE_REPLICA = None
+
+# enabled per test w/ ``override_settings``
+METRICS_BACKEND = None
+
 PASSWORD_HASHERS = ('django.contrib.auth.hashers.MD5PasswordHasher', )
 
 DEFAULT_FILE_STORAGE = 'inmemorystorage.InMemoryStorage'
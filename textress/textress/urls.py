@@ -5,8 +5,9 @@ from django.contrib import admin
 from rest_framework import routers
 
 from concierge import views_api as concierge_views
-from concierge.views_api import CurrentUserAPIView
+from concierge.views_api import CurrentUserAPIView, DeltaAPIView
 from textress import views
+from utils.views import metrics_view
 
 
 admin.autodiscover()
@@ -36,6 +37,9 @@ urlpatterns = patterns('',
     url(r'api-auth/', include('rest_framework.urls', namespace='rest_framework')),
     # My DRF (Non-ViewSet Endpoints)
     url(r'^api/current-user/$', CurrentUserAPIView.as_view()),
+    url(r'^api/deltas/$', DeltaAPIView.as_view(), name='deltas'),
+    # Prometheus
+    url(r'^metrics/$', metrics_view, name='metrics'),
 
     # Textress Views
     url(r'^$', views.IndexView.as_view(), name='index'),
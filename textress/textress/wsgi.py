@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "textress.settings")
 
 application = get_wsgi_application()
+
+try:
+    from uwsgidecorators import postfork
+except ImportError:
+    # not running under uWSGI
+    pass
+else:
+    # workers are forked from the master after the app is loaded
+    from utils.connections import discard_inherited
+    postfork(discard_inherited)
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 
+import datetime
 import re
 
 from django import forms
@@ -12,6 +13,8 @@ from .helpers import salt
 from .messages import alert_messages, dj_messages, login_messages, sms_messages
 from .mixins import DeleteButtonMixin
 
+default_app_config = 'utils.apps.UtilsConfig'
+
 __all__ = [
     'DeleteButtonMixin',
     'alert_messages',
@@ -23,6 +26,19 @@ __all__ = [
 ]
 
 
+NON_DIGITS = re.compile(r"[^\d]")
+
+LAST_10_DIGITS = re.compile(r"\d{10}$")
+
+
+def normalize_phone(phone):
+    '''Return: valid Twilio PH #. i.e. '+17025101234', else None.'''
+    try:
+        return "+1" + LAST_10_DIGITS.search(NON_DIGITS.sub("", phone)).group()
+    except (AttributeError, TypeError):
+        return None
+
+
 def validate_phone(phone):
     '''Return: valid Twilio PH #. i.e. '+17025101234'
         else raise Form Error.'''
@@ -30,13 +46,28 @@ def validate_phone(phone):
     error_messages = {
         'invalid_ph':_('Please enter a 10-digit phone number'),
     }
-    try:
-        r = re.compile(r"[^\d]")
-        re_phone = re.search(r'\d{10}$', r.sub("", phone)).group()
-    except (AttributeError, TypeError):
+    re_phone = normalize_phone(phone)
+    if not re_phone:
         raise ValidationError(error_messages['invalid_ph'])
-    else:
-        return "+1"+re_phone
+    return re_phone
+
+
+def to_date(value, formats=('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y')):
+    """
+    Return: ``date`` of a ``date`` or a string in one of ``formats``, the
+    ISO, and US formats of PMS exports. None if blank.
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime.date):
+        return value
+
+    for format in formats:
+        try:
+            return datetime.datetime.strptime(value.strip(), format).date()
+        except ValueError:
+            pass
+    raise ValueError("{} isn't a valid date".format(value))
 
 
 def ph_formatter(phone):
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class UtilsConfig(AppConfig):
+    name = 'utils'
+
+    def ready(self):
+        from utils import connections, metrics
+        metrics.connect_task_signals()
+        connections.connect_signals()
@@ -0,0 +1,78 @@
+"""
+DB Connections
+--------------
+Connections persist for ``CONN_MAX_AGE`` seconds, so requests and Tasks
+reuse them instead of connecting to Postgres each time. Django closes them
+once too old, or after an error.
+
+- Before reuse, a connection idle for ``DATABASE_HEALTH_CHECK_IDLE``
+  seconds or more is checked w/ ``is_usable``, a ``SELECT 1``, and dropped
+  if Postgres or PgBouncer closed it. Busy connections skip the round trip.
+- uWSGI workers and Celery prefork children drop the connections inherited
+  from their parent. They aren't closed, b/c that would end the parent's
+  session too.
+
+New connections are counted as ``db_connects`` by ``utils.metrics``.
+"""
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from utils import metrics
+
+
+# inherited connections, kept so they're never garbage collected, which
+# would close them
+_inherited = []
+
+
+def check(**kwargs):
+    "Drop connections that were idle, and are no longer usable."
+    now = time.time()
+    for conn in connections.all():
+        released_at = getattr(conn, 'released_at', None)
+        conn.released_at = None
+
+        if conn.connection is None or conn.in_atomic_block or released_at is None:
+            continue
+
+        if (getattr(conn.connection, 'closed', False) or
+                (now - released_at >= settings.DATABASE_HEALTH_CHECK_IDLE and
+                 not conn.is_usable())):
+            conn.close()
+
+
+def release(**kwargs):
+    "Mark the open connections idle, at the end of a request or Task."
+    now = time.time()
+    for conn in connections.all():
+        if conn.connection is not None:
+            conn.released_at = now
+
+
+def discard_inherited(**kwargs):
+    "After a fork, connect anew instead of sharing the parent's connections."
+    for conn in connections.all():
+        if conn.connection is not None:
+            _inherited.append(conn.connection)
+            conn.connection = None
+            conn.released_at = None
+
+
+def count_connect(sender, connection, **kwargs):
+    metrics.count('db_connects')
+
+
+def connect_signals():
+    from celery.signals import task_postrun, task_prerun, worker_process_init
+
+    request_started.connect(check, dispatch_uid='utils.connections.request_started')
+    request_finished.connect(release, dispatch_uid='utils.connections.request_finished')
+    task_prerun.connect(check, dispatch_uid='utils.connections.task_prerun')
+    task_postrun.connect(release, dispatch_uid='utils.connections.task_postrun')
+    worker_process_init.connect(discard_inherited,
+        dispatch_uid='utils.connections.worker_process_init')
+    connection_created.connect(count_connect, dispatch_uid='utils.connections.connection_created')
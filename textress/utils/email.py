@@ -1,12 +1,30 @@
 from __future__ import absolute_import
 
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import get_template
 from django.utils import html
 
 from celery import shared_task
 
+from utils.models import OutboxEmail
+
+
+# Compiled templates by name. Not used when ``DEBUG``, so template
+# edits show w/o a restart.
+_templates = {}
+
+
+def render_to_string(template_name, context):
+    if settings.DEBUG:
+        return get_template(template_name).render(context)
+
+    try:
+        template = _templates[template_name]
+    except KeyError:
+        template = _templates[template_name] = get_template(template_name)
+    return template.render(context)
+
 
 class Email(object):
     '''Base class for sending Email with HTML / Text.
@@ -14,6 +32,8 @@ class Email(object):
     `to` and `bcc` must be a `list`
 
     If `text_content` is None, use `html.strip_tags` to populate it.
+
+    `queue` instead of `msg.send()` to not wait on delivery.
     '''
     def __init__(self, subject, to, html_content, text_content=None,
         obj=None, extra_context=None, from_email=settings.DEFAULT_FROM_EMAIL,
@@ -37,13 +57,13 @@ class Email(object):
 
         self.html_content = render_to_string(html_content, c)
 
-        self.text_content = self._get_text_content(text_content, html_content, c)
+        self.text_content = self._get_text_content(text_content, c)
 
-    def _get_text_content(self, text_content, html_content, c):
+    def _get_text_content(self, text_content, c):
         if text_content:
-             return render_to_string(self.text_content, c)
+            return render_to_string(text_content, c)
         else:
-            return html.strip_tags(render_to_string(html_content, c))
+            return html.strip_tags(self.html_content)
 
     @property
     def msg(self):
@@ -52,6 +72,30 @@ class Email(object):
         msg.attach_alternative(self.html_content, "text/html")
         return msg
 
+    def queue(self):
+        "Save to the Outbox for ``send_outbox_emails`` to send."
+        return OutboxEmail.objects.queue(self)
+
+
+@shared_task
+def send_outbox_emails(batch_size=None):
+    """
+    Send all pending OutboxEmails over 1 connection to the
+    ``EMAIL_BACKEND``, ``batch_size`` at a time.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    connection = get_connection()
+    connection.open()
+    try:
+        while True:
+            batch = OutboxEmail.objects.claim(batch_size)
+            if not batch:
+                break
+            for outbox_email in batch:
+                outbox_email.send(connection)
+    finally:
+        connection.close()
+
 
 ### EMAILS
 
@@ -69,7 +113,7 @@ def send_account_charged_email(hotel, charge):
             'hotel': hotel
             }
         )
-    email.msg.send()
+    email.queue()
 
 
 @shared_task
@@ -85,7 +129,7 @@ def send_auto_recharge_failed_email(hotel):
             'hotel': hotel
             }
         )
-    email.msg.send()
+    email.queue()
 
 
 @shared_task
@@ -101,7 +145,7 @@ def send_charge_failed_email(hotel, amount):
             'amount': amount
             }
         )
-    email.msg.send()
+    email.queue()
 
 
 @shared_task
@@ -120,4 +164,4 @@ def send_delete_unknown_number_failed_email(ph_num):
             'ph_num': ph_num
             }
         )
-    email.msg.send()
+    email.queue()
@@ -52,6 +52,9 @@ class DailyLimit(Exception):
 class PhoneNumberNotDeletedExcp(Exception):
     pass
 
+class PhoneNumberPurchaseFailedExcp(Exception):
+    pass
+
 
 # TODO: maybe add cost args to this, so show in error msg
 class ConvertCostException(Exception):
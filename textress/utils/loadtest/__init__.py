@@ -0,0 +1,10 @@
+"""
+Load Tests
+----------
+Offline load tests, run w/ ``./manage.py loadtest``.
+
+Scenarios run in process against a throw away test DB, w/ ``fakes``
+standing in for Twilio, Stripe, Mandrill and Redis, so they never hit
+live services, and report throughput, p50 / p95 / p99 latency and
+queries per request.
+"""
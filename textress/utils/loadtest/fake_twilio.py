@@ -0,0 +1,93 @@
+"""
+Local stand-in for the ``TwilioRestClient.phone_numbers`` resource, so the 
+PhoneNumber purchase workflow can be tested w/o buying live PH #'s.
+
+Usage::
+
+    client = FakeTwilioClient(available={'702': 5})
+    with patch.object(PhoneNumber.objects, 'client', client):
+        PhoneNumber.objects.purchase_number(hotel)
+"""
+import itertools
+
+from twilio import TwilioRestException
+
+
+def friendly_name(phone_number):
+    "+17025550001 -> (702) 555-0001"
+    return "({}) {}-{}".format(phone_number[2:5], phone_number[5:8], phone_number[8:])
+
+
+class FakeTwilioPhoneNumber(object):
+
+    def __init__(self, sid, phone_number, **kwargs):
+        self.sid = sid
+        self.phone_number = phone_number
+        self.friendly_name = friendly_name(phone_number)
+        self.account_sid = None
+        self.sms_url = None
+        self.__dict__.update(kwargs)
+
+
+class FakePhoneNumbers(object):
+    """
+    :available: dict of area_code: count of available PH #'s
+    :nearby: list of area codes that a ``near_number`` search returns
+    :taken: PH #'s that fail on purchase, b/c bought since the search
+    """
+    def __init__(self, available=None, nearby=None, taken=None):
+        self._sids = itertools.count(1)
+        self.available = {}
+        for area_code, count in (available or {}).items():
+            self.available[area_code] = ["+1{}555{:04d}".format(area_code, i)
+                                         for i in range(1, count+1)]
+        self.nearby = nearby or []
+        self.taken = set(taken or [])
+        self.searches = []
+        self.purchased = {}
+        self.deleted = []
+
+    def search(self, area_code=None, near_number=None, **kwargs):
+        self.searches.append(dict(area_code=area_code, near_number=near_number, **kwargs))
+
+        if near_number:
+            area_codes = self.nearby
+        else:
+            area_codes = [area_code]
+
+        return [FakeTwilioPhoneNumber(sid=None, phone_number=ph)
+                for ac in area_codes
+                for ph in self.available.get(ac, [])]
+
+    def purchase(self, phone_number=None, **kwargs):
+        if phone_number in self.taken or phone_number in self.purchased:
+            raise TwilioRestException(400, "/IncomingPhoneNumbers",
+                msg="{} is not available".format(phone_number))
+
+        number = FakeTwilioPhoneNumber(sid="PN{:032d}".format(next(self._sids)),
+            phone_number=phone_number)
+        self.purchased[phone_number] = number
+        return number
+
+    def get(self, sid):
+        for number in self.purchased.values():
+            if number.sid == sid:
+                return number
+        raise TwilioRestException(404, "/IncomingPhoneNumbers/{}".format(sid))
+
+    def update(self, sid, **kwargs):
+        number = self.get(sid)
+        number.__dict__.update(kwargs)
+        return number
+
+    def delete(self, sid):
+        number = self.get(sid)
+        del self.purchased[number.phone_number]
+        self.deleted.append(sid)
+        return True
+
+
+class FakeTwilioClient(object):
+
+    def __init__(self, **kwargs):
+        self.phone_numbers = FakePhoneNumbers(**kwargs)
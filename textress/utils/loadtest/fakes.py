@@ -0,0 +1,411 @@
+"""
+Local stand-ins for the external services, that count every call made to
+them in ``calls``.
+
+Usage::
+
+    with offline():
+        PhoneNumber.objects.purchase_number(hotel)
+
+    calls['twilio']
+"""
+import contextlib
+import datetime
+import importlib
+import itertools
+from collections import Counter
+
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from celery.app.task import Task
+import stripe
+
+from utils.loadtest.fake_twilio import FakePhoneNumbers
+
+
+calls = Counter()
+
+_ids = itertools.count(1)
+
+
+def _id(prefix):
+    return "{}{:030d}".format(prefix, next(_ids))
+
+
+class FakeObject(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+##########
+# TWILIO #
+##########
+
+class FakeMessages(object):
+
+    def __init__(self):
+        self.sent = []
+
+    def create(self, to, from_, body, **kwargs):
+        calls['twilio'] += 1
+        message = FakeObject(sid=_id('SM'), to=to, from_=from_, body=body,
+            status='queued', price=None, error_code=None,
+            date_sent=timezone.now())
+        self.sent.append(message)
+        return message
+
+    def list(self, to=None, date=None, **kwargs):
+        calls['twilio'] += 1
+        return [m for m in self.sent
+                if (to is None or m.to == to) and
+                   (date is None or m.date_sent.date() == date)]
+
+
+class FakeAccounts(object):
+
+    def get(self, sid):
+        calls['twilio'] += 1
+        return FakeObject(sid=sid, auth_token='x', status='active')
+
+    def list(self, **kwargs):
+        calls['twilio'] += 1
+        return []
+
+    def create(self, friendly_name, **kwargs):
+        calls['twilio'] += 1
+        return FakeObject(sid=_id('AC'), auth_token='x', status='active',
+            friendly_name=friendly_name)
+
+    def update(self, sid, **kwargs):
+        calls['twilio'] += 1
+        return FakeObject(sid=sid, auth_token='x', **kwargs)
+
+
+class CountingPhoneNumbers(FakePhoneNumbers):
+
+    def search(self, *args, **kwargs):
+        calls['twilio'] += 1
+        return super(CountingPhoneNumbers, self).search(*args, **kwargs)
+
+    def purchase(self, *args, **kwargs):
+        calls['twilio'] += 1
+        return super(CountingPhoneNumbers, self).purchase(*args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        calls['twilio'] += 1
+        return super(CountingPhoneNumbers, self).update(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        calls['twilio'] += 1
+        return super(CountingPhoneNumbers, self).delete(*args, **kwargs)
+
+
+class FakeTwilioRestClient(object):
+    """
+    1 instance is shared by every ``TwilioRestClient(sid, token)``, so
+    Messages sent can be listed back.
+    """
+    def __init__(self, *args, **kwargs):
+        self.messages = FakeMessages()
+        self.accounts = FakeAccounts()
+        self.phone_numbers = CountingPhoneNumbers(available={'702': 1000})
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+
+##########
+# STRIPE #
+##########
+
+def _stripe_card():
+    return FakeObject(id=_id('card_'), brand='Visa', last4=4242, exp_month=12,
+        exp_year=datetime.date.today().year + 1)
+
+
+class FakeStripeCards(object):
+
+    def __init__(self, card):
+        self.card = card
+
+    def retrieve(self, id):
+        calls['stripe'] += 1
+        return self.card
+
+    def create(self, card=None):
+        calls['stripe'] += 1
+        return self.card
+
+
+class FakeStripeCustomer(FakeObject):
+
+    @classmethod
+    def create(cls, **kwargs):
+        calls['stripe'] += 1
+        return cls._new(_id('cus_'), **kwargs)
+
+    @classmethod
+    def retrieve(cls, id):
+        calls['stripe'] += 1
+        return cls._new(id)
+
+    @classmethod
+    def _new(cls, id, **kwargs):
+        card = _stripe_card()
+        return cls(id=id, default_card=card.id, cards=FakeStripeCards(card), **kwargs)
+
+    def save(self):
+        calls['stripe'] += 1
+        return self
+
+
+class FakeStripeCharge(FakeObject):
+
+    @classmethod
+    def create(cls, amount, currency='usd', customer=None, **kwargs):
+        calls['stripe'] += 1
+        return cls(id=_id('ch_'), amount=amount, currency=currency,
+            customer=customer, card=_stripe_card())
+
+    @classmethod
+    def retrieve(cls, id):
+        calls['stripe'] += 1
+        return cls(id=id, amount=0, card=_stripe_card())
+
+    @classmethod
+    def all(cls, **kwargs):
+        calls['stripe'] += 1
+        return FakeObject(data=[])
+
+
+############
+# MANDRILL #
+############
+
+class MandrillBackend(BaseEmailBackend):
+    "Accepts Emails the way ``DjrillBackend`` does, w/o sending them."
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            calls['mandrill'] += 1
+            message.mandrill_response = [
+                {'email': to, 'status': 'sent', '_id': _id('')}
+                for to in message.recipients()
+            ]
+        return len(email_messages)
+
+
+#########
+# REDIS #
+#########
+
+class FakeRedisPublisher(object):
+
+    def __init__(self, **kwargs):
+        pass
+
+    def publish_message(self, message, expire=None):
+        calls['redis_publish'] += 1
+
+
+def _slice(values, start, end):
+    "Redis' inclusive ``start`` / ``end`` range, either of which can be negative."
+    if end < 0:
+        end += len(values)
+    return values[start:end + 1] if end >= 0 else []
+
+
+class FakeRedis(object):
+    """
+    In memory stand-in for the ``utils.redis_server`` client, w/ the commands
+    of the raw keys, i.e. the SMS token buckets, Guest List deltas, queued
+    status callbacks and ``PhoneNumberCandidates``. Keys don't expire.
+
+    Its scripts are Python versions of the Lua ones. The SMS token bucket
+    always reserves a token w/o a wait, i.e. the rate limit is off, as the
+    fake Twilio doesn't answer 429s.
+    """
+    def __init__(self):
+        self.data = {}
+
+    # strings
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    def delete(self, *keys):
+        return len([self.data.pop(key) for key in keys if key in self.data])
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    # lists
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(str(v) for v in values)
+        return len(self.data[key])
+
+    def lrange(self, key, start, end):
+        return _slice(self.data.get(key, []), start, end)
+
+    def ltrim(self, key, start, end):
+        self.data[key] = _slice(self.data.get(key, []), start, end)
+        return True
+
+    def llen(self, key):
+        return len(self.data.get(key, []))
+
+    # hashes
+
+    def hmget(self, key, *fields):
+        return [self.data.get(key, {}).get(field) for field in fields]
+
+    # sorted sets, of [(score, member)]
+
+    def zrange(self, key, start, end, withscores=False):
+        values = _slice(self.data.get(key, []), start, end)
+        if withscores:
+            return [(member, score) for score, member in values]
+        return [member for score, member in values]
+
+    def zrangebyscore(self, key, min, max):
+        exclusive = str(min).startswith('(')
+        min = float(str(min).lstrip('('))
+        max = float(max)
+        return [member for score, member in self.data.get(key, [])
+                if (score > min if exclusive else score >= min) and score <= max]
+
+    # pipelines and scripts
+
+    def pipeline(self, transaction=True):
+        return FakeRedisPipeline(self)
+
+    def register_script(self, script):
+        from concierge.deltas import PUBLISH_SCRIPT
+        from sms.ratelimit import RESERVE_SCRIPT
+
+        scripts = {
+            PUBLISH_SCRIPT: self._publish_script,
+            RESERVE_SCRIPT: self._reserve_script,
+        }
+        return scripts[script]
+
+    def _publish_script(self, keys, args):
+        version_key, log_key = keys
+        patch, size, timeout = args
+        version = self.incr(version_key)
+        patch = '{{"version":{},{}'.format(version, patch[1:])
+        log = self.data.setdefault(log_key, [])
+        log.append((float(version), patch))
+        del log[:-int(size)]
+        return patch
+
+    def _reserve_script(self, keys, args):
+        return [1, '0']
+
+
+class FakeRedisPipeline(object):
+    "Queues the commands, and runs them on ``execute``."
+
+    def __init__(self, server):
+        self.server = server
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.server, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+##########
+# CELERY #
+##########
+
+def fake_apply_async(self, *args, **kwargs):
+    "Queued Tasks are counted, not run, as a worker would run them later."
+    calls['celery'] += 1
+    calls['celery.{}'.format(self.name)] += 1
+
+
+def _patch(target, attr, new):
+    """
+    Set ``target.attr``, where ``target`` is an object or a module path.
+
+    Return: a function that restores it
+    """
+    if isinstance(target, basestring):
+        target = importlib.import_module(target)
+    if attr not in vars(target):
+        # i.e. a class attr, restored by deleting the override
+        setattr(target, attr, new)
+        return lambda: delattr(target, attr)
+    old = vars(target)[attr]
+    setattr(target, attr, new)
+    return lambda: setattr(target, attr, old)
+
+
+@contextlib.contextmanager
+def offline():
+    """
+    Patch every external service w/ a fake, and use local memory caches,
+    sessions and raw keys instead of Redis.
+    """
+    twilio_client = FakeTwilioRestClient()
+
+    from main.models import Subaccount
+    from sms.models import PhoneNumber
+
+    # w/o ``mock``, which is only installed for tests
+    patches = [
+        ('main.models', 'TwilioRestClient', twilio_client),
+        ('sms.helpers', 'TwilioRestClient', twilio_client),
+        ('utils.hotel', 'TwilioRestClient', twilio_client),
+        # Managers are created at import, w/ a real client
+        (Subaccount.objects, 'client', twilio_client),
+        (PhoneNumber.objects, 'client', twilio_client),
+        (stripe, 'Customer', FakeStripeCustomer),
+        (stripe, 'Charge', FakeStripeCharge),
+        ('concierge.helpers', 'RedisPublisher', FakeRedisPublisher),
+        ('concierge.views', 'RedisPublisher', FakeRedisPublisher),
+        ('account.views', 'RedisPublisher', FakeRedisPublisher),
+        ('concierge.deltas', 'RedisPublisher', FakeRedisPublisher),
+        # the raw keys' client, which every module gets on each call
+        ('utils.redis_server', '_server', FakeRedis()),
+        (Task, 'apply_async', fake_apply_async),
+    ]
+    settings_override = override_settings(
+        EMAIL_BACKEND='utils.loadtest.fakes.MandrillBackend',
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        SESSION_ENGINE='django.contrib.sessions.backends.cache',
+        METRICS_BACKEND=None
+    )
+
+    undos = [_patch(*p) for p in patches]
+    settings_override.enable()
+    try:
+        yield twilio_client
+    finally:
+        settings_override.disable()
+        for undo in reversed(undos):
+            undo()
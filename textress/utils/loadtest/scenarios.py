@@ -0,0 +1,201 @@
+"""
+Load Test Scenarios
+-------------------
+Each ``Scenario.request(i)`` is 1 unit of work: a request to a view, or
+the nightly jobs for 1 Hotel.
+"""
+import datetime
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test import Client
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from account.models import AcctCost, AcctTrans
+from account.tasks import (create_initial_acct_trans_and_stmt, get_or_create_acct_stmt,
+    charge_monthly_phone_numbers)
+from concierge.models import Guest, Message
+from concierge.tasks import create_hotel_default_help_reply, create_hotel_default_send_welcome
+from main.models import Hotel, Subaccount
+from main.tests.factory import CREATE_HOTEL_DICT, PASSWORD, create_hotel_user
+from payment.models import Customer
+from sms.models import PhoneNumber
+from utils import create
+from utils.loadtest.fakes import _id
+from utils.models import Dates
+
+
+FIXTURES = ('trans_type', 'card_images', 'trigger_type', 'icons')
+
+
+class Data(object):
+    """
+    Hotels w/ everything the Scenarios need: an Admin, Twilio Subaccount
+    and PhoneNumber, Stripe Customer, billing records, auto-replies,
+    current Guests and their Messages.
+    """
+    def __init__(self, hotels=10, guests=50, messages=5):
+        call_command('loaddata', *FIXTURES, verbosity=0)
+        create._get_groups_and_perms()
+
+        self.hotels = []
+        self.admins = {}
+        self.guests = {}
+        for i in range(hotels):
+            hotel = self.create_hotel(i)
+            self.hotels.append(hotel)
+            self.admins[hotel.id] = create_hotel_user(hotel, group='hotel_admin')
+            self.guests[hotel.id] = self.create_guests(hotel, i, guests, messages)
+
+    def create_hotel(self, i):
+        twilio_phone_number = "+1702555{:04d}".format(i)
+        hotel = Hotel.objects.create(**dict(CREATE_HOTEL_DICT,
+            name="Load Test Hotel {}".format(i),
+            address_phone=create._generate_ph(),
+            twilio_phone_number=twilio_phone_number))
+
+        Subaccount.objects.create(hotel=hotel, sid=_id('AC'), auth_token='x')
+        PhoneNumber.objects.create(hotel=hotel, sid=_id('PN'),
+            phone_number=twilio_phone_number, default=True)
+        hotel.update_customer(Customer.objects.create(id=_id('cus_')))
+
+        AcctCost.objects.get_or_create(hotel=hotel)
+        create_initial_acct_trans_and_stmt(hotel.id)
+        create_hotel_default_help_reply(hotel.id)
+        create_hotel_default_send_welcome(hotel.id)
+
+        return Hotel.objects.get(id=hotel.id)
+
+    def create_guests(self, hotel, i, number, messages):
+        today = timezone.localtime(timezone.now()).date()
+
+        guests = []
+        for j in range(number):
+            guests.append(Guest.objects.create(hotel=hotel,
+                name="Guest {}".format(j),
+                phone_number="+1{:03d}{:07d}".format(200 + i, j),
+                check_in=today,
+                check_out=today + datetime.timedelta(days=3)))
+
+        # bulk, so no SMS are sent
+        Message.objects.bulk_create([
+            Message(hotel=hotel, guest=guest, sid=_id('SM'), received=True,
+                to_ph=hotel.twilio_phone_number, from_ph=guest.phone_number,
+                body=create.random_lorem(), insert_date=today)
+            for guest in guests
+            for k in range(messages)
+        ])
+        return guests
+
+    def login(self, hotel, client_class=Client):
+        client = client_class()
+        client.login(username=self.admins[hotel.id].username, password=PASSWORD)
+        return client
+
+
+class Scenario(object):
+    name = None
+
+    def __init__(self, data):
+        self.data = data
+        self.setup()
+
+    def setup(self):
+        pass
+
+    def request(self, i):
+        raise NotImplementedError
+
+    def hotel(self, i):
+        hotels = self.data.hotels
+        return hotels[i % len(hotels)]
+
+
+class InboundWebhookStorm(Scenario):
+    """
+    Twilio POSTs to ``ReceiveSMSView`` from every Guest of every Hotel.
+    Every 10th SMS is the "help" letter, so gets an auto-reply.
+    """
+    name = 'inbound_webhook'
+
+    def setup(self):
+        self.client = Client()
+        self.url = reverse('concierge:receive_sms')
+
+    def request(self, i):
+        hotel = self.hotel(i)
+        guests = self.data.guests[hotel.id]
+        guest = guests[(i // len(self.data.hotels)) % len(guests)]
+
+        if i % 10 == 0:
+            body = settings.DEFAULT_REPLY_HELP_LETTER
+        else:
+            body = create.random_lorem()
+
+        response = self.client.post(self.url, {
+            'To': hotel.twilio_phone_number,
+            'From': guest.phone_number,
+            'Body': body,
+            'SmsSid': _id('SM'),
+            'SmsStatus': 'received'
+        })
+        assert response.status_code == 200, response.status_code
+
+
+class BulkWelcomeSend(Scenario):
+    "An Admin sends the welcome message to ``batch`` phone numbers at once."
+    name = 'bulk_welcome'
+    batch = 10
+
+    def setup(self):
+        self.clients = {hotel.id: self.data.login(hotel, APIClient)
+                        for hotel in self.data.hotels}
+        self.url = reverse('message-send-welcome')
+
+    def request(self, i):
+        hotel = self.hotel(i)
+        phone_numbers = {str(k): "(702) 600-{:04d}".format((i * self.batch + k) % 10000)
+                         for k in range(self.batch)}
+
+        response = self.clients[hotel.id].post(self.url, phone_numbers, format='json')
+        # 202: the rate limited rest are sent by a Task
+        assert response.status_code in (200, 202), response.status_code
+
+
+class GuestListPoll(Scenario):
+    "The Angular app polling '/api/guests/'."
+    name = 'guest_list_poll'
+
+    def setup(self):
+        self.clients = {hotel.id: self.data.login(hotel, APIClient)
+                        for hotel in self.data.hotels}
+        self.url = reverse('guest-list')
+
+    def request(self, i):
+        hotel = self.hotel(i)
+        response = self.clients[hotel.id].get(self.url)
+        assert response.status_code == 200, response.status_code
+
+
+class NightlyBilling(Scenario):
+    """
+    The nightly billing jobs for 1 Hotel: update the AcctStmt, charge its
+    PhoneNumbers for the month, and the final 'sms_used' of yesterday.
+    """
+    name = 'nightly_billing'
+
+    def setup(self):
+        self.dates = Dates()
+
+    def request(self, i):
+        hotel = self.hotel(i)
+        get_or_create_acct_stmt(hotel.id, self.dates._month, self.dates._year)
+        charge_monthly_phone_numbers([hotel.id])
+        AcctTrans.objects.update_or_create_sms_used(hotel, self.dates._yesterday)
+
+
+SCENARIOS = (InboundWebhookStorm, BulkWelcomeSend, GuestListPoll, NightlyBilling)
@@ -0,0 +1,79 @@
+import math
+import time
+import traceback
+from collections import Counter
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from utils.loadtest.fakes import calls
+
+
+def percentile(values, p):
+    "Nearest rank percentile of a ``list``."
+    if not values:
+        return 0
+    values = sorted(values)
+    rank = int(math.ceil(p / 100.0 * len(values))) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+class Result(object):
+    """
+    Timings and query counts of each request of a Scenario, and the
+    external calls made by all of them.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.timings = []
+        self.queries = []
+        self.calls = Counter()
+        self.errors = 0
+        self.last_error = None
+
+    def measure(self, func, *args, **kwargs):
+        before = calls.copy()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.time()
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                self.errors += 1
+                self.last_error = traceback.format_exc()
+            elapsed = time.time() - start
+        self.timings.append(elapsed)
+        self.queries.append(len(queries))
+        self.calls.update(calls - before)
+
+    @property
+    def requests(self):
+        return len(self.timings)
+
+    @property
+    def throughput(self):
+        "Requests per second."
+        total = sum(self.timings)
+        return self.requests / total if total else 0
+
+    def p(self, n):
+        "Latency percentile in ms."
+        return percentile(self.timings, n) * 1000
+
+    @property
+    def queries_per_request(self):
+        return float(sum(self.queries)) / (self.requests or 1)
+
+    def calls_per_request(self, service):
+        return float(self.calls[service]) / (self.requests or 1)
+
+    HEADER = "{:<18}{:>8}{:>8}{:>9}{:>9}{:>9}{:>9}{:>8}{:>8}{:>8}{:>8}{:>8}{:>8}".format(
+        "scenario", "reqs", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms",
+        "q/req", "q max", "twilio", "stripe", "email", "tasks")
+
+    def __str__(self):
+        return "{:<18}{:>8}{:>8}{:>9.1f}{:>9.1f}{:>9.1f}{:>9.1f}{:>8.1f}{:>8}{:>8.2f}{:>8.2f}{:>8.2f}{:>8.2f}".format(
+            self.name, self.requests, self.errors, self.throughput,
+            self.p(50), self.p(95), self.p(99),
+            self.queries_per_request, max(self.queries or [0]),
+            self.calls_per_request('twilio'), self.calls_per_request('stripe'),
+            self.calls_per_request('mandrill'), self.calls_per_request('celery'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from concierge.tasks import archive_messages
+
+
+class Command(BaseCommand):
+    help = "Move old Messages to the archive table, and the oldest to cold storage."
+
+    def handle(self, *args, **options):
+        archive_messages.delay()
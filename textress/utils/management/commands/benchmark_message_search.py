@@ -0,0 +1,108 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from concierge.models import Message
+from main.models import Hotel
+
+
+# Message bodies are 6-10 random words of these, so each word matches ~1/3
+WORDS = ('towels', 'wifi', 'password', 'late', 'check', 'out', 'pool', 'hours',
+    'breakfast', 'room', 'service', 'parking', 'taxi', 'airport', 'thank', 'you',
+    'please', 'extra', 'pillows', 'restaurant', 'reservation', 'noise', 'key', 'card')
+
+QUERIES = ('towels', 'wifi password', 'late check out', 'airport taxi reservation',
+    'zzz no match')
+
+SEED_SQL = """
+INSERT INTO concierge_message (created, modified, hidden, received, to_ph, from_ph,
+    body, segments, insert_date, read, hotel_id)
+SELECT now(), now(), false, true, '', '',
+    (SELECT string_agg(word, ' ') FROM
+        (SELECT words[1 + floor(random() * array_length(words, 1))::int] AS word
+         FROM generate_series(1, 6 + i %% 5)) AS t),
+    1, current_date - (%s - i) * 60 / %s, true, %s
+FROM generate_series(1, %s) AS i, (SELECT %s::text[] AS words) AS w
+ORDER BY i
+"""
+
+
+class Command(BaseCommand):
+    """
+    Time ``/api/messages/search/`` queries, the 1st page and its count, for
+    a Hotel w/ ``--messages`` Messages. Postgres only.
+
+    Seeds the Messages w/ 1 ``INSERT ... SELECT``, so the ``body_search``
+    trigger runs as for real Messages. They're spread over the last 60 days,
+    oldest 1st, i.e. in the order real Messages are inserted. Use a scratch DB,
+    w/ ``DEBUG = False`` as in prod, else query logging adds to the timings.
+    """
+    args = "<hotel_id>"
+    help = "Benchmark Message full text search. Postgres only."
+
+    option_list = BaseCommand.option_list + (
+        make_option('--messages', type='int', default=1000000,
+            help="Messages to seed for the Hotel"),
+        make_option('--runs', type='int', default=20,
+            help="Runs per query"),
+        make_option('--budget', type='float', default=50,
+            help="Max p95 ms per query"),
+        make_option('--no-seed', action='store_false', dest='seed', default=True,
+            help="Use the Hotel's existing Messages"),
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Message search benchmarks need Postgres.")
+        try:
+            hotel = Hotel.objects.get(id=args[0])
+        except IndexError:
+            raise CommandError("Usage: benchmark_message_search {}".format(self.args))
+        except Hotel.DoesNotExist:
+            raise CommandError("Hotel {} doesn't exist.".format(args[0]))
+
+        if options['seed']:
+            self.seed(hotel, options['messages'])
+
+        count = Message.objects.filter(hotel=hotel).count()
+        self.stdout.write("{} Messages for Hotel {}\n".format(count, hotel.id))
+        self.stdout.write("{:<28}{:>10}{:>10}{:>10}{:>10}".format(
+            "query", "matches", "p50 ms", "p95 ms", "max ms"))
+
+        over = []
+        for query in QUERIES:
+            matches, timings = self.run(hotel, query, options['runs'])
+            p50, p95 = percentile(timings, 50), percentile(timings, 95)
+            self.stdout.write("{:<28}{:>10}{:>10.1f}{:>10.1f}{:>10.1f}".format(
+                query, matches, p50, p95, max(timings)))
+            if p95 > options['budget']:
+                over.append(query)
+
+        if over:
+            raise CommandError("Over the {}ms p95 budget: {}".format(
+                options['budget'], ', '.join(over)))
+
+    def seed(self, hotel, number):
+        start = time.time()
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_SQL, [number, number, hotel.id, number, list(WORDS)])
+            cursor.execute("ANALYZE concierge_message")
+        self.stdout.write("Seeded {} Messages in {:.1f}s".format(number, time.time() - start))
+
+    def run(self, hotel, query, runs):
+        "What the endpoint does: the count, and the 1st page."
+        timings = []
+        for i in range(runs):
+            start = time.time()
+            messages = Message.objects.current().filter(hotel=hotel).search(query)
+            matches = messages.count()
+            list(messages[:100])
+            timings.append((time.time() - start) * 1000)
+        return matches, timings
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
@@ -0,0 +1,114 @@
+import time
+from importlib import import_module
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+
+ENGINES = (
+    # (name, SESSION_ENGINE, SESSION_SERIALIZER)
+    ('redis_sessions + json', 'redis_sessions.session',
+        'django.contrib.sessions.serializers.JSONSerializer'),
+    ('utils.sessions', 'utils.sessions', 'utils.sessions.CompactSerializer'),
+)
+
+# What a logged in User's session holds when polling '/api/guests/'
+SESSION_DATA = {
+    '_auth_user_id': '1',
+    '_auth_user_backend': 'django.contrib.auth.backends.ModelBackend',
+    '_auth_user_hash': 'a' * 40,
+    'django_timezone': 'America/Los_Angeles',
+}
+
+
+class CountingRedis(object):
+    "Proxy to the session Redis connection that counts commands and bytes sent."
+
+    def __init__(self, server):
+        self.server = server
+        self.commands = 0
+        self.writes = 0
+        self.bytes_written = 0
+
+    def get(self, *args):
+        self.commands += 1
+        return self.server.get(*args)
+
+    def exists(self, *args):
+        self.commands += 1
+        return self.server.exists(*args)
+
+    def setex(self, key, time, value):
+        self.commands += 1
+        self.writes += 1
+        self.bytes_written += len(value)
+        return self.server.setex(key, time, value)
+
+    def expire(self, *args):
+        self.commands += 1
+        return self.server.expire(*args)
+
+    def delete(self, *args):
+        self.commands += 1
+        return self.server.delete(*args)
+
+    def pipeline(self, *args, **kwargs):
+        # 1 round trip
+        self.commands += 1
+        return self.server.pipeline(*args, **kwargs)
+
+
+class Command(BaseCommand):
+    """
+    Session overhead per request of the Angular app's '/api/guests/' poll.
+
+    Each request does what the middleware does w/ ``SESSION_SAVE_EVERY_REQUEST``:
+    load the session, read the auth keys, and save.
+    """
+    help = "Benchmark session overhead per request for the '/api/guests/' poll."
+
+    option_list = BaseCommand.option_list + (
+        make_option('--requests', type='int', default=1000,
+            help="Number of polls per session engine"),
+    )
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+
+        self.stdout.write("{:<24}{:>12}{:>12}{:>12}{:>14}".format(
+            "engine", "us/request", "cmds/req", "writes", "bytes/write"))
+
+        for name, engine, serializer in ENGINES:
+            with override_settings(SESSION_ENGINE=engine, SESSION_SERIALIZER=serializer):
+                self.stdout.write(self.run(name, engine, requests))
+
+    def run(self, name, engine, requests):
+        SessionStore = import_module(engine).SessionStore
+
+        session = SessionStore()
+        session.update(SESSION_DATA)
+        session.save()
+        session_key = session.session_key
+
+        counter = CountingRedis(session.server)
+
+        start = time.time()
+        for i in range(requests):
+            session = SessionStore(session_key)
+            session.server = counter
+            # AuthenticationMiddleware / TimezoneMiddleware reads
+            session.get('_auth_user_id')
+            session.get('django_timezone')
+            session.save()
+        elapsed = time.time() - start
+
+        SessionStore(session_key).delete()
+
+        return "{:<24}{:>12.1f}{:>12.2f}{:>12}{:>14.0f}".format(
+            name,
+            elapsed / requests * 1000000,
+            float(counter.commands) / requests,
+            counter.writes,
+            float(counter.bytes_written) / (counter.writes or 1)
+        )
@@ -0,0 +1,45 @@
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from concierge.helpers import read_guest_import
+from concierge.models import Guest
+from concierge.tasks import trigger_send_messages
+from main.models import Hotel
+
+
+class Command(BaseCommand):
+    """
+    Import a Hotel's arriving Guests from a CSV or PMS arrival feed, i.e.
+    a nightly PMS export, and send their "check_in" Triggers.
+    """
+    args = "<hotel_id> <path>"
+    help = "Import Guests from a CSV or PMS arrival feed."
+
+    option_list = BaseCommand.option_list + (
+        make_option('--no-trigger', action='store_false', dest='trigger', default=True,
+            help="Don't send the 'check_in' Trigger to the imported Guests"),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            hotel_id, path = args
+            hotel = Hotel.objects.get(id=hotel_id)
+        except ValueError:
+            raise CommandError("Usage: import_guests {}".format(self.args))
+        except Hotel.DoesNotExist:
+            raise CommandError("Hotel {} doesn't exist.".format(hotel_id))
+
+        with open(path, 'rU') as f:
+            rows = read_guest_import(f)
+
+        guests, errors = Guest.objects.bulk_import(hotel, rows)
+
+        if guests and options['trigger']:
+            trigger_send_messages.delay([guest.id for guest in guests],
+                settings.CHECK_IN_TRIGGER)
+
+        for row, messages in sorted(errors.items()):
+            self.stderr.write("Row {}: {}".format(row, '; '.join(messages)))
+        self.stdout.write("Imported {} of {} Guests.".format(len(guests), len(rows)))
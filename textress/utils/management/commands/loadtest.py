@@ -0,0 +1,61 @@
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    """
+    Offline load test. Scenarios run against a new test DB, w/ fake Twilio,
+    Stripe, Mandrill and Redis, and report throughput, latency percentiles
+    and queries per request, so before / after numbers can be compared.
+    """
+    help = "Run the offline load test scenarios."
+
+    option_list = BaseCommand.option_list + (
+        make_option('--scenario', action='append', dest='scenarios',
+            help="Scenario to run. Repeat for more. Default: all"),
+        make_option('--requests', type='int', default=200,
+            help="Requests per scenario"),
+        make_option('--hotels', type='int', default=10),
+        make_option('--guests', type='int', default=50,
+            help="Current Guests per Hotel"),
+        make_option('--messages', type='int', default=5,
+            help="Messages per Guest"),
+    )
+
+    def handle(self, *args, **options):
+        from utils.loadtest import fakes
+        from utils.loadtest.scenarios import Data, SCENARIOS
+        from utils.loadtest.stats import Result
+
+        scenarios = SCENARIOS
+        if options['scenarios']:
+            names = dict((s.name, s) for s in SCENARIOS)
+            try:
+                scenarios = [names[name] for name in options['scenarios']]
+            except KeyError as e:
+                raise CommandError("Unknown scenario: {}. Choices: {}".format(
+                    e.args[0], ', '.join(sorted(names))))
+
+        # as in production, and the test runner
+        settings.DEBUG = False
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with fakes.offline():
+                data = Data(options['hotels'], options['guests'], options['messages'])
+
+                self.stdout.write(Result.HEADER)
+                for scenario_class in scenarios:
+                    scenario = scenario_class(data)
+                    result = Result(scenario.name)
+                    for i in range(options['requests']):
+                        result.measure(scenario.request, i)
+                    self.stdout.write(str(result))
+                    if result.last_error:
+                        self.stderr.write(result.last_error)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
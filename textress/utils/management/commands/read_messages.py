@@ -0,0 +1,30 @@
+import json
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from concierge.archive import read_month
+
+
+class Command(BaseCommand):
+    """
+    Stream a month's Messages as JSONL, from the ``Message`` table, the
+    archive table and cold storage, i.e. for billing audits.
+    """
+    args = "<year> <month>"
+    help = "Stream a month's Messages as JSONL from all storage tiers."
+
+    option_list = BaseCommand.option_list + (
+        make_option('--hotel', type='int', dest='hotel_id',
+            help="Only this Hotel's Messages"),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            year, month = [int(arg) for arg in args]
+        except ValueError:
+            raise CommandError("Usage: read_messages {}".format(self.args))
+
+        for message in read_month(year, month, hotel_id=options['hotel_id']):
+            self.stdout.write(json.dumps(message, cls=DjangoJSONEncoder))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from utils.email import send_outbox_emails
+
+
+class Command(BaseCommand):
+    help = "Send all pending Outbox Emails."
+
+    def handle(self, *args, **options):
+        send_outbox_emails.delay()
@@ -0,0 +1,31 @@
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from concierge.tasks import send_scheduled_messages
+
+
+class Command(BaseCommand):
+    """
+    Send due ScheduledMessages, as a Task, or w/ ``--loop`` as a long running
+    scheduler process. Many ``--loop`` processes can run at once, see
+    ``supervisor/scheduler.conf``.
+    """
+    help = "Send all due ScheduledMessages."
+
+    option_list = BaseCommand.option_list + (
+        make_option('--loop', action='store_true', dest='loop', default=False,
+            help="Keep sending in this process, polling every "
+                 "SCHEDULED_MESSAGE_POLL_INTERVAL seconds when nothing is due"),
+    )
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            send_scheduled_messages.delay()
+            return
+
+        while True:
+            if not send_scheduled_messages():
+                time.sleep(settings.SCHEDULED_MESSAGE_POLL_INTERVAL)
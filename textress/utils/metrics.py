@@ -0,0 +1,394 @@
+"""
+Metrics
+-------
+Timings and call counts per endpoint and per Celery Task.
+
+For each request (``MetricsMiddleware``) and Task (``task_prerun`` /
+``task_postrun``), record the total time, and the number of calls and
+time spent in each service: the DB, Redis, Twilio and Stripe. Events w/o
+a time, i.e. new DB connections, are only counted.
+
+They are exported by the ``METRICS_BACKEND``:
+
+- ``RedisBackend``: summed in Redis for all processes, and scraped as
+  Prometheus text from ``/metrics/``
+- ``StatsdBackend``: sent as 1 UDP packet to StatsD
+
+Queries of every DB alias are counted by a cursor wrapper. The SQL is only
+kept for the ``METRICS_SLOW_QUERIES`` slowest, and only when the slow log is
+on: Requests and Tasks slower than ``METRICS_SLOW_REQUEST`` seconds are
+logged w/ them.
+"""
+import functools
+import heapq
+import itertools
+import logging
+import socket
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.utils.module_loading import import_string
+
+from utils.redis_server import get_server
+
+
+logger = logging.getLogger(__name__)
+
+SERVICES = ('db', 'cache', 'twilio', 'stripe')
+
+# counted w/ ``count``, see ``utils.connections``
+EVENTS = ('db_connects',)
+
+# Prometheus label names of ``Tracker.labels`` by kind
+LABELS = {
+    'request': ('endpoint', 'method'),
+    'task': ('task',),
+}
+
+_local = threading.local()
+
+_installed = False
+
+
+class Tracker(object):
+    """
+    Calls and time spent in each service, for the request or Task
+    running in this thread.
+    """
+    def __init__(self, kind, labels):
+        self.kind = kind
+        self.labels = labels
+        self.calls = Counter()
+        self.seconds = Counter()
+        self.elapsed = None
+        self.queries = []
+        # SQL kept of the slowest queries, or None to keep all, i.e. for
+        # ``utils.tests.budget``
+        self.max_queries = (settings.METRICS_SLOW_QUERIES
+                            if settings.METRICS_SLOW_REQUEST is not None else 0)
+
+        self._order = itertools.count()
+        self._start = time.time()
+
+    @property
+    def name(self):
+        return ' '.join(reversed(self.labels))
+
+    def add(self, service, seconds):
+        self.calls[service] += 1
+        self.seconds[service] += seconds
+
+    def add_query(self, sql, seconds):
+        self.add('db', seconds)
+
+        if self.max_queries is None:
+            self.queries.append({'sql': sql, 'time': seconds})
+        elif self.max_queries:
+            # min heap, so the fastest kept query is dropped 1st
+            item = (seconds, next(self._order), {'sql': sql, 'time': seconds})
+            if len(self.queries) < self.max_queries:
+                heapq.heappush(self.queries, item)
+            else:
+                heapq.heappushpop(self.queries, item)
+
+    def finish(self):
+        self.elapsed = time.time() - self._start
+
+        if self.max_queries is not None:
+            self.queries = [q for _, _, q in sorted(self.queries, reverse=True)]
+
+    def slowest_queries(self, n):
+        return sorted(self.queries, key=lambda q: q['time'], reverse=True)[:n]
+
+
+def _stack():
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+def start(kind, *labels):
+    """
+    Start tracking a request or Task. Trackers nest, for Tasks run eagerly
+    w/i a request.
+    """
+    install()
+    stack = _stack()
+    tracker = Tracker(kind, labels)
+    stack.append(tracker)
+    return tracker
+
+
+def current():
+    "The innermost Tracker, if any."
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def stop(record=True):
+    """
+    Finish the current Tracker, and export it unless not ``record``.
+    Metrics must never break the request or Task, so errors are only logged.
+    """
+    stack = _stack()
+    if not stack:
+        return
+    tracker = stack.pop()
+    tracker.finish()
+
+    if not record:
+        return tracker
+
+    # the backend's own calls aren't counted for an outer Tracker
+    _local.stack = []
+    try:
+        get_backend().record(tracker)
+    except Exception:
+        logger.exception("Failed to record metrics for: %s", tracker.name)
+    finally:
+        _local.stack = stack
+
+    if (settings.METRICS_SLOW_REQUEST is not None and
+            tracker.elapsed >= settings.METRICS_SLOW_REQUEST):
+        log_slow(tracker)
+
+    return tracker
+
+
+def count(event):
+    "Count 1 ``event`` for the current Trackers, if any."
+    for tracker in _stack():
+        tracker.calls[event] += 1
+
+
+def log_slow(tracker):
+    lines = ["Slow {}: {} {:.3f}s {}".format(tracker.kind, tracker.name, tracker.elapsed,
+        ' '.join("{}={}".format(s, tracker.calls[s]) for s in SERVICES))]
+    for query in tracker.slowest_queries(settings.METRICS_SLOW_QUERIES):
+        lines.append("  {:.3f}s {}".format(query['time'], query['sql'][:500]))
+    logger.warning('\n'.join(lines))
+
+
+#########
+# HOOKS #
+#########
+
+def _counted(service, func):
+    "Add the time of each call to ``func`` to the current Trackers, if any."
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        if not stack:
+            return func(*args, **kwargs)
+
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.time() - start
+            for tracker in stack:
+                tracker.add(service, elapsed)
+    return wrapper
+
+
+class CountedCursor(object):
+    "Adds each query of the DB ``cursor`` to the current Trackers, if any."
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self.cursor.__exit__(exc_type, exc_value, traceback)
+
+    def _counted(self, method, sql, params):
+        stack = _stack()
+        if not stack:
+            return method(sql, params)
+
+        start = time.time()
+        try:
+            return method(sql, params)
+        finally:
+            elapsed = time.time() - start
+            for tracker in stack:
+                tracker.add_query(sql, elapsed)
+
+    def execute(self, sql, params=None):
+        return self._counted(self.cursor.execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self._counted(self.cursor.executemany, sql, param_list)
+
+
+def _counted_cursor(func):
+    "Wrap the cursors of every DB alias w/ ``CountedCursor``."
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return CountedCursor(func(*args, **kwargs))
+    return wrapper
+
+
+def install():
+    """
+    Wrap the DB cursors, and the Redis, Twilio and Stripe clients' lowest
+    level request functions, so every call is counted. Only done once per
+    process.
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    import redis.client
+    import stripe.api_requestor
+    import twilio.rest.resources.base
+
+    BaseDatabaseWrapper.cursor = _counted_cursor(BaseDatabaseWrapper.cursor)
+    # 1 call per command, or per pipeline
+    redis.client.StrictRedis.execute_command = _counted('cache',
+        redis.client.StrictRedis.execute_command)
+    redis.client.BasePipeline.execute = _counted('cache',
+        redis.client.BasePipeline.execute)
+    twilio.rest.resources.base.make_request = _counted('twilio',
+        twilio.rest.resources.base.make_request)
+    stripe.api_requestor.APIRequestor.request = _counted('stripe',
+        stripe.api_requestor.APIRequestor.request)
+
+
+############
+# BACKENDS #
+############
+
+_backends = {}
+
+
+def get_backend():
+    try:
+        return _backends[settings.METRICS_BACKEND]
+    except KeyError:
+        backend = _backends[settings.METRICS_BACKEND] = import_string(settings.METRICS_BACKEND)()
+        return backend
+
+
+def values(tracker):
+    "(metric, value) of a Tracker."
+    yield 'count', 1
+    yield 'seconds', tracker.elapsed
+    for service in SERVICES:
+        yield service + '_calls', tracker.calls[service]
+        yield service + '_seconds', tracker.seconds[service]
+    for event in EVENTS:
+        yield event, tracker.calls[event]
+
+
+class RedisBackend(object):
+    """
+    Sum each metric in the ``metrics:<kind>`` hash. Fields are the tab
+    separated label values and metric name.
+    """
+    prefix = 'metrics'
+
+    def __init__(self):
+        self.server = get_server()
+
+    def key(self, kind):
+        return "{}:{}".format(self.prefix, kind)
+
+    def record(self, tracker):
+        key = self.key(tracker.kind)
+        labels = '\t'.join(tracker.labels)
+
+        pipe = self.server.pipeline(transaction=False)
+        for metric, value in values(tracker):
+            if value:
+                pipe.hincrbyfloat(key, "{}\t{}".format(labels, metric), value)
+        pipe.execute()
+
+    def reset(self):
+        self.server.delete(*[self.key(kind) for kind in LABELS])
+
+    def prometheus(self):
+        "All metrics in the Prometheus text format."
+        lines = []
+        for kind, label_names in sorted(LABELS.items()):
+            metrics = {}
+            for field, value in self.server.hgetall(self.key(kind)).items():
+                parts = field.split('\t')
+                labels = ','.join('{}="{}"'.format(name, escape(label))
+                                  for name, label in zip(label_names, parts[:-1]))
+                metrics.setdefault(parts[-1], []).append((labels, float(value)))
+
+            for metric in sorted(metrics):
+                name = "textress_{}_{}_total".format(kind, metric)
+                lines.append("# TYPE {} counter".format(name))
+                for labels, value in sorted(metrics[metric]):
+                    lines.append("{}{{{}}} {}".format(name, labels, repr(value)))
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class StatsdBackend(object):
+    """
+    1 UDP packet per Tracker, w/ all of its metrics as:
+    ``<prefix>.<kind>.<labels>.<metric>:<value>|<type>``
+    """
+    def __init__(self):
+        self.address = (settings.METRICS_STATSD_HOST, settings.METRICS_STATSD_PORT)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def lines(self, tracker):
+        prefix = '.'.join([settings.METRICS_STATSD_PREFIX, tracker.kind] +
+                          [statsd_name(label) for label in tracker.labels])
+        for metric, value in values(tracker):
+            if metric.endswith('seconds'):
+                yield "{}.{}:{:.3f}|ms".format(prefix, metric.replace('seconds', 'time'),
+                    value * 1000)
+            else:
+                yield "{}.{}:{}|c".format(prefix, metric, value)
+
+    def record(self, tracker):
+        self.socket.sendto('\n'.join(self.lines(tracker)), self.address)
+
+
+def statsd_name(value):
+    for char in ':|@. /':
+        value = value.replace(char, '_')
+    return value
+
+
+##########
+# CELERY #
+##########
+
+def task_prerun(task=None, **kwargs):
+    if settings.METRICS_BACKEND:
+        start('task', task.name)
+
+
+def task_postrun(task=None, **kwargs):
+    if settings.METRICS_BACKEND:
+        stop()
+
+
+def connect_task_signals():
+    from celery.signals import task_prerun as prerun, task_postrun as postrun
+
+    prerun.connect(task_prerun, dispatch_uid='utils.metrics.task_prerun')
+    postrun.connect(task_postrun, dispatch_uid='utils.metrics.task_postrun')
@@ -1,7 +1,12 @@
 import pytz
 
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.utils import timezone
 
+from utils import metrics, routers
+
+
 class TimezoneMiddleware(object):
     def process_request(self, request):
         tzname = request.session.get('django_timezone')
@@ -10,4 +15,48 @@ class TimezoneMiddleware(object):
         else:
             timezone.deactivate()
 
-        return timezone.localtime(timezone.now())
\ No newline at end of file
+        return timezone.localtime(timezone.now())
+
+class MetricsMiddleware(object):
+    """
+    Record the timings and service calls of each request w/ ``utils.metrics``,
+    by url name. Should be the 1st middleware, to include all others.
+    """
+    def __init__(self):
+        if not settings.METRICS_BACKEND:
+            raise MiddlewareNotUsed
+
+    def process_request(self, request):
+        metrics.start('request')
+
+    def process_response(self, request, response):
+        try:
+            endpoint = request.resolver_match.view_name
+        except AttributeError:
+            endpoint = 'unresolved'
+
+        tracker = metrics.current()
+        if tracker:
+            tracker.labels = (endpoint, request.method)
+            metrics.stop()
+        return response
+
+
+class ReplicaMiddleware(object):
+    """
+    After a request that wrote to the DB, keep the User's reads on the
+    primary for ``DATABASE_REPLICA_STICKY_SECONDS`` w/ a cookie, see
+    ``utils.routers``.
+    """
+    def __init__(self):
+        if not settings.DATABASE_REPLICA:
+            raise MiddlewareNotUsed
+
+    def process_request(self, request):
+        routers.reset(sticky=settings.DATABASE_REPLICA_STICKY_COOKIE in request.COOKIES)
+
+    def process_response(self, request, response):
+        if routers.wrote():
+            response.set_cookie(settings.DATABASE_REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.DATABASE_REPLICA_STICKY_SECONDS, httponly=True)
+        return response
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+import utils.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('subject', models.CharField(max_length=255)),
+                ('from_email', models.CharField(max_length=255)),
+                ('to', models.TextField(help_text=b'comma separated')),
+                ('bcc', models.TextField(help_text=b'comma separated', blank=True)),
+                ('text_content', models.TextField()),
+                ('html_content', models.TextField(blank=True)),
+                ('status', models.CharField(default=b'pending', max_length=10, db_index=True, choices=[(b'pending', b'Pending'), (b'sending', b'Sending'), (b'sent', b'Sent'), (b'failed', b'Failed')])),
+                ('batch_id', models.CharField(db_index=True, max_length=32, blank=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('send_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+            bases=(utils.models.Dates, models.Model),
+        ),
+    ]
@@ -5,6 +5,8 @@ from rest_framework.response import Response
 
 from braces.views import FormValidMessageMixin
 
+from utils.routers import use_replica
+
 
 class DeleteButtonMixin(object):
     "Color and Text for a Delete Button to display to User."
@@ -55,3 +57,21 @@ class DestroyModelMixin(object):
 
     def perform_destroy(self, instance, override):
         instance.delete(override)
+
+
+class ReplicaMixin(object):
+    """
+    Read only requests read from the replica, see ``utils.routers``.
+    Template responses are rendered here, so their lazy querysets do too.
+    """
+    replica_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in self.replica_methods:
+            return super(ReplicaMixin, self).dispatch(request, *args, **kwargs)
+
+        with use_replica():
+            response = super(ReplicaMixin, self).dispatch(request, *args, **kwargs)
+            if not getattr(response, 'is_rendered', True):
+                response.render()
+        return response
@@ -1,7 +1,9 @@
 import datetime
+import uuid
 
 from django.db import models
 from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
 from django.utils import timezone
 from django.utils.translation import ugettext, ugettext_lazy as _
 
@@ -59,6 +61,14 @@ class Dates(object):
         raw_datetime = datetime.datetime(day=1, year=year, month=month, tzinfo=self.tzinfo)
         return raw_datetime.date()
 
+    def first_of_month_ago(self, months):
+        "Return the 1st of the month ``months`` before the current one."
+        month = self._today.month - months
+        year = self._today.year
+        while month < 1:
+            month += 12
+            year -= 1
+        return self.first_of_month(month=month, year=year)
 
     def last_month_end(self, date=None):
         "Return the last month's ending date as a `date`."
@@ -136,3 +146,122 @@ class Tester(BaseModel):
     Concrete model used to test ``BaseModel``
     """
     pass
+
+
+class OutboxEmailManager(models.Manager):
+
+    def queue(self, email):
+        """
+        Save a rendered ``utils.email.Email`` to be sent by the
+        ``send_outbox_emails`` worker.
+        """
+        return self.create(
+            subject=email.subject,
+            from_email=email.from_email,
+            to=','.join(email.to),
+            bcc=','.join(email.bcc),
+            text_content=email.text_content,
+            html_content=email.html_content
+        )
+
+    def pending(self):
+        """
+        Due to be sent, or claimed by a worker that died before it
+        finished.
+        """
+        now = timezone.now()
+        stale = now - datetime.timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT)
+        return self.filter(
+            models.Q(status=OutboxEmail.PENDING, send_after__lte=now) |
+            models.Q(status=OutboxEmail.SENDING, modified__lt=stale)
+        )
+
+    def claim(self, batch_size):
+        """
+        Mark a batch as ``SENDING`` under a new ``batch_id``, so concurrent
+        workers never send the same OutboxEmail twice.
+
+        The ``UPDATE`` only claims rows still unclaimed since the ``SELECT``.
+        """
+        ids = list(self.pending().order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return self.none()
+
+        batch_id = uuid.uuid4().hex
+        self.pending().filter(id__in=ids).update(status=OutboxEmail.SENDING,
+            batch_id=batch_id, modified=timezone.now())
+        return self.filter(batch_id=batch_id).order_by('id')
+
+
+class OutboxEmail(TimeStampBaseModel):
+    """
+    An already rendered Email, waiting to be sent.
+
+    Failed sends are retried w/ exponential backoff, up to
+    ``EMAIL_OUTBOX_MAX_ATTEMPTS``.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=255)
+    to = models.TextField(help_text="comma separated")
+    bcc = models.TextField(blank=True, help_text="comma separated")
+    text_content = models.TextField()
+    html_content = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING,
+        db_index=True)
+    batch_id = models.CharField(max_length=32, blank=True, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    send_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    objects = OutboxEmailManager()
+
+    def __str__(self):
+        return "{self.to}: {self.subject} ({self.status})".format(self=self)
+
+    @property
+    def msg(self):
+        msg = EmailMultiAlternatives(self.subject, self.text_content, self.from_email,
+            self._split(self.to), self._split(self.bcc))
+        if self.html_content:
+            msg.attach_alternative(self.html_content, "text/html")
+        return msg
+
+    @staticmethod
+    def _split(addresses):
+        return [a for a in addresses.split(',') if a]
+
+    def send(self, connection):
+        """
+        Send over an already open ``connection``. Errors are recorded, not
+        raised, so 1 bad address doesn't stop the batch.
+        """
+        try:
+            connection.send_messages([self.msg])
+        except Exception as e:
+            self.failed(e)
+        else:
+            self.status = self.SENT
+            self.last_error = ''
+            self.save()
+
+    def failed(self, error):
+        self.attempts += 1
+        self.last_error = repr(error)
+        if self.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            self.status = self.FAILED
+        else:
+            self.status = self.PENDING
+            self.send_after = timezone.now() + datetime.timedelta(
+                seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (self.attempts - 1))
+        self.save()
@@ -0,0 +1,21 @@
+"""
+Migration Operations
+--------------------
+"""
+from django.db import migrations
+
+
+class PostgresRunSQL(migrations.RunSQL):
+    """
+    ``RunSQL`` for Postgres only features, i.e. ``tsvector`` columns and
+    GIN indexes. Skipped on other DBs, i.e. the sqlite test DB.
+    """
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super(PostgresRunSQL, self).database_forwards(app_label, schema_editor,
+                from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super(PostgresRunSQL, self).database_backwards(app_label, schema_editor,
+                from_state, to_state)
@@ -0,0 +1,23 @@
+"""
+Redis Server
+------------
+The 1 client for the raw Redis keys, i.e. the SMS rate limits, Guest List
+deltas and queued status callbacks, which don't go through the cache.
+
+It's on the cache's ``REDIS_URL`` server, but in db 0, while the cache
+uses db 1, so ``cache.clear()`` leaves the raw keys.
+"""
+from django.conf import settings
+
+import redis
+
+
+_server = None
+
+
+def get_server():
+    "The shared client, connected on 1st use. Its connection pool is thread safe."
+    global _server
+    if _server is None:
+        _server = redis.StrictRedis.from_url(settings.REDIS_URL, db=0)
+    return _server
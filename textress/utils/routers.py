@@ -0,0 +1,111 @@
+"""
+Read Replica Routing
+--------------------
+Reads inside ``use_replica`` go to the ``DATABASE_REPLICA`` alias. All
+other reads, and all writes, go to 'default'.
+
+A write switches the rest of the request, or Task, back to 'default',
+so it reads its own writes. ``ReplicaMiddleware`` then sets a cookie that
+keeps the User's next requests on 'default' for
+``DATABASE_REPLICA_STICKY_SECONDS``, until the replica has caught up.
+
+Values that get cached are read inside ``use_primary``, so a lagging
+replica's rows aren't cached past the lag.
+
+Views opt in w/ ``utils.mixins.ReplicaMixin``, and Tasks w/ the
+``on_replica`` decorator::
+
+    @shared_task
+    @on_replica
+    def report_task():
+        ...
+"""
+import functools
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+_local = threading.local()
+
+
+def reset(sticky=False):
+    """
+    Start a request's state. ``sticky`` keeps all of its reads on the
+    primary, b/c the User wrote recently.
+    """
+    _local.replica = False
+    _local.sticky = sticky
+    _local.wrote = False
+
+
+def wrote():
+    "True if the current request, or Task, wrote to the DB."
+    return getattr(_local, 'wrote', False)
+
+
+def replica_alias():
+    "The alias to read from now, or None for the primary."
+    if (settings.DATABASE_REPLICA and getattr(_local, 'replica', False) and
+        not getattr(_local, 'sticky', False) and not wrote()):
+        return settings.DATABASE_REPLICA
+
+
+class use_replica(object):
+    "Send the reads inside it to the replica, until the 1st write."
+
+    replica = True
+
+    def __enter__(self):
+        self._replica = getattr(_local, 'replica', False)
+        _local.replica = self.replica
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.replica = self._replica
+
+
+class use_primary(use_replica):
+    """
+    Send the reads inside it to 'default', even w/i ``use_replica``, i.e.
+    to build a value that gets cached.
+    """
+
+    replica = False
+
+
+def on_replica(func):
+    """
+    Run ``func``, i.e. a Task, in ``use_replica`` w/ its own state, so the
+    writes of earlier Tasks in the worker don't keep it on the primary.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        previous = _local.__dict__.copy()
+        reset()
+        try:
+            with use_replica():
+                return func(*args, **kwargs)
+        finally:
+            written = wrote()
+            _local.__dict__.update(previous)
+            _local.wrote = previous.get('wrote', False) or written
+    return wrapper
+
+
+class ReplicaRouter(object):
+
+    def db_for_read(self, model, **hints):
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        "Both aliases hold the same rows."
+        return True
+
+    def allow_migrate(self, db, app_label, model=None, **hints):
+        if db == settings.DATABASE_REPLICA:
+            return False
@@ -0,0 +1,124 @@
+"""
+Sliding Expiry Redis Sessions
+-----------------------------
+``redis_sessions`` SessionStore that doesn't rewrite the session on every
+request.
+
+With ``SESSION_SAVE_EVERY_REQUEST=True`` each API poll from the Angular
+app would ``SETEX`` the whole session. Instead:
+
+- the payload is only written when it changed
+- otherwise the TTL is slid w/ ``EXPIRE``, at most once per
+  ``SESSION_REFRESH_INTERVAL`` seconds, so a session can expire up to
+  that many seconds before the cookie does
+- payloads are stored as signed raw bytes (no base64) of the
+  ``CompactSerializer``
+
+Existing base64 and pickled sessions don't decode, so those Users log in
+again once.
+"""
+import json
+import zlib
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError
+from django.core.exceptions import SuspiciousOperation
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import force_bytes
+
+from redis_sessions.session import SessionStore as RedisSessionStore
+
+
+class CompactSerializer(object):
+    """
+    Compact JSON, like Django's ``JSONSerializer``, zlib compressed only
+    when large enough for it to help. The 1st byte flags which.
+
+    Not pickle, so a forged session can't run code when it's loaded.
+    """
+    compress_min = 512
+
+    def dumps(self, obj):
+        data = json.dumps(obj, separators=(',', ':')).encode('latin-1')
+        if len(data) >= self.compress_min:
+            return b'z' + zlib.compress(data)
+        return b'j' + data
+
+    def loads(self, data):
+        if data[:1] == b'z':
+            data = zlib.decompress(data[1:])
+        elif data[:1] == b'j':
+            data = data[1:]
+        else:
+            raise ValueError("Unknown session format")
+        return json.loads(data.decode('latin-1'))
+
+
+class SessionStore(RedisSessionStore):
+
+    def __init__(self, session_key=None):
+        super(SessionStore, self).__init__(session_key)
+        self._stored_session = None
+        self._stored_ttl = None
+
+    def encode(self, session_dict):
+        serialized = self.serializer().dumps(session_dict)
+        return self._hash(serialized).encode() + b':' + serialized
+
+    def decode(self, session_data):
+        try:
+            hash, serialized = force_bytes(session_data).split(b':', 1)
+            if not constant_time_compare(hash.decode(), self._hash(serialized)):
+                raise SuspiciousOperation("Session data corrupted")
+            return self.serializer().loads(serialized)
+        except Exception:
+            return {}
+
+    def load(self):
+        """
+        GET the session and its TTL in 1 round trip. Both are kept to
+        decide in ``save`` if a write or ``EXPIRE`` is needed.
+
+        The stored session is decoded separately from the one returned, so
+        in place changes to the returned session are detected. (JSON
+        bytes aren't stable across a load / dump to compare, b/c of dict
+        order)
+        """
+        key = self.get_real_stored_key(self._get_or_create_session_key())
+        pipe = self.server.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.ttl(key)
+        data, self._stored_ttl = pipe.execute()
+
+        session_dict = self.decode(data) if data else {}
+        if not session_dict:
+            self._session_key = None
+            self._stored_session = None
+        else:
+            self._stored_session = self.decode(data)
+        return session_dict
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        if must_create and self.exists(self._get_or_create_session_key()):
+            raise CreateError
+
+        key = self.get_real_stored_key(self._get_or_create_session_key())
+        expiry_age = self.get_expiry_age()
+        session_dict = self._get_session(no_load=must_create)
+
+        if must_create or session_dict != self._stored_session:
+            data = self.encode(session_dict)
+            self.server.setex(key, expiry_age, data)
+            self._stored_session = self.decode(data)
+            self._stored_ttl = expiry_age
+        elif self._needs_refresh(expiry_age):
+            self.server.expire(key, expiry_age)
+            self._stored_ttl = expiry_age
+
+    def _needs_refresh(self, expiry_age):
+        "The TTL was last slid more than ``SESSION_REFRESH_INTERVAL`` ago."
+        if self._stored_ttl is None or self._stored_ttl < 0:
+            return True
+        return expiry_age - self._stored_ttl >= settings.SESSION_REFRESH_INTERVAL
@@ -0,0 +1,82 @@
+"""
+Query Budgets
+-------------
+Assert the max DB queries, cache calls and Twilio / Stripe calls of a
+block of code, using the ``utils.metrics`` Tracker.
+
+Usage::
+
+    class GuestAPITests(QueryBudgetMixin, APITestCase):
+
+        def test_list(self):
+            with self.assertBudget(db=5, cache=0):
+                self.client.get('/api/guests/')
+
+        def test_list__budget(self):
+            # same budget for 1, 10 and 100 Guests, so no N+1 queries
+            self.assertBudgetFlat(
+                lambda n: make_guests(self.hotel, n - Guest.objects.count()),
+                lambda: self.client.get('/api/guests/'),
+                db=5)
+
+Twilio and Stripe calls default to a budget of 0.
+"""
+import contextlib
+
+from utils import metrics
+
+
+SIZES = (1, 10, 100)
+
+
+def check_budget(tracker, **budget):
+    """
+    :budget: max calls by service name, or None to not check a service.
+    """
+    errors = []
+    for service, max_calls in sorted(budget.items()):
+        if max_calls is not None and tracker.calls[service] > max_calls:
+            errors.append("{} calls: {} > budget of {}".format(
+                service, tracker.calls[service], max_calls))
+
+    if errors:
+        queries = '\n'.join("{}. {}".format(i, q['sql'])
+                            for i, q in enumerate(tracker.queries, start=1))
+        raise AssertionError("Over budget: {}\nQueries:\n{}".format(
+            '; '.join(errors), queries))
+
+
+@contextlib.contextmanager
+def query_budget(db=None, cache=None, twilio=0, stripe=0):
+    tracker = metrics.start('test')
+    # all SQL, to list in the error
+    tracker.max_queries = None
+    try:
+        yield tracker
+    finally:
+        metrics.stop(record=False)
+    check_budget(tracker, db=db, cache=cache, twilio=twilio, stripe=stripe)
+
+
+class QueryBudgetMixin(object):
+
+    def assertBudget(self, db=None, cache=None, twilio=0, stripe=0):
+        return query_budget(db=db, cache=cache, twilio=twilio, stripe=stripe)
+
+    def assertBudgetFlat(self, make, request, sizes=SIZES, **budget):
+        """
+        For each size ``n``, call ``make(n)`` to have ``n`` objects, then
+        ``request()`` must be w/i the same ``budget``.
+
+        :return: list of Trackers, 1 per size
+        """
+        trackers = []
+        for n in sizes:
+            make(n)
+            try:
+                with self.assertBudget(**budget) as tracker:
+                    request()
+            except AssertionError as e:
+                raise AssertionError("N={}: {}".format(n, e))
+            trackers.append(tracker)
+        return trackers
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from utils.tests.budget import QueryBudgetMixin
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def test_within_budget(self):
+        with self.assertBudget(db=1) as tracker:
+            User.objects.count()
+
+        self.assertEqual(tracker.calls['db'], 1)
+
+    def test_over_budget(self):
+        with self.assertRaises(AssertionError) as cm:
+            with self.assertBudget(db=1):
+                User.objects.count()
+                User.objects.count()
+
+        self.assertIn("db calls: 2 > budget of 1", str(cm.exception))
+        self.assertIn("auth_user", str(cm.exception))
+
+    def test_flat(self):
+        users = []
+
+        def make(n):
+            users.extend(User(username=str(i)) for i in range(len(users), n))
+
+        def request():
+            for user in users:
+                User.objects.filter(username=user.username).exists()
+
+        with self.assertRaises(AssertionError) as cm:
+            self.assertBudgetFlat(make, request, sizes=(1, 2), db=1)
+
+        self.assertIn("N=2", str(cm.exception))
@@ -0,0 +1,110 @@
+import time
+
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+
+from mock import Mock, patch
+
+from utils import connections, metrics
+from utils.tests.test_metrics import MEMORY_BACKEND
+
+
+def make_conn(released_at=None, closed=0, usable=True):
+    conn = Mock(in_atomic_block=False, released_at=released_at)
+    conn.connection.closed = closed
+    conn.is_usable.return_value = usable
+    return conn
+
+
+class ConnectionsTests(SimpleTestCase):
+
+    def setUp(self):
+        patcher = patch('utils.connections.connections')
+        self.connections = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def check(self, conn):
+        self.connections.all.return_value = [conn]
+        connections.check()
+        self.assertIsNone(conn.released_at)
+
+    @override_settings(DATABASE_HEALTH_CHECK_IDLE=30)
+    def test_check__busy(self):
+        conn = make_conn(released_at=time.time() - 1, usable=False)
+
+        self.check(conn)
+
+        self.assertFalse(conn.is_usable.called)
+        self.assertFalse(conn.close.called)
+
+    @override_settings(DATABASE_HEALTH_CHECK_IDLE=30)
+    def test_check__idle(self):
+        conn = make_conn(released_at=time.time() - 60)
+
+        self.check(conn)
+
+        self.assertTrue(conn.is_usable.called)
+        self.assertFalse(conn.close.called)
+
+    @override_settings(DATABASE_HEALTH_CHECK_IDLE=30)
+    def test_check__idle_unusable(self):
+        conn = make_conn(released_at=time.time() - 60, usable=False)
+
+        self.check(conn)
+
+        conn.close.assert_called_once_with()
+
+    def test_check__closed(self):
+        conn = make_conn(released_at=time.time(), closed=1)
+
+        self.check(conn)
+
+        self.assertFalse(conn.is_usable.called)
+        conn.close.assert_called_once_with()
+
+    def test_check__not_released(self):
+        # i.e. an eager Task w/i a request, or in a transaction
+        for conn in (make_conn(), make_conn(released_at=0)):
+            conn.in_atomic_block = conn.released_at is not None
+
+            self.check(conn)
+
+            self.assertFalse(conn.is_usable.called)
+            self.assertFalse(conn.close.called)
+
+    def test_release(self):
+        conn, closed = make_conn(), make_conn()
+        closed.connection = None
+        self.connections.all.return_value = [conn, closed]
+
+        connections.release()
+
+        self.assertTrue(conn.released_at <= time.time())
+        self.assertIsNone(closed.released_at)
+
+    def test_discard_inherited(self):
+        conn = make_conn(released_at=time.time())
+        inherited = conn.connection
+        self.connections.all.return_value = [conn]
+
+        connections.discard_inherited()
+
+        self.assertIsNone(conn.connection)
+        self.assertIsNone(conn.released_at)
+        self.assertFalse(inherited.close.called)
+        self.assertIn(inherited, connections._inherited)
+        connections._inherited.remove(inherited)
+
+
+@override_settings(METRICS_BACKEND=MEMORY_BACKEND, METRICS_SLOW_REQUEST=None)
+class ConnectionMetricsTests(SimpleTestCase):
+
+    def test_db_connects(self):
+        tracker = metrics.start('task', 'foo')
+        connection_created.send(sender=connection.__class__, connection=connection)
+        metrics.stop()
+
+        self.assertEqual(tracker.calls['db_connects'], 1)
+        self.assertIn(('db_connects', 1), list(metrics.values(tracker)))
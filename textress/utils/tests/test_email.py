@@ -1,13 +1,19 @@
+import datetime
+
 from django.conf import settings
+from django.core import mail
 from django.test import TestCase
+from django.utils import timezone
 
+from mock import MagicMock
 from model_mommy import mommy
 
 from account.models import AcctCost
 from main.tests.factory import create_hotel, create_hotel_user
 from payment.tests.factory import charge, customer
 from utils import create, email
-from utils.email import Email
+from utils.email import Email, send_outbox_emails
+from utils.models import OutboxEmail
 
 
 class LiveEmailTests(TestCase):
@@ -45,3 +51,115 @@ class LiveEmailTests(TestCase):
         _charge = charge(_customer.id)
         # send
         email.send_charge_failed_email(self.hotel, _charge.amount)
+
+
+class OutboxEmailTests(TestCase):
+
+    def setUp(self):
+        create._get_groups_and_perms()
+        self.hotel = create_hotel()
+        self.user = create_hotel_user(self.hotel, group="hotel_admin")
+        self.email = Email(
+            to=settings.DEFAULT_EMAIL_AARON,
+            subject='email/delete_unknown_number_failed/subject.txt',
+            html_content='email/delete_unknown_number_failed/email.html',
+            extra_context={'ph_num': '+17025551234'}
+            )
+
+    def test_text_content_from_html(self):
+        self.assertIn('+17025551234', self.email.text_content)
+        self.assertNotIn('<', self.email.text_content)
+
+    def test_text_content_template(self):
+        email = Email(
+            to=settings.DEFAULT_EMAIL_AARON,
+            subject='email/delete_unknown_number_failed/subject.txt',
+            html_content='email/delete_unknown_number_failed/email.html',
+            text_content='email/delete_unknown_number_failed/subject.txt'
+            )
+        self.assertEqual(email.text_content, email.subject)
+
+    def test_queue(self):
+        outbox_email = self.email.queue()
+
+        self.assertEqual(outbox_email.status, OutboxEmail.PENDING)
+        self.assertEqual(outbox_email.to, settings.DEFAULT_EMAIL_AARON)
+        self.assertEqual(outbox_email.bcc, settings.DEFAULT_EMAIL_NOREPLY)
+        self.assertEqual(outbox_email.html_content, self.email.html_content)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_msg(self):
+        msg = self.email.queue().msg
+
+        self.assertEqual(msg.subject, self.email.subject)
+        self.assertEqual(msg.to, [settings.DEFAULT_EMAIL_AARON])
+        self.assertEqual(msg.bcc, [settings.DEFAULT_EMAIL_NOREPLY])
+        self.assertEqual(msg.alternatives, [(self.email.html_content, "text/html")])
+
+    def test_billing_emails_are_queued(self):
+        mommy.make(AcctCost, hotel=self.hotel)
+        email.send_auto_recharge_failed_email(self.hotel)
+        email.send_charge_failed_email(self.hotel, 1000)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.filter(to=self.user.email).count(), 2)
+
+    def test_send_outbox_emails(self):
+        for i in range(3):
+            self.email.queue()
+
+        send_outbox_emails(batch_size=2)
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.SENT).count(), 3)
+
+    def test_send_outbox_emails_not_due(self):
+        outbox_email = self.email.queue()
+        outbox_email.send_after = timezone.now() + datetime.timedelta(minutes=1)
+        outbox_email.save()
+
+        send_outbox_emails()
+
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_claim(self):
+        self.email.queue()
+        self.email.queue()
+
+        batch = list(OutboxEmail.objects.claim(batch_size=1))
+
+        self.assertEqual(len(batch), 1)
+        self.assertEqual(batch[0].status, OutboxEmail.SENDING)
+        self.assertEqual(OutboxEmail.objects.pending().count(), 1)
+
+    def test_claim_stale(self):
+        outbox_email = self.email.queue()
+        stale = timezone.now() - datetime.timedelta(
+            seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT + 1)
+        OutboxEmail.objects.filter(pk=outbox_email.pk).update(
+            status=OutboxEmail.SENDING, modified=stale)
+
+        self.assertEqual(list(OutboxEmail.objects.claim(batch_size=1)), [outbox_email])
+
+    def test_send_failed_retry(self):
+        outbox_email = self.email.queue()
+        connection = MagicMock()
+        connection.send_messages.side_effect = Exception("Mandrill down")
+
+        outbox_email.send(connection)
+
+        outbox_email = OutboxEmail.objects.get(pk=outbox_email.pk)
+        self.assertEqual(outbox_email.status, OutboxEmail.PENDING)
+        self.assertEqual(outbox_email.attempts, 1)
+        self.assertIn("Mandrill down", outbox_email.last_error)
+        self.assertTrue(outbox_email.send_after > timezone.now())
+
+    def test_send_failed_max_attempts(self):
+        outbox_email = self.email.queue()
+        outbox_email.attempts = settings.EMAIL_OUTBOX_MAX_ATTEMPTS - 1
+        connection = MagicMock()
+        connection.send_messages.side_effect = Exception("Mandrill down")
+
+        outbox_email.send(connection)
+
+        self.assertEqual(outbox_email.status, OutboxEmail.FAILED)
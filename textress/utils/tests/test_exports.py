@@ -0,0 +1,49 @@
+import datetime
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from model_mommy import mommy
+
+from utils.exports import chunked, csv_lines, ndjson_lines
+
+
+class ExportsTests(TestCase):
+
+    def setUp(self):
+        self.users = mommy.make(User, _quantity=5)
+
+    def test_chunked(self):
+        rows = list(chunked(User.objects.all(), ['username'], size=2))
+
+        self.assertEqual(rows, [(u.username,) for u in sorted(self.users, key=lambda u: u.pk)])
+
+    def test_chunked__1_query_per_chunk(self):
+        # 2 full chunks and 1 partial
+        with self.assertNumQueries(3):
+            list(chunked(User.objects.all(), ['username'], size=2))
+
+        # 1 full chunk and 1 empty
+        with self.assertNumQueries(2):
+            list(chunked(User.objects.all(), ['username'], size=5))
+
+    @override_settings(EXPORT_CHUNK_SIZE=3)
+    def test_chunked__default_size(self):
+        with self.assertNumQueries(2):
+            rows = list(chunked(User.objects.all(), ['id']))
+
+        self.assertEqual(len(rows), 5)
+
+    def test_csv_lines(self):
+        lines = list(csv_lines(['id', 'body', 'cost'], [(1, u'caf\xe9, "ok"', None)]))
+
+        self.assertEqual(lines, ['id,body,cost\r\n', '1,"caf\xc3\xa9, ""ok""",\r\n'])
+
+    def test_ndjson_lines(self):
+        lines = list(ndjson_lines(['id', 'insert_date'], [(1, datetime.date(2015, 11, 1))]))
+
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith('\n'))
+        self.assertEqual(json.loads(lines[0]), {'id': 1, 'insert_date': '2015-11-01'})
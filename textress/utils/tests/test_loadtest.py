@@ -0,0 +1,102 @@
+import json
+
+from mock import patch
+
+from django.test import TestCase
+
+from celery.app.task import Task
+import stripe
+
+from concierge import deltas, status
+from main import models as main_models
+from sms.models import PhoneNumberCandidates
+from sms.ratelimit import TokenBucket
+
+from utils.loadtest import fakes
+from utils.loadtest.scenarios import Data, SCENARIOS
+from utils.loadtest.stats import Result, percentile
+from utils.redis_server import get_server
+
+
+class PercentileTests(TestCase):
+
+    def test_percentile(self):
+        values = range(1, 101)
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+
+    def test_percentile__empty(self):
+        self.assertEqual(percentile([], 50), 0)
+
+
+class ResultTests(TestCase):
+
+    def test_measure(self):
+        result = Result('foo')
+
+        result.measure(lambda: fakes.calls.update(['twilio', 'twilio']))
+
+        self.assertEqual(result.requests, 1)
+        self.assertEqual(result.errors, 0)
+        self.assertEqual(result.queries, [0])
+        self.assertEqual(result.calls_per_request('twilio'), 2)
+
+    def test_measure__error(self):
+        result = Result('foo')
+
+        result.measure(lambda: 1/0)
+
+        self.assertEqual(result.errors, 1)
+        self.assertIn('ZeroDivisionError', result.last_error)
+
+
+class ScenarioTests(TestCase):
+
+    @patch('sys.argv', ['manage.py', 'loadtest'])
+    def test_scenarios(self):
+        # w/o 'test' in ``sys.argv`` so the live code paths run against the fakes
+        with fakes.offline():
+            data = Data(hotels=2, guests=2, messages=1)
+
+            for scenario_class in SCENARIOS:
+                scenario = scenario_class(data)
+                result = Result(scenario.name)
+                for i in range(4):
+                    result.measure(scenario.request, i)
+
+                self.assertEqual(result.errors, 0, result.last_error)
+                self.assertTrue(result.queries_per_request > 0)
+
+    def test_offline__restores(self):
+        originals = (stripe.Customer, Task.__dict__['apply_async'], main_models.TwilioRestClient)
+
+        with fakes.offline():
+            self.assertIs(stripe.Customer, fakes.FakeStripeCustomer)
+
+        self.assertEqual((stripe.Customer, Task.__dict__['apply_async'],
+            main_models.TwilioRestClient), originals)
+
+    def test_offline__redis(self):
+        with fakes.offline():
+            server = get_server()
+            self.assertIsInstance(server, fakes.FakeRedis)
+
+            bucket = TokenBucket('+17025550000')
+            self.assertEqual([bucket.reserve(max_wait=0) for i in range(3)], [0, 0, 0])
+
+            patch = deltas.publish(1, 'guest', 'archive', {'ids': [1]}, users=['foo'])
+            self.assertEqual(json.loads(patch)['version'], 1)
+            self.assertEqual(deltas.since(1, 0)['deltas'], [json.loads(patch)])
+            self.assertEqual(deltas.since(1, 1)['deltas'], [])
+
+            self.assertTrue(status.push({'MessageSid': 'SM1', 'MessageStatus': 'sent'}))
+            self.assertFalse(status.push({'MessageSid': 'SM1', 'MessageStatus': 'delivered'}))
+            self.assertEqual([u['status'] for u in status.pop()], ['sent', 'delivered'])
+
+            PhoneNumberCandidates.set('702', ['+17025550001', '+17025550002'])
+            self.assertEqual(PhoneNumberCandidates.take('702', 1), ['+17025550001'])
+            self.assertEqual(PhoneNumberCandidates.get('702'), ['+17025550002'])
+
+        self.assertIsNot(get_server(), server)
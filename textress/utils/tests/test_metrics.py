@@ -0,0 +1,191 @@
+from mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from account import tasks
+from concierge.tests.factory import make_guests
+from main.tests.factory import create_hotel, create_hotel_user, PASSWORD
+from utils import create, metrics
+
+
+class MemoryBackend(object):
+    trackers = []
+
+    def record(self, tracker):
+        self.trackers.append(tracker)
+
+
+MEMORY_BACKEND = 'utils.tests.test_metrics.MemoryBackend'
+
+
+@override_settings(METRICS_BACKEND=MEMORY_BACKEND, METRICS_SLOW_REQUEST=None)
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        MemoryBackend.trackers = []
+
+    def test_tracker_db(self):
+        tracker = metrics.start('task', 'foo')
+        User.objects.count()
+        User.objects.count()
+        metrics.stop()
+
+        self.assertEqual(tracker.calls['db'], 2)
+        self.assertTrue(tracker.seconds['db'] >= 0)
+        # w/o the slow log, no SQL is kept
+        self.assertEqual(tracker.queries, [])
+        self.assertTrue(tracker.elapsed >= 0)
+        self.assertEqual(MemoryBackend.trackers, [tracker])
+
+    @override_settings(METRICS_SLOW_REQUEST=1, METRICS_SLOW_QUERIES=2)
+    def test_tracker_db__slowest_kept(self):
+        tracker = metrics.start('task', 'foo')
+        for seconds in (0.3, 0.1, 0.5, 0.2):
+            tracker.add_query("SELECT {}".format(seconds), seconds)
+        metrics.stop()
+
+        self.assertEqual(tracker.calls['db'], 4)
+        self.assertEqual([q['sql'] for q in tracker.queries], ["SELECT 0.5", "SELECT 0.3"])
+
+    def test_tracker_db__all_aliases(self):
+        tracker = metrics.start('task', 'foo')
+        with connections['replica'].cursor() as cursor:
+            cursor.execute("SELECT 1")
+            self.assertEqual(cursor.fetchone()[0], 1)
+        metrics.stop()
+
+        self.assertEqual(tracker.calls['db'], 1)
+
+    def test_tracker_cache(self):
+        tracker = metrics.start('task', 'foo')
+        cache.set('foo', 1)
+        cache.get('foo')
+        metrics.stop()
+
+        self.assertTrue(tracker.calls['cache'] >= 2)
+
+    def test_counted(self):
+        func = metrics._counted('twilio', lambda: 'bar')
+
+        self.assertEqual(func(), 'bar')
+
+        outer = metrics.start('request', 'foo', 'GET')
+        inner = metrics.start('task', 'foo')
+        func()
+        metrics.stop()
+        metrics.stop()
+
+        self.assertEqual(outer.calls['twilio'], 1)
+        self.assertEqual(inner.calls['twilio'], 1)
+        self.assertIsNone(metrics.current())
+
+    def test_stop__no_tracker(self):
+        self.assertIsNone(metrics.stop())
+
+    @override_settings(METRICS_SLOW_REQUEST=0, METRICS_SLOW_QUERIES=1)
+    def test_slow(self):
+        with patch.object(metrics.logger, 'warning') as mock_warning:
+            metrics.start('task', 'foo')
+            User.objects.count()
+            metrics.stop()
+
+        message = mock_warning.call_args[0][0]
+        self.assertIn("Slow task: foo", message)
+        self.assertIn("db=1", message)
+        self.assertIn("auth_user", message)
+
+    def test_statsd_lines(self):
+        tracker = metrics.start('request', 'concierge:receive_sms', 'POST')
+        metrics.stop()
+
+        with override_settings(METRICS_STATSD_PREFIX='textress'):
+            lines = list(metrics.StatsdBackend().lines(tracker))
+
+        self.assertIn("textress.request.concierge_receive_sms.POST.count:1|c", lines)
+        self.assertIn("textress.request.concierge_receive_sms.POST.db_calls:0|c", lines)
+
+
+@override_settings(METRICS_BACKEND='utils.metrics.RedisBackend', METRICS_SLOW_REQUEST=None)
+class RedisBackendTests(TestCase):
+
+    def setUp(self):
+        self.backend = metrics.RedisBackend()
+        self.backend.prefix = 'metrics_test'
+        metrics._backends['utils.metrics.RedisBackend'] = self.backend
+
+    def tearDown(self):
+        self.backend.reset()
+        del metrics._backends['utils.metrics.RedisBackend']
+
+    def test_prometheus(self):
+        for i in range(2):
+            metrics.start('request', 'guest-list', 'GET')
+            User.objects.count()
+            metrics.stop()
+
+        text = self.backend.prometheus()
+
+        self.assertIn("# TYPE textress_request_count_total counter", text)
+        self.assertIn('textress_request_count_total{endpoint="guest-list",method="GET"} 2.0', text)
+        self.assertIn('textress_request_db_calls_total{endpoint="guest-list",method="GET"} 2.0', text)
+
+    def test_metrics_view(self):
+        metrics.start('task', 'account.tasks.foo')
+        metrics.stop()
+
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('textress_task_count_total{task="account.tasks.foo"} 1.0', response.content)
+
+    def test_metrics_view__not_allowed(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(METRICS_BACKEND=MEMORY_BACKEND, METRICS_SLOW_REQUEST=None)
+class MetricsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        MemoryBackend.trackers = []
+        create._get_groups_and_perms()
+        self.hotel = create_hotel()
+        self.admin = create_hotel_user(self.hotel, group='hotel_admin')
+        make_guests(self.hotel, number=2)
+
+    def test_receive_sms(self):
+        self.client.get(reverse('concierge:receive_sms'))
+
+        tracker = MemoryBackend.trackers[-1]
+        self.assertEqual(tracker.kind, 'request')
+        self.assertEqual(tracker.labels, ('concierge:receive_sms', 'GET'))
+
+    def test_api(self):
+        self.client.login(username=self.admin.username, password=PASSWORD)
+        MemoryBackend.trackers = []
+
+        response = self.client.get('/api/guests/')
+
+        self.assertEqual(response.status_code, 200)
+        tracker = MemoryBackend.trackers[-1]
+        self.assertEqual(tracker.labels, ('guest-list', 'GET'))
+        self.assertTrue(tracker.calls['db'] > 0)
+
+    def test_unresolved(self):
+        self.client.get('/does-not-exist/')
+
+        self.assertEqual(MemoryBackend.trackers[-1].labels, ('unresolved', 'GET'))
+
+    @patch('account.tasks.get_or_create_acct_stmt.delay')
+    def test_task(self, mock_delay):
+        tasks.get_or_create_acct_stmt_all_hotels.apply(args=(1, 2016))
+
+        tracker = MemoryBackend.trackers[-1]
+        self.assertEqual(tracker.kind, 'task')
+        self.assertEqual(tracker.labels, ('account.tasks.get_or_create_acct_stmt_all_hotels',))
+        self.assertEqual(tracker.calls['db'], 1)
@@ -71,6 +71,17 @@ class DatesTests(TestCase):
         self.assertIsInstance(ret, datetime.date)
         self.assertEqual(ret, raw_first_of_next_month)
 
+    def test_first_of_month_ago(self):
+        dates = Dates()
+        self.assertEqual(dates.first_of_month_ago(0), dates.first_of_month())
+        self.assertEqual(dates.first_of_month_ago(1),
+            dates.last_month_end().replace(day=1))
+
+        ret = dates.first_of_month_ago(13)
+
+        self.assertEqual(ret.day, 1)
+        self.assertEqual((dates._today.year - ret.year) * 12 + dates._today.month - ret.month, 13)
+
     def test_last_month_end(self):
         dates = Dates()
         self.assertEqual(
@@ -0,0 +1,15 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from utils.redis_server import get_server
+
+
+class RedisServerTests(SimpleTestCase):
+
+    def test_get_server(self):
+        self.assertIs(get_server(), get_server())
+
+    def test_get_server__not_cache_db(self):
+        "``cache.clear()`` doesn't flush the raw keys."
+        self.assertNotEqual(get_server().connection_pool.connection_kwargs['db'],
+            cache.master_client.connection_pool.connection_kwargs['db'])
@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory
+from django.test.utils import override_settings
+from django.views.generic import View
+
+from contact.models import Topic
+from utils import routers
+from utils.middleware import ReplicaMiddleware
+from utils.mixins import ReplicaMixin
+
+
+class UserDBView(ReplicaMixin, View):
+    "Responds w/ the alias a User query would read from."
+
+    def get(self, request):
+        return HttpResponse(User.objects.all().db)
+
+    def post(self, request):
+        return HttpResponse(User.objects.all().db)
+
+
+@override_settings(DATABASE_REPLICA='replica')
+class ReplicaRouterTests(TestCase):
+
+    def setUp(self):
+        routers.reset()
+        self.addCleanup(routers.reset)
+
+    def test_read(self):
+        self.assertEqual(User.objects.all().db, 'default')
+
+        with routers.use_replica():
+            self.assertEqual(User.objects.all().db, 'replica')
+
+        self.assertEqual(User.objects.all().db, 'default')
+
+    def test_read__primary(self):
+        with routers.use_replica():
+            with routers.use_primary():
+                self.assertEqual(User.objects.all().db, 'default')
+
+            self.assertEqual(User.objects.all().db, 'replica')
+
+    def test_read__after_write(self):
+        with routers.use_replica():
+            Topic.objects.create(name='foo')
+
+            self.assertEqual(User.objects.all().db, 'default')
+
+        self.assertTrue(routers.wrote())
+
+    def test_read__sticky(self):
+        routers.reset(sticky=True)
+
+        with routers.use_replica():
+            self.assertEqual(User.objects.all().db, 'default')
+
+    @override_settings(DATABASE_REPLICA=None)
+    def test_read__no_replica(self):
+        with routers.use_replica():
+            self.assertEqual(User.objects.all().db, 'default')
+
+    def test_on_replica(self):
+        dbs = []
+        task = routers.on_replica(lambda: dbs.append(User.objects.all().db))
+        Topic.objects.create(name='foo')
+
+        task()
+
+        # the earlier write doesn't keep the Task on the primary
+        self.assertEqual(dbs, ['replica'])
+        self.assertTrue(routers.wrote())
+
+    def test_allow_migrate(self):
+        router = routers.ReplicaRouter()
+
+        self.assertFalse(router.allow_migrate('replica', 'main'))
+        self.assertIsNone(router.allow_migrate('default', 'main'))
+
+
+@override_settings(DATABASE_REPLICA='replica')
+class ReplicaMixinTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = ReplicaMiddleware()
+        self.cookie = settings.DATABASE_REPLICA_STICKY_COOKIE
+        self.addCleanup(routers.reset)
+
+    def dispatch(self, request):
+        self.middleware.process_request(request)
+        response = UserDBView.as_view()(request)
+        return self.middleware.process_response(request, response)
+
+    def test_get(self):
+        response = self.dispatch(self.factory.get('/'))
+
+        self.assertEqual(response.content, 'replica')
+        self.assertNotIn(self.cookie, response.cookies)
+
+    def test_post(self):
+        response = self.dispatch(self.factory.post('/'))
+
+        self.assertEqual(response.content, 'default')
+
+    def test_get__sticky(self):
+        request = self.factory.get('/')
+        request.COOKIES[self.cookie] = '1'
+
+        response = self.dispatch(request)
+
+        self.assertEqual(response.content, 'default')
+
+    def test_write_sets_sticky_cookie(self):
+        request = self.factory.post('/')
+        self.middleware.process_request(request)
+        Topic.objects.create(name='foo')
+
+        response = self.middleware.process_response(request, HttpResponse())
+
+        self.assertEqual(response.cookies[self.cookie]['max-age'],
+            settings.DATABASE_REPLICA_STICKY_SECONDS)
+
+    @override_settings(DATABASE_REPLICA=None)
+    def test_middleware_not_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaMiddleware()
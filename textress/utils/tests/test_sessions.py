@@ -0,0 +1,118 @@
+import pickle
+
+from mock import patch
+
+from django.conf import settings
+from django.test import TestCase
+
+from utils.sessions import CompactSerializer, SessionStore
+
+
+class CompactSerializerTests(TestCase):
+
+    def setUp(self):
+        self.serializer = CompactSerializer()
+
+    def test_dumps_loads(self):
+        data = {'_auth_user_id': '1', 'django_timezone': 'America/Los_Angeles'}
+
+        serialized = self.serializer.dumps(data)
+
+        self.assertEqual(serialized[:1], b'j')
+        self.assertEqual(self.serializer.loads(serialized), data)
+
+    def test_dumps_loads__compressed(self):
+        data = {'key': 'a' * 1000}
+
+        serialized = self.serializer.dumps(data)
+
+        self.assertEqual(serialized[:1], b'z')
+        self.assertLess(len(serialized), 1000)
+        self.assertEqual(self.serializer.loads(serialized), data)
+
+
+    def test_loads__pickle(self):
+        "Pickled sessions aren't loaded, they could run code."
+        with self.assertRaises(ValueError):
+            self.serializer.loads(b'p' + pickle.dumps({'_auth_user_id': '1'}))
+
+
+class SessionStoreTests(TestCase):
+
+    def setUp(self):
+        self.session = SessionStore()
+        self.session['_auth_user_id'] = '1'
+        self.session.save()
+        self.session_key = self.session.session_key
+        self.key = self.session.get_real_stored_key(self.session_key)
+        self.server = self.session.server
+
+    def tearDown(self):
+        self.session.delete()
+
+    def request(self, modify=False):
+        "What the middleware does for each request w/ ``SESSION_SAVE_EVERY_REQUEST``."
+        session = SessionStore(self.session_key)
+        session.get('_auth_user_id')
+        if modify:
+            session['django_timezone'] = 'America/Los_Angeles'
+        session.save()
+        return session
+
+    def test_load(self):
+        session = SessionStore(self.session_key)
+        self.assertEqual(session['_auth_user_id'], '1')
+
+    def test_load__does_not_exist(self):
+        session = SessionStore('x' * 32)
+        self.assertEqual(session.load(), {})
+        self.assertIsNone(session.session_key)
+
+    def test_load__corrupted(self):
+        self.server.set(self.key, b'bad-hash:data')
+
+        session = SessionStore(self.session_key)
+
+        self.assertEqual(session.load(), {})
+
+    def test_load__pickled(self):
+        session = SessionStore(self.session_key)
+        serialized = b'p' + pickle.dumps({'_auth_user_id': '1'})
+        self.server.set(self.key, session._hash(serialized).encode() + b':' + serialized)
+
+        self.assertEqual(SessionStore(self.session_key).load(), {})
+
+    def test_save__unchanged(self):
+        with patch.object(self.server, 'setex') as mock_setex, \
+            patch.object(self.server, 'expire') as mock_expire:
+            self.request()
+
+        self.assertFalse(mock_setex.called)
+        self.assertFalse(mock_expire.called)
+
+    def test_save__changed(self):
+        self.request(modify=True)
+
+        session = SessionStore(self.session_key)
+        self.assertEqual(session['django_timezone'], 'America/Los_Angeles')
+
+    def test_save__changed_in_place(self):
+        self.session['hotel'] = {'name': 'foo'}
+        self.session.save()
+
+        session = SessionStore(self.session_key)
+        session['hotel']['name'] = 'bar'
+        session.save()
+
+        self.assertEqual(SessionStore(self.session_key)['hotel']['name'], 'bar')
+
+    def test_save__refresh_ttl(self):
+        expiry_age = self.session.get_expiry_age()
+        stale_ttl = expiry_age - settings.SESSION_REFRESH_INTERVAL - 1
+        self.server.expire(self.key, stale_ttl)
+
+        with patch.object(self.server, 'setex') as mock_setex:
+            self.request()
+
+        self.assertFalse(mock_setex.called)
+        self.assertGreater(self.server.ttl(self.key), stale_ttl)
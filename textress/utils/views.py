@@ -1,6 +1,12 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
 from rest_framework import viewsets
 from rest_framework.response import Response
 
+from sms import ratelimit
+from utils import metrics
+
 
 class ListDataMixin(object):
 
@@ -45,3 +51,20 @@ class BaseModelViewSet(ListDataMixin, viewsets.ModelViewSet):
             queryset = queryset.filter(**kwargs)
 
         return queryset
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint for ``utils.metrics.RedisBackend``. Only
+    for ``METRICS_ALLOWED_IPS``.
+    """
+    if (not settings.METRICS_BACKEND or
+            request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS):
+        raise Http404
+
+    backend = metrics.get_backend()
+    if not hasattr(backend, 'prometheus'):
+        raise Http404
+
+    return HttpResponse(backend.prometheus() + ratelimit.prometheus(),
+        content_type='text/plain; version=0.0.4')